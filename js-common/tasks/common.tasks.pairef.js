@@ -2,7 +2,7 @@
 /*
  *  =================================================================
  *
- *    07.02.25   <--  Date of Last Modification.
+ *    18.10.26   <--  Date of Last Modification.
  *                   ~~~~~~~~~~~~~~~~~~~~~~~~~~~~
  *  -----------------------------------------------------------------
  *
@@ -13,7 +13,7 @@
  *  **** Content :  PaiRef task class
  *       ~~~~~~~~~
  *
- *  (C) M. Fando, E. Krissinel, A. Lebedev, M. Fando  2023-2025
+ *  (C) M. Fando, E. Krissinel, A. Lebedev, M. Fando  2023-2026
  *
  *  =================================================================
  *
@@ -309,6 +309,11 @@ TaskPaiRef.prototype.checkKeywords = function ( keywords )  {
                                            'resolution','cut-off'] );
 }
 
+TaskPaiRef.prototype.getNCores = function ( ncores_available )  {
+// refmac jobs of each resolution step run concurrently
+  return Math.min(8,ncores_available);
+}
+
 if (!__template)  {  //  will run only on client side
 
   TaskPaiRef.prototype.collectInput = function ( inputPanel )  {
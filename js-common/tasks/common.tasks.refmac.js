@@ -2,7 +2,7 @@
 /*
  *  ==========================================================================
  *
- *    20.02.25   <--  Date of Last Modification.
+ *    18.10.26   <--  Date of Last Modification.
  *                   ~~~~~~~~~~~~~~~~~~~~~~~~~~~~
  *  -------------------------------------------------------------------------
  *
@@ -14,7 +14,7 @@
  *       ~~~~~~~~~
  *
  *  (C) E. Krissinel, A. Lebedev, R. Nicholls, O. Kovalevskyi,
- *      M. Fando 2016-2025
+ *      M. Fando 2016-2026
  *
  *  ==========================================================================
  *
@@ -703,6 +703,18 @@ TaskRefmac.prototype.checkKeywords = function ( keywords )  {
   return this.__check_keywords ( keywords,['refmac','refinement','refmac5'] );
 }
 
+TaskRefmac.prototype.getNCores = function ( ncores_available )  {
+// independent ProSMART passes (protein and nucleic acid homologues, h-bonds)
+// run concurrently before refinement
+  let npasses = 0;
+  if (('hmodel' in this.input_data.data) && (this.input_data.data.hmodel.length>0))
+    npasses = 2;
+  if (('sec3' in this.parameters) && ('HBOND_RESTR' in this.parameters.sec3.contains) &&
+      (this.parameters.sec3.contains.HBOND_RESTR.value=='yes'))
+    npasses++;
+  return Math.max ( 1,Math.min(npasses,ncores_available) );
+}
+
 
 if (!__template)  {
   //  for client side
@@ -3,13 +3,13 @@
 #
 # ============================================================================
 #
-#    23.03.23   <--  Date of Last Modification.
+#    18.10.26   <--  Date of Last Modification.
 #                   ~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 # ----------------------------------------------------------------------------
 #
 #  CCP4build Base class
 #
-#  Copyright (C) Eugene Krissinel, Andrey Lebedev 2019-2023
+#  Copyright (C) Eugene Krissinel, Andrey Lebedev 2019-2026
 #
 # ============================================================================
 #
@@ -101,7 +101,68 @@ class Build(ccp4build_report.Report):
                                 self.report_page_id,self.rvrow+5,0 )
         return
 
-    
+
+    def build_branches ( self,meta,dm_mode,first_cycle,rebuild_dm,prefix,refcyc ):
+        #  builds model without and/or after density modification, as
+        #  required by dm_mode; returns metas of both builds (None if not
+        #  done). Both builds run at the same time if cores allow.
+
+        def build_nodm():
+            meta_mb = self.cbuccaneer ( meta,first_cycle,nameout=prefix+"01-1.cbuccaneer" )
+            if meta_mb["cbuccaneer"]["n_res_built"]>0:
+                return self.refmac ( meta_mb,ncycles=refcyc["inter"],nameout=prefix+"03-1.refmac" )
+            return meta_mb
+
+        def build_dm():
+            meta_dm = self.parrot     ( meta,first_cycle,nameout=prefix+"01-2.parrot" )
+            meta_mb = self.cbuccaneer ( meta_dm,rebuild_dm,nameout=prefix+"01-2.cbuccaneer" )
+            if meta_mb["cbuccaneer"]["n_res_built"]>0:
+                return self.refmac ( meta_mb,ncycles=refcyc["inter"],nameout=prefix+"03-2.refmac" )
+            return meta_mb
+
+        branches = []
+        if dm_mode in ["auto","never"]:
+            branches.append ( (prefix+"nodm",build_nodm) )
+        if dm_mode in ["auto","always"]:
+            branches.append ( (prefix+"dm",build_dm) )
+        metas = self.runBranches ( branches )
+
+        meta_mb1 = None
+        meta_mb2 = None
+        if dm_mode in ["auto","never"]:
+            meta_mb1 = metas[0]
+        if dm_mode in ["auto","always"]:
+            meta_mb2 = metas[-1]
+        return (meta_mb1,meta_mb2)
+
+
+    def trial_waters ( self,meta,prefix,refcyc ):
+        return self.refmac ( self.findwaters(meta,nameout=prefix+"12.findwaters"),
+                             ncycles=refcyc["inter"],nameout=prefix+"13.refmac" )
+
+    def trial_coot ( self,meta1,coot_script,prefix,refcyc,speculate_waters ):
+        #  runs coot trial on check point meta1 and returns its meta (None
+        #  if coot has failed). If speculate_waters is True and cores allow,
+        #  water trial on meta1 is run at the same time and returned as
+        #  well, to be used if coot trial is rejected; otherwise None is
+        #  returned for water trial.
+
+        def coot_branch():
+            meta2 = self.coot ( meta1,coot_script,nameout=prefix+"06.coot" )
+            if self.is_coot:  # self.is_coot may turn False in the above call
+                return self.refmac ( meta2,ncycles=refcyc["inter"],
+                                           nameout=prefix+"07.refmac" )
+            return None
+
+        if not (speculate_waters and self.parallelBranches()):
+            return (coot_branch(),None)
+
+        return tuple ( self.runBranches ([
+            (prefix+"coot"  ,coot_branch),
+            (prefix+"waters",lambda: self.trial_waters(meta1,prefix,refcyc))
+        ]))
+
+
     def ccp4build_mr ( self ):
 
         refcyc = self.ref_cycles[min(3,max(0,int(self.input_data["ref_level"])-1))]
@@ -170,23 +231,11 @@ class Build(ccp4build_report.Report):
 
             #  modify density
 
-            if dm_mode in ["auto","never"]:
-                #  first attempt: build without DM
-                meta_mb = self.cbuccaneer ( meta,(i<=0),nameout=prefix+"01-1.cbuccaneer" )
-                if meta_mb["cbuccaneer"]["n_res_built"]>0:
-                    meta_mb1 = self.refmac(meta_mb,ncycles=refcyc["inter"],nameout=prefix+"03-1.refmac")
-                else:
-                    meta_mb1 = meta_mb
+            #  first attempt: build without DM; second attempt: build after DM
+            meta_mb1,meta_mb2 = self.build_branches ( meta,dm_mode,(i<=0),(i<=0),
+                                                      prefix,refcyc )
 
             if dm_mode in ["auto","always"]:
-                #  second attempt: build after DM
-                meta_dm = self.parrot      ( meta,(i<=0),nameout=prefix+"01-2.parrot" )
-                meta_mb = self.cbuccaneer  ( meta_dm,(i<=0),nameout=prefix+"01-2.cbuccaneer" )
-                if meta_mb["cbuccaneer"]["n_res_built"]>0:
-                    meta_mb2 = self.refmac(meta_mb,ncycles=refcyc["inter"],nameout=prefix+"03-1.refmac")
-                else:
-                    meta_mb2 = meta_mb
-
                 if dm_mode=="auto":
                     n1 = meta_mb1["cbuccaneer"]["n_res_built"]
                     n2 = meta_mb2["cbuccaneer"]["n_res_built"]
@@ -216,6 +265,8 @@ class Build(ccp4build_report.Report):
                 self.workflow += "-"
                 meta_mb = meta_mb1
 
+            self.selectBranch ( meta_mb )
+
             if meta_mb["cbuccaneer"]["n_res_built"]<=0:
                 break
 
@@ -242,15 +293,18 @@ class Build(ccp4build_report.Report):
                 coot_workflow[2] = "R"
             coot_ind = "".join(coot_workflow)
 
+            meta_w = None  # water trial on check point meta1
             if (len(coot_script)>0) and self.is_coot:
-                meta2 = self.coot ( meta1,coot_script,nameout=prefix+"06.coot" )
-                if self.is_coot:  # self.is_coot may turn False in the above call
-                    meta4 = self.refmac ( meta2,ncycles=refcyc["inter"],
-                                                nameout=prefix+"07.refmac" )
-                    if fill_mode=="auto" or fit_mode=="auto" or rsr_mode=="auto":
+                coot_auto = fill_mode=="auto" or fit_mode=="auto" or rsr_mode=="auto"
+                meta4,meta_w = self.trial_coot ( meta1,coot_script,prefix,refcyc,
+                        coot_auto and model_waters and
+                        meta1["refmac"]["rfree"][1]<=float(self.input_data["trim_wat_rfree"]) )
+                if self.is_coot:
+                    if coot_auto:
                         meta4 = self.choose_solution ( coot_ind,meta1,meta4 )
                     else:
                         self.workflow += coot_ind
+                    self.selectBranch ( meta4 )
                 else:
                     self.workflow += coot_ind
                     meta4 = meta1
@@ -261,11 +315,10 @@ class Build(ccp4build_report.Report):
 
             if model_waters and self.is_coot:
                 if meta4["refmac"]["rfree"][1]<=float(self.input_data["trim_wat_rfree"]):
-                    meta_rf = self.choose_solution ( "W",meta4,
-                                self.refmac (
-                                    self.findwaters(meta4,
-                                              nameout=prefix+"12.findwaters" ),
-                                    ncycles=refcyc["inter"],nameout=prefix+"13.refmac" ) )
+                    if (meta_w is None) or (meta4 is not meta1):
+                        meta_w = self.trial_waters ( meta4,prefix,refcyc )
+                    meta_rf = self.choose_solution ( "W",meta4,meta_w )
+                    self.selectBranch ( meta_rf )
                 else:
                     self.workflow += "-"
                     meta_rf = meta4
@@ -358,27 +411,14 @@ class Build(ccp4build_report.Report):
 
             #  modify density
 
-            if dm_mode in ["auto","never"]:
-                #  first attempt: build without DM
-                meta_mb = self.cbuccaneer ( meta,(i<=0),nameout=prefix+"01-1.cbuccaneer" )
-                if meta_mb["cbuccaneer"]["n_res_built"]>0:
-                    meta_mb1 = self.refmac(meta_mb,ncycles=refcyc["inter"],nameout=prefix+"03-1.refmac")
-                else:
-                    meta_mb1 = meta_mb
+            #  first attempt: build without DM; second attempt: build after DM.
+            #  Note that meta contains xyzpath_mr ("MR model") and xyzpath
+            #  (fixed model) after previous iteration or if given on input,
+            #  and xyzpath_ha (HA substructure) used on 1st iteration
+            meta_mb1,meta_mb2 = self.build_branches ( meta,dm_mode,(i<=0),True,
+                                                      prefix,refcyc )
 
             if dm_mode in ["auto","always"]:
-                #  second attempt: build after DM
-                #  modify density; note that meta contains xyzpath_mr ("MR model")
-                #  and xyzpath (fixed model) after previous iteration or if given
-                #  on input, and xyzpath_ha (HA substructure) used on 1st
-                #  iteration
-                meta_dm = self.parrot     ( meta,(i<=0),nameout=prefix+"01-2.parrot" )
-                meta_mb = self.cbuccaneer ( meta_dm,True,nameout=prefix+"01-2.cbuccaneer" )
-                if meta_mb["cbuccaneer"]["n_res_built"]>0:
-                    meta_mb2 = self.refmac(meta_mb,ncycles=refcyc["inter"],nameout=prefix+"03-1.refmac")
-                else:
-                    meta_mb2 = meta_mb
-
                 if dm_mode=="auto":
                     n1 = meta_mb1["cbuccaneer"]["n_res_built"]
                     n2 = meta_mb2["cbuccaneer"]["n_res_built"]
@@ -400,6 +440,8 @@ class Build(ccp4build_report.Report):
                 self.workflow += "-"
                 meta_mb = meta_mb1
 
+            self.selectBranch ( meta_mb )
+
             if meta_mb["cbuccaneer"]["n_res_built"]<=0:
                 break
 
@@ -426,15 +468,18 @@ class Build(ccp4build_report.Report):
                 coot_workflow[2] = "R"
             coot_ind = "".join(coot_workflow)
 
+            meta_w = None  # water trial on check point meta1
             if (len(coot_script)>0) and self.is_coot:
-                meta2 = self.coot ( meta1,coot_script,nameout=prefix+"06.coot" )
+                coot_auto = fill_mode=="auto" or fit_mode=="auto" or rsr_mode=="auto"
+                meta4,meta_w = self.trial_coot ( meta1,coot_script,prefix,refcyc,
+                        coot_auto and model_waters and
+                        meta1["refmac"]["rfree"][1]<=float(self.input_data["trim_wat_rfree"]) )
                 if self.is_coot:
-                    meta4 = self.refmac ( meta2,ncycles=refcyc["inter"],
-                                                nameout=prefix+"07.refmac" )
-                    if fill_mode=="auto" or fit_mode=="auto" or rsr_mode=="auto":
+                    if coot_auto:
                         meta4 = self.choose_solution ( coot_ind,meta1,meta4 )
                     else:
                         self.workflow += coot_ind
+                    self.selectBranch ( meta4 )
                 else:
                     self.workflow += coot_ind
                     meta4 = meta1
@@ -445,11 +490,10 @@ class Build(ccp4build_report.Report):
 
             if model_waters and self.is_coot:
                 if meta4["refmac"]["rfree"][1]<=float(self.input_data["trim_wat_rfree"]):
-                    meta5 = self.choose_solution ( "W",meta4,
-                                self.refmac (
-                                    self.findwaters(meta4,
-                                              nameout=prefix+"12.findwaters" ),
-                                    ncycles=refcyc["inter"],nameout=prefix+"13.refmac" ) )
+                    if (meta_w is None) or (meta4 is not meta1):
+                        meta_w = self.trial_waters ( meta4,prefix,refcyc )
+                    meta5 = self.choose_solution ( "W",meta4,meta_w )
+                    self.selectBranch ( meta5 )
                 else:
                     self.workflow += "-"
                     meta5 = meta4
@@ -5,7 +5,7 @@
 #
 # ============================================================================
 #
-#    14.04.25   <--  Date of Last Modification.
+#    18.10.26   <--  Date of Last Modification.
 #                   ~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 # ----------------------------------------------------------------------------
 #
@@ -125,7 +125,8 @@ class Base(object):
         "stop_file"        : None,  # signal file to end gracefully
         "rfree_threshold"  : 0.000, # threshold for rfree comparisons in workflow
         "experiment_type"  : "xray",
-        "form_factor"      : "default"
+        "form_factor"      : "default",
+        "ncores"           : 1      # number of build branches to run at a time
     }
 
     workflow   = ""            # workflow tracker line
@@ -0,0 +1,182 @@
+##!/usr/bin/python
+
+#
+# ============================================================================
+#
+#    18.10.26   <--  Date of Last Modification.
+#                   ~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+# ----------------------------------------------------------------------------
+#
+#  CCP4build Branches class
+#
+#  Runs competing build branches (e.g. model building with and without
+#  density modification) in forked processes, each with its own scripts
+#  directory, log files and live-view files, so that branches do not
+#  interfere with each other. Branch outputs are returned to the driving
+#  process, where the winner is chosen as in serial build. Cores given to
+#  the job ("ncores") are split between branches running at a time, and
+#  programs started in a branch get thread variables for branch's share.
+#
+#  Copyright (C) Eugene Krissinel, Andrey Lebedev 2026
+#
+# ============================================================================
+#
+#
+
+import os
+import shutil
+import pickle
+import traceback
+
+import citations
+import ccp4build_edstats
+
+# ============================================================================
+
+thread_env_vars = [ "OMP_NUM_THREADS","MKL_NUM_THREADS","OPENBLAS_NUM_THREADS" ]
+
+def splitCores ( ncores,nparts ):
+    # numbers of threads for nparts branches sharing ncores, at least 1 each
+    return [ max(1,ncores//nparts + (1 if i<ncores%nparts else 0))
+             for i in range(nparts) ]
+
+
+class Branches(ccp4build_edstats.EDStats):
+
+    branch_results = []   # (meta,branch_dir) pairs from last runBranches()
+
+    def branchSlots ( self ):
+        #  number of branches which may run at a time
+        try:
+            ncores = int ( self.input_data["ncores"] )
+        except:
+            ncores = 1
+        if not hasattr(os,"fork"):
+            ncores = 1
+        return max ( 1,ncores )
+
+    def parallelBranches ( self ):
+        return self.branchSlots() > 1
+
+    # ----------------------------------------------------------------------
+
+    def _branch_dir ( self,name ):
+        return os.path.join ( self.workdir,"branches",name )
+
+    def _run_branch_child ( self,name,func,nthreads ):
+        #  executed in forked process; never returns
+        bdir   = self._branch_dir ( name )
+        status = 1
+        try:
+            for var in thread_env_vars:
+                os.environ[var] = str ( nthreads )
+            self.scriptsdir  = os.path.join ( bdir,"scripts" )
+            if not os.path.isdir(self.scriptsdir):
+                os.makedirs ( self.scriptsdir )
+            self.current_pdb = os.path.join ( bdir,"current.pdb" )
+            self.current_mtz = os.path.join ( bdir,"current.mtz" )
+            self.legend_html = os.path.join ( bdir,"legend.html" )
+            self.log_parser  = None
+            self.file_stdout = open ( os.path.join(bdir,"stdout.log"),"w" )
+            if self.file_srvout:
+                self.file_srvout = open ( os.path.join(bdir,"srvout.log"),"w" )
+            del citations.citation_list[:]
+            try:
+                meta = func()
+                with open(os.path.join(bdir,"result.pkl"),"wb") as f:
+                    pickle.dump ({
+                        "meta"      : meta,
+                        "is_coot"   : self.is_coot,
+                        "citations" : citations.citation_list
+                    },f )
+                status = 0
+            except:
+                self.file_stdout.write ( traceback.format_exc() )
+            self.file_stdout.close()
+            if self.file_srvout:
+                self.file_srvout.close()
+        finally:
+            os._exit ( status )
+
+    def _collect_branch ( self,name ):
+        #  appends branch logs to job logs and returns branch result, or
+        #  None if branch has failed
+        bdir = self._branch_dir ( name )
+        self.log ( "\n" + "="*80 + "\n## BRANCH " + name + "\n" )
+        fpath = os.path.join ( bdir,"stdout.log" )
+        if os.path.isfile(fpath):
+            with open(fpath,"r") as f:
+                shutil.copyfileobj ( f,self.file_stdout )
+        fpath = os.path.join ( bdir,"srvout.log" )
+        if self.file_srvout and os.path.isfile(fpath):
+            with open(fpath,"r") as f:
+                shutil.copyfileobj ( f,self.file_srvout )
+        fpath = os.path.join ( bdir,"result.pkl" )
+        if not os.path.isfile(fpath):
+            return None
+        with open(fpath,"rb") as f:
+            result = pickle.load ( f )
+        self.addCitations ( result["citations"] )
+        if not result["is_coot"]:
+            self.is_coot = False
+        return result
+
+    def runBranches ( self,branches ):
+        #  branches: list of (name,function) pairs, where function() runs
+        #            the branch and returns its meta; names must be unique
+        #            within the job.
+        #  Returns list of branch metas in order of branches. Up to
+        #  branchSlots() branches run at a time; logs are written in order
+        #  of branches. A branch failed in forked process is repeated in
+        #  this process, so that errors are reported as in serial build.
+
+        self.branch_results = []
+        nslots = self.branchSlots()
+        if nslots<=1 or len(branches)<=1:
+            return [func() for name,func in branches]
+
+        self.flush()
+        if self.file_srvout:
+            self.file_srvout.flush()
+
+        metas = []
+        for n0 in range(0,len(branches),nslots):
+            batch   = branches[n0:n0+nslots]
+            threads = splitCores ( nslots,len(batch) )
+            pids    = []
+            for (name,func),nthreads in zip(batch,threads):
+                bdir = self._branch_dir ( name )
+                if os.path.isdir(bdir):
+                    shutil.rmtree ( bdir )
+                os.makedirs ( bdir )
+                pid = os.fork()
+                if pid==0:
+                    self._run_branch_child ( name,func,nthreads )
+                pids.append ( pid )
+            for pid in pids:
+                os.waitpid ( pid,0 )
+            for name,func in batch:
+                result = self._collect_branch ( name )
+                if result:
+                    meta = result["meta"]
+                    self.branch_results.append ( (meta,self._branch_dir(name)) )
+                else:
+                    self.log ( "\n *** branch " + name + " failed, repeating\n" )
+                    meta = func()
+                metas.append ( meta )
+
+        self.flush()
+        return metas
+
+    def selectBranch ( self,meta ):
+        #  shows files of chosen branch in live view; does nothing if meta
+        #  was not produced by last runBranches()
+        for bmeta,bdir in self.branch_results:
+            if bmeta is meta:
+                for fname,fpath in [("current.pdb",self.current_pdb),
+                                    ("current.mtz",self.current_mtz),
+                                    ("legend.html",self.legend_html)]:
+                    if os.path.isfile(os.path.join(bdir,fname)):
+                        shutil.copyfile ( os.path.join(bdir,fname),fpath )
+                break
+        return
@@ -3,13 +3,13 @@
 #
 # ============================================================================
 #
-#    02.02.23   <--  Date of Last Modification.
+#    18.10.26   <--  Date of Last Modification.
 #                   ~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 # ----------------------------------------------------------------------------
 #
 #  CCP4build EDStats class
 #
-#  Copyright (C) Eugene Krissinel, Andrey Lebedev 2019-2023
+#  Copyright (C) Eugene Krissinel, Andrey Lebedev 2019-2026
 #
 # ============================================================================
 #
@@ -20,10 +20,78 @@ import sys
 import uuid
 import math
 
+import numpy as np
 import gemmi
 
 import ccp4build_findwaters
 
+
+# ============================================================================
+# Columnar access to edstats per-residue output
+
+#  columns of edstats per-residue table used in CCP4Build
+edstats_dtype = np.dtype ([ ("resname","U8"),("chain","U8"),("resnum","U16"),
+                            ("zdm","f8"),("zds","f8") ])
+
+def readEDStatsTable ( edstats_out ):
+    #  Returns edstats per-residue table as numpy structured array of
+    #  edstats_dtype; side chain ZD (zds) is NaN where not available.
+    #
+    #RT  CI RN     BAm  NPm   Rm    RGm  SRGm   CCSm   CCPm ZCCPm   ZOm  ZDm  ZD-m  ZD+m     BAs  NPs   Rs    RGs  SRGs   CCSs   CCPs ZCCPs   ZOs  ZDs  ZD-s  ZD+s     BAa  NPa   Ra    RGa  SRGa   CCSa   CCPa ZCCPa   ZOa  ZDa  ZD-a  ZD+a MN CP NR
+    #0   1   2     3     4   5     6      7     8      9      10     11   12    13    14     15    16   17   18    19     20     21      22    23   24    25   26      27    28   29    30    31     32    33     34     35   36   37     38  39 40 41
+        #LEU A  17    36.7   86 0.244 0.533 0.012  0.587  0.718   8.4   1.7  7.8   0.0   7.8    33.8   49 0.194 0.383 0.026  0.914  0.865   9.2   1.2  0.2   0.0   0.2    35.6  135 0.227 0.501 0.011  0.680  0.750  11.3   1.5  7.3   0.0   7.3  1 A   1
+    rows = []
+    with open(edstats_out,"r") as f:
+        f.readline()
+        for line in f:
+            if not line.rstrip("\n"):
+                break
+            lst = line.split()
+            zds = float("nan")
+            if len(lst)>24 and lst[24]!="n/a":
+                zds = float(lst[24])
+            rows.append ( (lst[0],lst[1],lst[2].replace(":",""),float(lst[12]),zds) )
+    table = np.array ( rows,dtype=edstats_dtype )
+    table["chain"][table["resname"]=="HOH"] = "W"  #  due to a bug or feature in edstats
+    return table
+
+
+def residueList ( table,zd_field ):
+    #  converts (sorted) table into list of [zd,chain,resnum,resname]
+    return [ list(r) for r in zip ( table[zd_field].tolist(),
+                                    table["chain"  ].tolist(),
+                                    table["resnum" ].tolist(),
+                                    table["resname"].tolist() ) ]
+
+
+def inflectionIndex ( y,block=1024 ):
+    #  Returns index of end of steep fall in decreasing series y: for every
+    #  trial index i<n/4, ZD drops dy after i give threshold mean+3*sigma,
+    #  and the index with most drops above threshold before it is chosen.
+    n    = len(y)
+    nmax = int(n/4)
+    if nmax<2:
+        return 0
+    dy  = y[:-1] - y[1:]  # always positive
+    s1  = np.cumsum ( dy[::-1] )[::-1]
+    s2  = np.cumsum ( (dy*dy)[::-1] )[::-1]
+    i   = np.arange ( 1,nmax )
+    dym = s1[i]/(n-i)
+    dys = np.sqrt ( np.maximum(s2[i]/(n-i) - dym*dym,0.0) )
+    dy0 = dym + 3.0*dys   # threshold values
+    #  number of drops above threshold before each trial index, in blocks
+    #  of trial indices to limit memory
+    k   = np.empty ( len(i),dtype=int )
+    for b in range(0,len(i),block):
+        ib = i[b:b+block]
+        above = dy[np.newaxis,:ib[-1]] > dy0[b:b+block,np.newaxis]
+        above &= np.arange(ib[-1])[np.newaxis,:] < ib[:,np.newaxis]
+        k[b:b+block] = np.count_nonzero ( above,axis=1 )
+    j = int ( np.argmax(k) )
+    if k[j]>0:
+        return int ( i[j] )
+    return 0
+
 # ============================================================================
 
 class EDStats(ccp4build_findwaters.FindWaters):
@@ -223,85 +291,42 @@ class EDStats(ccp4build_findwaters.FindWaters):
 
     def getResidueLists ( self,edstats_out,collectStats ):
 
-        mainchain = []
-        sidechain = []
-        solvent   = []
+        table = readEDStatsTable ( edstats_out )
+
+        #  residue lists are sorted by decreasing ZD; UNK residues go first
+        #  among residues with equal ZD
+        wsel  = table["resname"]=="HOH"
+        mtab  = table[~wsel]
+        stab  = mtab[~np.isnan(mtab["zds"])]
+        wtab  = table[wsel]
+
+        mtab  = mtab[np.lexsort((mtab["resname"]!="UNK",-mtab["zdm"]))]
+        stab  = stab[np.lexsort((stab["resname"]!="UNK",-stab["zds"]))]
+        wtab  = wtab[np.argsort(-wtab["zdm"],kind="stable")]
+
+        mainchain = residueList ( mtab,"zdm" )
+        sidechain = residueList ( stab,"zds" )
+        solvent   = residueList ( wtab,"zdm" )
+
+        ym = mtab["zdm"]
+        ys = stab["zds"]
+        yw = wtab["zdm"]
 
         mean_m  = 0
         sigma_m = 0
+        if len(ym)>0:
+            mean_m  = float ( np.mean(ym) )
+            sigma_m = float ( np.std (ym) )
 
         mean_s  = 0
         sigma_s = 0
+        if len(ys)>0:
+            mean_s  = float ( np.mean(ys) )
+            sigma_s = float ( np.std (ys) )
 
-        xm = []
-        ym = []
-        xs = []
-        ys = []
-        xw = []
-        yw = []
-
-        with open(edstats_out,"r") as f:
-            line = f.readline()
-            line = f.readline().rstrip("\n")
-            while line:
-                lst = line.split()
-
-                #RT  CI RN     BAm  NPm   Rm    RGm  SRGm   CCSm   CCPm ZCCPm   ZOm  ZDm  ZD-m  ZD+m     BAs  NPs   Rs    RGs  SRGs   CCSs   CCPs ZCCPs   ZOs  ZDs  ZD-s  ZD+s     BAa  NPa   Ra    RGa  SRGa   CCSa   CCPa ZCCPa   ZOa  ZDa  ZD-a  ZD+a MN CP NR
-                #0   1   2     3     4   5     6      7     8      9      10     11   12    13    14     15    16   17   18    19     20     21      22    23   24    25   26      27    28   29    30    31     32    33     34     35   36   37     38  39 40 41
-                    #LEU A  17    36.7   86 0.244 0.533 0.012  0.587  0.718   8.4   1.7  7.8   0.0   7.8    33.8   49 0.194 0.383 0.026  0.914  0.865   9.2   1.2  0.2   0.0   0.2    35.6  135 0.227 0.501 0.011  0.680  0.750  11.3   1.5  7.3   0.0   7.3  1 A   1
-
-                zdm = float(lst[12])
-                if lst[0]=="HOH":
-                    lst[1] = "W"  #  due to a bug or feature in edstats
-                    solvent.append ( [zdm,lst[1],lst[2].replace(":",""),lst[0]] )
-                else:
-                    mainchain.append ( [zdm,lst[1],lst[2].replace(":",""),lst[0]] )
-                    mean_m += zdm
-                    if len(lst)>24:
-                        if lst[24]!="n/a":
-                            zds = float(lst[24])
-                            sidechain.append ( [zds,lst[1],lst[2].replace(":",""),lst[0]] )
-                            mean_s += zds
-
-                line = f.readline().rstrip("\n")
-
-        if len(mainchain)>0:
-            mean_m /= len(mainchain)
-            for i in range(len(mainchain)):
-                for j in range(i+1,len(mainchain)):
-                    if mainchain[j][0]>mainchain[i][0] or (mainchain[j][3]=="UNK" and mainchain[i][3]!="UNK"):
-                        rl = [mainchain[i][0],mainchain[i][1],mainchain[i][2],mainchain[i][3]]
-                        mainchain[i] = [mainchain[j][0],mainchain[j][1],mainchain[j][2],mainchain[j][3]]
-                        mainchain[j] = rl
-                xm.append ( len(xm)+1.0     )
-                ym.append ( mainchain[i][0] )
-                d = mainchain[i][0] - mean_m
-                sigma_m += d*d
-            sigma_m = math.sqrt(sigma_m/len(mainchain))
-
-        if len(sidechain)>0:
-            mean_s /= len(sidechain)
-            for i in range(len(sidechain)):
-                for j in range(i+1,len(sidechain)):
-                    if sidechain[j][0]>sidechain[i][0] or (sidechain[j][3]=="UNK" and sidechain[i][3]!="UNK"):
-                        rl = [sidechain[i][0],sidechain[i][1],sidechain[i][2],sidechain[i][3]]
-                        sidechain[i] = [sidechain[j][0],sidechain[j][1],sidechain[j][2],sidechain[j][3]]
-                        sidechain[j] = rl
-                xs.append ( len(xs)+1.0     )
-                ys.append ( sidechain[i][0] )
-                d = sidechain[i][0] - mean_s
-                sigma_s += d*d
-            sigma_s = math.sqrt(sigma_s/len(sidechain))
-
-        if len(solvent)>0:
-            for i in range(len(solvent)):
-                for j in range(i+1,len(solvent)):
-                    if solvent[j][0]>solvent[i][0]:
-                        rl = [solvent[i][0],solvent[i][1],solvent[i][2],solvent[i][3]]
-                        solvent[i] = [solvent[j][0],solvent[j][1],solvent[j][2],solvent[j][3]]
-                        solvent[j] = rl
-                xw.append ( len(xw)+1.0   )
-                yw.append ( solvent[i][0] )
+        xm = np.arange ( 1.0,len(ym)+1.0 )
+        xs = np.arange ( 1.0,len(ys)+1.0 )
+        xw = np.arange ( 1.0,len(yw)+1.0 )
 
         zd_m = self.zd_cutoff ( xm,ym,"main" )
         zd_s = self.zd_cutoff ( xs,ys,"side" )
@@ -523,37 +548,13 @@ class EDStats(ccp4build_findwaters.FindWaters):
             else:
                 return [0,0.0,-1.0,1.0]
 
-        n  = len(x)
+        n  = len(y)
         n0 = 0
         x0 = 0.0
         y0 = 1.0
 
         if n>2:
-            dy  = []
-            dy2 = []
-            for i in range(1,n):
-                d = y[i-1] - y[i]  # always positive
-                dy .append ( d )
-                dy2.append ( d*d )
-            nmax = int(n/4)
-            kmax = 0
-            for i in range(1,nmax):
-                dym = 0.0
-                dys = 0.0
-                for j in range(i,len(dy)):
-                    dym += dy[j]
-                    dys += dy2[j]
-                dym /= (n-i)
-                dys /= (n-i)
-                dys  = math.sqrt ( dys - dym*dym )
-                dy0  = dym + 3.0*dys  # threshold value
-                k    = 0
-                for j in range(i):
-                    if dy[j]>dy0:
-                        k += 1
-                if k>kmax:
-                    kmax = k
-                    n0   = i
+            n0 = inflectionIndex ( y )
         if n>0:
             x0 = x[n0]
             y0 = y[n0]
@@ -573,4 +574,61 @@ class EDStats(ccp4build_findwaters.FindWaters):
                 y0 = min ( float(self.input_data["trimmax_zds"]),
                            max(float(self.input_data["trimmin_zds"]),y0) )
 
-        return [n0,x0,y0,1.0]
+        return [int(n0),float(x0),float(y0),1.0]
+
+
+# ----------------------------------------------------------------------------
+#  Benchmark, run from this directory:
+#     ccp4-python ccp4build_edstats.py bench [nres]
+#  times getResidueLists() on synthetic edstats table of given size; the
+#  same tables are used in pycofe/tests/test_ccp4build_edstats.py
+# ----------------------------------------------------------------------------
+
+def _synthetic_table ( fpath,nres,nwat=0,seed=1 ):
+    import random
+    rnd   = random.Random ( seed )
+    names = ["ALA","GLY","LEU","SER","LYS","TRP"]
+    with open(fpath,"w") as f:
+        f.write ( " RT  CI RN     BAm  NPm   Rm    RGm  SRGm   CCSm   CCPm ZCCPm   ZOm  ZDm  ZD-m  ZD+m     BAs  NPs   Rs    RGs  SRGs   CCSs   CCPs ZCCPs   ZOs  ZDs  ZD-s  ZD+s     BAa  NPa   Ra    RGa  SRGa   CCSa   CCPa ZCCPa   ZOa  ZDa  ZD-a  ZD+a MN CP NR\n" )
+        for i in range(nres+nwat):
+            cols = ["0.0"]*42
+            zd   = abs ( rnd.gauss(0.8,0.4) )
+            if rnd.random()<0.1:
+                zd += rnd.expovariate ( 0.4 )
+            if i<nres:
+                cols[0:3] = [rnd.choice(names),"A",str(i+1)]
+                zds = abs ( rnd.gauss(1.0,0.6) )
+                if rnd.random()<0.15:
+                    zds += rnd.expovariate ( 0.3 )
+                cols[24] = "n/a" if cols[0]=="GLY" else "%.1f" % zds
+            else:
+                cols[0:3] = ["HOH","B",str(i+1)+":"]
+            cols[12] = "%.1f" % zd
+            f.write ( " ".join(cols) + "\n" )
+    return fpath
+
+
+def benchmark ( nres=3000 ):
+    import time
+    import tempfile
+    import shutil
+    tmpdir = tempfile.mkdtemp()
+    try:
+        fpath = _synthetic_table ( os.path.join(tmpdir,"edstats.out"),
+                                   nres,nres//4,1 )
+        edstats = object.__new__ ( EDStats )
+        edstats.input_data = dict ( EDStats.input_data,trim_mode="auto",
+                                    trim_mode_w="auto" )
+        t = time.perf_counter()
+        edstats.getResidueLists ( fpath,False )
+        t = time.perf_counter() - t
+        print ( " residues         : %d" % nres )
+        print ( " getResidueLists  : %8.3f s" % t )
+    finally:
+        shutil.rmtree ( tmpdir )
+    return
+
+
+if __name__ == "__main__":
+    if len(sys.argv)>1 and sys.argv[1]=="bench":
+        benchmark ( *[int(a) for a in sys.argv[2:3]] )
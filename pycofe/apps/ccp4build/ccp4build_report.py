@@ -3,13 +3,13 @@
 #
 # ============================================================================
 #
-#    14.11.20   <--  Date of Last Modification.
+#    18.10.26   <--  Date of Last Modification.
 #                   ~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 # ----------------------------------------------------------------------------
 #
 #  CCP4build Report class
 #
-#  Copyright (C) Eugene Krissinel, Andrey Lebedev 2019-2020
+#  Copyright (C) Eugene Krissinel, Andrey Lebedev 2019-2026
 #
 # ============================================================================
 #
@@ -49,13 +49,13 @@ import json
 
 import pyrvapi
 
-import ccp4build_edstats
+import ccp4build_branches
 import edmap
 
 
 # ============================================================================
 
-class Report(ccp4build_edstats.EDStats):
+class Report(ccp4build_branches.Branches):
 
     # ------------------------------------------------------------------------
 
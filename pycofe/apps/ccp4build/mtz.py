@@ -3,13 +3,13 @@
 #
 # ============================================================================
 #
-#    01.05.20   <--  Date of Last Modification.
+#    18.10.26   <--  Date of Last Modification.
 #                   ~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 # ----------------------------------------------------------------------------
 #
 #  MTZ HANDLING UTILS
 #
-#  Copyright (C) Eugene Krissinel, Andrey Lebedev 2017-2020
+#  Copyright (C) Eugene Krissinel, Andrey Lebedev 2017-2026
 #
 # ============================================================================
 #
@@ -19,6 +19,7 @@ from future import *
 import os, sys, re
 import struct
 import math
+import mmap
 
 class measured():
     value = sigma = None
@@ -239,28 +240,11 @@ class mtz_dataset(object):
 class mtz_dataset_list(list):
     H = K = L = FREE = HM = CELL = RESO = MTZ = BRNG = None
 
-    def __init__(self, fname, header_dict, vstream=None):
+    def __init__(self, fname, header_dict, vstream=None, brng=None):
         self.MTZ = os.path.abspath(fname)
-        batch_set = set()
-        for data in header_dict.get('BATCH', ()):
-            batch_set.update([int(bno) for bno in data.split()])
-
-        b_list = sorted(batch_set)
-        self.BRNG = list()
-        if b_list:
-            b1 = b_list.pop(0)
-            b2 = b1 + 1
-            while b_list:
-                b3 = b_list.pop(0)
-                if b3 == b2:
-                    b2 += 1
-
-                else:
-                    self.BRNG.append((b1, b2))
-                    b1 = b3
-                    b2 = b1 + 1
-
-            self.BRNG.append((b1, b2))
+        if brng is None:
+            brng = batch_ranges(header_dict)
+        self.BRNG = list(brng)
 
         columns_dict = dict()
         for data in header_dict['COLUMN']:
@@ -365,24 +349,96 @@ class mtz_dataset_list(list):
     def is_merged(self):
         return not self.BRNG
 
-def mtz_file(fname, vstream=None):
-    header_dict = dict()
-    with open(fname, mode='rb') as istream:
-        line = None
+# ----------------------------------------------------------------------------
+#  MTZ header is read once per file: the trailer is memory-mapped and all
+#  80-character records from VERS up to MTZBATS (or end of file) are decoded
+#  and split in bulk. Results are memoised per (path, mtime, size), so that
+#  hkl_format(), mtz_file() and import code share one parse.
+
+_header_cache     = {}
+_header_cache_max = 16
+
+def batch_ranges(header_dict):
+    # list of (first, last+1) for runs of consecutive batch numbers
+    batch_set = set()
+    for data in header_dict.get('BATCH', ()):
+        batch_set.update([int(bno) for bno in data.split()])
+
+    brng = list()
+    for bno in sorted(batch_set):
+        if brng and brng[-1][1] == bno:
+            brng[-1][1] = bno + 1
+        else:
+            brng.append([bno, bno + 1])
+
+    return [tuple(r) for r in brng]
+
+def _scan_header(istream):
+    # returns (records, has_batches), or None if this is not an MTZ file
+    istream.seek(0, 2)
+    fsize = istream.tell()
+    if fsize < 12:
+        return None
+
+    istream.seek(4)
+    word = istream.read(4)
+    mm = mmap.mmap(istream.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
         for fmt in ('<I', '>I'):
-            istream.seek(4)
-            n = struct.unpack(fmt, istream.read(4))[0]
-            istream.seek(4* n - 4)
-            h = istream.read(80).decode()
-            if h.startswith('VERS'):
-                line = h
-                break
-
-        while line and not line.startswith('MTZBATS'):
-            if vstream:
-                #print(line, file=vstream)
-                vstream.write ( line )
+            pos = 4* struct.unpack(fmt, word)[0] - 4
+            if pos < 0 or pos + 4 > fsize or mm[pos:pos+4] != b'VERS':
+                continue
+
+            end = mm.find(b'MTZBATS', pos)
+            while end >= 0 and (end - pos) % 80:
+                end = mm.find(b'MTZBATS', end + 1)
+
+            has_batches = end >= 0
+            if not has_batches:
+                end = fsize
+
+            text = mm[pos:end].decode('latin-1')
+            return ([text[i:i+80] for i in range(0, len(text), 80)], has_batches)
+
+    finally:
+        mm.close()
+
+    return None
 
+def read_header(path):
+    # returns memoised header entry: dict with "records" (list of header
+    # records) and "batches" (True for unmerged files), or None if path is
+    # not an MTZ file
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+
+    key = (os.path.abspath(path), getattr(st, 'st_mtime_ns', st.st_mtime), st.st_size)
+    if key in _header_cache:
+        return _header_cache[key]
+
+    with open(path, 'rb') as istream:
+        scan = _scan_header(istream)
+
+    entry = None
+    if scan:
+        entry = { 'records' : scan[0], 'batches' : scan[1] }
+
+    if len(_header_cache) >= _header_cache_max:
+        _header_cache.clear()
+
+    _header_cache[key] = entry
+    return entry
+
+def mtz_file(fname, vstream=None):
+    entry = read_header(fname)
+    if not entry:
+        return None
+
+    if 'dict' not in entry:
+        header_dict = dict()
+        for line in entry['records']:
             key, sep, data = line.partition(' ')
             data_list = header_dict.get(key, None)
             if not data_list:
@@ -390,10 +446,16 @@ def mtz_file(fname, vstream=None):
                 header_dict[key] = data_list
 
             data_list.append(data)
-            line = istream.read(80).decode()
 
-    if header_dict:
-        return mtz_dataset_list(fname, header_dict, vstream)
+        entry['dict'] = header_dict
+        entry['brng'] = batch_ranges(header_dict)
+
+    if vstream:
+        for line in entry['records']:
+            vstream.write ( line )
+
+    if entry['dict']:
+        return mtz_dataset_list(fname, entry['dict'], vstream, entry['brng'])
 
 rec_xds = re.compile('(?:%s|%s)' %(
   "^!FORMAT=XDS_ASCII +MERGE=(TRUE|FALSE) +FRIEDEL'S_LAW=(?:TRUE|FALSE)",
@@ -401,19 +463,13 @@ rec_xds = re.compile('(?:%s|%s)' %(
 ))
 
 def hkl_format(path, vstream=None):
-    with open(path, 'rb') as istream:
-        for fmt in ('<I', '>I'):
-            istream.seek(4)
-            n = struct.unpack(fmt,istream.read(4))[0]
-            istream.seek(4* n - 4)
-            line = istream.read(80).decode()
-            if line.startswith('VERS'):
-                while line:
-                    line = istream.read(80).decode()
-                    if line.startswith('MTZBATS'):
-                        return 'mtz_integrated'
-                return 'mtz_merged'
+    entry = read_header(path)
+    if entry:
+        if entry['batches']:
+            return 'mtz_integrated'
+        return 'mtz_merged'
 
+    with open(path, 'rb') as istream:
         istream.seek(0)
         rec_data = rec_xds.search ( istream.read(256) )
         if rec_data:
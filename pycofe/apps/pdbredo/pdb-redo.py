@@ -112,6 +112,8 @@ def do_status(args):
     status = r.json()['status']
 
     print("Job status is", status)
+    if 'Retry-After' in r.headers:
+        print("Retry after", r.headers['Retry-After'])
 
 
 def do_fetch(args):
@@ -3,19 +3,20 @@
 #
 # ============================================================================
 #
-#    14.02.25   <--  Date of Last Modification.
+#    18.10.26   <--  Date of Last Modification.
 #                   ~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 # ----------------------------------------------------------------------------
 #
 #  AUTOMATIC WORKFLOW FRAMEWORK API
 #
-#  Copyright (C) Eugene Krissinel, Oleg Kovalevskyi, Andrey Lebedev 2021-2025
+#  Copyright (C) Eugene Krissinel, Oleg Kovalevskyi, Andrey Lebedev 2021-2026
 #
 # ============================================================================
 #
 
 import os
 import json
+import hashlib
 
 from   pycofe.varut  import jsonut
 
@@ -85,51 +86,177 @@ def log_comment ( message ):
         log_stream.write ( " ::: " + message + "\n" )
     return
 
+# ----------------------------------------------------------------------------
+# Context store
+#
+#  Workflow context is passed from task to task in a single JSON file. Custom
+#  entries and noted tasks are kept in it in encoded form, where data objects
+#  (dictionaries with "_type" key, such as revisions and their components)
+#  are replaced by references to a common pool of objects keyed by content
+#  hash:
+#
+#     context["objects"] = { hash : encoded object }
+#     reference          = { "@ref" : hash }
+#
+#  so that data objects copied into many entries (e.g. "<run>_outdata" and
+#  "<run>_rundata" at branch points) are stored once. Entries are decoded
+#  only when accessed. Only entries accessed or added in current task are
+#  encoded when context is written, so that each task adds just the objects
+#  it has made; other entries and pooled objects are passed on as read, and
+#  objects which are no longer referenced are dropped. Contexts written
+#  without encoding are read as they are.
+
+encode_context = True  # False for writing context without encoding
+
+def _is_ref ( value ):
+    return len(value)==1 and "@ref" in value
+
+class ContextSection(object):
+    # dictionary-like view of encoded context section
+
+    def __init__ ( self,store,encoded ):
+        self.store   = store
+        self.encoded = encoded  # name -> encoded entry
+        self.decoded = {}       # name -> entry accessed or added in this task
+
+    def __contains__ ( self,name ):
+        return name in self.decoded or name in self.encoded
+
+    def __getitem__ ( self,name ):
+        if name not in self.decoded:
+            self.decoded[name] = self.store.decode ( self.encoded[name] )
+        return self.decoded[name]
+
+    def __setitem__ ( self,name,value ):
+        self.decoded[name] = value
+
+    def __delitem__ ( self,name ):
+        if name not in self:
+            raise KeyError ( name )
+        self.decoded.pop ( name,None )
+        self.encoded.pop ( name,None )
+
+    def keys ( self ):
+        return list(self.encoded) + [k for k in self.decoded if k not in self.encoded]
+
+    def to_dict ( self,encode ):
+        if encode:
+            for name in self.decoded:
+                self.encoded[name] = self.store.encode ( self.decoded[name] )
+            return self.encoded
+        return dict ( (name,self[name]) for name in self.keys() )
+
+
+class ContextStore(object):
+
+    def __init__ ( self,context ):
+        self.context = context
+        self.objects = context.pop ( "objects",{} )
+        self.custom  = ContextSection ( self,context.pop("custom",{}) )
+        self.tasks   = ContextSection ( self,context.pop("tasks" ,{}) )
+
+    def __getitem__ ( self,key ):  # plain sections, e.g. "job_register"
+        return self.context[key]
+
+    def decode ( self,value ):
+        # returns new copy of value with references resolved
+        if isinstance(value,dict):
+            if _is_ref(value):
+                return self.decode ( self.objects[value["@ref"]] )
+            return dict ( (k,self.decode(v)) for k,v in value.items() )
+        if isinstance(value,list):
+            return [self.decode(v) for v in value]
+        return value
+
+    def encode ( self,value ):
+        # returns encoded copy of value, putting data objects in the pool
+        if isinstance(value,dict):
+            enc = dict ( (k,self.encode(v)) for k,v in value.items() )
+            if "_type" in value:
+                key = hashlib.sha1 ( json.dumps(enc).encode("utf-8") ).hexdigest()
+                self.objects[key] = enc
+                return { "@ref" : key }
+            return enc
+        if isinstance(value,(list,tuple)):
+            return [self.encode(v) for v in value]
+        return value
+
+    def _mark ( self,value,live ):
+        if isinstance(value,dict):
+            if _is_ref(value):
+                key = value["@ref"]
+                if key not in live:
+                    live.add ( key )
+                    self._mark ( self.objects[key],live )
+            else:
+                for v in value.values():
+                    self._mark ( v,live )
+        elif isinstance(value,list):
+            for v in value:
+                self._mark ( v,live )
+        return
+
+    def to_dict ( self ):
+        # returns context for writing in JSON file
+        context = dict ( self.context )
+        context["custom"] = self.custom.to_dict ( encode_context )
+        context["tasks" ] = self.tasks .to_dict ( encode_context )
+        if encode_context:
+            live = set()
+            self._mark ( context["custom"],live )
+            self._mark ( context["tasks" ],live )
+            context["objects"] = dict ( (k,v) for k,v in self.objects.items() if k in live )
+        return context
+
 # ----------------------------------------------------------------------------
 
 def initAutoMeta():
     global auto_meta
-    auto_meta = {
-        "context" : {
-            "custom"       : {},
-            "tasks"        : {},
-            "job_register" : {}
-        }
+    context = {
+        "custom"       : {},
+        "tasks"        : {},
+        "job_register" : {}
     }
     try:
         if os.path.isfile(auto_context_fname()):
             with open(auto_context_fname()) as json_file:
-                auto_meta["context"] = json.load(json_file)
+                context = json.load(json_file)
     except:
         pass
+    auto_meta = {
+        "context" : ContextStore ( context )
+    }
     return
 
 def writeAutoMeta ( body ):
     global auto_meta
     if auto_meta:
+        meta = dict ( auto_meta )
+        meta["context"] = auto_meta["context"].to_dict()
+        # json.dumps() uses fast encoder, unlike json.dump()
         with open(auto_meta_fname(),"w") as json_file:
-            json.dump ( auto_meta,json_file )
+            json_file.write ( json.dumps(meta) )
         body.keepWorkflow()
     return
 
 def getContext ( contextName ):
     global auto_meta
     log_debug ( 'getContext: "%s"' % (contextName) )
-    if contextName in auto_meta["context"]["custom"]:
-        return auto_meta["context"]["custom"][contextName]
+    if contextName in auto_meta["context"].custom:
+        return auto_meta["context"].custom[contextName]
     return None
 
 def addContext ( contextName,context ):
     global auto_meta
     log_debug ( 'addContext: "%s", "%s"' % (contextName, context) )
-    auto_meta["context"]["custom"][contextName] = context
+    auto_meta["context"].custom[contextName] = context
     return
 
 def removeContext ( contextName ):
     global auto_meta
     log_debug ( 'removeContext: "%s"' % (contextName) )
     try:
-        del auto_meta["context"]["custom"][contextName]
+        del auto_meta["context"].custom[contextName]
     except:
         log_error ('removeContext excepted: "%s"' % (contextName) )
     return
@@ -184,7 +311,7 @@ def addTaskParameter ( taskName,parameterName,parameterValue ):
 
 def noteTask ( taskName ):
     if taskName in auto_meta:
-        auto_meta["context"]["tasks"][taskName] = auto_meta[taskName]
+        auto_meta["context"].tasks[taskName] = auto_meta[taskName]
         log_debug ( 'noteTask: "%s"' % (taskName) )
         return True
     else:
@@ -193,8 +320,8 @@ def noteTask ( taskName ):
 
 def cloneTask ( clonedTaskName,taskName ):
     global auto_meta
-    if taskName in auto_meta["context"]["tasks"]:
-        task = auto_meta["context"]["tasks"][taskName]
+    if taskName in auto_meta["context"].tasks:
+        task = auto_meta["context"].tasks[taskName]
         parameters = {}
         for key in task["parameters"]:
             parameters[key] = task["parameters"][key]
@@ -257,4 +384,85 @@ def getContext ( contextName ):
     #     field = json.loads(field)
     return field
 
-"""
\ No newline at end of file
+"""
+
+# ----------------------------------------------------------------------------
+#  Benchmark:  python -m pycofe.auto.auto_api2 bench [nsteps]
+#  runs context operations of a workflow which refines structure in a loop,
+#  noting the task and storing branch data at every step, and compares
+#  context files written with and without encoding; context entries are
+#  checked in pycofe/tests/test_auto_api2.py
+# ----------------------------------------------------------------------------
+
+def _bench_object ( dtype,n,tag ):
+    obj = { "_type" : dtype, "dataId" : tag, "files" : { "mtz" : tag + ".mtz" } }
+    for i in range(n):
+        obj["field_%03d" % i] = [ i*0.5,"value %d of %s" % (i,tag),{ "flag":i%2==0 } ]
+    return obj
+
+
+def benchmark ( nsteps=50 ):
+    import time
+    import shutil
+    import tempfile
+
+    global encode_context
+
+    class Body(object):
+        def keepWorkflow ( self ):  pass
+
+    hkl = _bench_object ( "DataHKL",40,"hkl" )
+    seq = _bench_object ( "DataSequence",10,"seq" )
+    encode0 = encode_context
+    cwd     = os.getcwd()
+    for encode in (False,True):
+        encode_context = encode
+        tmpdir = tempfile.mkdtemp()
+        os.chdir ( tmpdir )
+        t_load = 0.0
+        t_save = 0.0
+        try:
+            for step in range(nsteps):
+                t = time.perf_counter()
+                initAutoMeta()
+                wdata = getContext ( "input_data" ) or { "variables":{}, "hkl":[hkl], "seq":[seq] }
+                t_load += time.perf_counter() - t
+                # task output
+                xyz = _bench_object ( "DataStructure",60,"xyz%d" % step )
+                rev = { "_type" : "DataRevision", "dataId" : "rev%d" % step,
+                        "HKL" : hkl, "ASU" : { "seq" : [seq] }, "Structure" : xyz }
+                wdata.setdefault("revision",[]).append ( rev )
+                wdata["revision.hkl"] = [ rev["HKL"] ]
+                wdata["variables"]["cnt"] = step
+                runName = "@REFINE[%d]" % step
+                addContext ( runName + "_outdata",{ "rev_list":[rev], "wdata":wdata } )
+                # next task
+                nextName = "@REFINE[%d]" % (step+1)
+                addTask ( nextName,"TaskRefmac",runName )
+                addTaskData ( nextName,"revision",rev )
+                addContext ( "@REFINE_rundata",{ "rev_list":[rev], "wdata":wdata, "tdata":{} } )
+                addContext ( "input_data",wdata )
+                noteTask ( nextName )
+                t = time.perf_counter()
+                writeAutoMeta ( Body() )
+                t_save += time.perf_counter() - t
+                # server passes context on to the next task
+                with open(auto_meta_fname(),"r") as f:
+                    meta = json.load ( f )
+                with open(auto_context_fname(),"w") as f:
+                    f.write ( json.dumps(meta["context"]) )
+            size = os.path.getsize ( auto_context_fname() )
+        finally:
+            os.chdir ( cwd )
+            shutil.rmtree ( tmpdir )
+        print ( " %-9s : context %8.1f KB after %d steps, load %7.1f ms, " \
+                "write %7.1f ms (totals)" % ("encoded" if encode else "plain",
+                    size/1024.0,nsteps,1000.0*t_load,1000.0*t_save) )
+    encode_context = encode0
+    return
+
+
+if __name__ == "__main__":
+    import sys
+    if len(sys.argv)>1 and sys.argv[1]=="bench":
+        benchmark ( *[int(a) for a in sys.argv[2:3]] )
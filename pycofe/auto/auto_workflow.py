@@ -3,25 +3,27 @@
 #
 # ============================================================================
 #
-#    14.02.25   <--  Date of Last Modification.
+#    18.10.26   <--  Date of Last Modification.
 #                   ~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 # ----------------------------------------------------------------------------
 #
 #  AUTOMATIC CUSTOM WORKFLOW FRAMEWORK
 #
-#  Copyright (C) Eugene Krissinel, Maria Fando, Andrey Lebedev 2023-2025
+#  Copyright (C) Eugene Krissinel, Maria Fando, Andrey Lebedev 2023-2026
 #
 # ============================================================================
 #
 
 import json
+import bisect
+import hashlib
 #from   pycofe.varut  import jsonut
 
 from   pycofe.auto   import  auto_api2
 from   pycofe.auto   import  auto_tasks2
 import traceback
 from   pycofe.etc    import  citations
-from   pycofe.etc.py_expression_eval import Parser
+from   pycofe.etc.py_expression_eval import Parser,Expression,Token
 # from   pycofe.varut  import  jsonut
 
 
@@ -65,6 +67,135 @@ def scrollToRunName ( script,runName ):
             lno = lno + 1
     return (lno,nextRunName,scope)
 
+# ============================================================================
+# Compiled workflow scripts
+#
+#  Workflow script is compiled at first workflow step into a program, which
+#  is kept in workflow context and passed from task to task. Program holds
+#  position of the first workflow statement, lines with settings, branch
+#  points, positions of runs and POINT labels targeted by REPEAT and CONTINUE,
+#  positions of RUN statements and postfix token lists of expressions
+#  evaluated at the last step. Script lines are stripped of comments and
+#  split into words only when visited, so that workflow steps do not rescan
+#  the script.
+
+program_version = 1
+
+class ScriptLines(object):
+    # comment-less script lines and their words, made on first access
+
+    def __init__ ( self,script_lines ):
+        self.script = script_lines
+        self.lines  = [None]*len(script_lines)
+        self.words  = [None]*len(script_lines)
+
+    def __len__ ( self ):
+        return len(self.script)
+
+    def __getitem__ ( self,lno ):
+        line = self.lines[lno]
+        if line is None:
+            line = self.script[lno].strip()
+            if "#" in line:
+                line = line[:line.index("#")].strip()
+            self.lines[lno] = line
+        return line
+
+    def split ( self,lno ):
+        if self.words[lno] is None:
+            self.words[lno] = self[lno].split()
+        return self.words[lno]
+
+
+def scriptHash ( script_lines ):
+    return hashlib.sha1 ( "\n".join(script_lines).encode("utf-8") ).hexdigest()
+
+def compileScript ( script_lines ):
+    script        = ScriptLines ( script_lines )
+    settings      = []  # lines with VERSION, DEBUG and COMMENTS statements
+    branch_points = []  # runs where project loops or branches
+    targets       = []  # run names and labels looked up by REPEAT and CONTINUE
+    run_lines     = []  # lines with RUN statements
+    for lno in range(len(script)):
+        words = script.split ( lno )
+        if len(words)>=2:
+            w0u = words[0].upper()
+            if w0u in ["VERSION","DEBUG","COMMENTS"]:
+                settings.append ( lno )
+            elif w0u in ["REPEAT","CONTINUE","BRANCH"]:
+                branch_points.append ( words[1].split("[")[0] )
+                if w0u=="REPEAT":
+                    targets.append ( words[1] )
+                elif w0u=="CONTINUE":
+                    targets.append ( makeRunName(words[1])[0] )
+        if script[lno].upper().startswith("RUN "):
+            run_lines.append ( lno )
+    runs = {}
+    for runName in targets:
+        if runName not in runs:
+            runs[runName] = list ( scrollToRunName(script,runName) )
+    return {
+        "version"       : program_version,
+        "hash"          : scriptHash ( script_lines ),
+        "start"         : list ( scrollToWorkflowDesc(script) ),
+        "settings"      : settings,
+        "branch_points" : branch_points,
+        "runs"          : runs,
+        "run_lines"     : run_lines,
+        "exprs"         : {}
+    }
+
+def getProgram ( script_lines ):
+    # returns compiled script from workflow context, compiling it if it is
+    # not there or was made for a different script
+    global _prev_exprs
+    program = auto_api2.getContext ( "program" )
+    if not program or program.get("version")!=program_version or \
+            program.get("hash")!=scriptHash(script_lines):
+        program = compileScript ( script_lines )
+        auto_api2.addContext ( "program",program )
+    # program keeps only expressions evaluated at the last step, which are
+    # those met again in workflow loops
+    _prev_exprs = program["exprs"]
+    program["exprs"] = {}
+    return program
+
+def findRunName ( program,script,runName ):
+    # same as scrollToRunName ( script,runName )
+    if runName in program["runs"]:
+        return tuple ( program["runs"][runName] )
+    return scrollToRunName ( script,runName )
+
+def nextRunLine ( program,script,lno ):
+    # returns number of first line with RUN statement after line lno
+    i = bisect.bisect_right ( program["run_lines"],lno )
+    if i<len(program["run_lines"]):
+        return program["run_lines"][i]
+    return len(script)
+
+_parser      = Parser()
+_prev_exprs  = {}  # expression string -> tokens, from workflow context
+_expressions = {}  # expression string -> (Expression,tokens)
+
+def evaluate ( program,expr,w ):
+    # evaluates expression with variables w, parsing it only if it was not
+    # parsed before; raises exceptions as Parser().parse(expr).evaluate(w)
+    if expr not in _expressions:
+        tokens = _prev_exprs.get ( expr )
+        if tokens is None:
+            e = _parser.parse ( expr )
+            tokens = [ [t.type_,t.index_,t.prio_,t.number_] for t in e.tokens ]
+        else:
+            e = Expression ( [Token(*t) for t in tokens],
+                             _parser.ops1,_parser.ops2,_parser.functions )
+        _expressions[expr] = (e,tokens)
+    e,tokens = _expressions[expr]
+    program["exprs"][expr] = tokens
+    return e.evaluate ( w )
+
+
+# ============================================================================
+
 def report ( body, title, message, log_message ):
     body.putMessage ( "&nbsp;" )
     body.putTitle ( title )
@@ -102,25 +233,16 @@ def nextTask ( body,data,log=None ):
             auto_api2.setLog ( body.file_stdout1 )
         auto_api2.initAutoMeta()
 
-        # make comment-less copy of the script
-        version = "1.0"
-        script  = []
-        for i in range(len(crTask.script)):
-            line = crTask.script[i].strip()
-            if "#" in line:
-                line = line[:line.index("#")].strip()
-            script.append ( line )
-            words = line.split()
-            if len(words)>=2:
-                if words[0].upper()=="VERSION":
-                    version = words[1]
-                    auto_api2.log_line ( i+1,crTask.script[i] )
-                elif words[0].upper()=="DEBUG":
-                    auto_api2.setDebugOutput ( words[1].upper()=="ON" )
-                    auto_api2.log_line ( i+1,crTask.script[i] )
-                elif words[0].upper()=="COMMENTS":
-                    auto_api2.setCommentsOutput ( words[1].upper()=="ON" )
-                    auto_api2.log_line ( i+1,crTask.script[i] )
+        # take compiled script from workflow context, or compile it
+        program = getProgram ( crTask.script )
+        script  = ScriptLines ( crTask.script )  # comment-less script
+        for i in program["settings"]:
+            words = script.split ( i )
+            if words[0].upper()=="DEBUG":
+                auto_api2.setDebugOutput ( words[1].upper()=="ON" )
+            elif words[0].upper()=="COMMENTS":
+                auto_api2.setCommentsOutput ( words[1].upper()=="ON" )
+            auto_api2.log_line ( i+1,crTask.script[i] )
         auto_api2.log_message ( " " )
 
         # prepare citation lists for passing down the project tree; this
@@ -206,8 +328,6 @@ def nextTask ( body,data,log=None ):
 
         # parse the script
 
-        eval_parser   = Parser()  # algebraic parser
-
         nextTaskType  = None
         nextRunName   = None
         lno           = crTask.script_pointer
@@ -218,12 +338,8 @@ def nextTask ( body,data,log=None ):
         repeat_mode   = ""  # no task repeat mode (default)
         parse_error   = ""
 
-        # identify runs where project loops or branches
-        branch_points = []
-        for line in script:
-            words = line.split()
-            if len(words)>=2 and words[0].upper() in ["REPEAT","CONTINUE","BRANCH"]:
-                branch_points.append ( words[1].split("[")[0] )
+        # runs where project loops or branches
+        branch_points = program["branch_points"]
         auto_api2.log_debug ( "branch_points=" + str(branch_points) )
 
         parentRunName = crTask.autoRunName
@@ -235,7 +351,7 @@ def nextTask ( body,data,log=None ):
 
         if lno<=0:
             # scroll script to the first workflow key
-            lno,key = scrollToWorkflowDesc ( script )
+            lno,key = program["start"]
             # if key and len(key)<2:
             #     parse_error = " *** LINE " + str(lno) + ": empty RUN NAMES are not allowed"
 
@@ -252,7 +368,7 @@ def nextTask ( body,data,log=None ):
 
                 auto_api2.log_line ( lno+1,crTask.script[lno] )
 
-                words  = script[lno].split()
+                words  = script.split ( lno )
                 nwords = len(words)
                 
                 if (nwords>0) and (not words[0].upper().startswith("CHECKTASK")):
@@ -281,7 +397,7 @@ def nextTask ( body,data,log=None ):
                                 k         = line.upper().find(" IF ")
                                 if k>0:  # condition is present
                                     try:
-                                        condition = eval_parser.parse(line[k+4:]).evaluate(w)
+                                        condition = evaluate(program,line[k+4:],w)
                                         auto_api2.log_comment ( "condition : " + str(condition) )
                                         line      = line[:k]  # remove "IF ...."
                                     except:
@@ -295,7 +411,7 @@ def nextTask ( body,data,log=None ):
                                         if statements[i]:
                                             (vname,expr) = statements[i].split('=')
                                             try:
-                                                value    = eval_parser.parse(expr).evaluate(w)
+                                                value    = evaluate(program,expr,w)
                                                 w[vname] = value
                                                 auto_api2.log_comment (
                                                     vname + " = " + str(value)
@@ -323,7 +439,7 @@ def nextTask ( body,data,log=None ):
                                     if words[k].upper() in ["WHILE","IF"]:
                                         expr = " ".join(words[k+1:])
                                         try:
-                                            condition = eval_parser.parse(expr).evaluate(w)
+                                            condition = evaluate(program,expr,w)
                                             if not condition:
                                                 repeat_mode = ""
                                             auto_api2.log_comment ( "condition : " + str(condition) )
@@ -341,7 +457,7 @@ def nextTask ( body,data,log=None ):
                                         # restore initial branch data
                                         rdata = auto_api2.getContext ( words[1] + "_rundata" )
                                         if rdata:
-                                            (lno,nextRunName,scope) = scrollToRunName ( script,words[1] )
+                                            (lno,nextRunName,scope) = findRunName ( program,script,words[1] )
                                             tdata = rdata["tdata"]
                                             # scope = "run"
                                         elif pass_error:
@@ -360,7 +476,7 @@ def nextTask ( body,data,log=None ):
                                         rdata = auto_api2.getContext ( parentRunName + "_outdata" )
                                         # if rdata or repeat_mode=="CONTINUE":
                                         if repeat_mode=="CONTINUE":
-                                            (lno,nextRunName,scope) = scrollToRunName ( script,pRunName[0] )
+                                            (lno,nextRunName,scope) = findRunName ( program,script,pRunName[0] )
                                             # scope = "run"
                                         elif not rdata:
                                             if pass_error:
@@ -386,7 +502,7 @@ def nextTask ( body,data,log=None ):
                             if nwords>1:
                                 expr = " ".join(words[1:])
                                 auto_api2.log_message ( 
-                                    expr + " = " + str(eval_parser.parse(expr).evaluate(w))
+                                    expr + " = " + str(evaluate(program,expr,w))
                                 )
 
                         elif w0u=="STOP":
@@ -394,7 +510,7 @@ def nextTask ( body,data,log=None ):
                                 if words[1].upper()=="IF" and nwords>2:
                                     expr = " ".join(words[2:]);
                                     try:
-                                        condition = eval_parser.parse(expr).evaluate(w)
+                                        condition = evaluate(program,expr,w)
                                         if condition:
                                             parse_error = "stop"  # just sinal end of play
                                         auto_api2.log_comment ( "condition : " + str(condition) )
@@ -447,19 +563,13 @@ def nextTask ( body,data,log=None ):
                                 else:
                                     p = " ".join(words[1:]).strip()
                                     try:
-                                        ok = eval_parser.parse(p).evaluate(w)
+                                        ok = evaluate(program,p,w)
                                     except:
                                         parse_error = "incomputable expression \"" + p + "\""
                                         ok = True
                                 if not ok:
                                     # some data is not available, scroll script to the next RUN
-                                    lno = lno + 1
-                                    ok  = True
-                                    while lno<len(script) and ok:
-                                        if script[lno].strip().upper().startswith("RUN "):
-                                            ok = False
-                                        else:
-                                            lno   = lno + 1
+                                    lno = nextRunLine ( program,script,lno )
                                     # reset parser
                                     nextTaskType  = None
                                     nextRunName   = None
@@ -485,7 +595,7 @@ def nextTask ( body,data,log=None ):
                                     parameters[words[1]] = p[1:len(p)-1]
                                 else:
                                     try:
-                                        parameters[words[1]] = eval_parser.parse(p).evaluate(w)
+                                        parameters[words[1]] = evaluate(program,p,w)
                                     except:
                                         parse_error = "incomputable expression \"" + p + "\""
 
@@ -505,7 +615,7 @@ def nextTask ( body,data,log=None ):
                                         wdata[dtype][0][words[2]] = p[1:len(p)-1]
                                     else:
                                         try:
-                                            wdata[dtype][0][words[2]] = eval_parser.parse(p).evaluate(w)
+                                            wdata[dtype][0][words[2]] = evaluate(program,p,w)
                                         except:
                                             parse_error = "incomputable expression \"" + p + "\""
 
@@ -531,7 +641,7 @@ def nextTask ( body,data,log=None ):
                             else:
                                 p = "".join ( words[2:] )
                                 try:
-                                    revno = eval_parser.parse(p).evaluate(w)
+                                    revno = evaluate(program,p,w)
                                     auto_api2.log_comment ( "use revision '" + str(revno) + "' now" )
                                     if rev_list and revno<len(rev_list):
                                         revision = rev_list[revno]
@@ -698,3 +808,104 @@ def nextTask ( body,data,log=None ):
         body.stderrln ( str(tb))
         body.putMessage ( "&nbsp;<p><h3><i>Automatic workflow excepted</i></h3>" )
         return "errors (excepted)"
+
+
+# ----------------------------------------------------------------------------
+#  Benchmark:  python -m pycofe.auto.auto_workflow bench [nlines]
+#  times nextTask() in REPEAT loop placed after nlines of script, with
+#  program compiled at first call and taken from context afterwards; same
+#  steps are checked in pycofe/tests/test_auto_workflow.py
+# ----------------------------------------------------------------------------
+
+def _bench_script ( nlines ):
+    script = [ "VERSION 1.0", "COMMENTS OFF", "" ]
+    n = 0
+    while len(script)<nlines:
+        script += [ "# run " + str(n),
+                    "@RUN_" + str(n),
+                    "    IFDATA    ligand",
+                    "    PARAMETER SAMPLES 100*" + str(n) + "+1",
+                    "    RUN       Refmac",
+                    "let x = " + str(n) + " + 1" ]
+        n += 1
+    script += [ "let cnt = 1",
+                "@REFINE[cnt]",
+                "    PARAMETER NCYC cnt*2+1",
+                "    RUN       Refmac",
+                "let cnt = cnt + 1; Rfree0 = Rfree  if  Rfree<Rfree0",
+                "repeat @REFINE while cnt<100000 and suggested>=0",
+                "END" ]
+    return script
+
+
+def _bench_steps ( script,nsteps ):
+    # runs nsteps of workflow, passing context from step to step as the
+    # framework does; returns list of (rc,runName,time) for every step
+    import os
+    import io
+    import time
+    import shutil
+    import tempfile
+
+    class Task(object):  pass
+    class Body(object):
+        def __init__ ( self,task ):
+            self.task          = task
+            self.citation_list = []
+            self.file_stdout1  = io.StringIO()
+        def putMessage ( self,msg ):  pass
+        def putTitle   ( self,msg ):  pass
+        def stderrln   ( self,msg ):  print ( msg )
+        def keepWorkflow   ( self ):  pass
+        def _add_citations ( self,clist ):  pass
+
+    cwd    = os.getcwd()
+    tmpdir = tempfile.mkdtemp()
+    os.chdir ( tmpdir )
+    steps  = []
+    try:
+        context = { "custom":{ "input_data":{ "variables":{"Rfree0":1.0} } },
+                    "tasks":{}, "job_register":{} }
+        runName = "root"
+        pointer = 0
+        for step in range(nsteps):
+            with open(auto_api2.auto_context_fname(),"w") as f:
+                json.dump ( context,f )
+            task = Task()
+            task.script         = script
+            task.script_pointer = pointer
+            task.autoRunId      = "bench"
+            task.autoRunName    = runName
+            body = Body ( task )
+            t  = time.perf_counter()
+            rc = nextTask ( body,{ "variables":{ "Rfree":0.3 } } )
+            t  = time.perf_counter() - t
+            if rc!="ok":
+                steps.append ( (rc,None,t) )
+                break
+            with open(auto_api2.auto_meta_fname(),"r") as f:
+                meta = json.load ( f )
+            context = meta["context"]
+            runName = [k for k in meta if k!="context"][0]
+            pointer = task.script_end_pointer
+            steps.append ( (rc,runName,t) )
+    finally:
+        os.chdir ( cwd )
+        shutil.rmtree ( tmpdir )
+    return steps
+
+
+def benchmark ( nlines=2000,nsteps=50 ):
+    script  = _bench_script ( nlines )
+    timings = [ t for rc,runName,t in _bench_steps(script,nsteps) ]
+    print ( " script lines          : %d" % len(script) )
+    print ( " first step (compile)  : %8.2f ms" % (1000.0*timings[0]) )
+    print ( " later steps, mean     : %8.2f ms" % (1000.0*sum(timings[1:])/(len(timings)-1)) )
+    print ( " later steps, last 10  : %8.2f ms" % (1000.0*sum(timings[-10:])/10.0) )
+    return
+
+
+if __name__ == "__main__":
+    import sys
+    if len(sys.argv)>1 and sys.argv[1]=="bench":
+        benchmark ( *[int(a) for a in sys.argv[2:3]] )
@@ -3,13 +3,13 @@
 #
 # ============================================================================
 #
-#    03.10.22   <--  Date of Last Modification.
+#    18.10.26   <--  Date of Last Modification.
 #                   ~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 # ----------------------------------------------------------------------------
 #
 #  THE DATABOX
 #
-#  Copyright (C) Eugene Krissinel, Andrey Lebedev 2017-2022
+#  Copyright (C) Eugene Krissinel, Andrey Lebedev 2017-2026
 #
 # ============================================================================
 #
@@ -89,17 +89,18 @@ class DataBox(jsonut.jObject):
     def save ( self,dir_path ):
         if self.data:
             file = open ( os.path.join(dir_path,"databox.meta"),"w" )
-            file.write ( self.to_JSON() )
+            file.write ( self.to_JSON(compact=True) )
             file.close ()
         return
 
 
 def make_class ( obj ):
     if hasattr(obj,"_type"):
-        json_str = obj.to_JSON()
+        # DType is built directly from obj's JSON tree, without serialising
+        # it to string and parsing back; untouched parts are built lazily
         import_name = "dtype_" + obj._type[len("Data"):].lower()
         dt = __import__( "dtypes." + import_name )
-        return getattr(dt,import_name).DType(-1,json_str)
+        return getattr(dt,import_name).DType(-1,jsonut.plain(obj))
     else:
         return obj
 
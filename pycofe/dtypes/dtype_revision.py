@@ -3,13 +3,13 @@
 #
 # ============================================================================
 #
-#    03.02.23   <--  Date of Last Modification.
+#    18.10.26   <--  Date of Last Modification.
 #                   ~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 # ----------------------------------------------------------------------------
 #
 #  REVISION DATA TYPE
 #
-#  Copyright (C) Eugene Krissinel, Andrey Lebedev 2017-2023
+#  Copyright (C) Eugene Krissinel, Andrey Lebedev 2017-2026
 #
 # ============================================================================
 #
@@ -101,22 +101,22 @@ class DType(dtype_template.DType):
             for t in prevRevision.subtype:
                 self.subtype.append ( t )
             if prevRevision.HKL:
-                self.HKL = jsonut.jObject ( prevRevision.HKL.to_JSON() )
+                self.HKL = jsonut.clone ( prevRevision.HKL )
             else:
                 self.HKL = None
-            self.ASU = jsonut.jObject ( prevRevision.ASU.to_JSON() )
+            self.ASU = jsonut.clone ( prevRevision.ASU )
             if prevRevision.Structure:
-                self.Structure = jsonut.jObject ( prevRevision.Structure.to_JSON() )
+                self.Structure = jsonut.clone ( prevRevision.Structure )
             else:
                 self.Structure = None
             if prevRevision.Substructure:
-                self.Substructure = jsonut.jObject ( prevRevision.Substructure.to_JSON() )
+                self.Substructure = jsonut.clone ( prevRevision.Substructure )
             else:
                 self.Substructure = None
             self.Ligands = []
             for l in prevRevision.Ligands:
                 self.Ligands.append ( l )
-            self.Options = jsonut.jObject ( prevRevision.Options.to_JSON() )
+            self.Options = jsonut.clone ( prevRevision.Options )
         return
 
     def makeDataId ( self,serialNo ):
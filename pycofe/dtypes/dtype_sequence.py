@@ -3,13 +3,13 @@
 #
 # ============================================================================
 #
-#    23.05.25   <--  Date of Last Modification.
+#    18.10.26   <--  Date of Last Modification.
 #                   ~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 # ----------------------------------------------------------------------------
 #
 #  SEQUENCE DATA TYPE
 #
-#  Copyright (C) Eugene Krissinel, Andrey Lebedev 2017-2025
+#  Copyright (C) Eugene Krissinel, Andrey Lebedev 2017-2026
 #
 # ============================================================================
 #
@@ -19,6 +19,7 @@ import os
 
 #  application imports
 from . import dtype_template
+from pycofe.varut import zutils
 
 # ============================================================================
 
@@ -214,7 +215,7 @@ class DType(dtype_template.DType):
             if fname.lower().endswith('.pir'):
                 fname_seq = os.path.splitext(fname)[0] + "_pir.seq"
                 self.files[dtype_template.file_key["seq"]] = fname_seq
-            f     = open(os.path.join(inputDir,fname),'r')
+            f     = zutils.open_input(os.path.join(inputDir,fname),'r')
             lines = f.readlines()
             f.close()
             f     = open(os.path.join(outputDir,fname_seq),'w')
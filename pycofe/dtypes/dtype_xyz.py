@@ -3,13 +3,13 @@
 #
 # ============================================================================
 #
-#    11.08.24   <--  Date of Last Modification.
+#    18.10.26   <--  Date of Last Modification.
 #                   ~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 # ----------------------------------------------------------------------------
 #
 #  XYZ (COORDINATES) DATA TYPE
 #
-#  Copyright (C) Eugene Krissinel, Andrey Lebedev 2017-2024
+#  Copyright (C) Eugene Krissinel, Andrey Lebedev 2017-2026
 #
 # ============================================================================
 #
@@ -25,6 +25,7 @@ import gemmi
 from  pycofe.dtypes  import dtype_template
 from  pycofe.proc    import xyzmeta
 from  pycofe.varut   import mmcif_utils
+from  pycofe.varut   import xyzcache
 
 # ============================================================================
 
@@ -139,7 +140,7 @@ class DType(dtype_template.DType):
         self.BF_correction = "none"        # "none", "af2", "rosetta"
         fpath = self.getPDBFilePath ( dirPath )
         if fpath:
-            st = gemmi.read_structure ( fpath )
+            st = xyzcache.read_structure ( fpath )
             st.setup_entities()
             need_to_fix  = True
             max_bfactor  = 0.0
@@ -183,7 +184,7 @@ class DType(dtype_template.DType):
     def convertToPDB ( self,dirPath ):
         fpath = self.getPDBFilePath ( dirPath )
         if not fpath.lower().endswith(".pdb"):
-            st = gemmi.read_structure ( fpath )
+            st = xyzcache.read_structure ( fpath,shared=True )
             fp,fe = os.path.splitext ( fpath )
             st.write_pdb ( fp+".pdb" )
             fp,fe = os.path.splitext ( self.getPDBFileName() )
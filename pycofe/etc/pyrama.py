@@ -3,7 +3,7 @@
 #
 # ============================================================================
 #
-#    31.03.25   <--  Date of Last Modification.
+#    18.10.26   <--  Date of Last Modification.
 #                   ~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 # ----------------------------------------------------------------------------
 #
@@ -19,8 +19,11 @@
 #  Cbeta deviation. 2003. DOI: 10.1002/prot.10286
 #
 #  Reference data should be in 'rama_data' subdirectory relative to this file.
+#  Text tables are compiled into binary file, which is then memory-mapped:
+#  rama_data/pref_tables.npy if made at packaging time ("pyrama.py -compile"),
+#  or a file in temporary directory made on first use otherwise.
 #
-#  Adopted in present form by Eugene Krissinel, Andrey Lebedev, Maria Fando 2019-2025
+#  Adopted in present form by Eugene Krissinel, Andrey Lebedev, Maria Fando 2019-2026
 #
 # ============================================================================
 #
@@ -31,71 +34,335 @@ import math
 import os
 import sys
 import json
+import hashlib
+import tempfile
 
-import matplotlib.pyplot as plt
-#import numpy as np
-#from   Bio import PDB
-from   matplotlib import colors
-
-import matplotlib.colors as mplcolors
-
+import numpy
 import gemmi
 
-plt.switch_backend ( "agg" )
+# the module is also run as a script by file path, where pycofe may be not
+# importable; structures are then read without cache
+try:
+    from pycofe.varut import xyzcache
+    read_structure = xyzcache.read_structure
+except ImportError:
+    read_structure = gemmi.read_structure
+
+# matplotlib is imported only when plots are made (see _pyplot()), so that
+# importing this module for calculations alone is cheap
 
 # ============================================================================
 
 RAMA_PREFERENCES = {
     "General": {
         "file": os.path.join('rama_data', 'pref_general.data'),
-        "cmap": mplcolors.ListedColormap(['#FFFFFF', '#B3E8FF', '#7FD9FF']),
+        "colors": ['#FFFFFF', '#B3E8FF', '#7FD9FF'],
         "bounds": [0, 0.0005, 0.02, 1],
     },
     "GLY": {
         "file": os.path.join('rama_data', 'pref_glycine.data'),
-        "cmap": mplcolors.ListedColormap(['#FFFFFF', '#FFE8C5', '#FFCC7F']),
+        "colors": ['#FFFFFF', '#FFE8C5', '#FFCC7F'],
         "bounds": [0, 0.002, 0.02, 1],
     },
     "PRO": {
         "file": os.path.join('rama_data', 'pref_proline.data'),
-        "cmap": mplcolors.ListedColormap(['#FFFFFF', '#D0FFC5', '#7FFF8C']),
+        "colors": ['#FFFFFF', '#D0FFC5', '#7FFF8C'],
         "bounds": [0, 0.002, 0.02, 1],
     },
     "PRE-PRO": {
         "file": os.path.join('rama_data', 'pref_preproline.data'),
-        "cmap": mplcolors.ListedColormap(['#FFFFFF', '#B3E8FF', '#7FD9FF']),
+        "colors": ['#FFFFFF', '#B3E8FF', '#7FD9FF'],
         "bounds": [0, 0.002, 0.02, 1],
     }
 }
 
-#RAMA_PREF_VALUES = None
+# order of tables in compiled file and residue type codes in calculations
+RAMA_KEYS = [ "General","GLY","PRO","PRE-PRO" ]
+
+# compiled tables: array 4x360x360 of preference values indexed as
+# [type][psi+180][phi+180], made from text tables on first use
+RAMA_TABLES_FILE = os.path.join ( 'rama_data','pref_tables.npy' )
+
+RAMA_PREF_VALUES = None   # { key : 360x360 array }, loaded on first use
 
 
 # ============================================================================
 
-def _cache_RAMA_PREF_VALUES():
-    #f_path = os.path.realpath(os.path.join(os.getcwd(), os.path.dirname(__file__)))
+def _pyplot():
+    import matplotlib.pyplot as plt
+    plt.switch_backend ( "agg" )
+    return plt
+
+
+def _cmap ( key ):
+    from matplotlib import colors
+    cmap = colors.ListedColormap ( RAMA_PREFERENCES[key]["colors"] )
+    return cmap, colors.BoundaryNorm ( RAMA_PREFERENCES[key]["bounds"],cmap.N )
+
+
+def _parse_RAMA_PREF_VALUES ( f_path ):
+    # reads text tables; each data point fills 2x2 cells exactly as in
+    # original PyRAMA, including wrapping of negative indices
+    tables = numpy.zeros ( (len(RAMA_KEYS),360,360),dtype=numpy.float64 )
+    for n in range(len(RAMA_KEYS)):
+        data = numpy.loadtxt ( os.path.join(f_path,RAMA_PREFERENCES[RAMA_KEYS[n]]["file"]),
+                               comments="#",ndmin=2 )
+        x = data[:,1].astype(numpy.int64)  # int(float()) truncates, as astype()
+        y = data[:,0].astype(numpy.int64)
+        t = tables[n]
+        # points are on 2-degree grid, therefore 2x2 cells written for
+        # different points do not overlap and may be assigned in bulk
+        t[x+180,y+180] = data[:,2]
+        t[x+179,y+179] = data[:,2]
+        t[x+179,y+180] = data[:,2]
+        t[x+180,y+179] = data[:,2]
+    return tables
+
+
+def _save_RAMA_TABLES ( fpath,tables ):
+    # writes compiled tables atomically; returns False if this is not
+    # possible
+    tmpath = fpath + "." + str(os.getpid()) + ".tmp"
+    try:
+        with open(tmpath,"wb") as f:
+            numpy.save ( f,tables )
+        os.replace ( tmpath,fpath )
+    except OSError:
+        if os.path.isfile(tmpath):
+            os.remove ( tmpath )
+        return False
+    return True
+
+
+def _compile_RAMA_PREF_VALUES ( f_path ):
+    # writes compiled tables next to text ones (done at packaging time);
+    # returns path or None if directory is not writable
+    tables = _parse_RAMA_PREF_VALUES ( f_path )
+    fpath  = os.path.join ( f_path,RAMA_TABLES_FILE )
+    if not _save_RAMA_TABLES(fpath,tables):
+        return None, tables
+    return fpath, tables
+
+
+def _temp_tables_path ( f_path ):
+    # compiled tables made at run time are kept in temporary directory, under
+    # name which changes with location and time stamps of text tables
+    h = hashlib.sha1 ( f_path.encode("utf-8") )
+    for key in RAMA_KEYS:
+        s = os.stat ( os.path.join(f_path,RAMA_PREFERENCES[key]["file"]) )
+        h.update ( ("%d %d" % (s.st_size,s.st_mtime_ns)).encode("utf-8") )
+    return os.path.join ( tempfile.gettempdir(),
+                          "pyrama_tables_" + h.hexdigest()[:16] + ".npy" )
+
+
+def _load_RAMA_TABLES():
+    # returns 4x360x360 array of preference values, memory-mapped from
+    # compiled file: one made at packaging time, if it is up to date, or one
+    # made on first use in temporary directory. The installation directory
+    # is never written at run time.
     f_path = os.path.realpath ( os.path.dirname ( __file__ ) )
-    RAMA_PREF_VALUES = {}
-    for key, val in list(RAMA_PREFERENCES.items()):
-        #RAMA_PREF_VALUES[key] = np.full((360, 360), 0, dtype=np.float64)
-        RAMA_PREF_VALUES[key] = [ [0.0]*360 for _ in range(360) ]
-        with open(os.path.join(f_path, val["file"])) as fn:
-            for line in fn:
-                if line.startswith("#"):
+    fpath  = os.path.join ( f_path,RAMA_TABLES_FILE )
+    try:
+        mtime = os.path.getmtime ( fpath )
+        for key in RAMA_KEYS:
+            if os.path.getmtime(os.path.join(f_path,RAMA_PREFERENCES[key]["file"]))>mtime:
+                mtime = None
+                break
+        if mtime is not None:
+            return numpy.load ( fpath,mmap_mode="r" )
+    except (OSError,ValueError):
+        pass
+    try:
+        fpath = _temp_tables_path ( f_path )
+        if os.path.isfile(fpath):
+            return numpy.load ( fpath,mmap_mode="r" )
+    except (OSError,ValueError):
+        fpath = None
+    tables = _parse_RAMA_PREF_VALUES ( f_path )
+    if fpath:
+        _save_RAMA_TABLES ( fpath,tables )
+    return tables
+
+
+def _cache_RAMA_PREF_VALUES():
+    tables = _load_RAMA_TABLES()
+    RAMA_PREF_VALUES = { "_tables" : tables }
+    for n in range(len(RAMA_KEYS)):
+        RAMA_PREF_VALUES[RAMA_KEYS[n]] = tables[n]
+    return RAMA_PREF_VALUES
+
+
+def _get_RAMA_PREF_VALUES():
+    global RAMA_PREF_VALUES
+    if RAMA_PREF_VALUES is None:
+        RAMA_PREF_VALUES = _cache_RAMA_PREF_VALUES()
+    return RAMA_PREF_VALUES
+
+
+def calc_dihedrals ( p0,p1,p2,p3 ):
+    # dihedral angles (radians) for arrays of points of shape (n,3), same
+    # formula as in gemmi.calculate_dihedral()
+    b0 = p1 - p0
+    b1 = p2 - p1
+    b2 = p3 - p2
+    u  = numpy.cross ( b1,b0 )
+    w  = numpy.cross ( b2,b1 )
+    y  = numpy.einsum ( "ij,ij->i",numpy.cross(u,w),b1 )
+    x  = numpy.einsum ( "ij,ij->i",u,w ) * numpy.sqrt ( numpy.einsum("ij,ij->i",b1,b1) )
+    return numpy.arctan2 ( y,x )
+
+
+def _name_code ( name ):
+    return numpy.frombuffer ( name.encode().ljust(8,b"\0"),dtype=numpy.int64 )[0]
+
+
+def _flat_phi_psi ( st ):
+    # calculates phi,psi for all models and chains at once from flat atom
+    # arrays, taking neighbours of residues as gemmi's previous_residue() and
+    # next_residue() do. Returns None if structure has features for which
+    # this may disagree with gemmi (alternative backbone conformations,
+    # microheterogeneity, chains split in several pieces), in which case the
+    # calculation is done residue by residue.
+    fs    = gemmi.FlatStructure ( st )
+    natoms = len(fs.resnums)
+    if natoms<=0:
+        return None
+
+    def codes ( a ):
+        return numpy.ascontiguousarray(a).view(numpy.int64).ravel()
+
+    # FlatStructure makes new arrays on every access, therefore take them once
+    anames = codes ( fs.atom_names    )
+    chains = codes ( fs.chain_ids     )
+    rnames = codes ( fs.residue_names )
+    models = fs.model_num
+    seqnum = fs.resnums
+    icodes = fs.icodes
+    elems  = fs.elements
+    altloc = fs.altlocs
+    pos    = fs.pos
+
+    # residue index of every atom
+    newseq = numpy.ones ( natoms,dtype=bool )
+    newseq[1:] = (models[1:]!=models[:-1]) | (chains[1:]!=chains[:-1]) |\
+                 (seqnum[1:]!=seqnum[:-1]) | (icodes[1:]!=icodes[:-1])
+    newres = newseq.copy()
+    newres[1:] |= rnames[1:]!=rnames[:-1]
+    if numpy.count_nonzero(newres)!=numpy.count_nonzero(newseq):
+        return None   # microheterogeneity
+    rid   = numpy.cumsum(newres) - 1
+    nres  = int(rid[-1]) + 1
+    first = numpy.flatnonzero ( newres )
+
+    # neighbours are looked for within chain; chain must be in one piece
+    newchain = numpy.ones ( natoms,dtype=bool )
+    newchain[1:] = (models[1:]!=models[:-1]) | (chains[1:]!=chains[:-1])
+    if numpy.count_nonzero(newchain)!=sum([len(model) for model in st]):
+        return None
+
+    # backbone atoms, one per residue
+    bb = {}
+    for name,el in (("N",7),("CA",6),("C",6)):
+        sel = numpy.flatnonzero ( (anames==_name_code(name)) & (elems==el) )
+        if numpy.any(altloc[sel]!=0) or numpy.any(numpy.diff(rid[sel])<=0):
+            return None   # alternative conformations
+        bb[name] = numpy.full ( (nres,3),numpy.nan )
+        bb[name][rid[sel]] = pos[sel]
+    has = { key : ~numpy.isnan(bb[key][:,0]) for key in bb }
+
+    # residues having both neighbours
+    linked = ~newchain[first]   # True if residue i-1 is in the same chain
+    ires   = numpy.flatnonzero ( linked[:-1] & linked[1:] )
+
+    # only residues with complete backbone have torsions defined
+    ires = ires[ has["N"][ires-1] & has["C"][ires-1] & has["N"][ires] &
+                 has["CA"][ires]  & has["C"][ires]   & has["N"][ires+1] ]
+    phi  = calc_dihedrals ( bb["C"][ires-1],bb["N"][ires],bb["CA"][ires],bb["C"][ires] )
+    psi  = calc_dihedrals ( bb["N"][ires],bb["CA"][ires],bb["C"][ires],bb["N"][ires+1] )
+
+    rname = rnames[first]
+    rtype = numpy.zeros ( len(ires),dtype=numpy.int64 )
+    rtype[rname[ires]==_name_code("GLY")] = 1
+    rtype[rname[ires]==_name_code("PRO")] = 2
+    rtype[rname[ires+1]==_name_code("PRO")] = 3
+
+    # residue ids; there are few distinct names and numbers, which are
+    # therefore converted to strings once
+    fa = first[ires]
+    def strings ( a,conv ):
+        u,inv = numpy.unique ( a,return_inverse=True )
+        ustr  = [conv(v) for v in u.tolist()]
+        return [ustr[i] for i in inv.ravel().tolist()]
+    def decode ( v ):
+        return numpy.array([v],dtype=numpy.int64).view("S8")[0].decode()
+    resids = [ list(r) for r in zip (
+                    strings ( models[fa],str    ),
+                    strings ( chains[fa],decode ),
+                    strings ( seqnum[fa],str    ),
+                    strings ( rnames[fa],decode ),
+                    strings ( icodes[fa],chr    ) ) ]
+
+    return numpy.degrees(numpy.stack([phi,psi],axis=1)), rtype, resids
+
+
+def collect_phi_psi ( st ):
+    # calculates phi,psi (degrees) for residues which have both neighbours
+    # and complete backbone, chain by chain for all models. Returns:
+    #   phipsi : array (n,2) of phi,psi
+    #   rtype  : array (n,) of indices in RAMA_KEYS
+    #   resids : list of [model,chain,seqnum,name,icode]
+    if hasattr(gemmi,"FlatStructure"):
+        result = _flat_phi_psi ( st )
+        if result is not None:
+            return result
+    phipsi = []
+    rtype  = []
+    resids = []
+    calculate_phi_psi = gemmi.calculate_phi_psi
+    for model in st:
+        mnum = str(model.num)
+        for chain in model:
+            cname    = chain.name
+            prev_res = chain.previous_residue
+            next_res = chain.next_residue
+            # previous_residue() and next_residue() return previous/next
+            # residue only if the residues are bonded. Otherwise -- None.
+            for res in chain:
+                prev = prev_res(res)
+                if not prev:
+                    continue
+                next = next_res(res)
+                if not next:
+                    continue
+                v = calculate_phi_psi ( prev,res,next )
+                if math.isnan(v[0]) or math.isnan(v[1]):
                     continue
+                phipsi.append ( v )
+                rname = res.name
+                if next.name == "PRO":
+                    rtype.append ( 3 )
+                elif rname == "PRO":
+                    rtype.append ( 2 )
+                elif rname == "GLY":
+                    rtype.append ( 1 )
                 else:
-                    x = int(float(line.split()[1]))
-                    y = int(float(line.split()[0]))
-                    RAMA_PREF_VALUES[key][x + 180][y + 180] \
-                        = RAMA_PREF_VALUES[key][x + 179][y + 179] \
-                        = RAMA_PREF_VALUES[key][x + 179][y + 180] \
-                        = RAMA_PREF_VALUES[key][x + 180][y + 179] \
-                        = float(line.split()[2])
-    return RAMA_PREF_VALUES
+                    rtype.append ( 0 )
+                seqid = res.seqid
+                resids.append ( [mnum,cname,str(seqid.num),rname,seqid.icode] )
+    phipsi = numpy.degrees ( numpy.array(phipsi,dtype=numpy.float64).reshape((-1,2)) )
+    return phipsi, numpy.array(rtype,dtype=numpy.int64), resids
 
-RAMA_PREF_VALUES = _cache_RAMA_PREF_VALUES()
 
+def classify_phi_psi ( phi,psi,rtype ):
+    # returns boolean array of outlier flags; a single gather from the
+    # compiled tables
+    tables = _get_RAMA_PREF_VALUES()["_tables"]
+    bounds = numpy.array ( [RAMA_PREFERENCES[key]["bounds"][1] for key in RAMA_KEYS] )
+    # int() truncation towards zero as in original code; +/-180 are folded
+    # into the table
+    iphi = numpy.clip ( numpy.trunc(phi).astype(numpy.int64)+180,0,359 )
+    ipsi = numpy.clip ( numpy.trunc(psi).astype(numpy.int64)+180,0,359 )
+    return tables[rtype,ipsi,iphi] < bounds[rtype]
 
 
 def calc_ramachandran ( file_name_list ):
@@ -104,16 +371,12 @@ def calc_ramachandran ( file_name_list ):
     :param file_name_list: List of PDB files to plot
     :return: Nothing
     """
-    global RAMA_PREF_VALUES
-
-    if RAMA_PREF_VALUES is None:
-        RAMA_PREF_VALUES = _cache_RAMA_PREF_VALUES()
 
     # Read in the expected torsion angles
     reslist  = { "normals" : [], "outliers" : [] }
     normals  = {}
     outliers = {}
-    for key, val in list(RAMA_PREFERENCES.items()):
+    for key in RAMA_PREFERENCES:
         normals [key] = {"x": [], "y": [] }
         outliers[key] = {"x": [], "y": [] }
 
@@ -124,107 +387,44 @@ def calc_ramachandran ( file_name_list ):
         if not os.path.isfile(inp):
             continue
 
-        st = gemmi.read_structure ( inp )
+        st = read_structure ( inp )
         st.setup_entities()
-        for model in st:
-            #print ( "  do model " )
-            for chain in model:
-                #print ( "   do chain " )
-                #for res in chain.get_polymer(): <- should work, check with new gemmi
-                for res in chain:
-                    #print ( "  do residue " + res.name )
-                    # previous_residue() and next_residue() return previous/next
-                    # residue only if the residues are bonded. Otherwise -- None.
-                    prev_res = chain.previous_residue(res)
-                    next_res = chain.next_residue(res)
-                    if prev_res and next_res:
-                        #print ( " prev="+prev_res.name + "  next=" + next_res.name )
-                        v = gemmi.calculate_phi_psi ( prev_res, res, next_res )
-                        #print ( "  v=" + str(v) )
-                        if not math.isnan(v[0]) and not math.isnan(v[1]):
-                            if next_res.name == "PRO":
-                                aa_type = "PRE-PRO"
-                            elif res.name == "PRO":
-                                aa_type = "PRO"
-                            elif res.name == "GLY":
-                                aa_type = "GLY"
-                            else:
-                                aa_type = "General"
-                            phi = math.degrees ( v[0] )
-                            psi = math.degrees ( v[1] )
-                            #print ( str(phi) + " : " + str(psi) )
-                            #phi = max ( -180.0,min(179.0,phi) )
-                            #psi = max ( -180.0,min(179.0,psi) )
-
-                            try:
-                                litem = [ str(model.num),chain.name,str(res.seqid.num),
-                                          res.name,res.seqid.icode,phi,psi ]
-                            except:
-                                litem = [ str(model.num),chain.name,str(res.seqid.num),
-                                          res.name,res.seqid.icode,phi,psi ]
-                            if RAMA_PREF_VALUES[aa_type][int(psi)+180][int(phi)+180] < \
-                                    RAMA_PREFERENCES[aa_type]["bounds"][1]:
-                                outliers[aa_type]["x"].append(phi)
-                                outliers[aa_type]["y"].append(psi)
-                                if aa_type!="General":
-                                    outliers["General"]["x"].append(phi)
-                                    outliers["General"]["y"].append(psi)
-                                reslist["outliers"].append ( litem )
-                            else:
-                                normals[aa_type]["x"].append(phi)
-                                normals[aa_type]["y"].append(psi)
-                                if aa_type!="General":
-                                    normals["General"]["x"].append(phi)
-                                    normals["General"]["y"].append(psi)
-                                reslist["normals"].append ( litem )
-
-        """
-        #print ( " ===================================" )
-
-        structure = PDB.PDBParser().get_structure('input_structure', inp)
-        for model in structure:
-            for chain in model:
-                polypeptides = PDB.PPBuilder().build_peptides(chain)
-                for poly_index, poly in enumerate(polypeptides):
-                    phi_psi = poly.get_phi_psi_list()
-                    for res_index, residue in enumerate(poly):
-                        res_name = "{}".format(residue.resname)
-                        res_num = residue.id[1]
-                        phi, psi = phi_psi[res_index]
-                        if phi and psi:
-                            if str(poly[res_index + 1].resname) == "PRO":
-                                aa_type = "PRE-PRO"
-                            elif res_name == "PRO":
-                                aa_type = "PRO"
-                            elif res_name == "GLY":
-                                aa_type = "GLY"
-                            else:
-                                aa_type = "General"
-                            #print ( str(math.degrees(phi)) + " : " + str(math.degrees(psi)) )
-                            if RAMA_PREF_VALUES[aa_type][int(math.degrees(psi)) + 180][int(math.degrees(phi)) + 180] < \
-                                    RAMA_PREFERENCES[aa_type]["bounds"][1]:
-                                outliers[aa_type]["x"].append(math.degrees(phi))
-                                outliers[aa_type]["y"].append(math.degrees(psi))
-                            else:
-                                normals[aa_type]["x"].append(math.degrees(phi))
-                                normals[aa_type]["y"].append(math.degrees(psi))
-        """
+
+        phipsi,rtype,resids = collect_phi_psi ( st )
+        if len(resids)<=0:
+            continue
+
+        phi  = phipsi[:,0]
+        psi  = phipsi[:,1]
+        outl = classify_phi_psi ( phi,psi,rtype )
+        lphi = phi.tolist()
+        lpsi = psi.tolist()
+
+        # every residue also goes to "General" plot, in residue order
+        for flag,data,rlist in ((True,outliers,reslist["outliers"]),
+                                (False,normals,reslist["normals"])):
+            sel = outl==flag
+            data["General"]["x"] += phi[sel].tolist()
+            data["General"]["y"] += psi[sel].tolist()
+            for n in range(1,len(RAMA_KEYS)):
+                tsel = sel & (rtype==n)
+                data[RAMA_KEYS[n]]["x"] += phi[tsel].tolist()
+                data[RAMA_KEYS[n]]["y"] += psi[tsel].tolist()
+            for i in numpy.flatnonzero(sel).tolist():
+                rlist.append ( resids[i] + [lphi[i],lpsi[i]] )
 
     return normals, outliers, reslist
 
 
 def plot_ramachandran ( normals,outliers ):
-    global RAMA_PREF_VALUES
-
-    if RAMA_PREF_VALUES is None:
-        RAMA_PREF_VALUES = _cache_RAMA_PREF_VALUES()
+    RAMA_PREF_VALUES = _get_RAMA_PREF_VALUES()
+    plt = _pyplot()
 
     for idx, (key, val) in enumerate(sorted(list(RAMA_PREFERENCES.items()), key=lambda x: x[0].lower())):
         plt.subplot(2, 2, idx + 1)
         plt.title(key)
-        plt.imshow(RAMA_PREF_VALUES[key], cmap=RAMA_PREFERENCES[key]["cmap"],
-                   norm=colors.BoundaryNorm(RAMA_PREFERENCES[key]["bounds"],
-                                            RAMA_PREFERENCES[key]["cmap"].N),
+        cmap, norm = _cmap ( key )
+        plt.imshow(RAMA_PREF_VALUES[key], cmap=cmap, norm=norm,
                    extent=(-180, 180, 180, -180))
         plt.scatter(normals[key]["x"], normals[key]["y"])
         plt.scatter(outliers[key]["x"], outliers[key]["y"], color="red")
@@ -244,16 +444,13 @@ def plot_ramachandran ( normals,outliers ):
 
 
 def plot_ramachandran1 ( key,title,normals,outliers,outimagepath ):
-    global RAMA_PREF_VALUES
-
-    if RAMA_PREF_VALUES is None:
-        RAMA_PREF_VALUES = _cache_RAMA_PREF_VALUES()
+    RAMA_PREF_VALUES = _get_RAMA_PREF_VALUES()
+    plt = _pyplot()
+    cmap, norm = _cmap ( key )
 
     plt.figure  ( figsize=(5.5, 5.5) )
     plt.title   ( title, fontsize=18 )
-    plt.imshow  ( RAMA_PREF_VALUES[key], cmap=RAMA_PREFERENCES[key]["cmap"],
-                  norm=colors.BoundaryNorm(RAMA_PREFERENCES[key]["bounds"],
-                                           RAMA_PREFERENCES[key]["cmap"].N),
+    plt.imshow  ( RAMA_PREF_VALUES[key], cmap=cmap, norm=norm,
                   extent=(-180, 180, 180, -180))
     plt.scatter ( normals[key]["x"], normals[key]["y"])
     plt.scatter ( outliers[key]["x"], outliers[key]["y"], color="red")
@@ -311,6 +508,21 @@ if __name__ == "__main__":
     #     output-name_pre_pro.png
     #     output-name_reslist.json
     #
+    #  ccp4-python pyrama.py -compile
+    #
+    #  will (re)make compiled preference tables rama_data/pref_tables.npy
+    #  at packaging time; otherwise, they are made on first use in temporary
+    #  directory
+    #
+
+    if sys.argv[1]=="-compile":
+        fpath,tables = _compile_RAMA_PREF_VALUES (
+                                os.path.realpath(os.path.dirname(__file__)) )
+        if not fpath:
+            print ( " *** cannot write compiled tables" )
+            sys.exit(1)
+        print ( " compiled tables written in " + fpath )
+        sys.exit(0)
 
     make_ramaplot2 ( sys.argv[2],sys.argv[1],sys.argv[3] )
     sys.exit(0)
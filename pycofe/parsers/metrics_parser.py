@@ -0,0 +1,243 @@
+##!/usr/bin/python
+
+#
+# ============================================================================
+#
+#    18.10.26   <--  Date of Last Modification.
+#                   ~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+# ----------------------------------------------------------------------------
+#
+#  METRICS EXTRACTORS FOR STREAMED PROGRAM LOGS
+#
+#  Extractors collect named values from program output while it is being
+#  written, so that task drivers do not need to re-read logs after programs
+#  finish. metrics_parser() wraps a list of extractors into an object with
+#  the parse_stream() interface expected by command.call(), and may be
+#  stacked on top of a report parser (e.g., rvapi generic parser):
+#
+#    vals = metrics_parser.regex_extractor()
+#    vals.add ( "rfree","R free\s*=\s*(\S+)",conv=float )
+#    rc = self.runApp ( "program",cmd,metrics=vals )
+#    rfree = vals.get ( "rfree" )
+#
+#  In TaskDriver.runApp(), extractors given in "metrics" are stacked on the
+#  currently set log parser, if any; without a log parser, output is passed
+#  through to the log file unchanged.
+#
+#  Copyright (C) Eugene Krissinel, Andrey Lebedev 2026
+#
+# ============================================================================
+#
+
+import re
+import codecs
+
+
+# ============================================================================
+# Extractors
+
+class extractor(object):
+    # base class: values are collected in self.values; feed() is called for
+    # every line of output (str, with line end) and finish() at end of stream
+
+    def __init__ ( self ):
+        self.values = {}
+        return
+
+    def feed ( self,line ):
+        return
+
+    def finish ( self ):
+        return
+
+    def get ( self,name,default=None ):
+        return self.values.get ( name,default )
+
+    def has ( self,name ):
+        return name in self.values
+
+
+class regex_extractor(extractor):
+    # collects values of regular expressions; for every name, mode is one of
+    #   "first" : value from the first matching line is kept
+    #   "last"  : value from the last matching line is kept
+    #   "all"   : list of values from all matching lines
+    # value is match.group(group), or tuple of all groups if group is None,
+    # converted with conv(); lines with values failing conversion are ignored
+
+    def __init__ ( self ):
+        super(regex_extractor,self).__init__()
+        self.rules = []
+        return
+
+    def add ( self,name,pattern,conv=None,mode="last",group=1 ):
+        self.rules.append ( [name,re.compile(pattern),conv,mode,group] )
+        if mode=="all":
+            self.values[name] = []
+        return self
+
+    def feed ( self,line ):
+        for name,regex,conv,mode,group in self.rules:
+            if mode=="first" and name in self.values:
+                continue
+            m = regex.search ( line )
+            if m:
+                if group is None:
+                    value = m.groups()
+                else:
+                    value = m.group ( group )
+                if conv:
+                    try:
+                        value = conv ( value )
+                    except (ValueError,TypeError):
+                        continue
+                if mode=="all":
+                    self.values[name].append ( value )
+                else:
+                    self.values[name] = value
+        return
+
+
+class table_extractor(extractor):
+    # collects rows of a table which follows the line matching header
+    # pattern: after skipping "skip" lines, every line with at least minwords
+    # words is taken as a row, until line matching "end" pattern (if given).
+    # Rows are kept as lists of words, in self.values["rows"], and are looked
+    # up by word in column keycol with row(); first row with given key wins.
+
+    def __init__ ( self,header,skip=0,minwords=1,end=None,keycol=0 ):
+        super(table_extractor,self).__init__()
+        self.header   = re.compile ( header )
+        self.end      = re.compile ( end ) if end else None
+        self.skip     = skip
+        self.minwords = minwords
+        self.keycol   = keycol
+        self.state    = -1   # -1: before table; >0: lines to skip; 0: in table
+        self.values["rows"] = []
+        self.index    = {}
+        return
+
+    def feed ( self,line ):
+        if self.state<0:
+            if self.header.search(line):
+                self.state = self.skip
+        elif self.state>0:
+            self.state -= 1
+        elif self.end and self.end.search(line):
+            self.state = -1
+        else:
+            words = line.split()
+            if len(words)>=self.minwords:
+                self.values["rows"].append ( words )
+                if len(words)>self.keycol and words[self.keycol] not in self.index:
+                    self.index[words[self.keycol]] = words
+        return
+
+    def rows ( self ):
+        return self.values["rows"]
+
+    def row ( self,key ):
+        return self.index.get ( key,None )
+
+
+# ============================================================================
+# Parser
+
+class _tee_stream(object):
+    # input stream proxy which passes all data read by a report parser to
+    # extractors, whatever way it is read
+
+    def __init__ ( self,istream,sink ):
+        self._istream = istream
+        self._sink    = sink
+        return
+
+    def read ( self,*args ):
+        data = self._istream.read ( *args )
+        self._sink.feed_data ( data )
+        return data
+
+    def readline ( self,*args ):
+        data = self._istream.readline ( *args )
+        self._sink.feed_data ( data )
+        return data
+
+    def readlines ( self,*args ):
+        lines = self._istream.readlines ( *args )
+        for line in lines:
+            self._sink.feed_data ( line )
+        return lines
+
+    def __iter__ ( self ):
+        return self
+
+    def __next__ ( self ):
+        line = self.readline()
+        if not line:
+            raise StopIteration
+        return line
+
+    next = __next__
+
+    def __getattr__ ( self,name ):
+        return getattr ( self._istream,name )
+
+
+class metrics_parser(object):
+
+    def __init__ ( self,extractors,log_parser=None ):
+        # extractors : extractor or list of extractors
+        # log_parser : report parser to stack on, or None
+        if isinstance(extractors,extractor):
+            extractors = [extractors]
+        self.extractors = extractors
+        self.log_parser = log_parser
+        self._decoder   = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        self._buffer    = ""
+        return
+
+    def _feed_line ( self,line ):
+        for e in self.extractors:
+            e.feed ( line )
+        return
+
+    def feed_data ( self,data ):
+        # accepts chunks of output (bytes or str) and feeds complete lines
+        if not data:
+            return
+        if isinstance(data,bytes):
+            data = self._decoder.decode ( data )
+        if "\n" not in data:
+            self._buffer += data
+            return
+        lines = (self._buffer + data).split ( "\n" )
+        self._buffer = lines.pop()
+        for line in lines:
+            self._feed_line ( line + "\n" )
+        return
+
+    def finish ( self ):
+        tail = self._buffer + self._decoder.decode ( b"",final=True )
+        self._buffer = ""
+        if tail:
+            self._feed_line ( tail )
+        for e in self.extractors:
+            e.finish()
+        return
+
+    def parse_stream ( self,istream,ostream=None,verbose=False,pause=0,patches=None ):
+        if self.log_parser:
+            self.log_parser.parse_stream ( _tee_stream(istream,self),
+                                           ostream=ostream )
+        else:
+            for data in istream:
+                self.feed_data ( data )
+                if ostream:
+                    if isinstance(data,bytes):
+                        ostream.write ( data.decode("utf-8",errors="replace") )
+                    else:
+                        ostream.write ( data )
+        self.finish()
+        if ostream:
+            ostream.flush()
+        return
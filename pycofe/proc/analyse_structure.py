@@ -3,7 +3,7 @@
 #
 # ============================================================================
 #
-#    01.02.25   <--  Date of Last Modification.
+#    18.10.26   <--  Date of Last Modification.
 #                   ~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 # ----------------------------------------------------------------------------
 #
@@ -11,17 +11,19 @@
 #
 #  Calculates structure statistics for Table 1.
 #
-#  Copyright (C) Eugene Krissinel 2025
+#  Copyright (C) Eugene Krissinel 2025-2026
 #
 # ============================================================================
 #
 
 import gemmi
 
+from pycofe.varut import xyzcache
+
 def analyze_structure ( file_path ):
 
     # Read the structure from the file
-    structure = gemmi.read_structure(file_path)
+    structure = xyzcache.read_structure ( file_path,shared=True )
     
     # Initialize counters and accumulators
     macromolecular_atoms = 0
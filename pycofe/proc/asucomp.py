@@ -3,23 +3,24 @@
 #
 # ============================================================================
 #
-#    02.02.23   <--  Date of Last Modification.
+#    18.10.26   <--  Date of Last Modification.
 #                   ~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 # ----------------------------------------------------------------------------
 #
 #  ASYMETRIC UNIT INFERENCE
 #
-#  Copyright (C) Eugene Krissinel, Andrey Lebedev 2017-2023
+#  Copyright (C) Eugene Krissinel, Andrey Lebedev 2017-2026
 #
 # ============================================================================
 #
 
 import math
+from collections import Counter
 
 import gemmi
 
 #from ccp4mg import  mmdb2
-from Bio    import  pairwise2
+#from Bio    import  pairwise2
 from .      import  datred_utils
 
 
@@ -231,6 +232,130 @@ def suggestASUComp ( hkl,asu ):
 
 
 
+# ============================================================================
+#  Sequence identities.
+#
+#  Identity of two sequences is calculated from the score of global
+#  alignment with unit match score and no mismatch and gap penalties, which
+#  was previously obtained with Bio.pairwise2.align.globalxx(). This score
+#  is the length of the longest common subsequence (LCS), which is
+#  calculated here with a bit-parallel algorithm in O(L1*L2/w) time.
+#  Scores are memoised for the duration of the process, so that repeated
+#  calls (e.g., for several revisions in the same job) do not recalculate
+#  them. Clustering of chains uses, in addition:
+#
+#    - hashing of sequences, so that identical chains are collapsed
+#      without alignment;
+#    - an upper bound of the score from residue (1-mer) composition, so
+#      that pairs which cannot reach the clustering threshold are rejected
+#      without alignment; the bound is exact, therefore clustering results
+#      are identical to those of all-pairs alignment.
+
+_lcs_memo     = {}
+_lcs_memo_max = 200000
+_lcs_stats    = { "calls" : 0, "aligned" : 0, "rejected" : 0 }
+
+
+def _lcs_length ( seq1,seq2 ):
+    # length of the longest common subsequence, Allison-Dix/Hyyro bit-vector
+    # algorithm; bits of v are columns of DP matrix along seq1
+    if len(seq1)<len(seq2):
+        seq1,seq2 = seq2,seq1
+    if not seq2:
+        return 0
+    masks = {}
+    bit   = 1
+    for c in seq1:
+        masks[c] = masks.get(c,0) | bit
+        bit <<= 1
+    full = bit - 1
+    v    = full
+    for c in seq2:
+        u = v & masks.get(c,0)
+        v = ((v + u) | (v - u)) & full
+    return len(seq1) - bin(v).count("1")
+
+
+def getAlignmentScore ( seq1,seq2 ):
+    # returns the number of matches in optimal globalxx alignment, memoised
+    _lcs_stats["calls"] += 1
+    if seq1==seq2:
+        return len(seq1)
+    key = (seq1,seq2) if seq1<seq2 else (seq2,seq1)
+    if key not in _lcs_memo:
+        if len(_lcs_memo)>=_lcs_memo_max:
+            _lcs_memo.clear()
+        _lcs_stats["aligned"] += 1
+        _lcs_memo[key] = _lcs_length ( seq1,seq2 )
+    return _lcs_memo[key]
+
+
+def _composition_bound ( comp1,comp2 ):
+    # upper bound of alignment score from residue compositions
+    if len(comp1)>len(comp2):
+        comp1,comp2 = comp2,comp1
+    n = 0
+    for c in comp1:
+        if c in comp2:
+            n += min ( comp1[c],comp2[c] )
+    return n
+
+
+def clusterSequences ( seqlist,clustThresh=0.9 ):
+    #  seqlist = [[sequence,type,chainId],...]
+    #  Chains are clustered greedily in the order given: each chain, which
+    #  is not yet clustered, starts a new cluster and takes all following
+    #  unclustered chains with identity
+    #      2*score/(len1+len2) >= clustThresh
+    #  Returns list of clusters as [[index of first chain,number of chains]]
+
+    #  collapse identical sequences, keeping order of first occurrence
+    unique = {}   # sequence -> [index of first chain,number of chains]
+    for i in range(len(seqlist)):
+        seq = seqlist[i][0]
+        if seq:
+            if seq in unique:
+                unique[seq][1] += 1
+            else:
+                unique[seq] = [i,1]
+
+    useqs = list(unique.keys())
+    if clustThresh>1.0:
+        # nothing clusters, not even identical chains
+        clusters = []
+        for i in range(len(seqlist)):
+            if seqlist[i][0]:
+                clusters.append ( [i,1] )
+        return clusters
+
+    comps    = [Counter(seq) for seq in useqs]
+    taken    = [False]*len(useqs)
+    clusters = []
+    for i in range(len(useqs)):
+        if not taken[i]:
+            seq1    = useqs[i]
+            cluster = list(unique[seq1])
+            for j in range(i+1,len(useqs)):
+                if not taken[j]:
+                    seq2 = useqs[j]
+                    lsum = len(seq1) + len(seq2)
+                    if 2.0*min(len(seq1),len(seq2))<clustThresh*lsum or \
+                       2.0*_composition_bound(comps[i],comps[j])<clustThresh*lsum:
+                        _lcs_stats["rejected"] += 1
+                    elif 2.0*getAlignmentScore(seq1,seq2)/lsum>=clustThresh:
+                        cluster[1] += unique[seq2][1]
+                        taken[j]    = True
+            clusters.append ( cluster )
+
+    return clusters
+
+
+def getAlignmentStats():
+    return dict ( _lcs_stats,memo=len(_lcs_memo) )
+
+
+# ============================================================================
+
 def getASUComp ( coorFilePath,sequenceList,clustThresh=0.9,body=None ):
     #  sequenceList has the following format:
     #    [[name1,seq1],[name2,seq2]...[nameN,seqN]]
@@ -270,18 +395,9 @@ def getASUComp ( coorFilePath,sequenceList,clustThresh=0.9,body=None ):
     # 2. Cluster chains and match them to the template ones
 
     asuComp = []
-    for i in range(len(seqlist)):
-        if seqlist[i][0]:
-            asuentry = { "seq":seqlist[i][0], "n":1, "type":seqlist[i][1],
-                         "chain_id":seqlist[i][2], "name":str(i) }
-            for j in range(i+1,len(seqlist)):
-                if seqlist[j][0]:
-                    align = pairwise2.align.globalxx ( seqlist[i][0],seqlist[j][0] )
-                    seqid = 2.0*align[0][2]/(len(seqlist[i][0])+len(seqlist[j][0]))
-                    if seqid>=clustThresh:
-                        asuentry["n"] += 1
-                        seqlist[j][0]  = None  # exclude from further processing
-            asuComp.append ( asuentry )
+    for i,n in clusterSequences(seqlist,clustThresh):
+        asuComp.append ({ "seq":seqlist[i][0], "n":n, "type":seqlist[i][1],
+                          "chain_id":seqlist[i][2], "name":str(i) })
 
     # 3. Infer on the correspondence between template and from-coordinates sequences
 
@@ -295,10 +411,10 @@ def getASUComp ( coorFilePath,sequenceList,clustThresh=0.9,body=None ):
             for j in range(len(sequenceList)):
                 if body:
                     body.stdoutln ( " .... seq=" + str(seq) )
-                align = pairwise2.align.globalxx ( seq,sequenceList[j][1] )
+                score = getAlignmentScore ( seq,sequenceList[j][1] )
                 if body:
-                    body.stdoutln ( " .... align=" + str(align) )
-                seqid = align[0][2]/len(seq)
+                    body.stdoutln ( " .... score=" + str(score) )
+                seqid = score/len(seq)
                 matchentry = { "seqid":seqid, "coorseq":i, "givenseq":j }
                 matches.append ( matchentry )
         #  assign by best seqid, therefore sort all matches first
@@ -479,5 +595,96 @@ Expected output:
 
 """
 
+
+def _reference_clusters ( seqlist,clustThresh,align ):
+    # all-pairs clustering as originally done, for comparisons
+    seqs     = [s[0] for s in seqlist]
+    clusters = []
+    for i in range(len(seqs)):
+        if seqs[i]:
+            cluster = [i,1]
+            for j in range(i+1,len(seqs)):
+                if seqs[j]:
+                    seqid = 2.0*align(seqs[i],seqs[j])/(len(seqs[i])+len(seqs[j]))
+                    if seqid>=clustThresh:
+                        cluster[1] += 1
+                        seqs[j]     = None
+            clusters.append ( cluster )
+    return clusters
+
+
+def _synthetic_assembly ( rnd,nentities,ncopies,lmin,lmax ):
+    # assembly of several entities (random sequences), each present in
+    # ncopies, some of which carry point mutations or truncations
+    aa = "ACDEFGHIKLMNPQRSTVWY"
+
+    def mutate ( seq,nmut ):
+        seq = list(seq)
+        for k in range(nmut):
+            seq[rnd.randrange(len(seq))] = rnd.choice(aa)
+        return "".join(seq)
+
+    seqlist = []
+    for e in range(nentities):
+        seq = "".join ( rnd.choice(aa) for k in range(rnd.randint(lmin,lmax)) )
+        for c in range(ncopies):
+            r = rnd.random()
+            if r<0.7:
+                s = seq
+            elif r<0.9:
+                s = mutate ( seq,max(1,len(seq)//100) )
+            else:
+                s = seq[rnd.randint(0,5):len(seq)-rnd.randint(0,5)]
+            seqlist.append ( [s,"protein","C"+str(len(seqlist))] )
+    rnd.shuffle ( seqlist )
+    return seqlist
+
+
+def benchmark():
+    #  Usage:
+    #
+    #    ccp4-python -m pycofe.proc.asucomp bench
+    #
+    #  Clusters chains of synthetic assemblies and compares timing with
+    #  all-pairs alignment (Bio.pairwise2 if available). Results are
+    #  compared in pycofe/tests/test_asucomp.py
+    import random, time
+    try:
+        from Bio import pairwise2
+        def align ( seq1,seq2 ):
+            return pairwise2.align.globalxx ( seq1,seq2 )[0][2]
+        aname = "pairwise2.globalxx"
+    except:
+        align = _lcs_length
+        aname = "bit-parallel LCS without prefilter/memo"
+
+    rnd   = random.Random ( 12345 )
+    cases = [
+        [ "capsid 60x3"     , _synthetic_assembly(rnd, 3,60,180,300)  ],
+        [ "ribosome 55x1"   , _synthetic_assembly(rnd,55, 1, 60,250)  ],
+        [ "filament 120x2"  , _synthetic_assembly(rnd, 2,120,300,450) ]
+    ]
+
+    print ( " reference: " + aname + "\n" )
+    print ( "   assembly          chains  clusters  reference(s)  new(s)  new-repeat(s)" )
+    for name,seqlist in cases:
+        t0 = time.time()
+        _reference_clusters ( seqlist,0.9,align )
+        t1 = time.time()
+        new = clusterSequences ( seqlist,0.9 )
+        t2 = time.time()
+        clusterSequences ( seqlist,0.9 )   # memoised identities
+        t3 = time.time()
+        print ( "   {0:16s} {1:7d} {2:9d} {3:13.3f} {4:7.3f} {5:14.4f}".format (
+                    name,len(seqlist),len(new),t1-t0,t2-t1,t3-t2 ) )
+
+    print ( "\n " + str(getAlignmentStats()) )
+    return
+
+
 if __name__ == '__main__':
-    main()
+    import sys
+    if len(sys.argv)>1 and sys.argv[1]=="bench":
+        benchmark()
+    else:
+        main()
@@ -3,13 +3,13 @@
 #
 # ============================================================================
 #
-#    19.05.24   <--  Date of Last Modification.
+#    18.10.26   <--  Date of Last Modification.
 #                   ~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 # ----------------------------------------------------------------------------
 #
 #  CALCULATION OF ED MAPS
 #
-#  Copyright (C) Eugene Krissinel, Andrey Lebedev 2017-2024
+#  Copyright (C) Eugene Krissinel, Andrey Lebedev 2017-2026
 #
 # ============================================================================
 #
@@ -76,31 +76,33 @@ def calcCCP4Maps ( mtzin,output_file_prefix,job_dir,file_stdout,file_stderr,
         LAB_F1  = _columns[source_key][0]
         LAB_PHI = _columns[source_key][1]
 
+    # both maps are independent and calculated concurrently, subject to
+    # limit in command.max_processes
+    pool = command.app_pool()
+
     # Start cfft
-    rc = command.call ( "cfft",
+    pool.start ( "cfft",
               ["-mtzin" ,mtzin,
                "-mapout",output_file_prefix + file_map(),
                "-colin-fc","/*/*/[" + LAB_F1 + "," + LAB_PHI + "]"
               ],
               job_dir,None,file_stdout,file_stderr,log_parser )
 
-    if rc.msg:
-        file_stdout.write ( "Error calling FFT(1): " + rc.msg + "\n" )
-        file_stderr.write ( "Error calling FFT(1): " + rc.msg + "\n" )
-
     #   Sigmaa style mfo-dfc map
     if source_key in ["refmac","acorn-map","refmac_anom"]:
         # Start cfft
-        rc = command.call ( "cfft",
+        pool.start ( "cfft",
                   ["-mtzin" ,mtzin,
                    "-mapout",output_file_prefix + file_dmap(),
                    "-colin-fc","/*/*/[" + _columns[source_key][2] + "," + _columns[source_key][3] + "]"
                   ],
                   job_dir,None,file_stdout,file_stderr,log_parser )
 
-        if rc.msg:
-            file_stdout.write ( "Error calling FFT(2): " + rc.msg + "\n" )
-            file_stderr.write ( "Error calling FFT(2): " + rc.msg + "\n" )
+    rcs = pool.wait_all()
+    for i in range(len(rcs)):
+        if rcs[i].msg:
+            file_stdout.write ( "Error calling FFT(" + str(i+1) + "): " + rcs[i].msg + "\n" )
+            file_stderr.write ( "Error calling FFT(" + str(i+1) + "): " + rcs[i].msg + "\n" )
 
     return
 
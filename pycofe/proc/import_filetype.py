@@ -3,25 +3,28 @@
 #
 # ============================================================================
 #
-#    25.12.23   <--  Date of Last Modification.
+#    18.10.26   <--  Date of Last Modification.
 #                   ~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 # ----------------------------------------------------------------------------
 #
 #  FILE TYPE DETECTION FUNCTION
 #
-#  Copyright (C) Eugene Krissinel, Andrey Lebedev 2018-2023
+#  Copyright (C) Eugene Krissinel, Andrey Lebedev 2018-2026
 #
 # ============================================================================
 #
 
 #  python native imports
 import os
+import re
+import gzip
 
 #  ccp4-python imports
 from   gemmi       import  cif
 
 #  application imports
 from   pycofe.proc import  mtz
+from   pycofe.varut import zutils
 
 
 # ============================================================================
@@ -50,11 +53,255 @@ def ftype_PNG          ():  return "png"
 def ftype_GIF          ():  return "gif"
 def ftype_Unknown      ():  return "unknown"
 
+# ============================================================================
+#  CIF classification.
+#
+#  sniffCIF() streams the file (plain or gzipped) line by line, looking only
+#  at tags, and stops as soon as the outcome of the full-document rules in
+#  parseCIFType() is known: e.g. coordinate files are decided on the first
+#  _atom_site tag and structure-factor files at the end of the first block
+#  with a _refln loop, which is found by a chunked search rather than line
+#  by line. Data rows are skipped without tokenising. At most
+#  sniff_limit bytes are examined; None is returned if the type is still
+#  undecided then, in which case the full parse is used.
+
+sniff_limit  = 16*1024*1024
+
+_ligand_tags = ( b"_chem_comp_atom.type_energy",
+                 b"_chem_mod_atom.new_type_energy",
+                 b"_chem_comp.three_letter_code" )
+_xyz_tag     = b"_atom_site.label_asym_id"
+_refln_tag   = b"_refln.index_h"
+
+
+def _open_binary ( fpath ):
+    with open(fpath,"rb") as f:
+        magic = f.read(2)
+    if magic==b"\x1f\x8b":
+        return gzip.open ( fpath,"rb" )
+    return open ( fpath,"rb" )
+
+
+def _scan_refln_block ( f,limit,chunk_size=1048576 ):
+    # reads on in large chunks until the next block starts (or end of file);
+    # coordinates met before that leave the type to the full parse
+    tail = b""
+    while limit>0:
+        chunk = f.read ( min(chunk_size,limit) )
+        if not chunk:
+            break
+        limit -= len(chunk)
+        chunk  = tail + chunk
+        n1 = chunk.find ( b"\ndata_" )
+        n2 = chunk.find ( _xyz_tag )
+        if n2>=0 and (n1<0 or n2<n1):
+            return None
+        if n1>=0:
+            break
+        tail = chunk[-len(_xyz_tag):]
+    return ftype_CIFMerged()
+
+
+def sniffCIF ( fpath,limit=None ):
+    if limit is None:
+        limit = sniff_limit
+    ligand = False  # ligand tags met in any block
+    jlig   = False  # jligand output: coordinates in block "xyz"
+    refln  = False  # current block has reflections
+    block  = b""
+    nbytes = 0
+    try:
+        with _open_binary(fpath) as f:
+            intext = False
+            for line in f:
+                nbytes += len(line)
+                if nbytes>limit:
+                    if refln:
+                        return ftype_CIFMerged()
+                    return None
+                c = line[:1]
+                if c==b";":
+                    intext = not intext
+                    continue
+                if intext:
+                    continue
+                s = line.lstrip()
+                c = s[:1]
+                if c==b"d" or c==b"D":
+                    if s[:5].lower()==b"data_":
+                        if refln:
+                            return ftype_CIFMerged()
+                        block = s[5:].split()
+                        block = block[0] if block else b""
+                    continue
+                if c==b"l" or c==b"L":
+                    if s[:5].lower()!=b"loop_":
+                        continue
+                    s = s[5:]
+                elif c!=b"_":
+                    continue
+                for tok in s.split():
+                    if tok[:1]!=b"_":
+                        break
+                    tok = tok.lower()
+                    if tok in _ligand_tags:
+                        ligand = True
+                        if jlig:
+                            return ftype_Ligand()
+                    elif jlig:
+                        pass
+                    elif tok==_xyz_tag:
+                        if block!=b"xyz":
+                            return ftype_XYZ()
+                        jlig  = True
+                        refln = False
+                        if ligand:
+                            return ftype_Ligand()
+                    elif tok==_refln_tag:
+                        refln = True
+                if refln:
+                    # reflection data follow: only coordinates further in
+                    # the same block can change the type
+                    return _scan_refln_block ( f,limit-nbytes )
+    except:
+        return None
+
+    if refln:
+        return ftype_CIFMerged()
+    if ligand:
+        return ftype_Ligand()
+    return ftype_Unknown()
+
+
+# ----------------------------------------------------------------------------
+#  Validity check for files classified by sniffCIF(), which does not read
+#  files to the end. Files up to check_parse_limit bytes are parsed; larger
+#  ones are read in large chunks (without parsing) to find errors which are
+#  typical of truncated or damaged files: unterminated text fields, a tag
+#  without value at end of file, and an incomplete last row of a loop with
+#  one row per line. Files failing the check are of unknown type, as they
+#  were with the full parse.
+
+check_parse_limit = 1024*1024
+
+_cif_token = re.compile ( rb"""'.*?'(?=\s|$)|".*?"(?=\s|$)|\S+""" )
+
+
+def _significant_lines ( text ):
+    # lines of text which are not empty and not comments
+    return [ line for line in text.split(b"\n")
+                  if line.strip() and not line.lstrip().startswith(b"#") ]
+
+
+def _loop_columns ( header ):
+    # returns number of tags in loop starting with header text, and whether
+    # its first row fits in one line (None if this cannot be decided)
+    lines = _significant_lines ( header )[1:]
+    ntags = 0
+    while ntags<len(lines)-1 and lines[ntags].lstrip().startswith(b"_"):
+        ntags += 1
+    if ntags>=len(lines)-1:
+        return ntags,None
+    row = lines[ntags]
+    if row.startswith(b";"):
+        return ntags,False
+    return ntags,len(_cif_token.findall(row))==ntags
+
+
+def checkCIF ( fpath,chunk_size=4*1024*1024,tail_size=65536 ):
+    try:
+        if os.path.getsize(fpath)<=check_parse_limit:
+            cif.read ( fpath ).check_for_missing_values()
+            return True
+        ntext = 0     # text field delimiters
+        loop  = None  # [ file position of last "loop_", text following it ]
+        nread = 0
+        prev  = b"\n"  # end of previous chunk
+        with _open_binary(fpath) as f:
+            while True:
+                chunk = f.read ( chunk_size )
+                if not chunk:
+                    break
+                data   = prev + chunk
+                ntext += data.count(b"\n;") - prev.count(b"\n;")
+                n = data.rfind ( b"\nloop_" )
+                if n>=0:
+                    loop = [ nread-len(prev)+n,data[n:n+tail_size] ]
+                nread += len(chunk)
+                prev   = data[-tail_size:]
+        if ntext%2:
+            return False  # unterminated text field
+        lines = _significant_lines ( prev )
+        if not lines:
+            return True
+        last = lines[-1].lstrip()
+        if last.startswith(b"_"):
+            return len(_cif_token.findall(last))>=2  # tag without value
+        if not loop or last[:5].lower() in (b"data_",b"loop_") or \
+           last.startswith(b";"):
+            return True
+        # last line is a value: check it if it is a row of the last loop
+        # with one row per line
+        ntags,one_line_rows = _loop_columns ( loop[1] )
+        if loop[0]>=nread-len(prev):  # loop starts in the tail
+            lines = _significant_lines(prev[loop[0]-nread+len(prev):])[1+ntags:]
+        if one_line_rows and not any([line.lstrip()[:1] in (b"_",b";") or
+                                      line[:5].lower() in (b"data_",b"loop_")
+                                      for line in lines]):
+            return len(_cif_token.findall(last))==ntags
+    except:
+        return False
+    return True
+
+
+def parseCIFType ( fpath ):
+    ftype = ftype_Unknown()
+    try:
+        if fpath.lower().endswith(".gz"):
+            doc = cif.read ( fpath )
+        else:
+            #doc = cif.read ( fpath )
+            doc = cif.Document()
+            doc.source = fpath
+            doc.parse_file ( fpath )
+        doc.check_for_missing_values()
+        #doc.check_for_duplicates()  <-- DO NOT CHECK HERE
+        for block in doc:
+            if block.find_values("_chem_comp_atom.type_energy"):
+                ftype = ftype_Ligand()
+                break
+            ### libs containing only modifications or links
+            if block.find_values("_chem_mod_atom.new_type_energy"):
+                ftype = ftype_Ligand()
+                break
+            if block.find_values("_chem_comp.three_letter_code"):
+                ftype = ftype_Ligand()
+                break
+        ### ftype_Ligand() is later converted to ftype_Library() if necessary
+        ### continue because xyz-type cif-file may contain ligand descriptions
+        for block in doc:
+            if block.find_values("_atom_site.label_asym_id"):
+                ### jligand output: not ftype_XYZ but has xyzs in the block xyz
+                if block.name != "xyz":
+                    ftype = ftype_XYZ()
+                break
+            elif block.find_values("_refln.index_h"):
+                ftype = ftype_CIFMerged()
+                break
+        ### ? extension of the mmcif-file with unmerged data produced by dials
+    except:
+        pass
+    return ftype
+
+
 # ============================================================================
 
 def getFileType ( fname,importDir,file_stdout ):
 
     fn,fext = os.path.splitext(fname.lower())
+    if fext=='.gz' and fn.endswith('.cif'):
+        fn,fext = os.path.splitext(fn)
+        fname   = fname[:-3]
 
     if fext in ('.hkl','.mtz'):
         fpath = os.path.join ( importDir,fname )
@@ -68,40 +315,12 @@ def getFileType ( fname,importDir,file_stdout ):
         return ftype_Unknown()
 
     if fext=='.cif':
-        fpath = os.path.join ( importDir,fname )
-        ftype = ftype_Unknown()
-        try:
-            #doc = cif.read ( fpath )
-            doc = cif.Document()
-            doc.source = fpath
-            doc.parse_file ( fpath )
-            doc.check_for_missing_values()
-            #doc.check_for_duplicates()  <-- DO NOT CHECK HERE
-            for block in doc:
-                if block.find_values("_chem_comp_atom.type_energy"):
-                    ftype = ftype_Ligand()
-                    break
-                ### libs containing only modifications or links
-                if block.find_values("_chem_mod_atom.new_type_energy"):
-                    ftype = ftype_Ligand()
-                    break
-                if block.find_values("_chem_comp.three_letter_code"):
-                    ftype = ftype_Ligand()
-                    break
-            ### ftype_Ligand() is later converted to ftype_Library() if necessary
-            ### continue because xyz-type cif-file may contain ligand descriptions
-            for block in doc:
-                if block.find_values("_atom_site.label_asym_id"):
-                    ### jligand output: not ftype_XYZ but has xyzs in the block xyz
-                    if block.name != "xyz":
-                        ftype = ftype_XYZ()
-                    break
-                elif block.find_values("_refln.index_h"):
-                    ftype = ftype_CIFMerged()
-                    break
-            ### ? extension of the mmcif-file with unmerged data produced by dials
-        except:
-            pass
+        fpath = zutils.input_path ( os.path.join(importDir,fname) )
+        ftype = sniffCIF ( fpath )
+        if ftype is None:
+            ftype = parseCIFType ( fpath )
+        elif ftype!=ftype_Unknown() and not checkCIF(fpath):
+            ftype = ftype_Unknown()
         return ftype
 
     if fext=='.lib':                      return ftype_Ligand()
@@ -132,3 +351,116 @@ def getFileType ( fname,importDir,file_stdout ):
     if fext=='.gif' :  return ftype_GIF ()
 
     return ftype_Unknown()
+
+
+# ----------------------------------------------------------------------------
+#  Benchmark:  python -m pycofe.proc.import_filetype bench [file.cif ...]
+#  compares sniffCIF() and checkCIF() with the full parse on given files or on
+#  synthetic ligand, library, jligand, coordinate and structure-factor CIFs
+#  (plain and gzipped, intact and truncated); the same files are used in
+#  pycofe/tests/test_import_filetype.py
+# ----------------------------------------------------------------------------
+
+def _synthetic_cifs ( dirpath,natoms=300000,nrefl=1000000 ):
+
+    def ligand ( code ):
+        lines = [ "data_comp_list","loop_","_chem_comp.id",
+                  "_chem_comp.three_letter_code","_chem_comp.name",
+                  "%s %s 'ligand %s'"%(code,code,code),
+                  "data_comp_%s"%code,"loop_","_chem_comp_atom.comp_id",
+                  "_chem_comp_atom.atom_id","_chem_comp_atom.type_symbol",
+                  "_chem_comp_atom.type_energy" ]
+        lines += [ "%s C%d C CH2"%(code,i) for i in range(40) ]
+        return lines
+
+    def atoms ( n ):
+        lines = [ "loop_" ] + [ "_atom_site."+t for t in (
+                  "group_PDB","id","type_symbol","label_atom_id","label_comp_id",
+                  "label_asym_id","label_seq_id","Cartn_x","Cartn_y","Cartn_z") ]
+        lines += [ "ATOM %d C CA ALA A %d %.3f %.3f %.3f"%(i+1,i//5+1,i*0.01,1.0,2.0)
+                   for i in range(n) ]
+        return lines
+
+    files = {
+      "ligand.cif"  : ( ligand("LIG"),ftype_Ligand() ),
+      "library.cif" : ( ligand("LG1")+ligand("LG2")[1:]+[
+                         "data_link_list","loop_","_chem_link.id","_chem_link.comp_id_1",
+                         "_chem_link.comp_id_2","LG1-LG2 LG1 LG2"],ftype_Ligand() ),
+      "jligand.cif" : ( ["data_xyz"]+atoms(200)+ligand("LIG"),ftype_Ligand() ),
+      "model.cif"   : ( ["data_model","_struct.title",";","_atom_site.id in text",";",
+                         "_cell.length_a 100.0"]+
+                        atoms(natoms),ftype_XYZ() ),
+      "model-sf.cif": ( ["data_r1abcsf","_cell.length_a 100.0","loop_",
+                         "_refln.index_h","_refln.index_k","_refln.index_l",
+                         "_refln.F_meas_au","_refln.F_meas_sigma_au"] +
+                        [ "%d %d %d %.2f %.2f"%(i%50,(i//50)%50,i//2500,100.0,5.0)
+                          for i in range(nrefl) ] +
+                        ["data_r1abcsf2","loop_","_refln.index_h","_refln.index_k",
+                         "_refln.index_l","1 2 3"],ftype_CIFMerged() )
+    }
+    # damaged files: truncated in the middle of a row, and unterminated
+    # text field
+    model = "\n".join(files["model.cif"][0]) + "\n"
+    files["model-cut.cif"]  = ( [model[:-20]],ftype_Unknown() )
+    files["model-text.cif"] = ( [model,"_struct.pdbx_descriptor",";","text"],
+                                ftype_Unknown() )
+    sf = "\n".join(files["model-sf.cif"][0]) + "\n"
+    files["model-sf-cut.cif"] = ( [sf[:sf.rfind("data_")-8]],ftype_Unknown() )
+    flist = []
+    for fname in files:
+        text = "\n".join(files[fname][0]) + "\n"
+        fpath = os.path.join ( dirpath,fname )
+        with open(fpath,"w") as f:
+            f.write ( text )
+        flist.append ( (fpath,files[fname][1]) )
+        with gzip.open(fpath+".gz","wt") as f:
+            f.write ( text )
+        flist.append ( (fpath+".gz",files[fname][1]) )
+    return flist
+
+
+def benchmark ( fpaths=None ):
+    import time
+    import shutil
+    import tempfile
+
+    tmpdir = None
+    if fpaths:
+        flist = [ (fpath,None) for fpath in fpaths ]
+    else:
+        tmpdir = tempfile.mkdtemp()
+        flist  = _synthetic_cifs ( tmpdir )
+
+    def sniff ( fpath ):
+        ftype = sniffCIF ( fpath )
+        if ftype not in (None,ftype_Unknown()) and not checkCIF(fpath):
+            ftype = ftype_Unknown()
+        return ftype
+
+    def timed ( func,fpath ):
+        t = time.perf_counter()
+        r = func ( fpath )
+        return (time.perf_counter()-t,r)
+
+    print ( " %-20s %9s %10s %10s  %s" % ("file","size, MB","full, s","sniff, s","type") )
+    try:
+        for fpath,expected in flist:
+            t_full,r_full   = timed ( parseCIFType,fpath )
+            t_sniff,r_sniff = timed ( sniff,fpath )
+            if r_sniff is None:
+                t_sniff += t_full
+                r_sniff  = r_full
+            print ( " %-20s %9.2f %10.4f %10.4f  %s" % (
+                    os.path.basename(fpath),os.path.getsize(fpath)/1.0e6,
+                    t_full,t_sniff,r_full) )
+    finally:
+        if tmpdir:
+            shutil.rmtree ( tmpdir )
+    return
+
+
+if __name__ == "__main__":
+    import sys
+    if len(sys.argv)>1 and sys.argv[1]=="bench":
+        benchmark ( sys.argv[2:] )
+        sys.exit(0)
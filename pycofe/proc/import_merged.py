@@ -3,27 +3,26 @@
 #
 # ============================================================================
 #
-#    10.02.25   <--  Date of Last Modification.
+#    18.10.26   <--  Date of Last Modification.
 #                   ~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 # ----------------------------------------------------------------------------
 #
 #  MERGED MTZ DATA IMPORT FUNCTIONS
 #
-#  Copyright (C) Eugene Krissinel, Andrey Lebedev 2017-2025
+#  Copyright (C) Eugene Krissinel, Andrey Lebedev 2017-2026
 #
 # ============================================================================
 #
 
 #  python native imports
 import os
-import subprocess
 
 #  ccp4-python imports
 import pyrvapi
 # import pyrvapi_ext.parsers
 
 #  application imports
-from   pycofe.varut   import command
+from   pycofe.varut   import command, zutils
 from   pycofe.dtypes  import dtype_hkl
 from   pycofe.proc    import import_filetype, mtz, patterson
 #from   pycofe.proc    import srf
@@ -116,6 +115,146 @@ def makeHKLTable ( body,tableId,holderId,original_data,new_data,
     return
 
 
+# ============================================================================
+# Conversion of merged files
+#
+#  Before datasets are imported one by one, all files are converted to MTZ,
+#  complemented with FreeR flags and cleaned with cad. These steps do not
+#  depend on other files, and are run for all files concurrently in stages
+#  (conversion, freerflag, mtzutils, freerflag, cad) through command.app_pool,
+#  which keeps logs of programs contiguous and in order of files. Results
+#  are returned in order of files, as (f_orig,f_fmt,p_mtzin,p_mtzout,rc)
+#  tuples, where p_mtzin is None if conversion failed and rc is return code
+#  of the last program. Files written concurrently get distinct names: item
+#  number is added to names which would repeat otherwise.
+
+def _write_script ( fname,text ):
+    with open(fname,"w") as scr_file:
+        scr_file.write ( text )
+    return fname
+
+def uniqueNames ( names ):
+    # returns names with list index added to those which occur more than once
+    unique = []
+    for n in range(len(names)):
+        fname = names[n]
+        if fname and names.count(fname)>1:
+            fname = os.path.splitext(fname)[0] + "_" + str(n) + \
+                    os.path.splitext(fname)[1]
+        unique.append ( fname )
+    return unique
+
+def convertMergedFiles ( body,files_mtz,freeRflag ):
+
+    pool  = command.app_pool()
+    items = []
+    cif   = False
+    converted = uniqueNames ([
+        os.path.splitext(f_orig)[0] + '.mtz'
+            if f_fmt in (import_filetype.ftype_CIFMerged(),
+                         import_filetype.ftype_XDSMerged()) else None
+        for f_orig,f_fmt in files_mtz ])
+    for n in range(len(files_mtz)):
+        f_orig,f_fmt = files_mtz[n]
+        item = { "n"       : n,
+                 "f_orig"  : f_orig,
+                 "f_fmt"   : f_fmt,
+                 "p_orig"  : os.path.join ( body.importDir(),f_orig ),
+                 "p_mtzin" : os.path.join ( body.importDir(),f_orig ),
+                 "handle"  : None,
+                 "rc"      : command.comrc() }
+        items.append ( item )
+        if f_fmt==import_filetype.ftype_CIFMerged():
+            # gemmi reads compressed uploads directly
+            item["p_orig"]  = zutils.input_path ( item["p_orig"] )
+            item["p_mtzin"] = converted[n]
+            item["handle"]  = pool.start ( "gemmi",
+                                ["cif2mtz",item["p_orig"],item["p_mtzin"]],"./",None,
+                                body.file_stdout,body.file_stderr,body.log_parser )
+            cif = True
+        elif f_fmt==import_filetype.ftype_XDSMerged():
+            item["p_mtzin"] = converted[n]
+            item["handle"]  = pool.start ( "pointless",[],"./",
+                                _write_script ( "pointless_" + str(n) + ".script",
+                                    "XDSIN "  + item["p_orig"]  + "\n" +\
+                                    "HKLOUT " + item["p_mtzin"] + "\nCOPY\n" ),
+                                body.file_stdout,body.file_stderr )
+    pool.wait_all()
+    if cif:
+        body.unsetLogParser()
+
+    for item in items:
+        h = item["handle"]
+        if h and (h.rc.msg or not os.path.isfile(item["p_mtzin"])):
+            item["p_mtzin"] = None
+        elif item["f_fmt"]==import_filetype.ftype_CIFMerged():
+            item["f_orig"] = item["p_mtzin"]
+            item["f_fmt"]  = import_filetype.ftype_MTZMerged()
+        item["p_mtzin1"] = item["p_mtzin"]
+
+    items_ok = [item for item in items if item["p_mtzin"]]
+
+    def run_stage ( stage_items,appName,cmd,script ):
+        # starts program for every item and waits for all; cmd and script
+        # are functions of item
+        for item in stage_items:
+            item["handle"] = pool.start ( appName,cmd(item),"./",
+                                _write_script ( appName + "_" + str(item["n"]) +\
+                                                ".script",script(item) ),
+                                body.file_stdout1,body.file_stderr,log_parser=None,
+                                citation_ref="freerflag-srv",
+                                file_stdout_alt=body.file_stdout )
+        pool.wait_all()
+        for item in stage_items:
+            item["rc"] = item["handle"].rc
+        return
+
+    if freeRflag:
+
+        for item in items_ok:
+            item["p_mtzin1"] = "temp_" + str(item["n"]) + ".mtz"
+            item["p_mtzin2"] = "temp2_" + str(item["n"]) + ".mtz"
+            try:
+                os.remove ( item["p_mtzin1"] )
+                os.remove ( item["p_mtzin2"] )
+            except OSError:
+                pass
+            item["mf"] = mtz.mtz_file ( item["p_mtzin"] )
+            if item["f_fmt"]==import_filetype.ftype_CIFMerged():
+                item["rc"].msg = "recalculate"
+
+        # run freerflag: generate FreeRFlag if it is absent, and expand
+        # all reflections
+        def freerflag_in ( item ):
+            if item["mf"].FREE:
+                return "COMPLETE FREE=" + item["mf"].FREE + "\nEND\n"
+            return "END\n"
+        run_stage ( [item for item in items_ok if not item["rc"].msg],
+                    "freerflag",
+                    lambda item: ["HKLIN",item["p_mtzin"],"HKLOUT",item["p_mtzin1"]],
+                    freerflag_in )
+
+        items_recalc = [item for item in items_ok if item["rc"].msg]
+        run_stage ( items_recalc,"mtzutils",
+                    lambda item: ["HKLIN",item["p_mtzin"],"HKLOUT",item["p_mtzin2"]],
+                    lambda item: "EXCLUDE " + str(item["mf"].FREE) + " \nEND\n" )
+        run_stage ( items_recalc,"freerflag",
+                    lambda item: ["HKLIN",item["p_mtzin2"],"HKLOUT",item["p_mtzin1"]],
+                    lambda item: "FREERFRAC  0.05\nEND\n" )
+
+    #  get rid of redundant reflections with cad
+    mtzout = uniqueNames ([ os.path.splitext(os.path.basename(item["f_orig"]))[0] +\
+                              ".mtz" for item in items_ok ])
+    for item,fname in zip(items_ok,mtzout):
+        item["p_mtzout"] = os.path.join ( body.outputDir(),fname )
+    run_stage ( items_ok,"cad",
+                lambda item: ["HKLIN1",item["p_mtzin1"],"HKLOUT",item["p_mtzout"]],
+                lambda item: "LABIN FILE 1 ALLIN\nEND\n" )
+
+    return [ (item["f_orig"],item["f_fmt"],item["p_mtzin"],
+              item.get("p_mtzout",None),item["rc"]) for item in items ]
+
+
 # ============================================================================
 # import merged mtz files
 
@@ -153,134 +292,18 @@ def run ( body,   # body is reference to the main Import class
     mtzSecId = body.getWidgetId ( "mtz_sec" )
 
     k = 0
-    for f_orig_0, f_fmt_0 in files_mtz:
-
-        f_orig  = f_orig_0
-        f_fmt   = f_fmt_0
+    for f_orig, f_fmt, p_mtzin, p_mtzout, rc in \
+                        convertMergedFiles ( body,files_mtz,freeRflag ):
 
-        p_orig  = os.path.join ( body.importDir(),f_orig )
-        p_mtzin = p_orig
-
-        if f_fmt==import_filetype.ftype_CIFMerged():
-            p_mtzin = os.path.splitext(f_orig)[0] + '.mtz'
-            # body.open_stdin()
-            # body.write_stdin ( "END\n" )
-            # body.close_stdin()
-            # rc = body.runApp ( "cif2mtz",["HKLIN",p_orig,"HKLOUT",p_mtzin],
-            #                    quitOnError=False )
-
-            #### Copied from below:
-            body.file_stdin = None  # not clear why this is not None at
-                                    # this point and needs to be forced,
-                                    # or else runApp looks for input script
-            #### There could be more places like this, check all gemmi calls?
-
-            rc = body.runApp ( "gemmi",["cif2mtz",p_orig,p_mtzin],
-                               quitOnError=False )
-            if rc.msg or not os.path.isfile(p_mtzin):
+        if not p_mtzin:
+            if f_fmt==import_filetype.ftype_CIFMerged():
                 body.putSummaryLine_red ( body.get_cloud_import_path(f_orig),
                                           "CIF","Failed to convert, ignored" )
-                p_mtzin = None
-            else:
-                f_orig = p_mtzin
-                f_fmt  = import_filetype.ftype_MTZMerged()
-            body.unsetLogParser()
-
-        #if not f_fmt.startswith('mtz_'):
-        elif f_fmt==import_filetype.ftype_XDSMerged():
-            p_mtzin = os.path.splitext(f_orig)[0] + '.mtz'
-            sp = subprocess.Popen ( 'pointless', stdin=subprocess.PIPE,
-                                    stdout=body.file_stdout, 
-                                    stderr=body.file_stderr )
-            sp.stdin.write('XDSIN ' + p_orig + '\nHKLOUT ' + p_mtzin + '\nCOPY\n')
-            sp.stdin.close()
-            if sp.wait():
+            elif f_fmt==import_filetype.ftype_XDSMerged():
                 body.putSummaryLine_red ( body.get_cloud_import_path(f_orig),"XDS",
                                           "Failed to convert, ignored" )
-                p_mtzin = None
-
-        if p_mtzin:
-
-            p_mtzin1 = p_mtzin
-            rc = command.comrc()
-
-            p_mtzout = os.path.splitext ( os.path.join(body.outputDir(),
-                                          os.path.basename(f_orig)) )[0] + ".mtz"
-
-            if freeRflag:
-
-                #if k==0 or True:  <-- to be deleted later  02.05.2019
-                rc = command.comrc()
-
-                p_mtzin1 = "temp.mtz"
-                p_mtzin2 = "temp2.mtz"
-                try:
-                    os.remove ( p_mtzin1 )
-                    os.remove ( p_mtzin2 )
-                except OSError:
-                    pass
-
-                """
-                mf = mtz.mtz_file ( p_mtzin )
-                attrs = vars(mf)
-                body.stdoutln ( " ############################################" )
-                body.stdoutln ( ', '.join("%s: %s" % item for item in attrs.items()) )
-                body.stdoutln ( " ############################################" )
-                """
-                mf = mtz.mtz_file(p_mtzin)
-                if f_fmt==import_filetype.ftype_CIFMerged():
-                    rc.msg = "recalculate"
-                else:
-                    scr_file = open ( freerflag_script(),"w" )
-                    if mf.FREE:
-                        scr_file.write ( "COMPLETE FREE=" + mf.FREE + "\n" )
-                    scr_file.write ( "END\n" )
-                    scr_file.close ()
-
-                    # run freerflag: generate FreeRFlag if it is absent, and expand
-                    # all reflections
-                    rc = command.call ( "freerflag",
-                                        ["HKLIN",p_mtzin,
-                                         "HKLOUT",p_mtzin1],"./",
-                                        freerflag_script(),body.file_stdout1,
-                                        body.file_stderr,log_parser=None,
-                                        citation_ref="freerflag-srv",
-                                        file_stdout_alt=body.file_stdout )
-                if rc.msg:
-                    scr_file = open ( mtzutils_script(),"w" )
-                    scr_file.write ( "EXCLUDE " + mf.FREE + " \nEND\n" )
-                    scr_file.close ()
-                    rc = command.call ( "mtzutils",
-                                        ["HKLIN",p_mtzin,
-                                         "HKLOUT",p_mtzin2],"./",
-                                        mtzutils_script(),body.file_stdout1,
-                                        body.file_stderr,log_parser=None,
-                                        citation_ref="freerflag-srv",
-                                        file_stdout_alt=body.file_stdout )
-
-                    scr_file = open ( freerflag_script(),"w" )
-                    scr_file.write ( "FREERFRAC  0.05\nEND\n" )
-                    scr_file.close ()
-                    rc = command.call ( "freerflag",
-                                        ["HKLIN",p_mtzin2,
-                                         "HKLOUT",p_mtzin1],"./",
-                                        freerflag_script(),body.file_stdout1,
-                                        body.file_stderr,log_parser=None,
-                                        citation_ref="freerflag-srv",
-                                        file_stdout_alt=body.file_stdout )
-
-            #  get rid of redundant reflections with cad
-            scr_file = open ( cad_script(),"w" )
-            scr_file.write ( "LABIN FILE 1 ALLIN\nEND\n" )
-            scr_file.close ()
-
-            rc = command.call ( "cad",
-                                ["HKLIN1",p_mtzin1,
-                                 "HKLOUT",p_mtzout],"./",
-                                cad_script(),body.file_stdout1,
-                                body.file_stderr,log_parser=None,
-                                citation_ref="freerflag-srv",
-                                file_stdout_alt=body.file_stdout )
+
+        else:
 
             if rc.msg:
                 msg = "\n\n Freerflag failed with message:\n\n" + \
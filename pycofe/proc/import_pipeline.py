@@ -0,0 +1,142 @@
+##!/usr/bin/python
+
+#
+# ============================================================================
+#
+#    18.10.26   <--  Date of Last Modification.
+#                   ~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+# ----------------------------------------------------------------------------
+#
+#  CONCURRENT PREPARATION OF UPLOADED FILES
+#
+#  prepareFiles() decompresses uploaded files and detects their types in a
+#  bounded pool of worker threads, returning results in the order of input
+#  list, so that the import summary and report do not depend on the order in
+#  which files are processed. Files which need external conversion before
+#  type detection (scalepack) are returned with type None and left to the
+#  caller.
+#
+#  Compressed files are registered with zutils.gunzip_lazy() and decompressed
+#  only if their type cannot be detected from the compressed stream or their
+#  importer needs a plain file. Coordinates, sequences and reflection CIFs
+#  are read from gzip streams directly, and unrecognised files are never
+#  decompressed.
+#
+#  Copyright (C) Eugene Krissinel, Andrey Lebedev 2026
+#
+# ============================================================================
+#
+
+#  python native imports
+import os
+import concurrent.futures
+
+#  application imports
+from   pycofe.varut import zutils
+from   pycofe.proc  import import_filetype
+
+
+# ============================================================================
+
+# extensions of files which must be decompressed for type detection
+plain_exts = ( ".mtz",".hkl",".sca" )
+
+# types of files which importers read from compressed streams
+lazy_types = ( import_filetype.ftype_XYZ      (),
+               import_filetype.ftype_Sequence (),
+               import_filetype.ftype_CIFMerged(),
+               import_filetype.ftype_Unknown  () )
+
+def prepareFile ( filePath,importDir,baseDirPath="",ftype=None,file_stdout=None ):
+    # returns (fpath,ftype) for single upload; ftype is detected if not given,
+    # with diagnostics written in file_stdout
+    fpath = filePath
+    if fpath.lower().endswith(".gz"):   # ungzip files as necessary
+        fpath = zutils.gunzip_lazy ( filePath,baseDirPath=baseDirPath )
+        ppath = os.path.join ( baseDirPath,fpath )
+        if not ftype and os.path.splitext(fpath.lower())[1] in plain_exts:
+            zutils.materialise ( ppath )
+    if fpath.lower().endswith(".sca"):  # converted by caller
+        return (fpath,ftype)
+    if not ftype:
+        ftype = import_filetype.getFileType ( fpath,importDir,file_stdout )
+    if filePath!=fpath and ftype not in lazy_types:
+        zutils.materialise ( ppath )
+    return (fpath,ftype)
+
+
+def prepareFiles ( filePaths,importDir,baseDirPath="",nworkers=1,
+                   file_stdout=None ):
+    # returns list of (fpath,ftype) in order of filePaths
+    if nworkers<=1 or len(filePaths)<=1:
+        return [prepareFile(f,importDir,baseDirPath,file_stdout=file_stdout)
+                for f in filePaths]
+    with concurrent.futures.ThreadPoolExecutor(max_workers=nworkers) as pool:
+        jobs = [pool.submit(prepareFile,f,importDir,baseDirPath,
+                            file_stdout=file_stdout) for f in filePaths]
+    return [job.result() for job in jobs]
+
+
+# ----------------------------------------------------------------------------
+#  Benchmark:  python -m pycofe.proc.import_pipeline bench [nfiles [nworkers]]
+#  prepares a synthetic upload directory with gzipped coordinate, structure
+#  factor, ligand and sequence files and times serial and concurrent
+#  preparation; results are compared in pycofe/tests/test_import_pipeline.py
+# ----------------------------------------------------------------------------
+
+def _synthetic_uploads ( dirpath,nfiles,natoms=60000,nrefl=200000 ):
+    import gzip
+    import shutil
+    import tempfile
+    srcdir = tempfile.mkdtemp()
+    try:
+        samples = import_filetype._synthetic_cifs ( srcdir,natoms=natoms,nrefl=nrefl )
+        samples = [s for s in samples if s[0].endswith(".gz")]
+        flist   = []
+        for i in range(nfiles):
+            src   = samples[i % len(samples)][0]
+            fname = "%03d_%s" % (i,os.path.basename(src))
+            shutil.copyfile ( src,os.path.join(dirpath,fname) )
+            flist.append ( fname )
+            if i % 5 == 4:
+                fname = "%03d_seq.fasta.gz" % i
+                with gzip.open(os.path.join(dirpath,fname),"wt") as f:
+                    f.write ( ">seq\n" + "MKVLAAGIVG"*30 + "\n" )
+                flist.append ( fname )
+    finally:
+        shutil.rmtree ( srcdir )
+    return flist
+
+
+def benchmark ( nfiles=40,nworkers=None ):
+    import time
+    import shutil
+    import tempfile
+
+    if not nworkers:
+        nworkers = min ( 4,os.cpu_count() or 1 )
+
+    results = []
+    timings = []
+    for n in (1,nworkers):
+        tmpdir = tempfile.mkdtemp()
+        try:
+            flist = _synthetic_uploads ( tmpdir,nfiles )
+            t = time.perf_counter()
+            results.append ( prepareFiles(flist,tmpdir,baseDirPath=tmpdir,nworkers=n) )
+            timings.append ( time.perf_counter()-t )
+        finally:
+            shutil.rmtree ( tmpdir )
+
+    print ( " files            : %d" % len(results[0]) )
+    print ( " cores available  : %d" % (os.cpu_count() or 1) )
+    print ( " serial           : %8.3f s" % timings[0] )
+    print ( " %2d workers       : %8.3f s" % (nworkers,timings[1]) )
+    return
+
+
+if __name__ == "__main__":
+    import sys
+    if len(sys.argv)>1 and sys.argv[1]=="bench":
+        benchmark ( *[int(a) for a in sys.argv[2:4]] )
+        sys.exit(0)
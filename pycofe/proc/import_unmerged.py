@@ -3,13 +3,13 @@
 #
 # ============================================================================
 #
-#    12.08.23   <--  Date of Last Modification.
+#    18.10.26   <--  Date of Last Modification.
 #                   ~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 # ----------------------------------------------------------------------------
 #
 #  UNMERGED DATA IMPORT CLASS
 #
-#  Copyright (C) Eugene Krissinel, Andrey Lebedev 2017-2023
+#  Copyright (C) Eugene Krissinel, Andrey Lebedev 2017-2026
 #
 # ============================================================================
 #
@@ -18,7 +18,6 @@
 import os
 import sys
 import traceback
-import subprocess
 import time
 
 #  ccp4-python imports
@@ -28,7 +27,7 @@ import pyrvapi
 #  application imports
 from   pycofe.varut  import command
 from   pycofe.dtypes import dtype_unmerged
-from   pycofe.proc   import import_filetype, mtz, datred_utils
+from   pycofe.proc   import import_filetype, mtz, datred_utils, import_merged
 
 
 # ============================================================================
@@ -128,19 +127,35 @@ def run ( body,        # body is reference to the main Import class
     unmergedSecId = body.getWidgetId ( "unmerged_mtz_sec" )
     imported_data = []
 
+    # convert all XDS files to MTZ concurrently, into distinct files; logs
+    # are written in order of files
+    pool = command.app_pool()
+    conversions = []
+    converted   = import_merged.uniqueNames ([
+        None if f_fmt.startswith('mtz_') else os.path.splitext(f_orig)[0] + ".mtz"
+        for f_orig,f_fmt in files_mtz ])
+    for n in range(len(files_mtz)):
+        f_orig, f_fmt = files_mtz[n]
+        if f_fmt.startswith('mtz_'):
+            conversions.append ( None )
+        else:
+            script = "pointless_xds_" + str(n) + ".script"
+            with open(script,"w") as scr_file:
+                scr_file.write ( "XDSIN "  + os.path.join(body.importDir(),f_orig) +\
+                                 "\nHKLOUT " + converted[n] + "\nCOPY\n" )
+            conversions.append ( pool.start ( "pointless",[],"./",script,
+                                              body.file_stdout,body.file_stderr ) )
+    pool.wait_all()
+
     k = 0
-    for f_orig, f_fmt in files_mtz:
+    for n in range(len(files_mtz)):
+      f_orig, f_fmt = files_mtz[n]
       try:
         p_orig = os.path.join(body.importDir(), f_orig)
         p_mtzin = p_orig
-        if not f_fmt.startswith('mtz_'):
-            p_mtzin = os.path.splitext(f_orig)[0] + '.mtz'
-            sp = subprocess.Popen ( 'pointless', stdin=subprocess.PIPE,
-                                    stdout=body.file_stdout,
-                                    stderr=body.file_stderr )
-            sp.stdin.write(('XDSIN ' + p_orig + '\nHKLOUT ' + p_mtzin + '\nCOPY\n').encode())
-            sp.stdin.close()
-            if sp.wait():
+        if conversions[n]:
+            p_mtzin = converted[n]
+            if conversions[n].rc.msg:
                 p_mtzin = None
 
         if p_mtzin:
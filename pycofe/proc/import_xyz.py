@@ -3,13 +3,13 @@
 #
 # ============================================================================
 #
-#    19.05.24   <--  Date of Last Modification.
+#    18.10.26   <--  Date of Last Modification.
 #                   ~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 # ----------------------------------------------------------------------------
 #
 #  XYZ DATA IMPORT FUNCTION
 #
-#  Copyright (C) Eugene Krissinel, Andrey Lebedev 2017-2024
+#  Copyright (C) Eugene Krissinel, Andrey Lebedev 2017-2026
 #
 # ============================================================================
 #
@@ -24,7 +24,7 @@ import pyrvapi
 #  application imports
 from   pycofe.dtypes  import dtype_xyz
 from   pycofe.proc    import import_filetype, xyzmeta
-from   pycofe.varut   import mmcif_utils
+from   pycofe.varut   import mmcif_utils, zutils
 
 
 # ============================================================================
@@ -79,7 +79,7 @@ def run ( body ):  # body is reference to the main Import class
         fpath = os.path.join ( body.importDir(),f )
         #coor.stripLigWat ( fpath,fpath )  #  strip ligands and waters
 
-        st = gemmi.read_structure ( fpath )
+        st = gemmi.read_structure ( zutils.input_path(fpath) )
         xyzMeta = xyzmeta.getXYZMeta ( st,body.file_stdout,body.file_stderr )
         # body.stderrln ( " >>>>> " + str(xyzMeta) )
         
@@ -104,7 +104,8 @@ def run ( body ):  # body is reference to the main Import class
             body.dataSerialNo += 1
             xyz.makeDName  ( body.dataSerialNo )
 
-            os.rename ( fpath,os.path.join(body.outputDir(),f) )
+            # decompressed straight into output directory if necessary
+            zutils.materialise ( fpath,os.path.join(body.outputDir(),f) )
             xyz.makeUniqueFNames ( body.outputDir() )
             # xyz.fixBFactors ( body.outputDir() )
             xyz.checkBFactors ( body.outputDir() )
@@ -3,13 +3,22 @@
 #
 # ============================================================================
 #
-#    27.08.20   <--  Date of Last Modification.
+#    18.10.26   <--  Date of Last Modification.
 #                   ~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 # ----------------------------------------------------------------------------
 #
 #  MakeLib (Ligand Library Maker)
 #
-#  Copyright (C) Eugene Krissinel, Andrey Lebedev 2019-2020
+#  Ligand dictionaries are merged in one pass: every input file is parsed
+#  once, entries of comp_list, link_list and mod_list blocks are collected
+#  in combined lists, definition blocks (comp_*, link_*, mod_*) are copied
+#  and the library is written once. Where definitions of same component
+#  come from several inputs, the first one is kept. Inputs which cannot be
+#  merged this way (not CIF, or having blocks other than listed above) are
+#  merged with libcheck, one by one, as before. Library headers (global_
+#  blocks) are not carried over.
+#
+#  Copyright (C) Eugene Krissinel, Andrey Lebedev 2019-2026
 #
 # ============================================================================
 #
@@ -20,7 +29,7 @@ import os
 import shutil
 
 #  ccp4-python imports
-#import pyrvapi
+import gemmi
 
 #  application imports
 from pycofe.varut   import command
@@ -28,37 +37,190 @@ from pycofe.varut   import command
 
 # ============================================================================
 
-# should be rewritten using AceDrg accummulator
+# list blocks and categories of their entries, in order of output
+_lib_lists = [
+    ( "comp_list","_chem_comp." ),
+    ( "link_list","_chem_link." ),
+    ( "mod_list" ,"_chem_mod."  )
+]
+
+
+def _read_library ( path ):
+    # returns parsed library, or None if it cannot be merged in-process
+    try:
+        doc = gemmi.cif.read_file ( path )
+    except Exception:
+        return None
+    for block in doc:
+        name = block.name
+        if name and not any([name.startswith(lname[:-4]) for lname,cat in _lib_lists]):
+            return None
+    for lname,cat in _lib_lists:
+        block = doc.find_block ( lname )
+        if block and not block.find_mmcif_category(cat):
+            return None
+    return doc
+
+
+def mergeLibraries ( lib_paths,out_path ):
+    # merges ligand libraries in one pass and writes result in out_path.
+    # Returns list of merged component codes, or None if any of libraries
+    # cannot be merged in-process, in which case nothing is written.
+
+    docs = []
+    for path in lib_paths:
+        doc = _read_library ( path )
+        if doc is None:
+            return None
+        docs.append ( doc )
+
+    lists  = dict ( [(lname,[]) for lname,cat in _lib_lists] )  # rows as dicts
+    tags   = dict ( [(lname,[]) for lname,cat in _lib_lists] )
+    blocks = dict ( [(lname,[]) for lname,cat in _lib_lists] )
+    ids    = dict ( [(lname,set()) for lname,cat in _lib_lists] )
+
+    for doc in docs:
+        for lname,cat in _lib_lists:
+            prefix = lname[:-4]  # "comp_", "link_" or "mod_"
+            added  = set()
+            block  = doc.find_block ( lname )
+            if block:
+                table = block.find_mmcif_category ( cat )
+                ltags = list ( table.tags )
+                for tag in ltags:
+                    if tag not in tags[lname]:
+                        tags[lname].append ( tag )
+                for row in table:
+                    entry = dict ( zip(ltags,[row[i] for i in range(len(ltags))]) )
+                    eid   = gemmi.cif.as_string ( entry.get(cat+"id",".") )
+                    if eid not in ids[lname]:
+                        ids[lname].add ( eid )
+                        added.add ( eid )
+                        lists[lname].append ( entry )
+            for block in doc:
+                if block.name.startswith(prefix) and block.name!=lname:
+                    eid = block.name[len(prefix):]
+                    if eid in added or eid not in ids[lname]:
+                        ids[lname].add ( eid )
+                        blocks[lname].append ( block )
+
+    out = gemmi.cif.Document()
+    for lname,cat in _lib_lists:
+        if lists[lname]:
+            table = out.add_new_block(lname).init_mmcif_loop ( cat,
+                                [tag[len(cat):] for tag in tags[lname]] )
+            for entry in lists[lname]:
+                table.add_row ( [entry.get(tag,".") for tag in tags[lname]] )
+        for block in blocks[lname]:
+            out.add_copied_block ( block )
+    out.write_file ( out_path )
+
+    return [ gemmi.cif.as_string(entry.get("_chem_comp.id","."))
+             for entry in lists["comp_list"] ]
+
+
+def mergeLibraryFiles ( body,lib_paths,out_path ):
+    # merges ligand libraries in out_path, in-process where possible and
+    # with libcheck otherwise
+    if len(lib_paths)==1:
+        shutil.copy2 ( lib_paths[0],out_path )
+    elif mergeLibraries(lib_paths,out_path) is None:
+        lib_path = out_path + ".tmp"
+        shutil.copy2 ( lib_paths[0],out_path )
+        for ligpath in lib_paths[1:]:
+            body.open_stdin()
+            body.write_stdin (
+                "_Y"          +\
+                "\n_FILE_L  " + out_path +\
+                "\n_FILE_L2 " + ligpath  +\
+                "\n_FILE_O  " + lib_path +\
+                "\n_END\n" )
+            body.close_stdin()
+            body.runApp ( "libcheck",[],logType="Service" )
+            shutil.copy2 ( lib_path + ".lib",out_path )
+        for fpath in (lib_path,lib_path + ".lib"):
+            if os.path.exists(fpath):
+                os.remove ( fpath )
+    return
+
+
 def makeLibrary ( body,ligands,library_path ):
 
-    lib_path = library_path + ".tmp"
-    codes    = []
+    lib_paths = []
+    codes     = []
 
     for ligand in ligands:
         process = True  # i.e. library is taken anyway, which is wrong
         if ligand._type=="DataLigand":
             process = not ligand.code in codes
         if process:
-            ligpath = ligand.getLibFilePath ( body.inputDir() )
-            if len(codes)>0:
-                body.open_stdin()
-                body.write_stdin (
-                    "_Y"          +\
-                    "\n_FILE_L  " + library_path +\
-                    "\n_FILE_L2 " + ligpath      +\
-                    "\n_FILE_O  " + lib_path     +\
-                    "\n_END\n" )
-                body.close_stdin()
-                body.runApp ( "libcheck",[],logType="Service" )
-                shutil.copy2 ( lib_path + ".lib", library_path )
-            else:
-                shutil.copy2 ( ligpath,library_path )
+            lib_paths.append ( ligand.getLibFilePath(body.inputDir()) )
             if ligand._type=="DataLigand":
                 codes.append ( ligand.code )
             else:
                 codes += ligand.codes
 
-    if os.path.exists(lib_path):
-        os.remove ( lib_path )
+    if len(lib_paths)>0:
+        mergeLibraryFiles ( body,lib_paths,library_path )
 
     return codes
+
+
+# ============================================================================
+#  Benchmark:  python -m pycofe.proc.makelib bench
+#  merges N ligand dictionaries made from monomer library entries, one by
+#  one (re-reading accumulated library at every step, as with libcheck)
+#  and in one pass; merging is checked in pycofe/tests/test_makelib.py
+# ============================================================================
+
+_bench_template = os.path.join ( os.path.dirname(os.path.abspath(__file__)),"..","..",
+                    "js-lib","webCoot","baby-gru","baby-gru","tutorials","NUT.cif" )
+
+def _bench_ligands ( template,n,dirpath ):
+    # makes n dictionaries from template, with component codes L00, L01 ...
+    text  = open(template).read()
+    code  = gemmi.cif.read_file(template)[1].name[5:]
+    paths = []
+    for i in range(n):
+        lcode = "L%02d" % i if i<100 else "L%d" % i
+        paths.append ( os.path.join(dirpath,lcode + ".cif") )
+        with open(paths[-1],"w") as f:
+            f.write ( text.replace(code,lcode) )
+    return paths
+
+
+def benchmark():
+    import sys
+    import time
+    import tempfile
+    from pycofe.proc import mergeone
+    template = _bench_template
+    if len(sys.argv)>2:
+        template = sys.argv[2]
+    tmpdir = tempfile.mkdtemp()
+    try:
+        for n in (2,10,50):
+            paths = _bench_ligands ( template,n,tmpdir )
+            # one by one, as with repeated libcheck runs
+            out_path = os.path.join ( tmpdir,"seq.lib" )
+            t = time.perf_counter()
+            shutil.copy2 ( paths[0],out_path )
+            for path in paths[1:]:
+                mergeone.add_one_comp ( path,out_path,out_path )
+            t_seq = time.perf_counter() - t
+            # one pass
+            out_path = os.path.join ( tmpdir,"one.lib" )
+            t = time.perf_counter()
+            codes = mergeLibraries ( paths,out_path )
+            t_one = time.perf_counter() - t
+            print ( " %3d ligands : one by one %8.1f ms, one pass %7.1f ms, %d codes" %
+                    (n,1000.0*t_seq,1000.0*t_one,len(codes)) )
+    finally:
+        shutil.rmtree ( tmpdir )
+    return
+
+
+if __name__ == "__main__":
+    import sys
+    if len(sys.argv)>1 and sys.argv[1]=="bench":
+        benchmark()
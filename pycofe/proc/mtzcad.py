@@ -0,0 +1,185 @@
+##!/usr/bin/python
+
+#
+# ============================================================================
+#
+#    18.10.26   <--  Date of Last Modification.
+#                   ~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+# ----------------------------------------------------------------------------
+#
+#  IN-PROCESS MTZ COLUMN SLICING AND MERGING (CAD REPLACEMENT)
+#
+#  Implements the subset of CAD functionality used by TaskDriver.sliceMTZ(),
+#  makeMTZ() and makePhasesMTZ() with gemmi.Mtz (functions of the same names
+#  and signatures below):
+#
+#    - LABIN FILE n E1=lbl1 E2=lbl2 ...  or  LABIN FILE n ALL
+#    - LABOUT FILE n E1=out1 E2=out2 ...
+#    - merging of several files on (H,K,L), with missing values set to NaN
+#      and output reflections sorted on H,K,L
+#
+#  Each function returns True on success and False if the request cannot be
+#  handled in-process (gemmi/numpy not available, unmerged or inconsistent
+#  input, unknown or clashing labels, I/O errors); in the latter case the
+#  caller is expected to fall back to running CAD.
+#
+#  Copyright (C) Eugene Krissinel, Andrey Lebedev 2026
+#
+# ============================================================================
+#
+
+#  python native imports
+import os
+
+#  ccp4-python imports
+try:
+    import gemmi
+    import numpy
+except ImportError:
+    gemmi = None
+    numpy = None
+
+
+# ============================================================================
+
+def available():
+    return gemmi is not None and numpy is not None
+
+
+def _log ( file_stdout,msg ):
+    if file_stdout:
+        file_stdout.write ( msg )
+    return
+
+
+def _select_columns ( mtz,labin,labout ):
+    # returns list of (column, output label) or None if labels are not found
+    if len(labin)==0 or (len(labin)==1 and labin[0].lower()=="all"):
+        return [(col,col.label) for col in mtz.columns
+                                if col.label not in ("H","K","L")]
+    if len(labout)>0 and len(labout)!=len(labin):
+        return None
+    sel = []
+    for i in range(len(labin)):
+        col = mtz.column_with_label ( labin[i] )
+        if col is None:
+            return None
+        if len(labout)>0:
+            sel.append ( (col,labout[i]) )
+        else:
+            sel.append ( (col,col.label) )
+    return sel
+
+
+def makeMTZ ( mtzlbl,mtzOut,file_stdout=None ):
+    # mtzlbl = [
+    #     { "path"   : "/path/file.mtz",
+    #       "labin"  : [l1,l2,...]       # [] or ["ALL"] for all columns
+    #       "labout" : [l1,l2,...]       # [] for keeping input labels
+    #     }, ...
+    # ]
+
+    if not available() or len(mtzlbl)<1:
+        return False
+
+    try:
+
+        inputs = []
+        labels = set(["H","K","L"])
+        for item in mtzlbl:
+            mtz = gemmi.read_mtz_file ( item["path"] )
+            if not mtz.is_merged():
+                return False
+            sel = _select_columns ( mtz,item["labin"],item.get("labout",[]) )
+            if sel is None:
+                return False
+            for col,lbl in sel:
+                if lbl in labels:
+                    return False   # CAD does not allow duplicate labels either
+                labels.add ( lbl )
+            inputs.append ( (mtz,sel) )
+
+        mtz0 = inputs[0][0]
+        for mtz,sel in inputs[1:]:
+            if mtz.spacegroup.number!=mtz0.spacegroup.number:
+                return False
+        if len(inputs)>1:
+            # bring all files to the same (CCP4) asymmetric unit, as CAD does
+            for mtz,sel in inputs:
+                mtz.ensure_asu()
+
+        # union of reflection indices, vectorised over all files
+        arrays = [numpy.asarray(mtz.array) for mtz,sel in inputs]
+        hkl    = numpy.concatenate ( [a[:,0:3] for a in arrays] )
+        hkl_u,inverse = numpy.unique ( hkl.astype(numpy.int32),axis=0,
+                                       return_inverse=True )
+        inverse = inverse.reshape(-1)
+        if len(inputs)==1 and len(hkl_u)!=len(hkl):
+            return False  # duplicate indices, leave it to CAD
+
+        ncols = 3 + sum([len(sel) for mtz,sel in inputs])
+        data  = numpy.full ( (len(hkl_u),ncols),numpy.nan,dtype=numpy.float32 )
+        data[:,0:3] = hkl_u
+
+        # output header
+        out = gemmi.Mtz ( with_base=True )
+        out.title      = mtz0.title
+        out.spacegroup = mtz0.spacegroup
+        out.set_cell_for_all ( mtz0.cell )
+        out.history    = [ "From CCP4 Cloud in-process CAD (gemmi)" ] +\
+                         list(mtz0.history)
+        dsmap  = { ("HKL_base","HKL_base","HKL_base") : 0 }
+        icol   = 3
+        offset = 0
+        for n in range(len(inputs)):
+            mtz,sel = inputs[n]
+            rows = inverse[offset:offset+len(arrays[n])]
+            offset += len(arrays[n])
+            for col,lbl in sel:
+                ds  = mtz.dataset ( col.dataset_id )
+                key = (ds.project_name,ds.crystal_name,ds.dataset_name)
+                if key not in dsmap:
+                    ods = out.add_dataset ( ds.dataset_name )
+                    ods.project_name = ds.project_name
+                    ods.crystal_name = ds.crystal_name
+                    ods.wavelength   = ds.wavelength
+                    ods.cell         = ds.cell
+                    dsmap[key] = ods.id
+                out.add_column ( lbl,col.type,dataset_id=dsmap[key],
+                                 expand_data=False )
+                data[rows,icol] = arrays[n][:,col.idx]
+                icol += 1
+
+        out.set_data    ( data )
+        out.update_reso ()
+        out.write_to_file ( mtzOut )
+
+    except Exception as e:
+        _log ( file_stdout," *** in-process CAD failed: " + str(e) + "\n" )
+        if os.path.isfile(mtzOut):
+            os.remove ( mtzOut )
+        return False
+
+    for n in range(len(mtzlbl)):
+        sel = inputs[n][1]
+        _log ( file_stdout," ..... HKLIN" + str(n+1) + " " + mtzlbl[n]["path"] +\
+                           "\n       " + " ".join([col.label+"->"+lbl for col,lbl in sel]) +\
+                           "\n" )
+    _log ( file_stdout," ..... HKLOUT " + mtzOut + " (" + str(len(hkl_u)) +\
+                       " reflections, in-process)\n" )
+    return True
+
+
+def sliceMTZ ( mtzInPath,label_list,mtzOutPath,labelout_list=[],file_stdout=None ):
+    labout = []
+    if len(labelout_list)==len(label_list):
+        labout = labelout_list
+    return makeMTZ ( [{ "path"   : mtzInPath,
+                        "labin"  : label_list,
+                        "labout" : labout }],mtzOutPath,file_stdout )
+
+
+def makePhasesMTZ ( mtzHKL,lblHKL,mtzPhases,lblPhases,mtzOut,file_stdout=None ):
+    return makeMTZ ( [{ "path" : mtzHKL   , "labin" : lblHKL   , "labout" : [] },
+                      { "path" : mtzPhases, "labin" : lblPhases, "labout" : [] }],
+                     mtzOut,file_stdout )
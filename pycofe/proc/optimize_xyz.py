@@ -5,27 +5,170 @@
 #
 # ============================================================================
 #
-#    29.01.24   <--  Date of Last Modification.
+#    18.10.26   <--  Date of Last Modification.
 #                   ~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 # ----------------------------------------------------------------------------
 #
 #  OPTIMIZES CHAIN ARRANGEMENT IN ASU
 #
-#  Copyright (C) Eugene Krissinel 2022-2024
+#  Polymer chains are moved to symmetry images with centres of mass closest
+#  to the centre of mass of the first chain, and waters are moved, residue
+#  by residue, to images closest to centres of (moved) polymer chains.
+#  Images are made by all symmetry operators combined with lattice shifts
+#  -2..2 along each axis; all images of a set of points are calculated as
+#  one array transform, using same arithmetic as gemmi, so that choices
+#  (including ties, where first image in order of operators and shifts
+#  wins) are the same as with per-image calculations.
+#
+#  Copyright (C) Eugene Krissinel 2022-2026
 #
 # ============================================================================
 #
 
 import gemmi
+import numpy
+
+# lattice shifts in order of images, last index running fastest
+_shifts = numpy.array ( [ [i1,i2,i3] for i1 in range(5)
+                                     for i2 in range(5)
+                                     for i3 in range(5) ],dtype=float )
+
+_ngrid = 6  # cell-list grid, number of boxes along each cell edge
+_eps   = 1.0e-6
+
+
+def _transform ( mat,vec,xyz ):
+    # xyz[...,3] -> mat*xyz + vec, as gemmi.Transform.apply()
+    return numpy.stack ([
+        mat[i][0]*xyz[...,0] + mat[i][1]*xyz[...,1] + mat[i][2]*xyz[...,2] + vec[i]
+        for i in range(3)
+    ],axis=-1 )
+
+def _apply_ops ( rot,tran,fxyz ):
+    # fxyz[n,3] -> [n,3], as gemmi.Op.apply_to_xyz() with operators given by
+    # rot[n,3,3] and tran[n,3], or rot[nops,3,3] and tran[nops,3] for
+    # fxyz[n,1,3] -> [n,nops,3]
+    x = fxyz[...,0]
+    y = fxyz[...,1]
+    z = fxyz[...,2]
+    return numpy.stack ([
+        (rot[...,i,0]*x + rot[...,i,1]*y + rot[...,i,2]*z + tran[...,i]) / gemmi.Op.DEN
+        for i in range(3)
+    ],axis=-1 )
+
+
+class SymImages(object):
+
+    def __init__ ( self,cell,ops ):
+        self.ops  = list ( ops )
+        self.rot  = numpy.array ( [op.rot  for op in self.ops],dtype=float )
+        self.tran = numpy.array ( [op.tran for op in self.ops],dtype=float )
+        self.frac = ( cell.frac.mat.tolist(),cell.frac.vec.tolist() )
+        self.orth = ( cell.orth.mat.tolist(),cell.orth.vec.tolist() )
+        # radius of sphere around cell-list box
+        corners   = numpy.array ( [ [i1,i2,i3] for i1 in (-0.5,0.5)
+                                               for i2 in (-0.5,0.5)
+                                               for i3 in (-0.5,0.5) ] )/_ngrid
+        self.rbox = numpy.sqrt ( (self.orthogonalize(corners)**2).sum(axis=1) ).max()
+
+    def fractionalize ( self,xyz ):
+        return _transform ( self.frac[0],self.frac[1],xyz )
+
+    def orthogonalize ( self,fxyz ):
+        return _transform ( self.orth[0],self.orth[1],fxyz )
+
+    def _candidates ( self,box,targets,tdist ):
+        # numbers of targets which may be closest to a point in given box
+        # of cell-list grid; tdist caches target distances from box centres
+        if box not in tdist:
+            b  = ( box//(_ngrid*_ngrid),(box//_ngrid)%_ngrid,box%_ngrid )
+            cb = self.orthogonalize ( (numpy.array(b)+0.5)/_ngrid )
+            d  = numpy.sqrt ( ((targets-cb)**2).sum(axis=1) )
+            tdist[box] = numpy.nonzero ( d-self.rbox <= d.min()+self.rbox+_eps )[0]
+        return tdist[box]
+
+    def nearest ( self,fxyz,centres ):
+        # for every fractional point in fxyz[n,3], finds symmetry image
+        # closest to any of given orthogonal centres. Returns arrays of
+        # operator numbers iop[n], operator translations tran[n,3], which
+        # include lattice shifts, and numbers of closest centres icentre[n].
+        #
+        # Image of point x made by operator op and shift s is at
+        # orth(op(x)%1+s-2), so that its distance to centre c equals distance
+        # between orth(op(x)%1) and target c-orth(s-2). Targets are fixed,
+        # and points orth(op(x)%1) lie in the unit cell, so that only few
+        # targets, found by cell-list, need to be checked for every point.
+        # Distances to these are calculated exactly as in gemmi, so that
+        # ties are resolved as with checking all images.
+        nops     = len(self.ops)
+        centres  = numpy.array ( centres,dtype=float ).reshape(-1,3)
+        ncentres = len(centres)
+        npoints  = len(fxyz)
+        if npoints<=0:
+            return ( numpy.zeros(0,dtype=int),numpy.zeros((0,3)),
+                     numpy.zeros(0,dtype=int) )
+
+        # targets in order of images, centre number running fastest
+        targets = ( centres[None,:,:] -
+                    self.orthogonalize(_shifts-2.0)[:,None,:] ).reshape(-1,3)
+
+        fp  = _apply_ops ( self.rot,self.tran,fxyz[:,None,:] )  # [n,nops,3]
+        fm  = numpy.mod ( fp,1.0 ).reshape(-1,3)
+        box = numpy.minimum ( (fm*_ngrid).astype(int),_ngrid-1 )
+        box = (box[:,0]*_ngrid + box[:,1])*_ngrid + box[:,2]
+        order  = numpy.argsort ( box,kind="stable" )
+        bounds = numpy.nonzero ( numpy.diff(box[order]) )[0] + 1
+        dmin   = numpy.empty ( len(fm) )
+        imin   = numpy.empty ( len(fm),dtype=int )
+        tdist  = {}
+        for q in numpy.split(order,bounds):
+            cand = self._candidates ( int(box[q[0]]),targets,tdist )
+            f1   = (fm[q][:,None,:] + _shifts[cand//ncentres]) - 2.0
+            p1   = self.orthogonalize ( f1 )
+            c    = centres[cand%ncentres]
+            dx   = p1[...,0] - c[:,0]
+            dy   = p1[...,1] - c[:,1]
+            dz   = p1[...,2] - c[:,2]
+            d    = numpy.sqrt ( dx*dx + dy*dy + dz*dz )
+            k    = numpy.argmin ( d,axis=1 )
+            dmin[q] = d[numpy.arange(len(q)),k]
+            imin[q] = cand[k]
+
+        n    = numpy.arange ( npoints )
+        iop  = numpy.argmin ( dmin.reshape(npoints,nops),axis=1 )
+        imin = imin.reshape(npoints,nops)[n,iop]
+        f1   = (fm.reshape(npoints,nops,3)[n,iop] + _shifts[imin//ncentres]) - 2.0
+        df   = numpy.round ( f1 - fp[n,iop] )
+        return ( iop,self.tran[iop] + gemmi.Op.DEN*df,imin%ncentres )
+
+    def makeOp ( self,iop,tran ):
+        return self.ops[iop].translated (
+                    [ int(t)-o for t,o in zip(tran,self.ops[iop].tran) ] )
+
+    def moveAtoms ( self,atoms,iop,tran ):
+        # applies operators to atoms, as
+        #    atom.pos = orthogonalize(op.apply_to_xyz(fractionalize(atom.pos)))
+        # where op for n-th atom is given by iop[n] and tran[n]
+        if len(atoms)<=0:
+            return
+        xyz = numpy.array ( [atom.pos.tolist() for atom in atoms],dtype=float )
+        rot = self.rot[numpy.asarray(iop)]
+        xyz = self.orthogonalize ( _apply_ops(rot,numpy.asarray(tran),
+                                              self.fractionalize(xyz)) )
+        for atom,pos in zip(atoms,xyz.tolist()):
+            atom.pos = gemmi.Position ( pos[0],pos[1],pos[2] )
+        return
+
 
 def optimizeXYZ ( gemmi_st,body=None ):
 
     if not gemmi_st.spacegroup_hm:
         return []
 
-    ops   = gemmi.SpaceGroup ( gemmi_st.spacegroup_hm ).operations()
-    model = gemmi_st[0]
-    p0    = model[0].calculate_center_of_mass()
+    ops    = gemmi.SpaceGroup ( gemmi_st.spacegroup_hm ).operations()
+    images = SymImages ( gemmi_st.cell,ops )
+    model  = gemmi_st[0]
+    p0     = model[0].calculate_center_of_mass()
 
     log         = []
     polymers    = []
@@ -37,8 +180,6 @@ def optimizeXYZ ( gemmi_st,body=None ):
         chain = model[n]
         cpos.append ( None )
 
-        # body.stderrln ( " >>>> chain=" + chain.name )
-
         water_chain = True
         for res in chain:
             if res.name not in ["HOH","WAT"]:
@@ -49,46 +190,17 @@ def optimizeXYZ ( gemmi_st,body=None ):
         else:
             polymers.append ( n )
             cm0   = chain.calculate_center_of_mass()
-            # body.stderrln ( " >>>> cm0=" + str(cm0) )
             fp0   = gemmi_st.cell.fractionalize ( gemmi.Position(cm0[0],cm0[1],cm0[2]) )
-            # body.stderrln ( " >>>> fp0=" + str(fp0) )
-            dmin  = 0.0
-            opmin = None
-            df    = [0,0,0]
-            for op in ops:
-                # body.stderrln ( " >>>> op=" + str(op) )
-                fp  = op.apply_to_xyz ( fp0.tolist() )
-                # body.stderrln ( " >>>> fp=" + str(fp) )
-                f1  = [0,0,0]
-                for i1 in range(5):
-                    f1[0] = (fp[0] % 1) + i1 - 2
-                    for i2 in range(5):
-                        f1[1] = (fp[1] % 1)  + i2 - 2
-                        for i3 in range(5):
-                            f1[2] = (fp[2] % 1) + i3 - 2
-                            # body.stderrln ( " >>>> f1=" + str(f1) )
-                            d1 = p0.dist ( gemmi_st.cell.orthogonalize ( gemmi.Fractional(f1[0],f1[1],f1[2])) )
-                            if not opmin or d1<dmin:
-                                opmin = op
-                                dmin  = d1
-                                for i in range(3):
-                                    df[i] = round ( f1[i]-fp[i] )
-            tran = [ 0,0,0 ]
-            for i in range(3):
-                tran[i] = opmin.tran[i] + gemmi.Op.DEN*df[i]
-            opmin.tran = tran
-
-            for res in chain:
-                for atom in res:
-                    fxyz  = opmin.apply_to_xyz ( gemmi_st.cell.fractionalize(atom.pos).tolist() )
-                    # for i in range(3):
-                    #     fxyz[i] += df[i]
-                    atom.pos = gemmi_st.cell.orthogonalize ( gemmi.Fractional(fxyz[0],fxyz[1],fxyz[2]) )
+            iop,tran,nc = images.nearest ( numpy.array([fp0.tolist()]),[p0.tolist()] )
+            opmin = images.makeOp ( iop[0],tran[0] )
+
+            atoms = [ atom for res in chain for atom in res ]
+            images.moveAtoms ( atoms,numpy.repeat(iop,len(atoms)),
+                                     numpy.repeat(tran,len(atoms),axis=0) )
 
             cm0     = chain.calculate_center_of_mass()
             cpos[n] = gemmi.Position ( cm0[0],cm0[1],cm0[2] )
 
-
             polymer = chain.get_polymer()
             t = polymer.check_polymer_type()
             ctype = "unknown"
@@ -109,38 +221,16 @@ def optimizeXYZ ( gemmi_st,body=None ):
                 "op"   : opmin.triplet()
             })
 
+    centres = [ cpos[n].tolist() for n in polymers ]
     for n in nonpolymers:
         chain = model[n]
-        for res in chain:
-            fp0   = gemmi_st.cell.fractionalize ( res[0].pos )
-            dmin  = 0.0
-            opmin = None
-            df    = [0,0,0]
-            for op in ops:
-                fp  = op.apply_to_xyz ( fp0.tolist() )
-                f1  = [0,0,0]
-                for i1 in range(5):
-                    f1[0] = (fp[0] % 1) + i1 - 2
-                    for i2 in range(5):
-                        f1[1] = (fp[1] % 1)  + i2 - 2
-                        for i3 in range(5):
-                            f1[2] = (fp[2] % 1) + i3 - 2
-                            p1 = gemmi_st.cell.orthogonalize ( gemmi.Fractional(f1[0],f1[1],f1[2]) )
-                            for n1 in polymers:
-                                d1 = cpos[n1].dist ( p1 )
-                                if not opmin or d1<dmin:
-                                    opmin = op
-                                    dmin  = d1
-                                    for i in range(3):
-                                        df[i] = round ( f1[i]-fp[i] )
-            tran = [ 0,0,0 ]
-            for i in range(3):
-                tran[i] = opmin.tran[i] + gemmi.Op.DEN*df[i]
-            opmin.tran = tran
-
-            for atom in res:
-                fxyz     = opmin.apply_to_xyz ( gemmi_st.cell.fractionalize(atom.pos).tolist() )
-                atom.pos = gemmi_st.cell.orthogonalize ( gemmi.Fractional(fxyz[0],fxyz[1],fxyz[2]) )
+        if centres and len(chain)>0:
+            fp0 = images.fractionalize (
+                        numpy.array([res[0].pos.tolist() for res in chain]) )
+            iop,tran,nc = images.nearest ( fp0,centres )
+            nat   = [ len(res) for res in chain ]
+            atoms = [ atom for res in chain for atom in res ]
+            images.moveAtoms ( atoms,numpy.repeat(iop,nat),numpy.repeat(tran,nat,axis=0) )
 
         log.append({
             "name" : chain.name,
@@ -148,15 +238,92 @@ def optimizeXYZ ( gemmi_st,body=None ):
             "op"   : "per residue"
         })
 
-
     return log
 
 
 # ============================================================================
+#  Benchmark:  python -m pycofe.proc.optimize_xyz bench [nchains [nwaters]]
+#  optimises a synthetic model made of polymer chains and water chains
+#  scattered over the unit cell by symmetry operators and lattice shifts;
+#  same models are used in pycofe/tests/test_optimize_xyz.py
+# ============================================================================
+
+def makeTestStructure ( nchains=8,nwaters=4000,spg="P 21 21 21",seed=1 ):
+    import random
+    rnd = random.Random ( seed )
+    st  = gemmi.Structure()
+    st.cell = gemmi.UnitCell ( 104.7,131.2,155.9,90,90,90 )
+    st.spacegroup_hm = spg
+    model = gemmi.Model ( "1" )
+    ops   = list ( gemmi.SpaceGroup(spg).operations() )
+    chain_ids = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+    for n in range(nchains):
+        # helical chain of CA atoms, 300 residues, placed at random image
+        chain = gemmi.Chain ( chain_ids[n%26] + ("" if n<26 else str(n//26)) )
+        x0  = [ rnd.uniform(0,1) for i in range(3) ]
+        op  = rnd.choice ( ops )
+        sft = [ rnd.randint(-1,1) for i in range(3) ]
+        for i in range(300):
+            res = gemmi.Residue()
+            res.name  = "ALA"
+            res.seqid = gemmi.SeqId ( i+1,' ' )
+            res.entity_type = gemmi.EntityType.Polymer
+            for aname,el,dx in (("N","N",-1.2),("CA","C",0.0),("C","C",1.3),("O","O",2.0)):
+                atom = gemmi.Atom()
+                atom.name = aname
+                atom.element = gemmi.Element ( el )
+                atom.occ  = 1.0
+                atom.b_iso = 30.0
+                f = st.cell.fractionalize ( gemmi.Position (
+                        2.3*numpy.cos(i*1.745) + dx,
+                        2.3*numpy.sin(i*1.745),1.5*i-225.0 ) )
+                f = op.apply_to_xyz ( [ f.x+x0[0]+sft[0],f.y+x0[1]+sft[1],f.z+x0[2]+sft[2] ] )
+                atom.pos = st.cell.orthogonalize ( gemmi.Fractional(*f) )
+                res.add_atom ( atom )
+            chain.add_residue ( res )
+        model.add_chain ( chain )
+    nwchains = max ( 1,nchains//2 )
+    for n in range(nwchains):
+        chain = gemmi.Chain ( "W" + str(n+1) )
+        for i in range(nwaters//nwchains):
+            res = gemmi.Residue()
+            res.name  = "HOH"
+            res.seqid = gemmi.SeqId ( i+1,' ' )
+            res.entity_type = gemmi.EntityType.Water
+            atom = gemmi.Atom()
+            atom.name = "O"
+            atom.element = gemmi.Element ( "O" )
+            atom.occ  = 1.0
+            atom.b_iso = 40.0
+            atom.pos  = st.cell.orthogonalize ( gemmi.Fractional (
+                    rnd.uniform(-1,2),rnd.uniform(-1,2),rnd.uniform(-1,2) ) )
+            res.add_atom ( atom )
+            chain.add_residue ( res )
+        model.add_chain ( chain )
+    st.add_model ( model )
+    st.setup_entities()
+    return st
+
+
+def benchmark ( nchains=8,nwaters=4000 ):
+    import time
+    for spg in ("P 21 21 21","P 61 2 2"):
+        st = makeTestStructure ( nchains,nwaters,spg )
+        t  = time.perf_counter()
+        optimizeXYZ ( st )
+        t  = time.perf_counter() - t
+        print ( " %-10s : %d chains, %d waters, %d atoms, %d operators: %.2f s" % (
+                spg,nchains,nwaters,st[0].count_atom_sites(),
+                len(gemmi.SpaceGroup(spg).operations()),t ) )
+    return
+
 
 if __name__ == "__main__":
     import sys
-    st = gemmi.read_structure ( sys.argv[1] )
-    st.setup_entities()
-    optimizeXYZ  ( st  ) 
-    st.write_pdb ( "a.pdb" )
+    if len(sys.argv)>1 and sys.argv[1]=="bench":
+        benchmark ( *[int(a) for a in sys.argv[2:4]] )
+    else:
+        st = gemmi.read_structure ( sys.argv[1] )
+        st.setup_entities()
+        optimizeXYZ  ( st  )
+        st.write_pdb ( "a.pdb" )
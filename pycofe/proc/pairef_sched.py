@@ -0,0 +1,321 @@
+##!/usr/bin/python
+
+#
+# ============================================================================
+#
+#    18.10.26   <--  Date of Last Modification.
+#                   ~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+# ----------------------------------------------------------------------------
+#
+#  PAIREF SCHEDULER
+#
+#  Command-line:
+#     ccp4-python pairef_sched.py --ncores N [pairef arguments]
+#
+#  Runs pairef with refmac jobs of every resolution step executed
+#  concurrently, up to N at a time. Pairef runs refinements one by one,
+#  although within a step only the refinement for each free flag depends on
+#  the model from previous step, and R-factor evaluations at the previous
+#  and initial cutoffs (and in high-resolution shells) depend only on the
+#  refined model. The scheduler replaces pairef's refmac runner with one
+#  that queues runs with these dependencies, and lets statistics, graphs and
+#  reports run in pairef's order, one at a time, when their inputs are
+#  ready. Functions which use results of all free flags (averaged statistics,
+#  bar graphs, cutoff suggestion) wait for all queued runs, so that steps
+#  are separated as before and output files are identical to those of
+#  serial pairef. With N<2, or with untested pairef versions, pairef is run
+#  as is.
+#
+#  The script does not import pycofe modules so that it can be run by path
+#  from job directory.
+#
+#  Copyright (C) Eugene Krissinel, Andrey Lebedev 2026
+#
+# ============================================================================
+#
+
+import os
+import sys
+import threading
+from concurrent import futures
+
+# ============================================================================
+
+tested_versions = ( "1.4", )
+
+thread_env_vars = [ "OMP_NUM_THREADS","MKL_NUM_THREADS","OPENBLAS_NUM_THREADS" ]
+
+# refmac modes run concurrently; "first" is run in place
+_async_modes   = ( "refine","prev_pair","comp" )
+
+# pairef functions using results of single free flag; positions of flag
+# argument in their argument lists, -1 where there is none
+_lane_calls    = { "matplotlib_line"      : -1,
+                   "collect_stat_OVERALL" :  2,
+                   "try_symlink"          : -1,
+                   "res_opt"              : -1 }
+
+# pairef functions using results of all free flags
+_barrier_calls = ( "collect_stat_OVERALL_AVG","collect_stat_BINNED",
+                   "collect_stat_binned_refmac_low","matplotlib_bar",
+                   "suggest_cutoff","calculate_merging_stats",
+                   "check_refinement_software" )
+
+# progress reports, made from files available at the time of call
+_report_calls  = ( "write_log_html", )
+
+
+class Scheduler(object):
+
+    def __init__ ( self,ncores ):
+        self.pool  = futures.ThreadPoolExecutor ( max_workers=ncores )
+        self.lock  = threading.Lock()  # serialises pairef's own work
+        self.tasks = []   # all tasks since last barrier
+        self.lanes = {}   # flag -> [ model task, tasks since last lane call ]
+
+    def _lane ( self,flag ):
+        if flag not in self.lanes:
+            self.lanes[flag] = [ None,[] ]
+        return self.lanes[flag]
+
+    def submit ( self,deps,fn,*args,**kwargs ):
+        # returns future of fn(*args,**kwargs) run in pool after all deps
+        # have finished, or failed with exception of first failed dependence
+        task  = futures.Future()
+        deps  = [ d for d in deps if d is not None ]
+        count = [ len(deps) ]
+        guard = threading.Lock()
+
+        def finish ( f ):
+            if f.exception() is not None:
+                task.set_exception ( f.exception() )
+            else:
+                task.set_result ( f.result() )
+
+        def start():
+            for d in deps:
+                if d.exception() is not None:
+                    task.set_exception ( d.exception() )
+                    return
+            self.pool.submit(fn,*args,**kwargs).add_done_callback ( finish )
+
+        def ready ( f ):
+            with guard:
+                count[0] -= 1
+                go = count[0]==0
+            if go:
+                start()
+
+        if not deps:
+            start()
+        for d in deps:
+            d.add_done_callback ( ready )
+        self.tasks.append ( task )
+        return task
+
+    def serial ( self,fn ):
+        def run ( *args,**kwargs ):
+            with self.lock:
+                return fn ( *args,**kwargs )
+        return run
+
+    def wait ( self ):
+        # waits for all tasks and raises exception of the first failed one
+        tasks = self.tasks
+        self.tasks = []
+        for lane in self.lanes.values():
+            lane[1] = []
+        for task in tasks:
+            task.result()
+        return
+
+    # ----------------------------------------------------------------------
+
+    def refmac ( self,fn ):
+        def run ( *args,**kwargs ):
+            mode = kwargs.get ( "mode","refine" )
+            if mode not in _async_modes:
+                self.wait()
+                return fn ( *args,**kwargs )
+            lane = self._lane ( kwargs.get("flag",0) )
+            task = self.submit ( [lane[0]],fn,*args,**kwargs )
+            if mode=="refine":
+                lane[0] = task
+            lane[1].append ( task )
+            return None  # results of these modes are not used by pairef
+        return run
+
+    def lane_call ( self,fn,flag_pos ):
+        def run ( *args,**kwargs ):
+            if "flag" in kwargs:
+                lanes = [ self._lane(kwargs["flag"]) ]
+            elif 0<=flag_pos<len(args):
+                lanes = [ self._lane(args[flag_pos]) ]
+            else:
+                lanes = list ( self.lanes.values() )
+            deps = []
+            for lane in lanes:
+                deps += lane[1]
+            if all([d.done() for d in deps]):
+                for d in deps:
+                    d.result()
+                return self.serial(fn) ( *args,**kwargs )
+            task = self.submit ( deps,self.serial(fn),*args,**kwargs )
+            for lane in lanes:
+                lane[1] = [ task ]
+            return None
+        return run
+
+    def barrier_call ( self,fn ):
+        def run ( *args,**kwargs ):
+            self.wait()
+            return fn ( *args,**kwargs )
+        return run
+
+    def install ( self,launcher,refinement ):
+        # replaces pairef functions with scheduling ones
+        refinement.refinement_refmac = self.refmac ( refinement.refinement_refmac )
+        for name,flag_pos in _lane_calls.items():
+            setattr ( launcher,name,self.lane_call(getattr(launcher,name),flag_pos) )
+        for name in _barrier_calls:
+            for module in (launcher,refinement):
+                if hasattr(module,name):
+                    setattr ( module,name,self.barrier_call(getattr(module,name)) )
+        for name in _report_calls:
+            setattr ( launcher,name,self.serial(getattr(launcher,name)) )
+        main = launcher.main
+        def run_main ( *args,**kwargs ):
+            result = main ( *args,**kwargs )
+            self.wait()
+            return result
+        launcher.main = run_main
+        return
+
+
+# ============================================================================
+
+def parseArgs ( argv ):
+    # returns number of cores and argument list without --ncores option
+    ncores = 1
+    args   = list ( argv )
+    if "--ncores" in args:
+        i = args.index ( "--ncores" )
+        try:
+            ncores = max ( 1,int(args[i+1]) )
+        except (IndexError,ValueError):
+            pass
+        del args[i:i+2]
+    return ncores,args
+
+
+def run ( argv ):
+    ncores,args = parseArgs ( argv )
+    sys.argv    = args
+    import pairef
+    from pairef import launcher, refinement
+    version = str ( getattr(pairef,"__version__","") )
+    if ncores>1 and version.startswith(tested_versions):
+        for var in thread_env_vars:
+            os.environ[var] = "1"
+        Scheduler(ncores).install ( launcher,refinement )
+    launcher.run_pairef()
+    return
+
+
+# ============================================================================
+#  Benchmark:  python pairef_sched.py bench [nshells [nflags [unit]]]
+#  replays pairef's sequence of calls with refmac runs replaced by sleeps:
+#  refinement takes ncyc units and R-factor evaluation 2 units (refmac with
+#  0 cycles still makes restraints, structure factors and scaling); pairef's
+#  own work is not timed. Serial replay is compared with scheduled ones;
+#  order of runs and calls is checked in pycofe/tests/test_pairef_sched.py
+# ============================================================================
+
+def _bench_modules ( unit,ncyc ):
+    import time
+    import types
+    launcher   = types.ModuleType ( "launcher"   )
+    refinement = types.ModuleType ( "refinement" )
+
+    def refinement_refmac ( res_cur,res_prev,res_high,args,n_bins_low,
+                            mode="refine",res_low=0,res_highest=0,flag=0 ):
+        time.sleep ( unit*(ncyc if mode in ("refine","first") else 2) )
+        return { "version" : "bench" }
+
+    def nothing ( *args,**kwargs ):
+        return ( [0.0,0.0],True,"" )
+
+    refinement.refinement_refmac = refinement_refmac
+    refinement.collect_stat_binned_refmac_low = nothing
+    for name in list(_lane_calls) + list(_barrier_calls) + list(_report_calls):
+        setattr ( launcher,name,nothing )
+
+    def main ( shells,flag_sets,complete ):
+        # mirrors refmac branch of pairef.launcher.main
+        ref = refinement
+        for flag in flag_sets:
+            ref.refinement_refmac ( shells[0],0,shells[0],None,10,mode="first",flag=flag )
+            launcher.matplotlib_line ( flag=flag )
+        launcher.write_log_html()
+        ref.collect_stat_binned_refmac_low()
+        for i in range(len(shells)-1):
+            for flag in flag_sets:
+                ref.refinement_refmac ( shells[i+1],shells[i],shells[i+1],None,10,
+                                        mode="refine",flag=flag )
+                launcher.matplotlib_line ( flag=flag )
+                launcher.write_log_html()
+                ref.refinement_refmac ( shells[i+1],shells[i],shells[i],None,10,
+                                        mode="prev_pair",flag=flag )
+                ref.refinement_refmac ( shells[i+1],shells[i],shells[0],None,10,
+                                        mode="comp",flag=flag )
+                launcher.collect_stat_OVERALL ( shells[:i+2],None,flag )
+                if not complete:
+                    for j in range(i+1):
+                        ref.refinement_refmac ( shells[i+1],shells[i],shells[j+1],
+                                                None,10,mode="comp",
+                                                res_low=shells[j],flag=flag )
+            if complete:
+                launcher.collect_stat_OVERALL_AVG()
+            else:
+                launcher.collect_stat_BINNED()
+            launcher.matplotlib_bar()
+            launcher.matplotlib_line ( flag=flag_sets[-1] )
+            launcher.suggest_cutoff()
+            launcher.write_log_html()
+        launcher.suggest_cutoff()
+        launcher.write_log_html()
+        return
+
+    launcher.main = main
+    return launcher,refinement
+
+
+def benchmark ( nshells=10,nflags=4,unit=0.005,ncyc=20 ):
+    import time
+    shells = [ 2.0-0.05*i for i in range(nshells+1) ]
+    print ( " %d shells, refinement %.0f ms, evaluation %.0f ms" %
+            (nshells,1000.0*unit*ncyc,2000.0*unit) )
+    for complete in (False,True):
+        flag_sets = list(range(nflags)) if complete else [0]
+        line = "   %-28s" % ("complete, %d flags" % nflags if complete else "one flag")
+        for ncores in (1,2,4,8):
+            launcher,refinement = _bench_modules ( unit,ncyc )
+            if ncores>1:
+                Scheduler(ncores).install ( launcher,refinement )
+            t = time.perf_counter()
+            launcher.main ( shells,flag_sets,complete )
+            dt = time.perf_counter() - t
+            if ncores==1:
+                t1 = dt
+                line += " serial %6.2f s" % dt
+            else:
+                line += "  %d cores %6.2f s (x%.1f)" % (ncores,dt,t1/dt)
+        print ( line )
+    return
+
+
+if __name__ == "__main__":
+    if len(sys.argv)>1 and sys.argv[1]=="bench":
+        benchmark ( *[ float(a) if "." in a else int(a) for a in sys.argv[2:] ] )
+    else:
+        run ( sys.argv )
@@ -0,0 +1,289 @@
+##!/usr/bin/python
+
+#
+# ============================================================================
+#
+#    18.10.26   <--  Date of Last Modification.
+#                   ~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+# ----------------------------------------------------------------------------
+#
+#  PROSMART RESTRAINT GENERATION
+#
+#  ProSMART passes (homologue, nucleic acid and h-bond restraints) are
+#  independent of each other and run concurrently, within job's core budget.
+#
+#  Restraints are kept in optional cache, given by environment variables
+#
+#     PROSMART_CACHE      : path to cache directory
+#     PROSMART_CACHE_SIZE : maximal number of cached restraint files (200)
+#
+#  and looked up by hash of coordinate records of the model and reference
+#  structures, ProSMART options and CCP4 setup, so that repeated refinements
+#  of the same model reuse restraints made before. Cache items are stored
+#  with pycofe.varut.predcache and hold restraint file and time spent on
+#  making it, which is reported as time saved.
+#
+#  Copyright (C) Eugene Krissinel, Andrey Lebedev, Robert Nicholls 2026
+#
+# ============================================================================
+#
+
+#  python native imports
+import os
+import json
+import time
+import shutil
+import hashlib
+
+#  application imports
+from pycofe.varut  import predcache
+
+# ============================================================================
+
+_cache_file = "restraints.txt"
+_meta_file  = "prosmart.json"
+
+# coordinate records hashed for cache keys; other records (e.g. REMARK)
+# change from job to job without changing the model
+_xyz_records = ( "CRYST1","MODEL ","ATOM  ","HETATM","ANISOU","TER   ","ENDMDL" )
+
+
+def coordinateHash ( fpath ):
+    # hash of coordinate records of PDB file; whole file is hashed if there
+    # are none (e.g. mmCIF files)
+    h = hashlib.sha256()
+    n = 0
+    with open(fpath,"rb") as f:
+        for line in f:
+            if line[:6].decode("ascii","replace") in _xyz_records:
+                h.update ( line.rstrip() )
+                h.update ( b"\n" )
+                n += 1
+    if n<=0:
+        h = hashlib.sha256()
+        with open(fpath,"rb") as f:
+            for chunk in iter(lambda: f.read(1048576),b""):
+                h.update ( chunk )
+    return h.hexdigest()
+
+
+def makeKey ( xyzin,references,options ):
+    data = { "xyzin"      : coordinateHash ( xyzin ),
+             "references" : [ coordinateHash(fpath) for fpath in references ],
+             "options"    : [ str(o) for o in options ],
+             "ccp4"       : os.environ.get ( "CCP4","" ) }
+    return hashlib.sha256 (
+        json.dumps(data,sort_keys=True,separators=(",",":")).encode("utf-8")
+    ).hexdigest()
+
+
+def restraintCache():
+    # returns cache object, or None if cache is not configured
+    path = os.environ.get ( "PROSMART_CACHE" )
+    if not path:
+        return None
+    return predcache.PredictionCache ( path,
+                    int(os.environ.get("PROSMART_CACHE_SIZE","200")) )
+
+
+def restraintFile ( outdir,xyzin ):
+    # name of restraint file made by ProSMART in outdir
+    return os.path.join ( outdir,os.path.splitext(os.path.basename(xyzin))[0] + ".txt" )
+
+
+# ============================================================================
+
+class Pass(object):
+    # single ProSMART run: restraints for model xyzin, from references
+    # (none for h-bond restraints), written in outdir
+
+    def __init__ ( self,title,outdir,xyzin,references,options ):
+        self.title      = title    # message put in report before running
+        self.outdir     = outdir
+        self.xyzin      = xyzin
+        self.references = references
+        self.options    = options
+        self.key        = None
+        self.cached     = False
+        self.time       = 0.0      # seconds spent on making restraints
+
+    def command ( self ):
+        cmd = [ "-quick","-o",self.outdir,"-p1",self.xyzin ]
+        if self.references:
+            cmd += [ "-p2" ] + self.references
+        return cmd + self.options
+
+    def restraintFile ( self ):
+        return restraintFile ( self.outdir,self.xyzin )
+
+
+def _fetch ( body,cache,p ):
+    # places cached restraints for pass p in its output directory
+    try:
+        p.key = makeKey ( p.xyzin,p.references,p.options )
+        if cache.fetch(p.key,p.outdir):
+            os.rename ( os.path.join(p.outdir,_cache_file),p.restraintFile() )
+            with open(os.path.join(p.outdir,_meta_file),"r") as f:
+                p.time = float ( json.load(f)["time"] )
+            p.cached = True
+    except Exception as e:
+        body.stderrln ( " ***** error reading ProSMART cache: " + str(e) )
+        p.cached = False
+    return
+
+
+def _store ( body,cache,p ):
+    stage = p.outdir + "_cache"
+    try:
+        if p.key and os.path.isfile(p.restraintFile()):
+            if os.path.isdir(stage):
+                shutil.rmtree ( stage )
+            os.mkdir ( stage )
+            shutil.copy2 ( p.restraintFile(),os.path.join(stage,_cache_file) )
+            with open(os.path.join(stage,_meta_file),"w") as f:
+                json.dump ( { "time" : p.time },f )
+            cache.store ( p.key,stage )
+    except Exception as e:
+        body.stderrln ( " ***** error writing ProSMART cache: " + str(e) )
+    shutil.rmtree ( stage,ignore_errors=True )
+    return
+
+
+def run ( body,passes ):
+    # makes restraints for all passes and returns list of restraint files;
+    # passes which are not in cache run concurrently
+    t0    = time.time()
+    cache = None
+    try:
+        cache = restraintCache()
+    except Exception as e:
+        body.stderrln ( " ***** error opening ProSMART cache: " + str(e) )
+
+    to_run = []
+    for p in passes:
+        if cache:
+            _fetch ( body,cache,p )
+        if p.cached:
+            body.putMessage ( "Using ProSMART restraints from cache (" +\
+                              p.title + ")" )
+        else:
+            body.putMessage ( "Running ProSMART to generate " + p.title )
+            body.startApp ( "prosmart",p.command(),logType="Main" )
+            to_run.append ( p )
+
+    if to_run:
+        rcs = body.waitApps()
+        for p,rc in zip(to_run,rcs):
+            p.time = rc.utime + rc.stime
+            if cache:
+                _store ( body,cache,p )
+
+    wall_time   = time.time() - t0
+    serial_time = sum ( [p.time for p in passes] )
+    body.stdoutln (
+        "\n ..... ProSMART: " + str(len(passes)) + " pass(es), " +\
+        str(len(passes)-len(to_run)) + " from cache; time %.1f s, " % wall_time +\
+        "one by one without cache %.1f s, saved %.1f s\n" %
+                    (serial_time,max(0.0,serial_time-wall_time)) )
+    if cache:
+        cache.writeStats ( body.file_stdout )
+
+    return [ p.restraintFile() for p in passes ]
+
+
+# ============================================================================
+#  Benchmark:  python -m pycofe.proc.prosmart bench [seconds]
+#  runs three passes of a stub program, which spends given CPU time (1 s by
+#  default) and writes restraint file, one by one, concurrently, and from
+#  cache; same stub is used in pycofe/tests/test_prosmart.py
+# ============================================================================
+
+_stub_program = """
+import sys, time
+t = time.process_time() + %f
+while time.process_time()<t:
+    pass
+args = sys.argv[1:]
+xyzin = args[args.index("-p1")+1]
+outdir = args[args.index("-o")+1]
+import os
+os.makedirs ( outdir,exist_ok=True )
+with open(os.path.join(outdir,os.path.splitext(os.path.basename(xyzin))[0]+".txt"),"w") as f:
+    f.write ( "exte dist first chain A resi 1 atom CA second chain A resi 2 atom CA value 3.8 sigma 0.1\\n" )
+"""
+
+
+class _BenchBody(object):
+    # minimal stand-in for task driver
+
+    def __init__ ( self,executable,nprocs ):
+        import sys
+        from pycofe.varut import command
+        self.command     = command
+        self.executable  = executable
+        self.pool        = command.app_pool ( nprocs )
+        self.file_stdout = open ( os.devnull,"w" )
+        self.file_stderr = sys.stderr
+
+    def putMessage ( self,message ):  pass
+    def stdoutln   ( self,line    ):  print ( line.rstrip() )
+    def stderrln   ( self,line    ):  self.file_stderr.write ( line + "\n" )
+
+    def startApp ( self,appName,cmd,logType="Main" ):
+        return self.pool.start ( self.executable,cmd,"./",os.devnull,
+                                 self.file_stdout,self.file_stderr )
+
+    def waitApps ( self ):
+        return self.pool.wait_all()
+
+
+def benchmark ( cpu_time=1.0 ):
+    import sys
+    import tempfile
+    tmpdir = tempfile.mkdtemp()
+    cwd    = os.getcwd()
+    env    = os.environ.get ( "PROSMART_CACHE" )
+    try:
+        os.chdir ( tmpdir )
+        stub = os.path.join ( tmpdir,"prosmart" )
+        with open(stub,"w") as f:
+            f.write ( "#!" + sys.executable + "\n" + _stub_program % cpu_time )
+        os.chmod ( stub,0o755 )
+        for fname in ("model.pdb","homolog.pdb","dna.pdb"):
+            with open(fname,"w") as f:
+                f.write ( "REMARK  " + fname + "\n" +
+                  "ATOM      1  CA  ALA A   1      11.104  13.207   9.600  1.00 20.00           C\n" )
+        def passes():
+            return [
+                Pass ( "protein restraints","out_protein","model.pdb",["homolog.pdb"],["-side"] ),
+                Pass ( "nucleic acid restraints","out_dnarna","model.pdb",["dna.pdb"],["-dna_rna"] ),
+                Pass ( "h-bond restraints","out_hbond","model.pdb",[],[] )
+            ]
+        os.environ.pop ( "PROSMART_CACHE",None )
+        for label,nprocs in (("one by one",1),("concurrent",3),("cached",3)):
+            if label=="cached":
+                os.environ["PROSMART_CACHE"] = os.path.join ( tmpdir,"cache" )
+                body = _BenchBody ( stub,nprocs )
+                body.stdoutln = lambda line: None
+                run ( body,passes() )  # fills cache
+            body = _BenchBody ( stub,nprocs )
+            t = time.time()
+            print ( "\n " + label + ":" )
+            files = run ( body,passes() )
+            t = time.time() - t
+            print ( " %.2f s, %d restraint files" %
+                    (t,sum([os.path.isfile(f) for f in files])) )
+    finally:
+        os.chdir ( cwd )
+        if env is None:
+            os.environ.pop ( "PROSMART_CACHE",None )
+        else:
+            os.environ["PROSMART_CACHE"] = env
+        shutil.rmtree ( tmpdir )
+    return
+
+
+if __name__ == "__main__":
+    import sys
+    if len(sys.argv)>1 and sys.argv[1]=="bench":
+        benchmark ( *[float(a) for a in sys.argv[2:3]] )
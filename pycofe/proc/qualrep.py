@@ -3,37 +3,123 @@
 #
 # ============================================================================
 #
-#    31.03.25   <--  Date of Last Modification.
+#    18.10.26   <--  Date of Last Modification.
 #                   ~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 # ----------------------------------------------------------------------------
 #
 #  GENERATE STRUCTURE QUALITY REPORT
 #
-#  Copyright (C) Eugene Krissinel, Andrey Lebedev 2020-2024
+#  Copyright (C) Eugene Krissinel, Andrey Lebedev 2020-2026
 #
 # ============================================================================
 #
 
 import os
 import sys, copy
+import time
+import shutil
+import concurrent.futures
 import xml.etree.ElementTree as ET
 # import traceback
 
 #  ccp4-python imports
 import pyrvapi
-import gemmi
 from   iris_validation.graphics import Panel
 from   iris_validation.metrics  import metrics_model_series_from_files
 
 #from   pycofe.etc  import pyrama
+from   pycofe.etc    import citations
+from   pycofe.varut  import signal
+from   pycofe.varut  import command
 from   pycofe.varut  import jsonut
 from   pycofe.varut  import rvapi_utils
+from   pycofe.varut  import xyzcache
+from   pycofe.parsers import metrics_parser
 from   pycofe.dtypes import dtype_template
 from   pycofe.proc   import analyse_structure
 
 # ============================================================================
+#  The report is produced in two phases. First, all analyses are started
+#  concurrently in a bounded pool of worker threads: external programs
+#  (baverage, fft/edstats, clashscore, molprobity, pyrama) run with their own
+#  keyword scripts and log files, and in-process analyses (structure
+#  statistics, Iris metrics) run in threads alongside. Second, report
+#  sections are written in fixed order from the collected results, so that
+#  report layout and log contents do not depend on the order in which the
+#  analyses finish. Citations of programs are also re-added in report order.
+
+def _max_workers ( body ):
+    # number of concurrent analyses: core budget of the job
+    return body.getCoreBudget() or 1
+
+
+def _run_program ( name,appName,cmd,stdin_lines=None,metrics=None ):
+    # runs external program with own script and log files; returns dictionary
+    # with return code, file paths and metrics extractor(s), which collect
+    # values from the log while it is written. Safe to use in worker threads.
+    script = None
+    if stdin_lines:
+        script = "_qr_" + name + ".script"
+        with open(script,"w") as f:
+            f.write ( "\n".join(stdin_lines) + "\n" )
+    logpath = "_qr_" + name + ".log"
+    errpath = "_qr_" + name + ".err"
+    log_parser = None
+    if metrics:
+        log_parser = metrics_parser.metrics_parser ( metrics )
+    with open(logpath,"w") as flog, open(errpath,"w") as ferr:
+        rc = command.call ( appName,cmd,"./",script,flog,ferr,log_parser )
+    return { "app" : appName, "rc" : rc, "log" : logpath, "err" : errpath,
+             "metrics" : metrics }
+
+
+def _python_app():
+    if sys.platform.startswith("win"):
+        return "ccp4-python.bat"
+    return "ccp4-python"
+
+
+def _replay_log ( body,run,file_stdout,log_parser=None ):
+    # copies program's log into job's log, passing it through report parser
+    # if given, and appends program's error output to job's error log
+    if not run:
+        return
+    citations.addCitation ( run["app"] )
+    if os.path.isfile(run["log"]):
+        if log_parser:
+            with open(run["log"],"rb") as f:
+                log_parser.parse_stream ( f,ostream=file_stdout )
+        else:
+            with open(run["log"],"r") as f:
+                file_stdout.write ( f.read() )
+        os.remove ( run["log"] )
+    if os.path.isfile(run["err"]):
+        with open(run["err"],"r") as f:
+            body.file_stderr.write ( f.read() )
+        os.remove ( run["err"] )
+    file_stdout.flush()
+    return
+
+
+def _timed ( timing,name,func,*args ):
+    t1 = time.time()
+    try:
+        return func ( *args )
+    finally:
+        timing[name] = time.time() - t1
+
 
-def put_bfactors_section ( body,structure ):
+# ----------------------------------------------------------------------------
+
+def run_bfactors ( body,structure ):
+    return _run_program ( "baverage","baverage",[
+                            "XYZIN" ,structure.getPDBFilePath ( body.outputDir() ),
+                            "RMSTAB","_rmstab.tab",
+                            "XYZOUT","_baverage.pdb"
+                          ],["END"] )
+
+
+def put_bfactors_section ( body,structure,run ):
     if structure:
 
         sec_id  = body.getWidgetId ( "bfactors" )
@@ -43,21 +129,16 @@ def put_bfactors_section ( body,structure ):
         # body.putGrid1   ( grid_id,sec_id,False,0 )
         # body.putMessage1 ( sec_id,"&nbsp;<p><h3>B-Factors Analysis</h3>",0,col=0 )
 
-        body.open_stdin()
-        body.write_stdin ( ["END"] )
-        body.close_stdin ()
-
         # Prepare report parser
         reportPanelId = body.getWidgetId ( "baverage_report" )
         pyrvapi.rvapi_add_panel  ( reportPanelId,sec_id,0,0,1,1 )
         body.setBaverLogParser ( reportPanelId,False,graphTables=False,makePanel=False )
-        body.runApp ( "baverage",[
-                        "XYZIN" ,structure.getPDBFilePath ( body.outputDir() ),
-                        "RMSTAB","_rmstab.tab",
-                        "XYZOUT","_baverage.pdb"
-                    ],logType="Main" )
+        _replay_log ( body,run,body.file_stdout,body.log_parser )
         body.unsetLogParser()
 
+        if run["rc"].msg:
+            raise signal.JobFailure ( run["rc"].msg )
+
     return
 
 
@@ -77,128 +158,126 @@ def getEDStatsMetrics ( stdout_fpath ):
     return meta
 
 
-def put_edstats_section ( body,revision ):
-    
-    # return None
+def run_edstats ( body,revision,hkl ):
 
-    edmeta = None
+    struct = revision.Structure
+    lowres = hkl.getLowResolution ( raw=True )
+    hires  = hkl.getHighResolution( raw=True )
+    if not lowres:  lowres = 40.0
+    if not hires:   hires  = 1.0
 
-    if revision.Structure:
-
-        struct = revision.Structure
-        sec_id = body.getWidgetId ( "edstats" )
-        body.putSection ( sec_id,"Electron Density Fit Analysis",openState_bool=False )
+    mtzin  = struct.getMTZFilePath ( body.outputDir() )
+    fo_map = "fo_map.map"
+    df_map = "df_map.map"
 
-        hkl = body.makeClass ( revision.HKL )
-        lowres = hkl.getLowResolution ( raw=True )
-        hires  = hkl.getHighResolution( raw=True )
-        if not lowres:  lowres = 40.0
-        if not hires:   hires  = 1.0
-
-        body.open_stdin()
-        body.write_stdin ([
+    runs = []
+    runs.append ( _run_program ( "fft_fo","fft",[
+            "HKLIN" ,mtzin,
+            "MAPOUT",fo_map
+        ],[
             "TITLE Sigmaa style 2mfo-dfc map calculated with refmac coefficients",
             "LABI  F1=" + struct.FWT + " PHI=" + struct.PHWT,
             "RESO  " + str(hires) + " " + str(lowres),
             "XYZL  ASU",
             "GRID  SAMP 4.5",
             "END"
-        ])
-        body.close_stdin()
-
-        mtzin  = struct.getMTZFilePath ( body.outputDir() )
-        fo_map = "fo_map.map"
-        body.runApp ( "fft",[
-                "HKLIN" ,mtzin,
-                "MAPOUT",fo_map
-            ],logType="Service" )
+        ]) )
 
-        # calculate mfo-dfc difference map assuming refmac's mtz on input
+    # calculate mfo-dfc difference map assuming refmac's mtz on input
 
-        body.open_stdin()
-        body.write_stdin ([
+    runs.append ( _run_program ( "fft_df","fft",[
+            "HKLIN" ,mtzin,
+            "MAPOUT",df_map
+        ],[
             "TITLE Sigmaa style mfo-dfc map calculated with refmac coefficients",
             "LABI  F1=" + struct.DELFWT + " PHI=" + struct.PHDELWT,
             "RESO  " + str(hires) + " " + str(lowres),
             "XYZL  ASU",
             "GRID  SAMP 4.5",
             "END"
-        ])
-        body.close_stdin()
+        ]) )
+
+    #  run edstats
+
+    edstats = None
+    edmeta  = None
+    if not runs[0]["rc"].msg and not runs[1]["rc"].msg:
+        edstats = _run_program ( "edstats","edstats",[
+                "XYZIN" ,struct.getPDBFilePath ( body.outputDir() ),
+                "MAPIN1",fo_map,
+                "MAPIN2",df_map,
+                "XYZOUT","edstats.pdb"
+                # "OUT"   ,"edstats.out"
+            ],[
+                "resl=" + str(lowres),
+                "resh=" + str(hires),
+                "main=resi",
+                "side=resi"
+            ])
+        if not edstats["rc"].msg:
+            edmeta = getEDStatsMetrics ( edstats["log"] )
+
+    for fpath in (fo_map,df_map):
+        if os.path.isfile(fpath):
+            os.remove ( fpath )   #  save space
+
+    return { "fft" : runs, "edstats" : edstats, "edmeta" : edmeta }
 
-        df_map = "df_map.map"
-        body.runApp ( "fft",[
-                "HKLIN" ,mtzin,
-                "MAPOUT",df_map
-            ],logType="Service" )
 
-        #  run edstats
+def put_edstats_section ( body,revision,run ):
 
-        body.open_stdin()
-        body.write_stdin ([
-            "resl=" + str(lowres),
-            "resh=" + str(hires),
-            "main=resi",
-            "side=resi"
-        ])
-        body.close_stdin()
+    edmeta = None
 
-        edstats_out = "edstats.out"
-        xyzout      = "edstats.pdb"
+    if revision.Structure:
+
+        sec_id = body.getWidgetId ( "edstats" )
+        body.putSection ( sec_id,"Electron Density Fit Analysis",openState_bool=False )
+
+        for r in run["fft"]:
+            _replay_log ( body,r,body.file_stdout1 )
+            if r["rc"].msg:
+                raise signal.JobFailure ( r["rc"].msg )
 
         # Prepare report parser
         reportPanelId = body.getWidgetId ( "edstats_report" )
         pyrvapi.rvapi_add_panel  ( reportPanelId,sec_id,0,0,1,1 )
         body.setEdstatsLogParser ( reportPanelId,False,graphTables=False,makePanel=False )
-        rc = body.runApp ( "edstats",[
-                "XYZIN" ,struct.getPDBFilePath ( body.outputDir() ),
-                "MAPIN1",fo_map,
-                "MAPIN2",df_map,
-                "XYZOUT",xyzout
-                # "OUT"   ,edstats_out
-            ],logType="Service",quitOnError=False )
-
+        _replay_log ( body,run["edstats"],body.file_stdout1,body.log_parser )
         body.unsetLogParser()
 
-        body.flush()
-        body.file_stdout1.close()
-        if not rc.msg:
-            edmeta = getEDStatsMetrics ( body.file_stdout1_path() )
-        else:
+        edmeta = run["edmeta"]
+        if edmeta is None:
             body.rvrow -= 1
             body.putMessage1 ( body.report_page_id(),"",body.rvrow )
 
-        body.file_stdout1 = open ( body.file_stdout1_path(),'a' )
+    return edmeta
 
-        os.remove ( fo_map )   #  save space
-        os.remove ( df_map )   #  save space
 
-    return edmeta
+def run_ramaplot ( body,structure,rama_outf ):
+
+    pyrama_path = os.path.join ( sys.argv[0][0:sys.argv[0].rfind("pycofe")+6],
+                                 "etc","pyrama.py" )
+
+    return _run_program ( "pyrama",_python_app(),[
+                            pyrama_path,
+                            structure.getPDBFilePath(body.outputDir()),
+                            "Ramachandran Plot",
+                            os.path.join(body.reportDir(),rama_outf)
+                          ] )
 
 
-def put_ramaplot_section ( body,structure ):
+def put_ramaplot_section ( body,structure,rama_outf,run ):
 
     sec_id  = body.getWidgetId ( "ramasec"  )
     grid_id = body.getWidgetId ( "ramagrid" )
     body.putSection ( sec_id,"Ramachandran Plot",openState_bool=False )
     body.putGrid1   ( grid_id,sec_id,False,0 )
 
-    rama_outf   = body.getWidgetId ( "rama_data" )
-    pyrama_path = os.path.join ( sys.argv[0][0:sys.argv[0].rfind("pycofe")+6],
-                                 "etc","pyrama.py" )
+    _replay_log ( body,run,body.file_stdout )
+    if run["rc"].msg:
+        raise signal.JobFailure ( run["rc"].msg )
 
     rama_outpath = os.path.join(body.reportDir(),rama_outf)
-    cmd = [
-        pyrama_path,
-        structure.getPDBFilePath(body.outputDir()),
-        "Ramachandran Plot",
-        rama_outpath
-    ]
-
-    if sys.platform.startswith("win"):
-        body.runApp ( "ccp4-python.bat",cmd,logType="Main" )
-    else:
-        body.runApp ( "ccp4-python",cmd,logType="Main" )
 
     body.putMessage1 ( grid_id,"<img src=\"" + rama_outf +\
                 ".png\" height=\"480pt\" style=\"vertical-align: middle;\"/>",
@@ -224,26 +303,39 @@ def put_ramaplot_section ( body,structure ):
 
     return
 
-def put_iris_section ( body,revision,xyzin ):
 
-    hkl       = body.makeClass ( revision.HKL )
-    structure = revision.Structure
+def prepare_iris ( body,revision ):
+    # reflection data for Iris; this is done in main thread before the
+    # analyses start because sliceMTZ() may need to run cad through
+    # TaskDriver's input script machinery
+    hkl     = body.makeClass ( revision.HKL )
+    tmp_mtz = "_tmp.mtz"
+    try:
+        cols = hkl.getMeanColumns()
+        FreeRColumn = hkl.getFreeRColumn()
+        body.sliceMTZ ( hkl.getHKLFilePath(body.inputDir()),
+                        [cols[0],cols[1],FreeRColumn],
+                        tmp_mtz,["F","SIGF",FreeRColumn] )
+    except:
+        return None
+    return tmp_mtz
 
-    sec_id    = body.getWidgetId ( "irissec"  )
-    body.putSection ( sec_id,"Iris Validation",openState_bool=False )
 
-    xyzout    = structure.getXYZFilePath ( body.outputDir() )
-    hklin     = hkl.getHKLFilePath ( body.inputDir() )
+def run_iris ( body,revision,xyzin,tmp_mtz ):
 
+    structure    = revision.Structure
+    xyzout       = structure.getXYZFilePath ( body.outputDir() )
     tmpin_mmcif  = "_tmpin.mmcif"
     tmpout_mmcif = "_tmpout.mmcif"
-    tmp_mtz      = "_tmp.mtz"
+
+    if not tmp_mtz:
+        return False
 
     try:
 
         model_paths = (tmpout_mmcif,tmpout_mmcif)
         if xyzin:
-            st = gemmi.read_structure ( xyzin )
+            st = xyzcache.read_structure ( xyzin )
             st.setup_entities()
             st.add_entity_types()
             st.remove_ligands_and_waters()
@@ -251,18 +343,13 @@ def put_iris_section ( body,revision,xyzin ):
             st.make_mmcif_document().write_file ( tmpin_mmcif )
             model_paths = (tmpin_mmcif,tmpout_mmcif)
 
-        st = gemmi.read_structure ( xyzout )
+        st = xyzcache.read_structure ( xyzout )
         st.setup_entities()
         st.add_entity_types()
         st.remove_ligands_and_waters()
         st.remove_empty_chains()
         st.make_mmcif_document().write_file ( tmpout_mmcif )
 
-        cols = hkl.getMeanColumns()
-        FreeRColumn = hkl.getFreeRColumn()
-        body.sliceMTZ ( hklin,[cols[0],cols[1],FreeRColumn],
-                        tmp_mtz,["F","SIGF",FreeRColumn] )
-
         model_series = metrics_model_series_from_files (
             model_paths       = model_paths, 
             reflections_paths = (tmp_mtz,tmp_mtz),
@@ -284,13 +371,23 @@ def put_iris_section ( body,revision,xyzin ):
             f.write ( html_str )
             f.write ( '\n')
 
+    except:
+        return False
+
+    return True
+
+
+def put_iris_section ( body,run ):
+
+    sec_id    = body.getWidgetId ( "irissec"  )
+    body.putSection ( sec_id,"Iris Validation",openState_bool=False )
+
+    if run:
         body.putMessage1 ( sec_id,"<iframe src=\"iris_report.html\" " +\
             "style=\"border:none;width:900px;height:600px;\"></iframe>",
             0 )
-        
         body.addCitation ( 'iris' )
-
-    except:
+    else:
         body.putMessage1 ( sec_id,"<h3>There were errors</h3>" +\
                            "<i>Iris failed, check messages in Errors tab.</i>" +\
                            "<p>&nbsp;",
@@ -299,7 +396,115 @@ def put_iris_section ( body,revision,xyzin ):
     return
 
 
-def put_molprobity_section ( body,revision ):
+class clashscore_extractor(metrics_parser.extractor):
+    # collects table of bad clashes from clashscore output:
+    #   values["clashes"] = [[atom id 1,atom id 2,distance],...] or None if
+    #                       there was no table
+    def __init__ ( self ):
+        super(clashscore_extractor,self).__init__()
+        self.values["clashes"] = None
+        self.state = 0   # 0: before table; 1: in table; 2: done
+        return
+
+    def feed ( self,line ):
+        if self.state==2:
+            return
+        if "Bad Clashes" in line:
+            if self.values["clashes"] is None:
+                self.values["clashes"] = []
+            self.state = 1
+        elif "clashscore = " in line:
+            self.state = 2
+        elif self.state==1:
+            lsplit = line.split(":")
+            if len(lsplit)>1:
+                self.values["clashes"].append ([
+                    lsplit[0][:18],lsplit[0][18:],lsplit[1] ])
+        return
+
+
+class molprobity_extractor(metrics_parser.extractor):
+    # collects model properties and summary scores from molprobity output
+    def __init__ ( self ):
+        super(molprobity_extractor,self).__init__()
+        self.key = 0
+        return
+
+    def feed ( self,line ):
+        if   "============ Geometry restraints =============" in line:
+            self.key = 0
+        elif "============ Model properties ================" in line:
+            self.key = 1
+            # =============================== Model properties ==============================
+            #
+            #    Number of:
+            #      all atoms      : 877
+            #      H or D atoms   : 0
+            #      chains         : 3
+            #      a.a. residues  : 95
+            #      nucleotides    : 0
+            #      water          : 78
+            #      other (ligands): 1
+            #    Ligands: NUT:1
+        elif "================ Summary =====================" in line:
+            self.key = 2
+        elif self.key==1:  # Model properties
+            try:
+                kval = [val.strip() for val in line.split(':')]
+                if len(kval)>=2:
+                    if kval[0]=="a.a. residues":
+                        self.values["nres_AA"] = int(kval[1])
+                    elif kval[0]=="nucleotides":
+                        self.values["nres_NA"] = int(kval[1])
+                    elif kval[0]=="other (ligands)":
+                        self.values["nligands"] = int(kval[1])
+                    elif kval[0]=="Ligands":
+                        self.values["ligands"] = ":".join(kval[1])  # list of ligands
+            except:
+                pass
+        elif self.key==2:  # Summary
+            lst = line.split()
+            if len(lst)>2:
+                try:
+                    if lst[0]=="Ramachandran":
+                        self.values["rama_outliers"] = float(lst[-2])
+                    elif lst[0]=="favored":
+                        self.values["rama_favored"] = float(lst[-2])
+                    elif lst[0]=="Rotamer":
+                        self.values["rota_outliers"] = float(lst[-2])
+                    elif lst[0]=="C-beta":
+                        self.values["cbeta_deviations"] = float(lst[-1])
+                    elif lst[0]=="Clashscore":
+                        self.values["clashscore"] = float(lst[2])
+                    elif lst[0]=="RMS(bonds)":
+                        self.values["rms_bonds"] = float(lst[-1])
+                    elif lst[0]=="RMS(angles)":
+                        self.values["rms_angles"] = float(lst[-1])
+                    elif lst[0]=="MolProbity":
+                        self.values["molp_score"] = float(lst[3])
+                except:
+                    pass
+        return
+
+
+def run_clashscore ( xyzpath ):
+    if sys.platform.startswith("win"):
+        return _run_program ( "clashscore","molprobity.clashscore.bat",[xyzpath],
+                              metrics=clashscore_extractor() )
+    return _run_program ( "clashscore","molprobity.clashscore",[xyzpath],
+                          metrics=clashscore_extractor() )
+
+
+def run_molprobity ( xyzpath ):
+    cmd_molp = [xyzpath,"percentile=True","allow_polymer_cross_special_position=True"]
+    if sys.platform.startswith("win"):
+        return _run_program ( "molprobity","molprobity.molprobity.bat",cmd_molp,
+                              metrics=molprobity_extractor() )
+    return _run_program ( "molprobity","molprobity.molprobity",cmd_molp,
+                          metrics=molprobity_extractor() )
+
+
+def put_molprobity_section ( body,revision,run_clash,run_molp,meta_s ):
 
     sec_id   = body.getWidgetId ( "molsec"  )
     grid_id  = body.getWidgetId ( "molgrid" )
@@ -308,15 +513,10 @@ def put_molprobity_section ( body,revision ):
     body.putSection ( sec_id,"Molprobity Analysis",openState_bool=False )
     body.putGrid1   ( grid_id,sec_id,False,0 )
 
-    xyzpath = revision.Structure.getPDBFilePath ( body.outputDir() )
-
     body.flush()
 
-    fstdout  = body.file_stdout
-    fstdout1 = body.file_stdout1
-
-    molprobity_log = "_molprobity.log"
-    clashscore_log = "_clashscore.log"
+    molprobity_log = run_molp["log"]
+    clashscore_log = run_clash["log"]
 
     # body.stdoutln ( "\n >>>>> xyz file for mol[rpbity: " + str(xyzpath) + "\n" )
 
@@ -332,18 +532,7 @@ def put_molprobity_section ( body,revision ):
         "molp_score"       : 0.0
     }
 
-    cmd_molp = [xyzpath,"percentile=True","allow_polymer_cross_special_position=True"]
-
-    body.file_stdout  = open ( molprobity_log,"w" )
-    body.file_stdout1 = open ( clashscore_log,"w" )
-    try:
-        if sys.platform.startswith("win"):
-            body.runApp ( "molprobity.clashscore.bat",[xyzpath],logType="Service" )
-            body.runApp ( "molprobity.molprobity.bat",cmd_molp ,logType="Main"    )
-        else:
-            body.runApp ( "molprobity.clashscore",[xyzpath],logType="Service" )
-            body.runApp ( "molprobity.molprobity",cmd_molp ,logType="Main"    )
-    except:
+    if run_clash["rc"].msg or run_molp["rc"].msg:
         meta["meta_complete"] = False
         body.putMessage1 ( grid_id,"<h3>There were errors</h3>" +\
                            "<i>Molprobity failed, check messages in Errors tab.</i>" +\
@@ -351,15 +540,13 @@ def put_molprobity_section ( body,revision ):
                            grid_row,col=0 )
         grid_row += 1
 
-    body.file_stdout .close()
-    body.file_stdout1.close()
-
-    body.file_stdout  = fstdout
-    body.file_stdout1 = fstdout1
-
-    key  = 0
+    for r in (run_clash,run_molp):
+        citations.addCitation ( r["app"] )
+        if os.path.isfile(r["err"]):
+            with open(r["err"],"r") as f:
+                body.file_stderr.write ( f.read() )
+            os.remove ( r["err"] )
 
-    meta_s = analyse_structure.analyze_structure ( xyzpath )
     meta["natoms_overall"] = meta_s["overall_atoms"]
     meta["natoms_macro"]   = meta_s["macromolecular_atoms"]
     meta["natoms_HD"]      = meta_s["hydrogen_atoms"]
@@ -373,8 +560,8 @@ def put_molprobity_section ( body,revision ):
     meta["bfac_water"]     = meta_s["avg_water_b"]
 
 
-    tableId = None
-    nclash  = 0
+    # values were collected from logs while programs were running, so that
+    # logs are only copied here
 
     if not os.path.isfile(clashscore_log):
         meta["meta_complete"] = False
@@ -383,28 +570,21 @@ def put_molprobity_section ( body,revision ):
         grid_row += 1
     else:
         with (open(clashscore_log,"r")) as fstd:
-            for line in fstd:
-                body.file_stdout1.write ( line )
-                if "Bad Clashes" in line:
-                    tableId = body.getWidgetId ( "clashes" )
-                    body.putTable ( tableId,"Bad Clashes",grid_id,grid_row,col=0,mode=0 )
-                    grid_row += 1
-                    body.setTableHorzHeaders ( tableId,["Atom #1","Atom #2","Distance"],
-                                            ["Atom ID of 1st clashing atom",
-                                                "Atom ID of 1st clashing atom",
-                                                "Interatomic distance in &Aring;"] )
-                elif "clashscore = " in line:
-                    tableId = None
-                    break
-                elif tableId:
-                    body.setTableVertHeader ( tableId,nclash,str(nclash+1),"" )
-                    lsplit = line.split(":")
-                    aid1   = lsplit[0][:18]
-                    aid2   = lsplit[0][18:]
-                    body.putTableString ( tableId,aid1,"",nclash,0 )
-                    body.putTableString ( tableId,aid2,"",nclash,1 )
-                    body.putTableString ( tableId,lsplit[1],"",nclash,2 )
-                    nclash += 1
+            shutil.copyfileobj ( fstd,body.file_stdout1 )
+        clashes = run_clash["metrics"].get ( "clashes" )
+        if clashes is not None:
+            tableId = body.getWidgetId ( "clashes" )
+            body.putTable ( tableId,"Bad Clashes",grid_id,grid_row,col=0,mode=0 )
+            grid_row += 1
+            body.setTableHorzHeaders ( tableId,["Atom #1","Atom #2","Distance"],
+                                    ["Atom ID of 1st clashing atom",
+                                        "Atom ID of 1st clashing atom",
+                                        "Interatomic distance in &Aring;"] )
+            for nclash in range(len(clashes)):
+                body.setTableVertHeader ( tableId,nclash,str(nclash+1),"" )
+                body.putTableString ( tableId,clashes[nclash][0],"",nclash,0 )
+                body.putTableString ( tableId,clashes[nclash][1],"",nclash,1 )
+                body.putTableString ( tableId,clashes[nclash][2],"",nclash,2 )
 
 
     if not os.path.isfile(molprobity_log):
@@ -414,71 +594,12 @@ def put_molprobity_section ( body,revision ):
         grid_row += 1
     else:
         with (open(molprobity_log,"r")) as fstd:
-            for line in fstd:
-                body.file_stdout.write ( line )
-                if   "============ Geometry restraints =============" in line:
-                    key = 0
-                elif "============ Model properties ================" in line:
-                    key = 1
-                    # =============================== Model properties ==============================
-                    #
-                    #    Number of:
-                    #      all atoms      : 877
-                    #      H or D atoms   : 0
-                    #      chains         : 3
-                    #      a.a. residues  : 95
-                    #      nucleotides    : 0
-                    #      water          : 78
-                    #      other (ligands): 1
-                    #    Ligands: NUT:1
-                elif "================ Summary =====================" in line:
-                    key = 2
-                elif key==1:  # Model properties
-                    try:
-                        kval = [val.strip() for val in line.split(':')]
-                        if len(kval)>=2:
-                            # if kval[0]=="all atoms":
-                            #     meta["natoms_overall"] = int(kval[1])
-                            # elif kval[0]=="H or D atoms":
-                            #     meta["natoms_HD"] = int(kval[1])
-                            # if kval[0]=="chains":
-                                # meta["nchains"] = int(kval[1])
-                            if kval[0]=="a.a. residues":
-                                meta["nres_AA"] = int(kval[1])
-                            elif kval[0]=="nucleotides":
-                                meta["nres_NA"] = int(kval[1])
-                            # elif kval[0]=="water":
-                            #     meta["natoms_water"] = int(kval[1])
-                            elif kval[0]=="other (ligands)":
-                                meta["nligands"] = int(kval[1])
-                            elif kval[0]=="Ligands":
-                                meta["ligands"] = ":".join(kval[1])  # list of ligands
-
-                    except:
-                        pass
-
-                elif key==2:  # Summary
-                    lst = line.split()
-                    if len(lst)>2:
-                        if lst[0]=="Ramachandran":
-                            meta["rama_outliers"] = float(lst[-2])
-                        elif lst[0]=="favored":
-                            meta["rama_favored"] = float(lst[-2])
-                        elif lst[0]=="Rotamer":
-                            meta["rota_outliers"] = float(lst[-2])
-                        elif lst[0]=="C-beta":
-                            meta["cbeta_deviations"] = float(lst[-1])
-                        elif lst[0]=="Clashscore":
-                            meta["clashscore"] = float(lst[2])
-                        elif lst[0]=="RMS(bonds)":
-                            meta["rms_bonds"] = float(lst[-1])
-                        elif lst[0]=="RMS(angles)":
-                            meta["rms_angles"] = float(lst[-1])
-                        elif lst[0]=="MolProbity":
-                            meta["molp_score"] = float(lst[3])
-                            if not "refmac" in body.generic_parser_summary:
-                                body.generic_parser_summary["refmac"] = {}
-                            body.generic_parser_summary["refmac"]["molp_score"] = meta["molp_score"]
+            shutil.copyfileobj ( fstd,body.file_stdout )
+        meta.update ( run_molp["metrics"].values )
+        if "molp_score" in run_molp["metrics"].values:
+            if not "refmac" in body.generic_parser_summary:
+                body.generic_parser_summary["refmac"] = {}
+            body.generic_parser_summary["refmac"]["molp_score"] = meta["molp_score"]
 
     molprob_out = "molprobity.out"
     if not os.path.isfile(molprob_out):
@@ -795,29 +916,97 @@ def quality_report ( body,revision,xyzin,title="Quality Assessment",refmacXML=No
         if title:
             body.putTitle ( title )
 
-        put_bfactors_section ( body,revision.Structure )
+        structure = revision.Structure
+        hkl       = body.makeClass ( revision.HKL )
+        xyzpath   = structure.getPDBFilePath ( body.outputDir() )
+        rama_outf = body.getWidgetId ( "rama_data" )
+        nworkers  = _max_workers ( body )
+
+        body.flush()
+        tmp_mtz = prepare_iris ( body,revision )
+
+        # run all analyses; longest ones are submitted first
+        ncitations = len(citations.citation_list)
+        t_compute  = {}
+        t0 = time.time()
+        with concurrent.futures.ThreadPoolExecutor(max_workers=nworkers,
+                    initializer=command.setThreadShare,
+                    initargs=(command.shareCores(nworkers),)) as pool:
+            jobs = {
+                "molprobity" : pool.submit ( _timed,t_compute,"molprobity",
+                                             run_molprobity,xyzpath ),
+                "clashscore" : pool.submit ( _timed,t_compute,"clashscore",
+                                             run_clashscore,xyzpath ),
+                "edstats"    : pool.submit ( _timed,t_compute,"edstats",
+                                             run_edstats,body,revision,hkl ),
+                "iris"       : pool.submit ( _timed,t_compute,"iris",
+                                             run_iris,body,revision,xyzin,tmp_mtz ),
+                "rama"       : pool.submit ( _timed,t_compute,"rama",
+                                             run_ramaplot,body,structure,rama_outf ),
+                "analysis"   : pool.submit ( _timed,t_compute,"analysis",
+                                             analyse_structure.analyze_structure,
+                                             xyzpath ),
+                "bfactors"   : pool.submit ( _timed,t_compute,"bfactors",
+                                             run_bfactors,body,structure )
+            }
+        t_wall = time.time() - t0
+        # citations are re-added in report order when sections are written
+        del citations.citation_list[ncitations:]
+
+        # write report sections in fixed order
+        t_render = {}
+        _timed ( t_render,"bfactors",put_bfactors_section,body,structure,
+                 jobs["bfactors"].result() )
         try:
-            edmeta = put_edstats_section ( body,revision )
+            edmeta = _timed ( t_render,"edstats",put_edstats_section,body,revision,
+                              jobs["edstats"].result() )
         except:
             edmeta = None
-        meta   = put_molprobity_section ( body,revision )
-        put_ramaplot_section ( body,revision.Structure )
-        put_iris_section     ( body,revision,xyzin  )
+        meta = _timed ( t_render,"molprobity",put_molprobity_section,body,revision,
+                        jobs["clashscore"].result(),jobs["molprobity"].result(),
+                        jobs["analysis"].result() )
+        _timed ( t_render,"rama",put_ramaplot_section,body,structure,rama_outf,
+                 jobs["rama"].result() )
+        _timed ( t_render,"iris",put_iris_section,body,jobs["iris"].result() )
 
         # body.stderrln ( " XXXXX " + str(meta) )
 
         if refmacXML:
             if os.path.exists(refmacXML):
                 refmacResults = RefmacXMLLog(refmacXML)
-        put_Tab1_section ( body, revision, meta, refmacResults )
+        _timed ( t_render,"table1",put_Tab1_section,body,revision,meta,refmacResults )
 
         if edmeta and meta:
             for key in edmeta:
                 meta[key] = edmeta[key]
 
+        write_timings ( body,t_compute,t_render,t_wall,nworkers )
+
     return meta
 
 
+def write_timings ( body,t_compute,t_render,t_wall,nworkers ):
+    body.file_stdout.write (
+        "\n" + "-"*80 +\
+        "\n ..... Quality report timings (sec):\n\n" +\
+        "       section        compute    report\n" )
+    for name in ["bfactors","edstats","clashscore","molprobity","analysis",
+                 "rama","iris","table1"]:
+        line = "       " + name.ljust(12)
+        for t in (t_compute,t_render):
+            if name in t:
+                line += "{0:10.2f}".format(t[name])
+            else:
+                line += " "*10
+        body.file_stdout.write ( line + "\n" )
+    body.file_stdout.write (
+        "\n       analyses took {0:.2f} sec on {1} worker(s), {2:.2f} sec if run "\
+        "serially\n".format(t_wall,nworkers,sum(t_compute.values())) +\
+        "-"*80 + "\n" )
+    body.file_stdout.flush()
+    return
+
+
 # REFMAC XML log parser
 class RefmacXMLLog:
   
@@ -3,7 +3,7 @@
 #
 # ============================================================================
 #
-#    16.04.21   <--  Date of Last Modification.
+#    18.10.26   <--  Date of Last Modification.
 #                   ~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 # ----------------------------------------------------------------------------
 #
@@ -13,7 +13,7 @@
 #
 #  ccp4-python -m pycofe.proc.usagestats projectDataPath userDataPath statsFile.json reportDir
 #
-#  Copyright (C) Eugene Krissinel, Andrey Lebedev 2019-2021
+#  Copyright (C) Eugene Krissinel, Andrey Lebedev 2019-2026
 #
 # ============================================================================
 #
@@ -24,6 +24,8 @@ import json
 
 import pyrvapi
 
+from   pycofe.varut  import rvapi_utils
+
 # ============================================================================
 
 def reportPage():  return "body"
@@ -53,19 +55,17 @@ def putGraphWidget ( graphId,legend,xData,yData,xTitle,yTitle,
     pyrvapi.rvapi_add_graph_plot    ( "plot",graphId,"---",xTitle,yTitle )
 
     nx = len(xData)
-    for j in range(nx):
-        pyrvapi.rvapi_add_graph_real ( "X","data",graphId,float(xData[j]),"%g" )
+    rvapi_utils.addGraphReals ( "X","data",graphId,xData )
 
     ny   = len(yData)
     ymax = 0.0
     for i in range(ny):
         yId = "Y"+str(i)
-        pyrvapi.rvapi_add_graph_dataset ( yId,"data",graphId,
-                                          lineNames[i],"Ycol"+str(i) )
-        for j in range(nx):
-            y = float(yData[i][j])
-            pyrvapi.rvapi_add_graph_real ( yId,"data",graphId,y,"%g" )
-            ymax = max ( ymax,y );
+        y   = [float(v) for v in yData[i][:nx]]
+        rvapi_utils.addGraphDataset ( yId,"data",graphId,
+                                      lineNames[i],"Ycol"+str(i),y )
+        if y:
+            ymax = max ( ymax,max(y) )
         pyrvapi.rvapi_add_plot_line ( "plot","data",graphId,"X",yId )
         colour = color[i % len(color)]
         if styles[i]=="thin":
@@ -1,11 +1,12 @@
 #!/usr/bin/python2
 
 import os
-import time
 
 from onedep import __apiUrl__
 from onedep.api.Validate import Validate
 
+from pycofe.varut import poller
+
 def checkStatus ( sD,logfile ):
     rc = ""
     if 'onedep_error_flag' in sD and sD['onedep_error_flag']:
@@ -51,24 +52,25 @@ def getValidationReport ( modelFilePath,sfFilePath,repFilePath,logfile,endfile )
                     rc = checkStatus ( rD,logfile )
                     if not rc:
                         #
-                        #   Poll for service completion -
+                        #   Poll for service completion, first after 2
+                        #   seconds and then at increasing intervals up to
+                        #   1 minute -
                         #
-                        it = 0
-                        sl = 2
-                        while (True):
-                            #    Pause -
-                            it += 1
-                            pause = it * it * sl
-                            time.sleep(pause)
+                        def check():
                             rD = val.getStatus()
-                            if rD['status'] in ['completed', 'failed']:
-                                break
-                            logfile.write ( "[%4d] Pausing for %4d (seconds)\n" % (it, pause) )
-                            logfile.flush()
-                            if endfile and os.path.isfile(endfile):
-                                msg = "terminated by user"
-                                rc  = "22222"
-                                break
+                            done = rD['status'] in ['completed', 'failed']
+                            if not done:
+                                logfile.write ( "[%4d] status: %s\n" % (pl.nchecks+1,rD['status']) )
+                                logfile.flush()
+                            return (done,rD,None)
+                        pl = poller.Poller ( first=2.0,maxwait=60.0 )
+                        done,rD = pl.poll ( check,
+                                    stop=lambda: bool(endfile) and os.path.isfile(endfile) )
+                        logfile.write ( " validation " + pl.report() + "\n" )
+                        logfile.flush()
+                        if not done:
+                            msg = "terminated by user"
+                            rc  = "22222"
 
                         #lt = time.strftime("%Y%m%d%H%M%S", time.localtime())
                         #fnR = "xray-report-%s.pdf" % lt
@@ -3,13 +3,13 @@
 #
 # ============================================================================
 #
-#    31.03.25   <--  Date of Last Modification.
+#    18.10.26   <--  Date of Last Modification.
 #                   ~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 # ----------------------------------------------------------------------------
 #
 #  XYZ HANDLING UTILS
 #
-#  Copyright (C) Eugene Krissinel, Andrey Lebedev 2017-2025
+#  Copyright (C) Eugene Krissinel, Andrey Lebedev 2017-2026
 #
 # ============================================================================
 #
@@ -19,6 +19,8 @@
 #  ccp4-python imports
 import os
 import gemmi
+
+from pycofe.varut import xyzcache
 #import pyrvapi
 
 #  application imports
@@ -96,7 +98,7 @@ def getXYZMeta ( fpath,file_stdout,file_stderr,log_parser=None ):
     """
 
     if isinstance(fpath,str):
-        st = gemmi.read_structure ( fpath )
+        st = xyzcache.read_structure ( fpath )
     else:
         st = fpath
 
@@ -167,7 +169,7 @@ def check_topology ( fpath ):
     mon_dir  = os.environ["CCP4"] + "/lib/data/monomers"
 
     if isinstance(fpath,str):
-        st = gemmi.read_structure ( fpath )
+        st = xyzcache.read_structure ( fpath )
     else:
         st = fpath
 
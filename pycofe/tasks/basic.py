@@ -3,7 +3,7 @@
 #
 # ============================================================================
 #
-#    14.02.25   <--  Date of Last Modification.
+#    18.10.26   <--  Date of Last Modification.
 #                   ~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 # ----------------------------------------------------------------------------
 #
@@ -11,7 +11,7 @@
 #
 #  Command-line:  N/A
 #
-#  Copyright (C) Eugene Krissinel, Andrey Lebedev, Maria Fando 2017-2025
+#  Copyright (C) Eugene Krissinel, Andrey Lebedev, Maria Fando 2017-2026
 #
 # ============================================================================
 #
@@ -41,6 +41,7 @@
 #  python native imports
 import os
 import sys
+import time
 import shutil
 import traceback
 try:
@@ -53,14 +54,16 @@ import datetime
 import pyrvapi
 import pyrvapi_ext.parsers
 from pycofe.parsers import refmac_parser, edstats_parser, baver_parser
-from pycofe.parsers import modelcraft_parser
+from pycofe.parsers import modelcraft_parser, metrics_parser
 
 # pycofe imports
 from pycofe.dtypes import dtype_template, dtype_xyz,   dtype_structure, databox
 from pycofe.dtypes import dtype_ensemble, dtype_ligand
 from pycofe.dtypes import dtype_sequence, dtype_model, dtype_library
 from pycofe.proc   import edmap,  import_filetype, import_merged, mergeone
+from pycofe.proc   import mtzcad, import_pipeline
 from pycofe.varut  import signal, jsonut, command, zutils, mmcif_utils
+from pycofe.varut  import xyzcache, rvapi_utils
 from pycofe.etc    import citations
 
 
@@ -76,6 +79,7 @@ class TaskDriver(object):
     _rvrow_bak        = 0  # saved report row
     _report_widget_id = "report_page"
     _scriptNo         = 0  # input script counter
+    _app_pool         = None # programs started with startApp()
 
     def appName(self):  return "CCP4 Cloud"
 
@@ -143,6 +147,10 @@ class TaskDriver(object):
     # flag to stop workflow in case of errors
     stop_workflow = True  
 
+    # use in-process gemmi code instead of cad in sliceMTZ(), makeMTZ() and
+    # makePhasesMTZ(); cad is still used if in-process code cannot do the job
+    native_cad    = True
+
     # report parsers
     log_parser    = None
     generic_parser_summary = {}
@@ -247,6 +255,14 @@ class TaskDriver(object):
         #if "CCP4_SCR" in os.environ:
         #    os.environ["TMPDIR"] = os.environ["CCP4_SCR"]
 
+        # core budget, which is also concurrency limit for programs started
+        # with startApp(): "ncores" parameter, or cores given to the job by
+        # queue, or up to 4 cores when job runs locally
+        ncores = command.allocatedCores ( self.jobManager,
+                                          self.getCommandLineParameter("ncores") )
+        command.setMaxProcesses ( ncores )
+        command.setCoreBudget   ( ncores )
+
         # always make job directory current
         os.chdir ( self.job_dir )
 
@@ -428,7 +444,7 @@ class TaskDriver(object):
         for f in flist:
             if " " in f:
                 f1 = f.replace ( " ","_" )
-                os.rename ( os.path.join(dirPath,f),os.path.join(dirPath,f1) )
+                zutils.rename ( os.path.join(dirPath,f),os.path.join(dirPath,f1) )
                 flist_out.append ( f1 )
             else:
                 flist_out.append ( f )
@@ -782,9 +798,26 @@ class TaskDriver(object):
         #else:
         #    fpath = fname
 
-        fpath = filePath
-        if fpath.lower().endswith(".gz"):   # ungzip files as necessary
-            fpath = zutils.gunzip ( filePath,baseDirPath=baseDirPath )
+        if filePath.lower().endswith(".gz"):   # ungzip files as necessary
+            filePath,ftype = import_pipeline.prepareFile ( filePath,
+                                    self.importDir(),baseDirPath=baseDirPath,
+                                    ftype=ftype,file_stdout=self.file_stdout )
+
+        self._registerFileImport ( filePath,ftype,baseDirPath )
+        return
+
+    def addFileImports ( self,filePaths,baseDirPath="" ):
+        # same as addFileImport() for list of files: decompression and type
+        # detection run concurrently (up to command.max_processes files at a
+        # time), files are registered in order of filePaths
+        for fpath,ftype in import_pipeline.prepareFiles ( filePaths,
+                                    self.importDir(),baseDirPath=baseDirPath,
+                                    nworkers=command.max_processes,
+                                    file_stdout=self.file_stdout ):
+            self._registerFileImport ( fpath,ftype,baseDirPath )
+        return
+
+    def _registerFileImport ( self,fpath,ftype,baseDirPath ):
 
         if fpath.lower().endswith(".sca"):  # convert to mtz
             scalepack = None;
@@ -1087,14 +1120,12 @@ class TaskDriver(object):
         pyrvapi.rvapi_add_graph_dataset ( "X","data",graphId,"Xcol","Xcol" )
         pyrvapi.rvapi_add_graph_plot    ( "plot",graphId,"---",xTitle,yTitle )
 
-        for j in range(len(xData)):
-            pyrvapi.rvapi_add_graph_real ( "X","data",graphId,xData[j],"%g" )
+        # xData and yData[i] may be lists or numpy arrays
+        rvapi_utils.addGraphReals ( "X","data",graphId,xData )
         for i in range(len(yData)):
             yId = "Y"+str(i)
-            pyrvapi.rvapi_add_graph_dataset ( yId,"data",graphId,
-                                              "Ycol"+str(i),"Ycol"+str(i) )
-            for j in range(len(yData[i])):
-                pyrvapi.rvapi_add_graph_real ( yId,"data",graphId,float(yData[i][j]),"%g" )
+            rvapi_utils.addGraphDataset ( yId,"data",graphId,
+                                          "Ycol"+str(i),"Ycol"+str(i),yData[i] )
             pyrvapi.rvapi_add_plot_line ( "plot","data",graphId,"X",yId )
 
         #pyrvapi.rvapi_set_line_options ( "dist","plot","data",self.dist_graph_id(),
@@ -1113,6 +1144,7 @@ class TaskDriver(object):
     #             y   : [{name:"Y1 name", values:[y11,y12,...]},
     #                    {name:"Y2 name", values:[y21,y22,...],
     #                    ...]
+    #             (values may be given as lists or numpy arrays)
     #           },
     #           ....
     #        ]
@@ -1136,16 +1168,12 @@ class TaskDriver(object):
                 x   = plot["x"]
                 y   = plot["y"]
                 xId = "x_" + str(i) + "_" + str(j)
-                pyrvapi.rvapi_add_graph_dataset ( xId,dataId,graphId,x["name"],x["name"] )
-                values = x["values"]
-                for k in range(len(values)):
-                    pyrvapi.rvapi_add_graph_real ( xId,dataId,graphId,values[k],"%g" )
+                rvapi_utils.addGraphDataset ( xId,dataId,graphId,x["name"],
+                                              x["name"],x["values"] )
                 for n in range(len(y)):
                     yId = "y_" + str(i) + "_" + str(j) + "_" + str(n)
-                    pyrvapi.rvapi_add_graph_dataset ( yId,dataId,graphId,y[n]["name"],y[n]["name"] )
-                    values = y[n]["values"]
-                    for k in range(len(values)):
-                        pyrvapi.rvapi_add_graph_real ( yId,dataId,graphId,values[k],"%g" )
+                    rvapi_utils.addGraphDataset ( yId,dataId,graphId,y[n]["name"],
+                                                  y[n]["name"],y[n]["values"] )
                     pyrvapi.rvapi_add_plot_line ( plotId,dataId,graphId,xId,yId )
                     #pyrvapi.rvapi_set_line_options ( yset,"plot","data",self.hits_graph_id(),
                     #                                         color,"solid","off",2.5,True )
@@ -1222,7 +1250,18 @@ class TaskDriver(object):
             return False
 
 
-    def runApp ( self,appName,cmd,logType="Main",quitOnError=True,env=None,work_dir="." ):
+    def getCoreBudget ( self ):
+        # number of cores given to the job
+        return command.getCoreBudget()
+
+    def splitCores ( self,nparts ):
+        # splits core budget between nparts concurrent programs; returns list
+        # of numbers of threads to be given to runApp() or startApp() as ncores
+        return command.splitCores ( nparts )
+
+
+    def runApp ( self,appName,cmd,logType="Main",quitOnError=True,env=None,work_dir=".",
+                 metrics=None,ncores=None ):
         # appName  -- name of application to run 
         # cmd      -- list of command-line parameters
         # logType  -- which log to use for standard output ( Main|Service|Error ) not really
@@ -1231,6 +1270,11 @@ class TaskDriver(object):
         # env      -- a modified copy of os.environ, if necessary 
         # work_dir -- working directory; using current directory "." is always
         #             the best idea
+        # metrics  -- metrics extractor(s) from pycofe.parsers.metrics_parser,
+        #             which collect values from program's output as it is
+        #             written; stacked on the current log parser, if any
+        # ncores   -- number of threads for the program; by default, the whole
+        #             core budget of the job (see command.applyThreads())
 
         input_script = None
         if self.file_stdin:
@@ -1243,10 +1287,14 @@ class TaskDriver(object):
             logfile     = self.file_stdout1
             logfile_alt = self.file_stdout
 
+        log_parser = self.log_parser
+        if metrics:
+            log_parser = metrics_parser.metrics_parser ( metrics,log_parser )
+
         rc = command.call ( appName,cmd,"./",input_script,
-                            logfile,self.file_stderr,self.log_parser,
+                            logfile,self.file_stderr,log_parser,
                             file_stdout_alt=logfile_alt,env=env,
-                            work_dir=work_dir )
+                            work_dir=work_dir,nthreads=ncores )
         self.file_stdin = None
         self.flush()
 
@@ -1256,6 +1304,57 @@ class TaskDriver(object):
         return rc
 
 
+    def startApp ( self,appName,cmd,logType="Main",env=None,work_dir=".",
+                   metrics=None,ncores=None ):
+        # Non-blocking version of runApp() for independent programs: returns
+        # handle of started (or queued) program; use waitApps() to wait for all
+        # started programs. Not more than command.max_processes programs run
+        # at a time. Output of each program is written to logs contiguously
+        # and in order of startApp() calls when the program finishes, and only
+        # then metrics become available. The input script (if any) must be
+        # written before calling startApp(), as for runApp(). Unless ncores
+        # is given, programs share the core budget equally.
+
+        input_script = None
+        if self.file_stdin:
+            input_script    = self.file_stdin_path()
+            self._scriptNo += 1
+
+        logfile     = self.file_stdout
+        logfile_alt = None
+        if logType=="Service":
+            logfile     = self.file_stdout1
+            logfile_alt = self.file_stdout
+
+        log_parser = self.log_parser
+        if metrics:
+            log_parser = metrics_parser.metrics_parser ( metrics,log_parser )
+
+        if not self._app_pool:
+            self._app_pool = command.app_pool()
+
+        handle = self._app_pool.start ( appName,cmd,"./",input_script,
+                                        logfile,self.file_stderr,log_parser,
+                                        file_stdout_alt=logfile_alt,env=env,
+                                        work_dir=work_dir,nthreads=ncores )
+        self.file_stdin = None
+        return handle
+
+
+    def waitApps ( self,quitOnError=True ):
+        # waits for all programs started with startApp(); returns list of
+        # their return codes (comrc) in order of startApp() calls
+        rcs = []
+        if self._app_pool:
+            rcs = self._app_pool.wait_all()
+        self.flush()
+        if quitOnError:
+            for rc in rcs:
+                if rc.msg:
+                    raise signal.JobFailure ( rc.msg )
+        return rcs
+
+
     def putCitations(self):
         if len(citations.citation_list)>0:
             self.putTitle ( "References" )
@@ -1373,8 +1472,27 @@ class TaskDriver(object):
 
     # ----------------------------------------------------------------------
 
+    def _native_cad ( self,title,func,*args ):
+        if not self.native_cad:
+            return False
+        self.file_stdout1.write ( "\n" + "="*80 + "\n## " + title +\
+                                  " (in-process CAD)\n\n" )
+        t1 = time.time()
+        done = func ( *args,file_stdout=self.file_stdout1 )
+        if done:
+            self.file_stdout1.write ( " ..... done in " +\
+                                "{:.3f}".format(time.time()-t1) + " s\n" )
+        else:
+            self.file_stdout1.write ( " ..... not applicable, running cad\n" )
+        self.file_stdout1.flush()
+        return done
+
     def makePhasesMTZ ( self,mtzHKL,lblHKL,mtzPhases,lblPhases,mtzOut ):
 
+        if self._native_cad ( "makePhasesMTZ",mtzcad.makePhasesMTZ,
+                              mtzHKL,lblHKL,mtzPhases,lblPhases,mtzOut ):
+            return
+
         cmd = [ "HKLIN1",mtzHKL,
                 "HKLIN2",mtzPhases,
                 "HKLOUT",mtzOut ]
@@ -1414,6 +1532,9 @@ class TaskDriver(object):
     #     }
     # ]
 
+        if self._native_cad ( "makeMTZ",mtzcad.makeMTZ,mtzlbl,mtzOut ):
+            return
+
         cmd = []
         self.open_stdin()
         for i in range(len(mtzlbl)):
@@ -1443,6 +1564,10 @@ class TaskDriver(object):
 
     def sliceMTZ ( self,mtzInPath,label_list,mtzOutPath,labelout_list=[] ):
 
+        if self._native_cad ( "sliceMTZ",mtzcad.sliceMTZ,mtzInPath,label_list,
+                              mtzOutPath,labelout_list ):
+            return
+
         self.open_stdin()
         self.write_stdin ( "LABIN  FILE 1" )
         for i in range(len(label_list)):
@@ -1462,6 +1587,8 @@ class TaskDriver(object):
 
     def mtz2hkl ( self,mtzInPath,labels,hklOutPath ):
         # labels = [FP,SigFP,FreeR_flag]
+        # mtz2various is kept here because SHELX output conventions (scaling
+        # and free flag translation) are not reproduced by mtzcad
 
         # use mtz2various to prepare the reflection file
         cmd = [ "HKLIN" ,mtzInPath,
@@ -2478,6 +2605,7 @@ class TaskDriver(object):
         self.stopWorkflow ( amend_report=True )
 
         self.putCitations()
+        xyzcache.writeStats ( self.file_stdout1 )
         if self.task:
             self.task.cpu_time = command.getTimes()[1]
             if self.generic_parser_summary:
@@ -2502,6 +2630,7 @@ class TaskDriver(object):
     def fail ( self,pageMessage,signalMessage ):
         self.stopWorkflow ( amend_report=True )
         self.putCitations()
+        xyzcache.writeStats ( self.file_stdout1 )
         if self.task:
             self.task.cpu_time = command.getTimes()[1]
             if self.generic_parser_summary:
@@ -2578,6 +2707,9 @@ class TaskDriver(object):
         finally:
             pass
 
+        # remove temporary decompressed copies of uploads
+        zutils.cleanup()
+
         self.end_date = datetime.datetime.today().strftime('%Y-%m-%d %H:%M:%S')
         cpu_time = ""
         if self.task and hasattr(self.task,"cpu_time"):
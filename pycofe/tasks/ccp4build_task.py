@@ -3,7 +3,7 @@
 #
 # ============================================================================
 #
-#    25.02.25   <--  Date of Last Modification.
+#    18.10.26   <--  Date of Last Modification.
 #                   ~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 # ----------------------------------------------------------------------------
 #
@@ -19,7 +19,7 @@
 #                       all successful imports
 #      jobDir/report  : directory receiving HTML report
 #
-#  Copyright (C) Eugene Krissinel, Andrey Lebedev 2019-2025
+#  Copyright (C) Eugene Krissinel, Andrey Lebedev 2019-2026
 #
 # ============================================================================
 #
@@ -212,7 +212,8 @@ class CCP4Build(basic.TaskDriver):
             "cycles_min       " + self.getParameter(sec1.NCYCLES_MIN),
             "cycles_max       " + self.getParameter(sec1.NCYCLES_MAX),
             "noimprove_cycles " + self.getParameter(sec1.NOIMPROVE_CYCLES),
-            "stop_file        " + self.jobEndFName
+            "stop_file        " + self.jobEndFName,
+            "ncores           " + str(self.getCoreBudget() or 1)
         ])
 
         trim_mode = self.getParameter(sec2.TRIMMODE_SEL)
@@ -3,7 +3,7 @@
 #
 # ============================================================================
 #
-#    13.01.24   <--  Date of Last Modification.
+#    18.10.26   <--  Date of Last Modification.
 #                   ~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 # ----------------------------------------------------------------------------
 #
@@ -19,7 +19,7 @@
 #                       all successful imports
 #      jobDir/report  : directory receiving HTML report
 #
-#  Copyright (C) Eugene Krissinel, Andrey Lebedev 2017-2024
+#  Copyright (C) Eugene Krissinel, Andrey Lebedev 2017-2026
 #
 # ============================================================================
 #
@@ -519,11 +519,13 @@ class Deposition(basic.TaskDriver):
                     while msg and (ntry<nattempts):
                         self.file_stdout.write ( "\n -- attempt " + str(ntry+1) + "\n" )
                         self.file_stdout.flush ()
-                        msg = valrep.getValidationReport ( deposition_cif,sfCIF,repFilePath,self.file_stdout )
+                        msg = valrep.getValidationReport ( deposition_cif,sfCIF,repFilePath,
+                                                           self.file_stdout,self.jobEndFName )
                         if msg and (ntry<nattempts):
                             self.file_stdout.write ( "\n -- server replied: " + msg + "\n" )
                             ntry += 1
-                            time.sleep ( 10 )
+                            if ntry<nattempts:  # no pause after last attempt
+                                time.sleep ( 10 )
 
                     # remove wait message
                     self.putMessage1 ( self.report_page_id(),"",self.rvrow,0,1,1 )
@@ -3,7 +3,7 @@
 #
 # ============================================================================
 #
-#    26.02.24   <--  Date of Last Modification.
+#    18.10.26   <--  Date of Last Modification.
 #                   ~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 # ----------------------------------------------------------------------------
 #
@@ -19,23 +19,22 @@
 #                       all successful imports
 #      jobDir/report  : directory receiving HTML report
 #
-#  Copyright (C) Eugene Krissinel, Andrey Lebedev, Jools Wills 2024
+#  Copyright (C) Eugene Krissinel, Andrey Lebedev, Jools Wills 2024-2026
 #
 # ============================================================================
 #
 
 #  python native imports
 import os
-import time
 
 import pyrvapi
 import json
-import requests
 import urllib.parse
 import re
 
 #  application imports
 from  pycofe.tasks  import basic
+from  pycofe.varut  import poller
 # from  pycofe.dtypes import dtype_template,dtype_xyz,dtype_ensemble
 # from  pycofe.dtypes import dtype_structure,dtype_revision
 # from  pycofe.dtypes import dtype_sequence
@@ -47,32 +46,32 @@ from  pycofe.tasks  import basic
 # class to handle communication with the Data Link API
 class DataLink:
 
-    # initialise API url, user and cloudrun_id
-    def __init__(self, url, user, cloudrun_id, verify_cert):
+    # initialise API url, user and cloudrun_id; requests are sent through
+    # transport (see pycofe.varut.poller), which retries failed connections
+    def __init__(self, url, user, cloudrun_id, verify_cert, transport = None):
         self.url = url + '/'
         self.user = user
         self.cloudrun_id = cloudrun_id
         self.verify_cert = verify_cert
+        self.transport = transport or poller.makeTransport(verify_cert)
 
     # send a request to the Data Link API
-    def api(self, method, endpoint, use_auth = True):
+    def api(self, method, endpoint, use_auth = True, retry = None):
         url = urllib.parse.urljoin(self.url, endpoint)
         auth_headers = {}
 
         if use_auth:
             auth_headers = { 'cloudrun_id': self.cloudrun_id }
 
-        # set up request retries
-        session = requests.Session()
-        retries = requests.adapters.Retry(total = 10, backoff_factor = 0.1)
-        session.mount('http://', requests.adapters.HTTPAdapter(max_retries = retries))
-        session.mount('https://', requests.adapters.HTTPAdapter(max_retries = retries))
-
         try:
-            res = session.request(method, url, headers = auth_headers, verify = self.verify_cert)
-        except requests.exceptions.RequestException as e:
+            res = self.transport.request(method, url, headers = auth_headers)
+        except OSError as e:
             return False, e
 
+        # retry interval suggested by server, if requested
+        if retry is not None:
+            retry.append(poller.retryAfter(res.headers))
+
         # parse JSON
         try:
             obj = json.loads(res.text)
@@ -102,9 +101,18 @@ class DataLink:
         return self.api('PUT', endpoint)
 
     # get the status of an existing data fetch
-    def status(self, source, id):
+    def status(self, source, id, retry = None):
         endpoint = f'data/{self.user}/{source}/{id}'
-        return self.api('GET', endpoint)
+        return self.api('GET', endpoint, retry = retry)
+
+    # status check function for poller.Poller
+    def status_check(self, source, id):
+        def check():
+            retry = []
+            res, data_info = self.status(source, id, retry = retry)
+            done = not res or data_info['status'] in ('completed', 'failed')
+            return done, (res, data_info), retry[0] if retry else None
+        return check
 
 class FetchData(basic.TaskDriver):
 
@@ -225,27 +233,23 @@ class FetchData(basic.TaskDriver):
         # initialise progress bar
         pbarMeta = self.putProgressBar('Fetching data:', 100)
 
-        status_c = 0
-        # status_c is incremented when a data fetch status is "completed"
-        # so when all data fetchs are complete, the loop will end
-        while status_c != len(results):
-            time.sleep(10)
-            status_c = 0
+        # check status of all fetches concurrently, first after 1 second and
+        # then at increasing intervals up to 10 seconds, or as suggested by
+        # the server
+        state = { 'error': None, 'size': 0 }
+
+        def progress(values):
             size = 0
             size_s = 0
-            # loop through the results and check the status of each fetch
-            for result in results:
-                res, data_info = dl.status(data['source'], data['id'])
+            for value in values:
+                res, data_info = value
                 if not res:
-                    self.dlError(data_info)
-                    return
+                    state['error'] = data_info
+                    return False
 
                 if data_info['status'] == 'failed':
-                    self.dlError(f'Fetch of {data_info["source"]}/{data_info["id"]} failed')
-                    return
-
-                if data_info['status'] == 'completed':
-                    status_c += 1
+                    state['error'] = f'Fetch of {data_info["source"]}/{data_info["id"]} failed'
+                    return False
 
                 size += data_info['size']
 
@@ -253,6 +257,7 @@ class FetchData(basic.TaskDriver):
                 if 'size_s' in data_info:
                     size_s += data_info['size_s']
 
+            state['size'] = size
             if size_s > 0:
                 note = ''
                 percent = int(size / size_s * 100)
@@ -263,6 +268,17 @@ class FetchData(basic.TaskDriver):
 
                 # update the progress bar
                 self.setProgressBar ( pbarMeta, percent, note )
+            return True
+
+        fetch_poller = poller.Poller(first = 1.0, maxwait = 10.0)
+        done, values = fetch_poller.pollAll(
+                [dl.status_check(data['source'], data['id']) for data in results],
+                nworkers = 8, progress = progress)
+        self.stdoutln(' ... data fetch ' + fetch_poller.report())
+        if not done:
+            self.dlError(state['error'])
+            return
+        size = state['size']
 
         # display finish message and data size
         self.putMessage ('<p><b>Data fetch finished. Status: OK</b>')
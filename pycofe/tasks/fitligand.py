@@ -3,7 +3,7 @@
 #
 # ============================================================================
 #
-#    10.04.25   <--  Date of Last Modification.
+#    18.10.26   <--  Date of Last Modification.
 #                   ~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 # ----------------------------------------------------------------------------
 #
@@ -19,7 +19,7 @@
 #                       all successful imports
 #      jobDir/report  : directory receiving HTML report
 #
-#  Copyright (C) Eugene Krissinel, Andrey Lebedev 2017-2025
+#  Copyright (C) Eugene Krissinel, Andrey Lebedev 2017-2026
 #
 # ============================================================================
 #
@@ -34,6 +34,7 @@ import chapi
 from . import basic
 from   pycofe.auto     import auto, auto_workflow
 from   pycofe.varut    import mmcif_utils
+from   pycofe.proc     import makelib
 from   pycofe.verdicts import verdict_fitligand
 
 # ============================================================================
@@ -168,22 +169,10 @@ class FitLigand(basic.TaskDriver):
             libstr = istruct.getLibFilePath ( self.inputDir() )
             if libstr and not ligand.code in istruct.ligands:
                 # this is not the first ligand in structure, append it to
-                # the previous one(s) with libcheck
+                # the previous one(s)
 
                 libadd = self.outputFName + ".dict.cif"
-
-                self.open_stdin()
-                self.write_stdin (
-                    "_Y"          +\
-                    "\n_FILE_L  " + libstr +\
-                    "\n_FILE_L2 " + libin  +\
-                    "\n_FILE_O  " + libadd +\
-                    "\n_END\n" )
-                self.close_stdin()
-
-                self.runApp ( "libcheck",[],logType="Service" )
-
-                libadd += ".lib"
+                makelib.mergeLibraryFiles ( self,[libstr,libin],libadd )
 
             row0 = self.rvrow + 2
 
@@ -361,22 +350,10 @@ class FitLigand(basic.TaskDriver):
             libstr = istruct.getLibFilePath ( self.inputDir() )
             if libstr and not ligand.code in istruct.ligands:
                 # this is not the first ligand in structure, append it to
-                # the previous one(s) with libcheck
+                # the previous one(s)
 
                 libadd = self.outputFName + ".dict.cif"
-
-                self.open_stdin()
-                self.write_stdin (
-                    "_Y"          +\
-                    "\n_FILE_L  " + libstr +\
-                    "\n_FILE_L2 " + libin  +\
-                    "\n_FILE_O  " + libadd +\
-                    "\n_END\n" )
-                self.close_stdin()
-
-                self.runApp ( "libcheck",[],logType="Service" )
-
-                libadd += ".lib"
+                makelib.mergeLibraryFiles ( self,[libstr,libin],libadd )
 
             pdbout = self.outputFName + ".pdb"
             #self.stdoutln ( "pdbin="+str(pdbin) )
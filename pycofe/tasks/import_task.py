@@ -3,7 +3,7 @@
 #
 # ============================================================================
 #
-#    16.10.24   <--  Date of Last Modification.
+#    18.10.26   <--  Date of Last Modification.
 #                   ~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 # ----------------------------------------------------------------------------
 #
@@ -20,7 +20,7 @@
 #                       all successful imports
 #      jobDir/report  : directory receiving HTML report
 #
-#  Copyright (C) Eugene Krissinel, Andrey Lebedev 2017-2024
+#  Copyright (C) Eugene Krissinel, Andrey Lebedev 2017-2026
 #
 # ============================================================================
 #
@@ -103,10 +103,13 @@ class Import(basic.TaskDriver):
         #self.files_all = [f for f in os.listdir(self.importDir()) if os.path.isfile(os.path.join(self.importDir(),f))]
 
         self.resetFileImport()
+        upload_list = []
         for dirName, subdirList, fileList in os.walk(self.importDir(),topdown=False):
             dName = dirName[len(self.importDir())+1:]
             for fname in fileList:
-                self.addFileImport ( os.path.join(dName,fname),baseDirPath=self.importDir() )
+                upload_list.append ( os.path.join(dName,fname) )
+        # decompression and type detection run concurrently
+        self.addFileImports ( upload_list,baseDirPath=self.importDir() )
 
         # ====================================================================
         # do individual data type imports
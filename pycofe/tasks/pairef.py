@@ -3,7 +3,7 @@
 #
 # ============================================================================
 #
-#    13.01.24   <--  Date of Last Modification.
+#    18.10.26   <--  Date of Last Modification.
 #                   ~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 # ----------------------------------------------------------------------------
 #
@@ -19,7 +19,7 @@
 #                       all successful imports
 #      jobDir/report  : directory receiving HTML report
 #
-#  Copyright (C) Eugene Krissinel, Maria Fando, Andrey Lebedev 2023-2024
+#  Copyright (C) Eugene Krissinel, Maria Fando, Andrey Lebedev 2023-2026
 #
 # ============================================================================
 #
@@ -32,7 +32,7 @@ import shutil
 #  application imports
 from . import basic
 from   pycofe.dtypes import dtype_template
-from   pycofe.proc   import import_filetype, import_merged
+from   pycofe.proc   import import_filetype, import_merged, pairef_sched
 
 # ============================================================================
 # Make PaiRef driver
@@ -177,8 +177,11 @@ class PaiRef(basic.TaskDriver):
                 resList[i] = str(resList[i])
         
 
+        # pairef is run through scheduler, which runs independent refmac
+        # jobs of each resolution step concurrently within core budget
         cmd = [
-            "-m"         , "pairef",
+            pairef_sched.__file__,
+            "--ncores"   , str(self.getCoreBudget() or 1),
             "--ccp4cloud",
             "--project"  , self.pairefProject(),
             "--XYZIN"    , xyzin,
@@ -3,7 +3,7 @@
 #
 # ============================================================================
 #
-#    25.02.25   <--  Date of Last Modification.
+#    18.10.26   <--  Date of Last Modification.
 #                   ~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 # ----------------------------------------------------------------------------
 #
@@ -19,7 +19,7 @@
 #                       all successful imports
 #      jobDir/report  : directory receiving HTML report
 #
-#  Copyright (C) Maria Fando, Eugene Krissinel, Andrey Lebedev 2022-2025
+#  Copyright (C) Maria Fando, Eugene Krissinel, Andrey Lebedev 2022-2026
 #
 # ============================================================================
 #
@@ -43,6 +43,7 @@ from   zipfile import ZipFile
 from .               import basic
 from pycofe.proc     import qualrep
 from  pycofe.auto    import auto,auto_workflow
+from  pycofe.varut   import poller as poller_mod
 
 # ============================================================================
 # Make PDB-REDO driver
@@ -237,33 +238,47 @@ class Pdbredo(basic.TaskDriver):
         self.rvrow = self.row0
         gridId     = self.putWaitMessageLF ( "starting on PDB REDO server " )
 
-        result     = "***"
-        status     = "starting"
-        status0    = status
-        errcount   = 0
-
-        while status in ["starting","queued","running","errors"] and (errcount<100):
-            result = self.run_pdbredo ( "status",[] )
+        # status is checked after 5 seconds first, then at increasing
+        # intervals up to 2 minutes, or as suggested by server
+        state  = { "result":"***", "status":"starting", "errcount":0,
+                   "gridId":gridId }
+        poller = poller_mod.Poller ( first=5.0,maxwait=120.0,minwait=5.0 )
+
+        def check():
+            status0 = state["status"]
+            result  = self.run_pdbredo ( "status",[] )
+            lines   = result.splitlines()
+            suggested = None
             if result.startswith("Job status is"):
-                status   = result.split()[-1]
-                errcount = 0
+                status = lines[0].split()[-1]
+                state["errcount"] = 0
                 if status!=status0:
                     self.rvrow = self.row0
-                    gridId  = self.putWaitMessageLF ( status + " on PDB REDO server " )
-                    status0 = status
+                    state["gridId"] = self.putWaitMessageLF ( status + " on PDB REDO server " )
+                if len(lines)>1 and lines[1].startswith("Retry after"):
+                    suggested = poller_mod.retryAfter ({
+                                    "Retry-After" : lines[1].split()[-1] })
             else:
-                errcount += 1
+                state["errcount"] += 1
                 self.stdoutln ( " ... possible PDB-REDO server connection issues" )
                 self.stderrln ( " ... possible PDB-REDO server connection issues" )
                 status = "errors"
                 if status!=status0:
                     self.rvrow = self.row0
-                    gridId  = self.putWaitMessageLF ( "running on PDB REDO server, possible errors " )
-                    status0 = status
-            self.putMessage1 ( gridId,"&nbsp;&nbsp;(" + self.getElapsedTime() + ")",0,2 )
+                    state["gridId"] = self.putWaitMessageLF ( "running on PDB REDO server, possible errors " )
+            state["result"] = result
+            state["status"] = status
+            self.putMessage1 ( state["gridId"],"&nbsp;&nbsp;(" + self.getElapsedTime() + ")",0,2 )
             self.flush()
-            if status!="ended":
-                time.sleep(120)
+            done = status not in ["starting","queued","running","errors"] or\
+                   state["errcount"]>=100
+            return (done,status,suggested)
+
+        poller.poll ( check,stop=lambda: os.path.isfile(self.jobEndFName) )
+        self.stdoutln ( " ... PDB-REDO job " + poller.report() )
+
+        result = state["result"]
+        status = state["status"]
 
         if status!="ended":
             self.rvrow = self.row0
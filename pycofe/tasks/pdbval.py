@@ -3,7 +3,7 @@
 #
 # ============================================================================
 #
-#    10.03.24   <--  Date of Last Modification.
+#    18.10.26   <--  Date of Last Modification.
 #                   ~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 # ----------------------------------------------------------------------------
 #
@@ -19,7 +19,7 @@
 #                       all successful imports
 #      jobDir/report  : directory receiving HTML report
 #
-#  Copyright (C) Eugene Krissinel, Andrey Lebedev, Maria Fando 2017-2024
+#  Copyright (C) Eugene Krissinel, Andrey Lebedev, Maria Fando 2017-2026
 #
 # ============================================================================
 #
@@ -420,7 +420,8 @@ class PDBVal(basic.TaskDriver):
                         else:
                             self.file_stdout.write ( "\n -- server replied: " + str(msg) + "\n" )
                         ntry += 1
-                        time.sleep ( 10 )
+                        if ntry<nattempts:  # no pause after last attempt
+                            time.sleep ( 10 )
 
                 # remove wait message
                 self.putMessage1 ( self.report_page_id(),"",self.rvrow,0,1,1 )
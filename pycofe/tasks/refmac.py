@@ -3,7 +3,7 @@
 #
 # ============================================================================
 #
-#    10.04.25   <--  Date of Last Modification.
+#    18.10.26   <--  Date of Last Modification.
 #                   ~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 # ----------------------------------------------------------------------------
 #
@@ -20,7 +20,7 @@
 #      jobDir/report  : directory receiving HTML report
 #
 #  Copyright (C) Eugene Krissinel, Andrey Lebedev, Robert Nicholls,
-#                Oleg Kovalevskiy, Maria Fando 2017-2025
+#                Oleg Kovalevskiy, Maria Fando 2017-2026
 #
 # ============================================================================
 #
@@ -39,7 +39,7 @@ from   pycofe.dtypes    import dtype_template
 from   pycofe.proc      import qualrep
 from   pycofe.verdicts  import verdict_refmac
 from   pycofe.auto      import auto,auto_workflow
-from   pycofe.proc      import covlinks
+from   pycofe.proc      import covlinks, prosmart
 from   pycofe.varut     import mmcif_utils
 
 # ============================================================================
@@ -146,7 +146,8 @@ class Refmac(basic.TaskDriver):
         #  dna:  hmodel[i].hasSubtype ( dtype_template.subtypeDNA() )
         #  rna:  hmodel[i].hasSubtype ( dtype_template.subtypeRNA() )
 
-        external_restraint_files = []
+        prosmart_passes = []
+        xyzin = istruct.getPDBFilePath ( self.inputDir() )
         if hasattr(self.input_data.data,"hmodel"):
             homolog_protein_fpaths = []
             homolog_dnarna_fpaths = []
@@ -161,40 +162,44 @@ class Refmac(basic.TaskDriver):
                     homolog_dnarna_fpaths.append ( hmodel[i].getPDBFilePath(self.inputDir() ) )
 
             if use_protein:
-                prosmart_cmd = [ "-quick", "-o", "ProSMART_Output_protein", "-p1", istruct.getPDBFilePath(self.inputDir() ), "-p2" ] + homolog_protein_fpaths
+                prosmart_opts = []
                 if sec3.ALL_BEST.value == 'all':
-                    prosmart_cmd += ['-restrain_all']
+                    prosmart_opts += ['-restrain_all']
                 else:
-                    prosmart_cmd += ['-restrain_best']
+                    prosmart_opts += ['-restrain_best']
 
                 if sec3.SIDE_MAIN.value == 'main':
-                    prosmart_cmd += ['-main']
+                    prosmart_opts += ['-main']
                 else:
-                    prosmart_cmd += ['-side']
+                    prosmart_opts += ['-side']
 
                 if sec3.TOGGLE_ALT.value == 'yes':
-                    prosmart_cmd += ['-alt']
+                    prosmart_opts += ['-alt']
 
-                prosmart_cmd += ['-restrain_seqid', str(sec3.SEQID.value)]
-                prosmart_cmd += ['-rmin', str(sec3.RMIN.value)]
-                prosmart_cmd += ['-rmax', str(sec3.RMAX.value)]
-                prosmart_cmd += ['-bfac_alpha', str(sec3.BFAC_RM.value)]
-                prosmart_cmd += ['-occup', str(sec3.OCCUPANCY.value)]
+                prosmart_opts += ['-restrain_seqid', str(sec3.SEQID.value)]
+                prosmart_opts += ['-rmin', str(sec3.RMIN.value)]
+                prosmart_opts += ['-rmax', str(sec3.RMAX.value)]
+                prosmart_opts += ['-bfac_alpha', str(sec3.BFAC_RM.value)]
+                prosmart_opts += ['-occup', str(sec3.OCCUPANCY.value)]
 
-                self.putMessage('Running ProSMART to generate external restraints for protein macromolecules')
-                self.runApp ( "prosmart",prosmart_cmd,logType="Main" )
-                external_restraint_files.append(os.path.join('ProSMART_Output_protein',os.path.splitext(istruct.getPDBFileName() )[0]+'.txt') )
+                prosmart_passes.append ( prosmart.Pass (
+                    'external restraints for protein macromolecules',
+                    'ProSMART_Output_protein',xyzin,homolog_protein_fpaths,prosmart_opts ) )
 
             if use_dnarna:
-                prosmart_cmd = [ "-quick", "-dna_rna", "-o", "ProSMART_Output_dnarna", "-p1" ,istruct.getPDBFilePath(self.inputDir() ), "-p2" ] + homolog_dnarna_fpaths
-                self.putMessage('Running ProSMART to generate external restraints for nucleic acid macromolecules')
-                self.runApp ( "prosmart",prosmart_cmd,logType="Main" )
-                external_restraint_files.append(os.path.join('ProSMART_Output_dnarna',os.path.splitext(istruct.getPDBFileName() )[0]+'.txt') )
+                prosmart_passes.append ( prosmart.Pass (
+                    'external restraints for nucleic acid macromolecules',
+                    'ProSMART_Output_dnarna',xyzin,homolog_dnarna_fpaths,['-dna_rna'] ) )
 
         if str(sec3.HBOND_RESTR.value) == 'yes':
-            prosmart_cmd = [ "-quick", "-o", "ProSMART_Output_hbond", "-p1", istruct.getPDBFilePath(self.inputDir() )]
-            self.runApp ( "prosmart",prosmart_cmd,logType="Main" )
-            external_restraint_files.append(os.path.join('ProSMART_Output_hbond',os.path.splitext(istruct.getPDBFileName() )[0]+'.txt') )
+            prosmart_passes.append ( prosmart.Pass (
+                'h-bond restraints','ProSMART_Output_hbond',xyzin,[],[] ) )
+
+        # independent passes run concurrently; restraints are reused from
+        # cache where available
+        external_restraint_files = []
+        if prosmart_passes:
+            external_restraint_files = prosmart.run ( self,prosmart_passes )
 
 
         # Input
@@ -3,7 +3,7 @@
 #
 # ============================================================================
 #
-#    20.01.25   <--  Date of Last Modification.
+#    18.10.26   <--  Date of Last Modification.
 #                   ~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 # ----------------------------------------------------------------------------
 #
@@ -30,7 +30,7 @@
 #               even if job is run by SGE, so it should be checked upon using
 #               comman line length
 #
-#  Copyright (C) Eugene Krissinel, Andrey Lebedev, Oleg Kovalevskyi, Maria Fando 2017-2025
+#  Copyright (C) Eugene Krissinel, Andrey Lebedev, Oleg Kovalevskyi, Maria Fando 2017-2026
 #
 # ============================================================================
 #
@@ -50,6 +50,7 @@ from   pycofe.dtypes   import dtype_revision
 from   pycofe.verdicts import verdict_simbad
 from   pycofe.auto     import auto
 from   pycofe.proc     import xyzmeta
+from   pycofe.parsers  import metrics_parser
 from   varut          import signal
 
 
@@ -231,8 +232,15 @@ class Simbad(asudef.ASUDef):
         self.flush()
         self.storeReportDocument ( self.log_page_id() )
 
-        # run simbad
-        self.runApp ( app,cmd,logType="Main",quitOnError=False )
+        # run simbad; table of results with TFZ, LLG and R-factors is picked
+        # from the log as it is written:
+        #   name  phaser_tfz  phaser_llg  ...  final_r_fact  final_r_free  ...
+        #   ----
+        #   1DTX  ...
+        results_table = metrics_parser.table_extractor ( "phaser_tfz",
+                                                         skip=1,minwords=6 )
+        self.runApp ( app,cmd,logType="Main",quitOnError=False,
+                      metrics=results_table )
         self.restoreReportDocument()
 
         #f = open ( 'xxx.json','w' )
@@ -283,30 +291,16 @@ class Simbad(asudef.ASUDef):
 
             # self.stdoutln ( " >>>>> " + str(result0) )
 
-            self.flush()
-            self.file_stdout.close()
-            f = open ( self.file_stdout_path(),"r" )
-            key     = -1
             LLG     = ""
             TFZ     = ""
             Rfactor = ""
             Rfree   = ""
-            for line in f:
-                if key==0:
-                    words = line.split()
-                    if len(words)>5 and words[0]==result0["name"]:
-                        TFZ     = words[1]
-                        LLG     = words[2]
-                        Rfactor = words[4]
-                        Rfree   = words[5]
-                        break
-                elif "phaser_tfz" in line:
-                    key = 1
-                else:
-                    key -= 1
-            f.close()
-            # continue writing to stdout
-            self.file_stdout = open ( self.file_stdout_path(),"a" )
+            words   = results_table.row ( result0["name"] )
+            if words:
+                TFZ     = words[1]
+                LLG     = words[2]
+                Rfactor = words[4]
+                Rfree   = words[5]
 
             if not LLG.replace(".","",1).isdigit():  LLG = ""
             if not TFZ.replace(".","",1).isdigit():  TFZ = ""
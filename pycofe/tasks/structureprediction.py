@@ -3,7 +3,7 @@
 #
 # ============================================================================
 #
-#    22.05.25   <--  Date of Last Modification.
+#    18.10.26   <--  Date of Last Modification.
 #                   ~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 # ----------------------------------------------------------------------------
 #
@@ -19,7 +19,7 @@
 #                       all successful imports
 #      jobDir/report  : directory receiving HTML report
 #
-#  Copyright (C) Maria Fando, Eugene Krissinel, Andrey Lebedev 2022-2025
+#  Copyright (C) Maria Fando, Eugene Krissinel, Andrey Lebedev 2022-2026
 #
 # ============================================================================
 #
@@ -29,13 +29,11 @@ import os
 import stat
 import json
 import shutil
-import uuid
-import time
 
 from pycofe.tasks  import basic
 from pycofe.dtypes import dtype_sequence
 from pycofe.auto   import auto, auto_workflow
-from pycofe.varut  import command
+from pycofe.varut  import command, predcache
 
 # ============================================================================
 # StructurePrediction driver
@@ -67,6 +65,23 @@ class StructurePrediction(basic.TaskDriver):
 
     def file_seq_path (self):  return "structure_prediction.seq"
 
+    # cached files which are not hard-linked because they become output data
+    cache_clone_exts = ( ".pdb",".cif" )
+
+    def clean_output ( self,dirPath,engine ):
+        # save space by cleaning
+        for root, dirs, files in os.walk(dirPath,topdown=False):
+            for file in files:
+                if file.endswith(".a3m") or \
+                   (engine!="alphafold" and file.lower().endswith(".pkl")):
+                    file_path = os.path.join(root, file)
+                    os.remove ( file_path )
+            for d in dirs:
+                if d.endswith("_env"):
+                    dir_path = os.path.join(root, d)
+                    shutil.rmtree ( dir_path )
+        return
+
     def run(self):
 
         scriptf = "process.sh"
@@ -82,7 +97,6 @@ class StructurePrediction(basic.TaskDriver):
         sequence  = []
         ncopies   = []
         npmax     = 0
-        cache_key = ""
         for i in range(len(seq)):
             seqname.append ( 'seq' + str(i+1) )
             seq[i] = self.makeClass ( seq[i] )
@@ -93,12 +107,9 @@ class StructurePrediction(basic.TaskDriver):
                 seq[i].npred = 1  # backward compatibility in existing setups
             ncopies.append ( seq[i].npred )
             npmax = max ( npmax,seq[i].npred )
-            cache_key += sequence[i] + ":" + str(ncopies[i])
 
         dtype_sequence.writeMultiSeqFile ( self.file_seq_path(),
                                            seqname,sequence,ncopies )
-        if hasattr(sec1,"MINSCORE"):
-            cache_key += ":" + self.getParameter(sec1.MINSCORE)
 
         simulation = False
 
@@ -142,40 +153,31 @@ class StructurePrediction(basic.TaskDriver):
         nmodels_str = "1"
         if hasattr(sec1,"NSTRUCTS"):
             nmodels_str = self.getParameter ( sec1.NSTRUCTS )
-        cache_key += "::" + nmodels_str
-
-        cache_index      = {}
-        cache_index_path = None
-        cache_dir        = None
 
+        # results cache (optional): see pycofe.varut.predcache
+        pcache    = None
+        cache_key = None
+        cache_hit = False
         try:
             if cache:
-                cache_index_path = os.path.join ( cache["path"],"cache_index.json" )
-                if not os.path.isdir(cache["path"]):
-                    os.makedirs ( cache["path"] )
-                elif os.path.isfile(cache_index_path):
-                    with open(cache_index_path,"r") as f:
-                        cache_index = json.load ( f )
-                    if cache_key in cache_index:
-                        cache_dir = cache_index[cache_key]["path"]
-                        if not os.path.isdir(cache_dir):
-                            # could be an effect of concurrent jobs
-                            cache_dir = None
-                            del cache_index[cache_key]
-                            with open(cache_index_path,"w") as f:
-                                json.dump ( cache_index,f )
+                cache_params = { "engine"  : engine,
+                                 "flavour" : flavour,
+                                 "nmodels" : nmodels_str }
+                if hasattr(sec1,"MINSCORE"):
+                    cache_params["minscore"] = self.getParameter(sec1.MINSCORE)
+                cache_key = predcache.makeKey ( sequence,ncopies,cache_params )
+                pcache    = predcache.PredictionCache ( cache["path"],cache["size"] )
+                cache_hit = pcache.fetch ( cache_key,dirPath,
+                                           clone_exts=self.cache_clone_exts )
         except:
-            cache_index      = {}
-            cache_index_path = None
-            cache_dir        = None
+            pcache    = None
+            cache_hit = False
             self.stderrln ( " ***** error reading AF cache" )
             pass
- 
-        if cache_dir:
-            # retrieve cached results
-            if os.path.isdir(dirPath):
-                shutil.rmtree ( dirPath )
-            shutil.copytree ( cache_dir,dirPath,dirs_exist_ok=True )
+
+        if cache_hit:
+            # cached results have been placed in dirPath
+            self.stdoutln ( " ..... prediction results retrieved from cache" )
             rc = command.comrc()
 
         elif engine=="script":
@@ -268,6 +270,19 @@ class StructurePrediction(basic.TaskDriver):
             self.putTitle ( "Failed to make models" )
             self.putMessage ( "<b>Execution errors</b>" )
         else:
+
+            if not cache_hit:
+                self.clean_output ( dirPath,engine )
+                if pcache and os.path.isdir(dirPath):
+                    # put results in cache before model files are moved out
+                    try:
+                        pcache.store ( cache_key,dirPath,
+                                       clone_exts=self.cache_clone_exts )
+                    except:
+                        self.stderrln ( " ***** error handling AF cache" )
+                        pass
+            if pcache:
+                pcache.writeStats ( self.file_stdout )
             
             fpaths  = []   #  relaxed structures
             fpaths0 = []   #  unrelaxed structures
@@ -475,80 +490,6 @@ class StructurePrediction(basic.TaskDriver):
 
                         #models.append ( model )
 
-            # save space by cleaning
-            for root, dirs, files in os.walk(dirPath,topdown=False):
-                for file in files:
-                    if file.endswith(".a3m"):
-                        file_path = os.path.join(root, file)
-                        os.remove ( file_path )            
-                for d in dirs:
-                    if d.endswith("_env"):
-                        dir_path = os.path.join(root, d)
-                        shutil.rmtree ( dir_path )
-
-            if cache:  # manage results cache (optional)
-
-                try:
-
-                    t0 = time.time()
-
-                    # prepare mew cache item if necessary - do this befofre dealing
-                    # with cache index because it may take a noticeable time
-                    cache_dir_1 = cache_dir
-                    if not cache_dir:
-                        # new item - pick a random directory name
-                        while not cache_dir_1 or os.path.isdir(cache_dir_1):
-                            cache_dir_1 = os.path.join ( cache["path"],"afcache_"+uuid.uuid4().hex )
-                        shutil.copytree ( dirPath,cache_dir_1 )
-
-                    # read again in case few AF jobs run in parallel
-                    if os.path.isfile(cache_index_path):
-                        with open(cache_index_path,"r") as f:
-                            cache_index = json.load ( f )
-                    else:
-                        cache_index = {}
-
-                    # trim cache if necessary
-                    max_size = cache["size"]
-                    if not cache_dir:
-                        max_size -= 1
-
-                    del_paths = []
-                    while len(cache_index)>max_size:
-                        dt0  = 0.0
-                        key0 = None
-                        for key in cache_index:
-                            if key!=cache_key:
-                                dt = t0 - cache_index[key]["seen"]
-                                if dt>dt0:
-                                    dt0  = dt
-                                    key0 = key
-                        if key0:
-                            # postpone deletions because they may take a noticeable time
-                            del_paths.append (  cache_index[key0]["path"] )
-                            del cache_index[key0]
-                        else:
-                            break
-                
-                    # put new item in the cache
-                    if not cache_dir:
-                        cache_index[cache_key] = {
-                            "path" : cache_dir_1
-                        }
-
-                    # update time stamp and write cache index on disk
-                    cache_index[cache_key]["seen"] = t0
-                    with open(cache_index_path,"w") as f:
-                        json.dump ( cache_index,f,indent=4 )
-
-                    for i in range(len(del_paths)):
-                        shutil.rmtree ( del_paths[i] )
-
-                except:
-                    self.stderrln ( " ***** error handling AF cache" )
-                    pass
- 
-
             # clean up
             # try:
             #     shutil.rmtree ( os.path.join(dirName,"input") )
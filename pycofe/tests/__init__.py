@@ -0,0 +1,22 @@
+##!/usr/bin/python
+
+#
+# ============================================================================
+#
+#    18.10.26   <--  Date of Last Modification.
+#                   ~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+# ----------------------------------------------------------------------------
+#
+#  TESTS OF PYCOFE MODULES
+#
+#  Run from the root of the source tree with
+#
+#     python -m pytest -q pycofe/tests
+#
+#  Tests which need CCP4 or ccp4-python modules (pyrvapi) are skipped where
+#  these are not available.
+#
+#  Copyright (C) Eugene Krissinel, Andrey Lebedev 2026
+#
+# ============================================================================
+#
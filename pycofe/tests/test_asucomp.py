@@ -0,0 +1,57 @@
+##!/usr/bin/python
+
+#
+# ============================================================================
+#
+#    18.10.26   <--  Date of Last Modification.
+#                   ~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+# ----------------------------------------------------------------------------
+#
+#  TESTS OF CHAIN CLUSTERING (pycofe.proc.asucomp)
+#
+#  Clusters of synthetic assemblies are compared with all-pairs clustering,
+#  and bit-parallel alignment scores with dynamic programming.
+#
+#  Copyright (C) Eugene Krissinel, Andrey Lebedev 2026
+#
+# ============================================================================
+#
+
+import random
+
+import pytest
+
+pytest.importorskip ( "pyrvapi" )
+
+from pycofe.proc import asucomp
+
+# ============================================================================
+
+def lcs_length ( seq1,seq2 ):
+    row = [0]*(len(seq2)+1)
+    for c in seq1:
+        prev = 0
+        for j in range(len(seq2)):
+            cur = row[j+1]
+            row[j+1] = prev+1 if c==seq2[j] else max(row[j+1],row[j])
+            prev = cur
+    return row[-1]
+
+
+def test_lcs_length():
+    rnd = random.Random ( 1 )
+    for n in range(200):
+        seq1 = "".join ( rnd.choice("ACDE") for k in range(rnd.randint(0,90)) )
+        seq2 = "".join ( rnd.choice("ACDE") for k in range(rnd.randint(0,90)) )
+        assert asucomp._lcs_length(seq1,seq2)==lcs_length(seq1,seq2)
+        assert asucomp.getAlignmentScore(seq1,seq2)==lcs_length(seq1,seq2)
+
+
+@pytest.mark.parametrize ( "clustThresh",[0.9,0.5,1.0,1.01] )
+@pytest.mark.parametrize ( "case",[(3,20,80,150),(12,1,40,120),(2,30,150,200)] )
+def test_same_as_all_pairs ( case,clustThresh ):
+    seqlist = asucomp._synthetic_assembly ( random.Random(12345),*case )
+    seqlist.append ( ["","protein","X"] )  # empty chains are not clustered
+    # alignment scores are checked in test_lcs_length()
+    assert asucomp.clusterSequences(seqlist,clustThresh)==\
+           asucomp._reference_clusters(seqlist,clustThresh,asucomp._lcs_length)
@@ -0,0 +1,137 @@
+##!/usr/bin/python
+
+#
+# ============================================================================
+#
+#    18.10.26   <--  Date of Last Modification.
+#                   ~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+# ----------------------------------------------------------------------------
+#
+#  TESTS OF WORKFLOW CONTEXT STORE (pycofe.auto.auto_api2)
+#
+#  Contexts passed through workflow steps with and without encoding must
+#  give same entries, with data objects pooled once in encoded contexts.
+#
+#  Copyright (C) Eugene Krissinel, Maria Fando, Andrey Lebedev 2026
+#
+# ============================================================================
+#
+
+import os
+import json
+
+import pytest
+
+from pycofe.auto import auto_api2
+
+# ============================================================================
+
+class Body(object):
+    def keepWorkflow ( self ):  pass
+
+
+def next_step():
+    # server passes context written by task on to the next task
+    auto_api2.writeAutoMeta ( Body() )
+    with open(auto_api2.auto_meta_fname(),"r") as f:
+        meta = json.load ( f )
+    with open(auto_api2.auto_context_fname(),"w") as f:
+        f.write ( json.dumps(meta["context"]) )
+    auto_api2.initAutoMeta()
+    return meta["context"]
+
+
+def run_workflow ( nsteps ):
+    hkl = auto_api2._bench_object ( "DataHKL",5,"hkl" )
+    seq = auto_api2._bench_object ( "DataSequence",2,"seq" )
+    auto_api2.initAutoMeta()
+    for step in range(nsteps):
+        wdata = auto_api2.getContext("input_data") or \
+                    { "variables":{}, "hkl":[hkl], "seq":[seq] }
+        xyz = auto_api2._bench_object ( "DataStructure",5,"xyz%d" % step )
+        rev = { "_type" : "DataRevision", "dataId" : "rev%d" % step,
+                "HKL" : hkl, "ASU" : { "seq" : [seq] }, "Structure" : xyz }
+        wdata.setdefault("revision",[]).append ( rev )
+        wdata["variables"]["cnt"] = step
+        runName  = "@REFINE[%d]" % step
+        nextName = "@REFINE[%d]" % (step+1)
+        auto_api2.addContext ( runName + "_outdata",{ "rev_list":[rev], "wdata":wdata } )
+        auto_api2.addTask ( nextName,"TaskRefmac",runName )
+        auto_api2.addTaskData ( nextName,"revision",rev )
+        auto_api2.addContext ( "input_data",wdata )
+        auto_api2.noteTask ( nextName )
+        context = next_step()
+    return context
+
+
+def entries():
+    store = auto_api2.auto_meta["context"]
+    return ( dict([(k,store.custom[k]) for k in store.custom.keys()]),
+             dict([(k,store.tasks [k]) for k in store.tasks .keys()]) )
+
+
+@pytest.fixture
+def workdir ( tmp_path,monkeypatch ):
+    monkeypatch.chdir ( tmp_path )
+    monkeypatch.setattr ( auto_api2,"encode_context",True )
+    monkeypatch.setattr ( auto_api2,"log_stream",None )
+    return tmp_path
+
+
+# ============================================================================
+
+def test_encoded_same_as_plain ( workdir,monkeypatch ):
+    os.mkdir ( "plain" )
+    os.mkdir ( "encoded" )
+    monkeypatch.chdir ( workdir/"plain" )
+    monkeypatch.setattr ( auto_api2,"encode_context",False )
+    plain = run_workflow ( 4 )
+    plain_entries = entries()
+    monkeypatch.chdir ( workdir/"encoded" )
+    monkeypatch.setattr ( auto_api2,"encode_context",True )
+    encoded = run_workflow ( 4 )
+    assert entries()==plain_entries
+    assert "objects" not in plain
+    # every data object is pooled once
+    types = [ obj["_type"] for obj in encoded["objects"].values() ]
+    assert types.count("DataHKL")==1 and types.count("DataSequence")==1
+    assert types.count("DataStructure")==4 and types.count("DataRevision")==4
+    assert len(json.dumps(encoded))<len(json.dumps(plain))
+
+
+def test_plain_context_read ( workdir,monkeypatch ):
+    # contexts written without encoding are read as they are
+    monkeypatch.setattr ( auto_api2,"encode_context",False )
+    run_workflow ( 2 )
+    plain_entries = entries()
+    monkeypatch.setattr ( auto_api2,"encode_context",True )
+    context = next_step()
+    assert "objects" in context
+    assert entries()==plain_entries
+
+
+def test_entries_are_copies ( workdir ):
+    run_workflow ( 2 )
+    rev = auto_api2.getContext ( "@REFINE[1]_outdata" )["rev_list"][0]
+    rev["HKL"]["dataId"] = "changed"
+    wdata = auto_api2.getContext ( "input_data" )
+    assert wdata["revision"][1]["HKL"]["dataId"]=="hkl"
+    context = next_step()
+    assert auto_api2.getContext("@REFINE[1]_outdata")["rev_list"][0]["HKL"]["dataId"]=="changed"
+    assert auto_api2.getContext("input_data")["hkl"][0]["dataId"]=="hkl"
+    assert len([obj for obj in context["objects"].values()
+                if obj["_type"]=="DataHKL"])==2
+
+
+def test_unreferenced_objects_dropped ( workdir ):
+    run_workflow ( 3 )
+    for name in ("@REFINE[0]_outdata","@REFINE[1]_outdata","@REFINE[2]_outdata",
+                 "input_data"):
+        auto_api2.removeContext ( name )
+    context = next_step()
+    assert auto_api2.getContext("input_data") is None
+    # only objects of noted tasks are left
+    revs = [ obj["dataId"] for obj in context["objects"].values()
+             if obj["_type"]=="DataRevision" ]
+    assert sorted(revs)==["rev0","rev1","rev2"]
+    assert entries()[1]["@REFINE[3]"]["data"]["revision"][0]["dataId"]=="rev2"
@@ -0,0 +1,95 @@
+##!/usr/bin/python
+
+#
+# ============================================================================
+#
+#    18.10.26   <--  Date of Last Modification.
+#                   ~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+# ----------------------------------------------------------------------------
+#
+#  TESTS OF COMPILED WORKFLOW SCRIPTS (pycofe.auto.auto_workflow)
+#
+#  Positions and expressions kept in compiled program must give the same
+#  results as scanning and parsing the script at every workflow step.
+#
+#  Copyright (C) Eugene Krissinel, Maria Fando, Andrey Lebedev 2026
+#
+# ============================================================================
+#
+
+import json
+
+import pytest
+
+from pycofe.auto import auto_workflow, auto_api2
+from pycofe.etc.py_expression_eval import Parser
+
+# ============================================================================
+
+script = [
+    "VERSION 1.0",
+    "DEBUG OFF  # no debug output",
+    "",
+    "@PREP",
+    "    RUN       FreeRFlag",
+    "POINT start",
+    "@REFINE[cnt]",
+    "    PARAMETER NCYC cnt*2+1",
+    "    RUN       Refmac",
+    "let cnt = cnt + 1",
+    "repeat @REFINE while cnt<5",
+    "continue @FIT[1] start",
+    "@FIT[1]",
+    "    RUN  FitWaters",
+    "END"
+]
+
+
+def test_compile():
+    program = auto_workflow.compileScript ( script )
+    assert program["start"]     == [3,"@PREP"]
+    assert program["settings"]  == [0,1]
+    assert program["run_lines"] == [4,8,13]
+    assert program["branch_points"] == ["@REFINE","@FIT"]
+    lines = auto_workflow.ScriptLines ( script )
+    for runName in ("@REFINE","@FIT","@PREP","start","@NONE"):
+        assert auto_workflow.findRunName(program,lines,runName) ==\
+               auto_workflow.scrollToRunName(lines,runName)
+    assert [auto_workflow.nextRunLine(program,lines,lno) for lno in (0,4,5,13)]==\
+           [4,8,8,len(script)]
+
+
+def test_evaluate ( monkeypatch ):
+    exprs = [ "cnt*2+1","cnt<5 and suggested>=0","(x+y)/2^2","max(x,y)-1" ]
+    w     = { "cnt":3, "suggested":0, "x":0.25, "y":1.5 }
+    monkeypatch.setattr ( auto_workflow,"_expressions",{} )
+    program = { "exprs":{} }
+    values  = [ auto_workflow.evaluate(program,e,w) for e in exprs ]
+    assert values==[ Parser().parse(e).evaluate(w) for e in exprs ]
+    # expressions are restored from tokens kept in workflow context
+    monkeypatch.setattr ( auto_workflow,"_expressions",{} )
+    monkeypatch.setattr ( auto_workflow,"_prev_exprs",
+                          json.loads(json.dumps(program["exprs"])) )
+    assert [auto_workflow.evaluate({"exprs":{}},e,w) for e in exprs]==values
+    with pytest.raises(Exception):
+        auto_workflow.evaluate ( program,"z+1",w )
+
+
+def test_steps_same_without_program ( monkeypatch ):
+    # program taken from context gives same workflow steps as one
+    # compiled anew at every step
+    bscript = auto_workflow._bench_script ( 60 )
+    monkeypatch.setattr ( auto_workflow,"_expressions",{} )
+    steps   = auto_workflow._bench_steps ( bscript,6 )
+    assert [rc for rc,runName,t in steps]==["ok"]*6
+    assert steps[0][1]=="@REFINE[1]"
+
+    getContext = auto_api2.getContext
+    def no_program ( contextName ):
+        if contextName=="program":
+            return None
+        return getContext ( contextName )
+    monkeypatch.setattr ( auto_api2,"getContext",no_program )
+    monkeypatch.setattr ( auto_workflow,"_expressions",{} )
+    assert [s[:2] for s in auto_workflow._bench_steps(bscript,6)]==\
+           [s[:2] for s in steps]
@@ -0,0 +1,72 @@
+##!/usr/bin/python
+
+#
+# ============================================================================
+#
+#    18.10.26   <--  Date of Last Modification.
+#                   ~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+# ----------------------------------------------------------------------------
+#
+#  TESTS OF CCP4BUILD EDSTATS PROCESSING (apps/ccp4build/ccp4build_edstats)
+#
+#  Cut-offs and ZD statistics found for synthetic edstats tables are compared
+#  with those found by the original (list-based) implementation.
+#
+#  Copyright (C) Eugene Krissinel, Andrey Lebedev 2026
+#
+# ============================================================================
+#
+
+import os
+import sys
+
+import pytest
+
+pytest.importorskip ( "pyrvapi" )
+
+sys.path.insert ( 0,os.path.join(os.path.dirname(os.path.dirname(
+                                 os.path.abspath(__file__))),"apps","ccp4build") )
+import ccp4build_edstats
+
+# ============================================================================
+
+#  (trim_mode, nres, nwat, seed) : ( mainchain [n0,x0,y0], sidechain [n0,x0,y0],
+#                                    solvent [n0,x0,y0], [mean_m,sigma_m,mean_s,sigma_s] )
+reference_cutoffs = {
+    ("auto",300,60,1)         : ( [65,65.5,1.25],[53,53.5,1.85],[6,6.5,1.3],
+                                  [1.0013333333333332,0.9951205398789075,1.7378048780487798,2.115273930091753] ),
+    ("auto",1200,400,2)       : ( [240,240.5,1.25],[232,232.5,1.65],[75,75.5,1.25],
+                                  [1.061916666666667,1.1504743918875044,1.4905391658189227,1.6962414360585494] ),
+    ("auto",3000,800,3)       : ( [575,575.5,1.25],[595,595.5,1.65],[179,179.5,1.25],
+                                  [1.013133333333335,1.0301913328223176,1.5589528377298165,1.9458039110572818] ),
+    ("restricted",300,60,1)   : ( [65,65.5,1.8],[53,53.5,1.85],[6,6.5,1.5],
+                                  [1.0013333333333332,0.9951205398789075,1.7378048780487798,2.115273930091753] ),
+    ("restricted",1200,400,2) : ( [240,240.5,1.8],[232,232.5,1.8],[75,75.5,1.5],
+                                  [1.061916666666667,1.1504743918875044,1.4905391658189227,1.6962414360585494] ),
+    ("restricted",3000,800,3) : ( [575,575.5,1.8],[595,595.5,1.8],[179,179.5,1.5],
+                                  [1.013133333333335,1.0301913328223176,1.5589528377298165,1.9458039110572818] )
+}
+
+
+@pytest.mark.parametrize ( "key",sorted(reference_cutoffs) )
+def test_residue_lists ( key,tmp_path ):
+    trim_mode,nres,nwat,seed = key
+    fpath = ccp4build_edstats._synthetic_table (
+                        str(tmp_path/"edstats.out"),nres,nwat,seed )
+    edstats = object.__new__ ( ccp4build_edstats.EDStats )
+    edstats.input_data = dict ( ccp4build_edstats.EDStats.input_data,
+                                trim_mode=trim_mode,trim_mode_w=trim_mode )
+    reslist = edstats.getResidueLists ( fpath,False )
+    ref     = reference_cutoffs[key]
+    for cutoff,rcutoff in ((reslist["zd_cutoff_m"],ref[0]),
+                           (reslist["zd_cutoff_s"],ref[1]),
+                           (reslist["zd_cutoff_w"],ref[2])):
+        assert cutoff[0]==rcutoff[0]
+        assert cutoff[1:3]==pytest.approx(rcutoff[1:3],abs=1.0e-9)
+    stats = [ reslist["mean_m"],reslist["sigma_m"],
+              reslist["mean_s"],reslist["sigma_s"] ]
+    assert stats==pytest.approx(ref[3],abs=1.0e-9)
+    zd = [ c[0] for c in reslist["mainchain"] ]
+    assert zd==sorted(zd,reverse=True)
+    assert len(reslist["mainchain"])==nres
+    assert len(reslist["solvent"  ])==nwat
@@ -0,0 +1,196 @@
+##!/usr/bin/python
+
+#
+# ============================================================================
+#
+#    18.10.26   <--  Date of Last Modification.
+#                   ~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+# ----------------------------------------------------------------------------
+#
+#  TESTS OF CORE BUDGET AND PROGRAM CALLS (pycofe.varut.command)
+#
+#  A stub program records its command line, keyword input and thread-count
+#  variables, which are checked under different core budgets.
+#
+#  Copyright (C) Eugene Krissinel, Andrey Lebedev 2026
+#
+# ============================================================================
+#
+
+import os
+import sys
+import json
+import threading
+
+import pytest
+
+from pycofe.varut import command
+
+# ============================================================================
+
+_stub_program = """
+import sys, os, json
+rec = { "argv" : sys.argv[1:], "stdin" : sys.stdin.read(),
+        "env"  : dict([(v,os.environ.get(v)) for v in %s]) }
+with open(os.path.join(%r,"%%s_%%d.json" %% (os.path.basename(sys.argv[0]),os.getpid())),"w") as f:
+    json.dump ( rec,f )
+"""
+
+
+class Stubs(object):
+
+    def __init__ ( self,tmpdir ):
+        self.tmpdir = str(tmpdir)
+        self.paths  = {}
+        for name in ("stub","phaser","shelxd"):
+            self.paths[name] = os.path.join ( self.tmpdir,name )
+            with open(self.paths[name],"w") as f:
+                f.write ( "#!" + sys.executable + "\n" +
+                          _stub_program % (repr(command.thread_env_vars),self.tmpdir) )
+            os.chmod ( self.paths[name],0o755 )
+        self.flog = open ( os.path.join(self.tmpdir,"_log"),"w" )
+
+    def stdin ( self,script="" ):
+        # programs always get keyword file, so that they do not read
+        # standard input of the test process
+        fname = os.path.join ( self.tmpdir,"_stdin" )
+        with open(fname,"w") as f:
+            f.write ( script )
+        return fname
+
+    def run ( self,name,cmd=[],script="",**kwargs ):
+        rc = command.call ( self.paths[name],cmd,"./",self.stdin(script),
+                            self.flog,self.flog,**kwargs )
+        assert not rc.msg,rc.msg
+        return self.records()
+
+    def start ( self,pool,args,**kwargs ):
+        return pool.start ( self.paths["stub"],args,"./",self.stdin(),
+                            self.flog,self.flog,**kwargs )
+
+    def records ( self ):
+        recs = []
+        for fname in sorted(os.listdir(self.tmpdir)):
+            if fname.endswith(".json"):
+                with open(os.path.join(self.tmpdir,fname),"r") as f:
+                    recs.append ( json.load(f) )
+                os.remove ( os.path.join(self.tmpdir,fname) )
+        return recs
+
+
+@pytest.fixture
+def stubs ( tmp_path,monkeypatch ):
+    monkeypatch.chdir ( tmp_path )
+    for var in command.thread_env_vars:
+        monkeypatch.delenv ( var,raising=False )
+    saved = ( command.core_budget,getattr(command._thread_share,"nthreads",None) )
+    s = Stubs ( tmp_path )
+    yield s
+    s.flog.close()
+    command.setCoreBudget  ( saved[0] )
+    command.setThreadShare ( saved[1] )
+
+
+def budget ( ncores ):
+    command.setCoreBudget  ( ncores )
+    command.setThreadShare ( ncores )
+    return
+
+
+# ============================================================================
+
+def test_no_budget ( stubs ):
+    # programs are started unchanged
+    budget ( None )
+    rec = stubs.run ( "phaser",[],"MODE MR_AUTO\nEND\n" )[0]
+    assert rec["env"]["OMP_NUM_THREADS"] is None
+    assert rec["stdin"]=="MODE MR_AUTO\nEND\n"
+
+
+def test_whole_budget ( stubs ):
+    budget ( 4 )
+    rec = stubs.run ( "stub",["a"] )[0]
+    assert rec["argv"]==["a"]
+    assert all([rec["env"][v]=="4" for v in command.thread_env_vars]),rec["env"]
+
+
+def test_caller_variables_kept ( stubs ):
+    budget ( 4 )
+    env = dict ( os.environ )
+    env["OMP_NUM_THREADS"] = "2"
+    rec = stubs.run ( "stub",env=env )[0]
+    assert rec["env"]["OMP_NUM_THREADS"]=="2" and rec["env"]["MKL_NUM_THREADS"]=="4"
+
+
+def test_thread_options ( stubs ):
+    budget ( 4 )
+    rec = stubs.run ( "phaser",[],"MODE MR_AUTO\nEND\n" )[0]
+    assert rec["stdin"]=="JOBS 4\nMODE MR_AUTO\nEND\n"
+    rec = stubs.run ( "phaser",[],"MODE MR_AUTO\nJOBS 1\nEND\n" )[0]
+    assert rec["stdin"]=="MODE MR_AUTO\nJOBS 1\nEND\n"
+    assert stubs.run("shelxd",["x_fa"])[0]["argv"]==["x_fa","-t4"]
+    assert stubs.run("shelxd",["x_fa","-t2"])[0]["argv"]==["x_fa","-t2"]
+    rec = stubs.run ( "shelxd",["x_fa"],nthreads=1 )[0]
+    assert rec["argv"]==["x_fa","-t1"] and rec["env"]["OMP_NUM_THREADS"]=="1"
+
+
+def test_worker_share ( stubs ):
+    budget ( 4 )
+    result = []
+    def worker():
+        with command.core_share ( command.shareCores(2) ):
+            result.extend ( stubs.run("stub") )
+    t = threading.Thread ( target=worker )
+    t.start()
+    t.join()
+    assert result[0]["env"]["OMP_NUM_THREADS"]=="2"
+    assert command.threadShare()==4
+
+
+def test_pool_slot_shares ( stubs ):
+    budget ( 4 )
+    pool = command.app_pool ( max_procs=2 )
+    for i in range(3):
+        stubs.start ( pool,[str(i)] )
+    stubs.start ( pool,["3"],nthreads=3 )
+    assert not any([rc.msg for rc in pool.wait_all()])
+    threads = dict ( [(r["argv"][0],r["env"]["OMP_NUM_THREADS"])
+                      for r in stubs.records()] )
+    assert threads=={"0":"2","1":"2","2":"2","3":"3"}
+
+
+def test_pools_scratch_files ( stubs ):
+    # pools alive at the same time use distinct scratch files
+    budget ( 2 )
+    pools = [ command.app_pool(),command.app_pool() ]
+    hs    = [ stubs.start(pool,[str(i)]) for i,pool in enumerate(pools) ]
+    assert hs[0]._out_path!=hs[1]._out_path
+    for pool in pools:
+        assert not any([rc.msg for rc in pool.wait_all()])
+    assert len(stubs.records())==2
+
+
+def test_split_cores():
+    assert command.splitCores(3,4)==[2,1,1]
+    assert command.splitCores(8,4)==[1]*8
+    assert command.splitCores(2,5)==[3,2]
+
+
+def test_allocated_cores ( monkeypatch ):
+    ncpus = os.cpu_count() or 1
+    if hasattr(os,"sched_getaffinity"):
+        ncpus = len ( os.sched_getaffinity(0) )
+    monkeypatch.delenv ( "NSLOTS",raising=False )
+    monkeypatch.setenv ( "SLURM_CPUS_PER_TASK","1" )
+    # ncores parameter takes precedence over queue allocation
+    assert command.allocatedCores("SLURM","3")==min(3,ncpus)
+    assert command.allocatedCores("SLURM",None)==1
+    assert command.allocatedCores("SGE","x")==1
+    monkeypatch.setenv ( "NSLOTS","2" )
+    monkeypatch.delenv ( "SLURM_CPUS_PER_TASK" )
+    assert command.allocatedCores("SGE",None)==min(2,ncpus)
+    assert command.allocatedCores("SGE","1")==1
+    # up to 4 cores for local jobs only if ncores is not given
+    assert command.allocatedCores("SHELL",None)==min(4,ncpus)
+    assert command.allocatedCores("SHELL","1")==1
+    assert command.allocatedCores("SHELL","2")==min(2,ncpus)
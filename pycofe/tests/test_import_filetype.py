@@ -0,0 +1,57 @@
+##!/usr/bin/python
+
+#
+# ============================================================================
+#
+#    18.10.26   <--  Date of Last Modification.
+#                   ~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+# ----------------------------------------------------------------------------
+#
+#  TESTS OF CIF TYPE DETECTION (pycofe.proc.import_filetype)
+#
+#  getFileType(), which uses sniffCIF() and checkCIF(), must give the same type as the full parse on
+#  synthetic ligand, library, jligand, coordinate and structure-factor CIFs,
+#  plain and gzipped, intact and damaged.
+#
+#  Copyright (C) Eugene Krissinel, Andrey Lebedev 2026
+#
+# ============================================================================
+#
+
+import os
+
+import pytest
+
+from pycofe.proc import import_filetype as ft
+
+# ============================================================================
+
+@pytest.fixture(scope="module")
+def cif_files ( tmp_path_factory ):
+    # coordinate and structure-factor files are larger than
+    # check_parse_limit, so that checkCIF() scans rather than parses them
+    dirpath = str ( tmp_path_factory.mktemp("cif") )
+    return ft._synthetic_cifs ( dirpath,natoms=30000,nrefl=80000 )
+
+
+def sniff ( fpath ):
+    return ft.getFileType ( os.path.basename(fpath),os.path.dirname(fpath),None )
+
+
+def test_large_files_are_scanned ( cif_files ):
+    sizes = [ os.path.getsize(fpath) for fpath,ftype in cif_files
+                                     if fpath.endswith("model.cif") ]
+    assert sizes[0]>ft.check_parse_limit
+
+
+def test_types ( cif_files ):
+    for fpath,expected in cif_files:
+        assert ft.parseCIFType(fpath)==expected, fpath
+        assert sniff(fpath)==expected, fpath
+
+
+def test_types_without_parsing ( cif_files,monkeypatch ):
+    # all files are checked by scanning
+    monkeypatch.setattr ( ft,"check_parse_limit",0 )
+    for fpath,expected in cif_files:
+        assert sniff(fpath)==expected, fpath
@@ -0,0 +1,64 @@
+##!/usr/bin/python
+
+#
+# ============================================================================
+#
+#    18.10.26   <--  Date of Last Modification.
+#                   ~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+# ----------------------------------------------------------------------------
+#
+#  TESTS OF UPLOAD PREPARATION (pycofe.proc.import_pipeline)
+#
+#  Concurrent preparation must give the same result as serial one, in order
+#  of files, and compressed uploads read by importers from gzip streams
+#  must not be decompressed.
+#
+#  Copyright (C) Eugene Krissinel, Andrey Lebedev 2026
+#
+# ============================================================================
+#
+
+import os
+
+import pytest
+
+from pycofe.varut import zutils
+from pycofe.proc  import import_filetype, import_pipeline
+
+# ============================================================================
+
+def prepare ( dirpath,nworkers ):
+    flist  = import_pipeline._synthetic_uploads ( dirpath,12,natoms=2000,nrefl=5000 )
+    result = import_pipeline.prepareFiles ( flist,dirpath,baseDirPath=dirpath,
+                                            nworkers=nworkers )
+    return flist,result
+
+
+@pytest.fixture(autouse=True)
+def cleanup():
+    yield
+    zutils.cleanup()
+
+
+def test_concurrent_same_as_serial ( tmp_path ):
+    os.mkdir ( str(tmp_path/"serial") )
+    os.mkdir ( str(tmp_path/"concurrent") )
+    flist,serial = prepare ( str(tmp_path/"serial"),1 )
+    zutils.cleanup()
+    flist,concurrent = prepare ( str(tmp_path/"concurrent"),4 )
+    assert concurrent==serial
+    assert [fpath+".gz" for fpath,ftype in serial]==flist
+
+
+def test_lazy_decompression ( tmp_path ):
+    dirpath = str ( tmp_path )
+    flist,result = prepare ( dirpath,2 )
+    types = dict ( result )
+    assert types["004_seq.fasta"]==import_filetype.ftype_Sequence()
+    for fpath,ftype in result:
+        if ftype in import_pipeline.lazy_types:
+            # read from compressed original
+            assert not os.path.exists(os.path.join(dirpath,fpath)), fpath
+            assert zutils.is_pending(os.path.join(dirpath,fpath))
+        else:
+            assert os.path.isfile(os.path.join(dirpath,fpath)), fpath
@@ -0,0 +1,69 @@
+##!/usr/bin/python
+
+#
+# ============================================================================
+#
+#    18.10.26   <--  Date of Last Modification.
+#                   ~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+# ----------------------------------------------------------------------------
+#
+#  TESTS OF LAZY JSON OBJECTS (pycofe.varut.jsonut)
+#
+#  Lazy objects and direct copies must give the same JSON as eager parsing
+#  and string round trips used before.
+#
+#  Copyright (C) Eugene Krissinel, Andrey Lebedev 2026
+#
+# ============================================================================
+#
+
+import json
+
+import pytest
+
+from pycofe.varut import jsonut
+
+# ============================================================================
+
+@pytest.fixture(scope="module")
+def json_str():
+    return jsonut._synthetic_databox ( nchains=30,nligands=5,nrevisions=2 )
+
+
+def test_parse_and_write ( json_str ):
+    b0 = jsonut._eager_jobj ( json.loads(json_str) )
+    b1 = jsonut.jObject ( json_str )
+    assert json.loads(b0.to_JSON())==json.loads(b1.to_JSON(compact=True))
+    assert jsonut.jObject(json_str).to_JSON()==b0.to_JSON()
+
+
+def test_copy_revision ( json_str ):
+    b0 = jsonut._eager_jobj ( json.loads(json_str) )
+    b1 = jsonut.jObject ( json_str )
+    c0 = jsonut._eager_jobj ( json.loads(b0.data.DataRevision[0].to_JSON()) )
+    c1 = jsonut.jObject ( jsonut.plain(b1.data.DataRevision[0]) )
+    assert c0.to_JSON()==c1.to_JSON()
+
+
+def test_typical_job ( json_str ):
+    # read databox, make object of each revision, touch a few fields and
+    # write output revision
+    box  = jsonut._eager_jobj ( json.loads(json_str) )
+    revs = [ jsonut._eager_jobj(json.loads(r.to_JSON())) for r in box.data.DataRevision ]
+    revs[0].ASU.nres += 1
+    j0   = revs[0].to_JSON()
+    box  = jsonut.jObject ( json_str )
+    revs = [ jsonut.jObject(jsonut.plain(r)) for r in box.data.DataRevision ]
+    revs[0].ASU.nres += 1
+    j1   = revs[0].to_JSON ( compact=True )
+    assert json.loads(j0)==json.loads(j1)
+
+
+def test_attributes():
+    A = jsonut.jObject()
+    A.name   = "Onur"
+    A.dog    = jsonut.jObject()
+    A.dog.name = "Apollo"
+    A.array2 = ['a','b','c']
+    B = jsonut.jObject ( A.to_JSON() )
+    assert B.name=="Onur" and B.dog.name=="Apollo" and B.array2[1]=="b"
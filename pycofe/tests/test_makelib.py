@@ -0,0 +1,67 @@
+##!/usr/bin/python
+
+#
+# ============================================================================
+#
+#    18.10.26   <--  Date of Last Modification.
+#                   ~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+# ----------------------------------------------------------------------------
+#
+#  TESTS OF LIGAND LIBRARY MERGING (pycofe.proc.makelib)
+#
+#  Dictionaries are made from a monomer library entry with changed
+#  component codes and merged in one pass.
+#
+#  Copyright (C) Eugene Krissinel, Andrey Lebedev 2026
+#
+# ============================================================================
+#
+
+import os
+
+import pytest
+
+gemmi = pytest.importorskip ( "gemmi" )
+
+from pycofe.proc import makelib
+
+# ============================================================================
+
+@pytest.fixture
+def ligands ( tmp_path ):
+    if not os.path.isfile(makelib._bench_template):
+        pytest.skip ( "no template dictionary" )
+    return makelib._bench_ligands ( makelib._bench_template,3,str(tmp_path) )
+
+
+def test_merge ( tmp_path,ligands ):
+    out_path = str ( tmp_path/"out.lib" )
+    # repeated dictionary is merged once
+    codes = makelib.mergeLibraries ( ligands + ligands[:1],out_path )
+    assert codes==["L00","L01","L02"]
+    doc = gemmi.cif.read_file ( out_path )
+    assert [block.name for block in doc]==["comp_list","comp_L00","comp_L01","comp_L02"]
+    table = doc.find_block("comp_list").find_mmcif_category ( "_chem_comp." )
+    assert len(table)==3
+    # definitions are copied unchanged
+    src = gemmi.cif.read_file ( ligands[1] )
+    assert len(doc.find_block("comp_L01").find_loop("_chem_comp_atom.atom_id"))==\
+           len(src.find_block("comp_L01").find_loop("_chem_comp_atom.atom_id"))
+
+
+def test_not_mergeable ( tmp_path,ligands ):
+    # nothing is written if any input cannot be merged in-process
+    bad = str ( tmp_path/"bad.cif" )
+    with open(bad,"w") as f:
+        f.write ( "data_global_\n_lib.name x\n" )
+    out_path = str ( tmp_path/"out.lib" )
+    assert makelib.mergeLibraries(ligands + [bad],out_path) is None
+    assert makelib.mergeLibraries([str(tmp_path/"none.cif")],out_path) is None
+    assert not os.path.exists(out_path)
+
+
+def test_single_library ( tmp_path,ligands ):
+    out_path = str ( tmp_path/"out.lib" )
+    makelib.mergeLibraryFiles ( None,ligands[:1],out_path )
+    with open(out_path) as f1, open(ligands[0]) as f2:
+        assert f1.read()==f2.read()
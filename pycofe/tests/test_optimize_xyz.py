@@ -0,0 +1,101 @@
+##!/usr/bin/python
+
+#
+# ============================================================================
+#
+#    18.10.26   <--  Date of Last Modification.
+#                   ~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+# ----------------------------------------------------------------------------
+#
+#  TESTS OF CHAIN ARRANGEMENT IN ASU (pycofe.proc.optimize_xyz)
+#
+#  Results on synthetic models are compared with a search which checks
+#  symmetry images one by one with gemmi.
+#
+#  Copyright (C) Eugene Krissinel 2026
+#
+# ============================================================================
+#
+
+import pytest
+
+gemmi = pytest.importorskip ( "gemmi" )
+
+from pycofe.proc import optimize_xyz
+
+# ============================================================================
+
+def nearest_op ( cell,ops,fp0,centres ):
+    # first symmetry image of fp0 closest to any of centres
+    dmin  = 0.0
+    opmin = None
+    df    = [0,0,0]
+    for op in ops:
+        fp = op.apply_to_xyz ( fp0.tolist() )
+        for i1 in range(5):
+            for i2 in range(5):
+                for i3 in range(5):
+                    f1 = [ (fp[0]%1)+i1-2,(fp[1]%1)+i2-2,(fp[2]%1)+i3-2 ]
+                    p1 = cell.orthogonalize ( gemmi.Fractional(*f1) )
+                    for c in centres:
+                        d1 = c.dist ( p1 )
+                        if not opmin or d1<dmin:
+                            opmin = op
+                            dmin  = d1
+                            df    = [ round(f1[i]-fp[i]) for i in range(3) ]
+    opmin = gemmi.Op ( opmin.triplet() )
+    opmin.tran = [ opmin.tran[i] + gemmi.Op.DEN*df[i] for i in range(3) ]
+    return opmin
+
+
+def move ( cell,op,atoms ):
+    for atom in atoms:
+        fxyz     = op.apply_to_xyz ( cell.fractionalize(atom.pos).tolist() )
+        atom.pos = cell.orthogonalize ( gemmi.Fractional(*fxyz) )
+
+
+def reference ( st ):
+    ops    = gemmi.SpaceGroup ( st.spacegroup_hm ).operations()
+    model  = st[0]
+    p0     = model[0].calculate_center_of_mass()
+    triplets = []
+    centres  = []
+    waters   = []
+    for chain in model:
+        if all([res.name in ("HOH","WAT") for res in chain]):
+            waters.append ( chain )
+        else:
+            fp0 = st.cell.fractionalize ( chain.calculate_center_of_mass() )
+            op  = nearest_op ( st.cell,ops,fp0,[p0] )
+            move ( st.cell,op,[atom for res in chain for atom in res] )
+            triplets.append ( op.triplet() )
+            centres.append  ( chain.calculate_center_of_mass() )
+    for chain in waters:
+        for res in chain:
+            fp0 = st.cell.fractionalize ( res[0].pos )
+            move ( st.cell,nearest_op(st.cell,ops,fp0,centres),res )
+    return triplets
+
+
+def positions ( st ):
+    return [ atom.pos.tolist() for chain in st[0] for res in chain for atom in res ]
+
+
+@pytest.mark.parametrize ( "spg",["P 21 21 21","P 61 2 2","C 1 2 1"] )
+def test_same_as_per_image_search ( spg ):
+    st  = optimize_xyz.makeTestStructure ( nchains=3,nwaters=40,spg=spg )
+    ref = optimize_xyz.makeTestStructure ( nchains=3,nwaters=40,spg=spg )
+    log = optimize_xyz.optimizeXYZ ( st )
+    triplets = reference ( ref )
+    assert [item["op"] for item in log if item["type"]!="Water"]==triplets
+    assert [item["type"] for item in log]==["Protein"]*3 + ["Water"]
+    for p,q in zip(positions(st),positions(ref)):
+        assert p==pytest.approx(q,abs=1.0e-6)
+
+
+def test_no_space_group():
+    st = optimize_xyz.makeTestStructure ( nchains=1,nwaters=4 )
+    st.spacegroup_hm = ""
+    xyz = positions ( st )
+    assert optimize_xyz.optimizeXYZ(st)==[]
+    assert positions(st)==xyz
@@ -0,0 +1,162 @@
+##!/usr/bin/python
+
+#
+# ============================================================================
+#
+#    18.10.26   <--  Date of Last Modification.
+#                   ~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+# ----------------------------------------------------------------------------
+#
+#  TESTS OF PAIREF SCHEDULER (pycofe.proc.pairef_sched)
+#
+#  Pairef's sequence of calls is replayed with refmac runs replaced by
+#  sleeps, as in the benchmark, and every call is recorded, so that
+#  dependencies between refmac runs and pairef's own functions can be
+#  checked.
+#
+#  Copyright (C) Eugene Krissinel, Andrey Lebedev 2026
+#
+# ============================================================================
+#
+
+import threading
+
+import pytest
+
+from pycofe.proc import pairef_sched
+
+# ============================================================================
+
+class Recorder(object):
+
+    def __init__ ( self ):
+        self.lock    = threading.Lock()
+        self.events  = []  # (event,name,key)
+        self.running = 0
+        self.maxrun  = 0
+        self.serial  = 0   # pairef functions running at the same time
+        self.overlap = False
+
+    def log ( self,event,name,key ):
+        with self.lock:
+            self.events.append ( (event,name,key) )
+
+    def wrap_refmac ( self,fn,fail=None ):
+        def run ( *args,**kwargs ):
+            key = ( kwargs.get("mode"),kwargs.get("flag"),args[0],args[2],
+                    kwargs.get("res_low",0) )
+            with self.lock:
+                self.running += 1
+                self.maxrun = max ( self.maxrun,self.running )
+            self.log ( "start","refmac",key )
+            try:
+                if key==fail:
+                    raise RuntimeError ( "refmac failed" )
+                return fn ( *args,**kwargs )
+            finally:
+                self.log ( "end","refmac",key )
+                with self.lock:
+                    self.running -= 1
+        return run
+
+    def wrap_call ( self,name,fn ):
+        def run ( *args,**kwargs ):
+            with self.lock:
+                self.serial += 1
+                self.overlap = self.overlap or self.serial>1
+            self.log ( "call",name,kwargs.get("flag") )
+            try:
+                return fn ( *args,**kwargs )
+            finally:
+                with self.lock:
+                    self.serial -= 1
+        return run
+
+
+names = list(pairef_sched._lane_calls) + list(pairef_sched._barrier_calls) +\
+        list(pairef_sched._report_calls)
+
+
+def replay ( ncores,complete,nshells=4,nflags=3,fail=None ):
+    rec = Recorder()
+    launcher,refinement = pairef_sched._bench_modules ( 0.002,3 )
+    refinement.refinement_refmac = rec.wrap_refmac ( refinement.refinement_refmac,fail )
+    for name in names:
+        setattr ( launcher,name,rec.wrap_call(name,getattr(launcher,name)) )
+    refinement.collect_stat_binned_refmac_low = rec.wrap_call (
+                "collect_stat_binned_refmac_low",
+                refinement.collect_stat_binned_refmac_low )
+    if ncores>1:
+        pairef_sched.Scheduler(ncores).install ( launcher,refinement )
+    shells    = [ 2.0-0.1*i for i in range(nshells+1) ]
+    flag_sets = list(range(nflags)) if complete else [0]
+    launcher.main ( shells,flag_sets,complete )
+    return rec
+
+
+def segments ( calls ):
+    # calls between functions using all free flags, in any order
+    segs = [ [] ]
+    for c in calls:
+        if c[0] in pairef_sched._barrier_calls:
+            segs += [ c,[] ]
+        else:
+            segs[-1].append ( c )
+    return [ s if isinstance(s,tuple) else sorted(s,key=str) for s in segs ]
+
+
+# ============================================================================
+
+@pytest.mark.parametrize ( "complete",[False,True] )
+def test_same_runs_as_serial ( complete ):
+    serial = replay ( 1,complete )
+    sched  = replay ( 4,complete )
+    runs   = lambda rec: sorted([ e[2] for e in rec.events if e[0]=="start" ])
+    calls  = lambda rec: [ e[1:] for e in rec.events if e[0]=="call" ]
+    assert runs(sched)==runs(serial)
+    # pairef's own functions are called one at a time, in pairef's order
+    # for every free flag and between functions using all free flags;
+    # progress reports are not delayed
+    assert segments(calls(sched))==segments(calls(serial))
+    for flag in range(3):
+        assert [c for c in calls(sched)  if c[1]==flag]==\
+               [c for c in calls(serial) if c[1]==flag]
+    assert not sched.overlap
+    assert serial.maxrun==1 and sched.maxrun>1
+
+
+def test_dependencies():
+    rec    = replay ( 4,True )
+    events = rec.events
+    pos    = dict ( [((e[0],e[2]),i) for i,e in enumerate(events) if e[1]=="refmac"] )
+    refine = dict ( [(key[1:3],key) for ev,key in pos if key[0] in ("refine","first")] )
+    for ev,key in pos:
+        if ev!="start":
+            continue
+        mode,flag,res_cur,res_high,res_low = key
+        if mode=="refine":
+            # refinement starts from model of previous step
+            prev = [ k for (f,r),k in refine.items() if f==flag and r>res_cur ]
+            prev = min ( prev,key=lambda k: k[2] )
+            assert pos[("end",prev)] < pos[("start",key)]
+        elif mode in ("prev_pair","comp"):
+            # evaluations use refined model of the same step
+            assert pos[("end",refine[(flag,res_cur)])] < pos[("start",key)]
+    # functions using all free flags see all runs finished
+    for i,e in enumerate(events):
+        if e[0]=="call" and e[1] in pairef_sched._barrier_calls:
+            started = [ k for ev,k in pos if ev=="start" and pos[("start",k)]<i ]
+            assert all([pos[("end",k)]<i for k in started]), e
+
+
+def test_failure_raised():
+    fail = ( "comp",1,1.8,2.0,0 )
+    with pytest.raises(RuntimeError):
+        replay ( 4,True,fail=fail )
+
+
+def test_parse_args():
+    assert pairef_sched.parseArgs(["pairef","--ncores","4","-x","a"])==(4,["pairef","-x","a"])
+    assert pairef_sched.parseArgs(["pairef","--ncores","x"])==(1,["pairef"])
+    assert pairef_sched.parseArgs(["pairef","--ncores","0"])==(1,["pairef"])
+    assert pairef_sched.parseArgs(["pairef"])==(1,["pairef"])
@@ -0,0 +1,136 @@
+##!/usr/bin/python
+
+#
+# ============================================================================
+#
+#    18.10.26   <--  Date of Last Modification.
+#                   ~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+# ----------------------------------------------------------------------------
+#
+#  TESTS OF REMOTE SERVICE POLLING (pycofe.varut.poller)
+#
+#  Poller is run against a local mock server, which reports jobs completed
+#  after given times and suggests retry intervals.
+#
+#  Copyright (C) Eugene Krissinel, Andrey Lebedev 2026
+#
+# ============================================================================
+#
+
+import json
+import time
+import threading
+import http.server
+
+import pytest
+
+from pycofe.varut import poller
+
+# ============================================================================
+
+def mock_server ( job_times,retry_after=None ):
+
+    t0 = time.time()
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+        def do_GET ( self ):
+            job = self.path.strip("/").split("/")[-1]
+            if job not in job_times:
+                self.send_response ( 404 )
+                self.end_headers()
+                return
+            status = "completed" if time.time()-t0>=job_times[job] else "running"
+            body   = json.dumps({ "id":job, "status":status }).encode("utf-8")
+            self.send_response ( 200 )
+            if retry_after is not None and status!="completed":
+                self.send_header ( "Retry-After",str(retry_after) )
+            self.send_header ( "Content-Type","application/json" )
+            self.send_header ( "Content-Length",str(len(body)) )
+            self.end_headers()
+            self.wfile.write ( body )
+        def log_message ( self,*args ):
+            pass
+
+    server = http.server.ThreadingHTTPServer ( ("127.0.0.1",0),Handler )
+    threading.Thread ( target=server.serve_forever,daemon=True ).start()
+    return server,"http://127.0.0.1:%d/status/" % server.server_address[1]
+
+
+def status_check ( transport,url ):
+    def check():
+        res = transport.request ( "GET",url )
+        if res.status!=200:
+            return (True,None,None)
+        obj = json.loads ( res.text )
+        return (obj["status"]=="completed",obj,poller.retryAfter(res.headers))
+    return check
+
+
+@pytest.fixture
+def server():
+    srv,url = mock_server ( {"a":0.3,"b":0.6,"c":0.1,"z":1.0e9} )
+    yield url
+    srv.shutdown()
+
+
+# ============================================================================
+
+def test_retry_after():
+    assert poller.retryAfter({"Retry-After":"3"})==3.0
+    assert poller.retryAfter({"retry-after":"soon"}) is None
+    assert poller.retryAfter({}) is None
+
+
+def test_delays():
+    p = poller.Poller ( first=1.0,maxwait=8.0,jitter=0.0 )
+    assert [p.nextDelay() for i in range(5)]==[1.0,2.0,4.0,8.0,8.0]
+    assert p.nextDelay(100.0)==8.0 and p.nextDelay(0.0)==1.0
+
+
+def test_single_item ( server ):
+    p = poller.Poller ( first=0.05,maxwait=0.2,jitter=0.1 )
+    done,obj = p.poll ( status_check(poller.UrllibTransport(),server+"a") )
+    assert done and obj["status"]=="completed" and p.nchecks>1
+    assert 0.3<=p.t_detect<0.3+0.25
+
+
+def test_several_items ( server ):
+    transport = poller.UrllibTransport()
+    p = poller.Poller ( first=0.05,maxwait=0.2,jitter=0.1 )
+    done,objs = p.pollAll ([ status_check(transport,server+j)
+                             for j in ("a","b","c") ])
+    assert done and [o["id"] for o in objs]==["a","b","c"]
+
+
+def test_progress_abandons ( server ):
+    transport = poller.UrllibTransport()
+    p = poller.Poller ( first=0.05,maxwait=0.2 )
+    done,objs = p.pollAll ([ status_check(transport,server+j)
+                             for j in ("b","x") ],
+                           progress=lambda values: None not in values )
+    assert not done and objs[1] is None and p.nchecks==1
+
+
+def test_timeout ( server ):
+    p = poller.Poller ( first=0.05,maxwait=0.2,timeout=0.3 )
+    done,obj = p.poll ( status_check(poller.UrllibTransport(),server+"z") )
+    assert not done
+
+
+def test_server_suggested_delay():
+    srv,url = mock_server ( {"a":0.5},retry_after=0.25 )
+    try:
+        p = poller.Poller ( first=0.01,maxwait=1.0,minwait=0.0,jitter=0.0 )
+        done,obj = p.poll ( status_check(poller.UrllibTransport(),url+"a") )
+        assert done and p.nchecks==3
+    finally:
+        srv.shutdown()
+
+
+def test_requests_transport ( server ):
+    pytest.importorskip ( "requests" )
+    transport = poller.RequestsTransport()
+    p = poller.Poller ( first=0.05,maxwait=0.2,jitter=0.1 )
+    done,objs = p.pollAll ([ status_check(transport,server+j)
+                             for j in ("a","b","c") ])
+    assert done and [o["id"] for o in objs]==["a","b","c"]
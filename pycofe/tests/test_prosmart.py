@@ -0,0 +1,121 @@
+##!/usr/bin/python
+
+#
+# ============================================================================
+#
+#    18.10.26   <--  Date of Last Modification.
+#                   ~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+# ----------------------------------------------------------------------------
+#
+#  TESTS OF PROSMART RESTRAINT GENERATION (pycofe.proc.prosmart)
+#
+#  ProSMART is replaced by the benchmark's stub program, which writes a
+#  restraint file for the model.
+#
+#  Copyright (C) Eugene Krissinel, Andrey Lebedev, Robert Nicholls 2026
+#
+# ============================================================================
+#
+
+import os
+import sys
+
+import pytest
+
+from pycofe.proc import prosmart
+
+# ============================================================================
+
+atom = "ATOM      1  CA  ALA A   1      11.104  13.207   9.600  1.00 20.00           C\n"
+
+
+class Body(prosmart._BenchBody):
+
+    def __init__ ( self,executable,nprocs ):
+        prosmart._BenchBody.__init__ ( self,executable,nprocs )
+        self.started = []
+        self.output  = []
+
+    def stdoutln ( self,line ):
+        self.output.append ( line )
+
+    def startApp ( self,appName,cmd,logType="Main" ):
+        self.started.append ( cmd )
+        return prosmart._BenchBody.startApp ( self,appName,cmd,logType )
+
+
+@pytest.fixture
+def workdir ( tmp_path,monkeypatch ):
+    monkeypatch.chdir ( tmp_path )
+    monkeypatch.delenv ( "PROSMART_CACHE",raising=False )
+    stub = str ( tmp_path/"prosmart" )
+    with open(stub,"w") as f:
+        f.write ( "#!" + sys.executable + "\n" + prosmart._stub_program % 0.05 )
+    os.chmod ( stub,0o755 )
+    for fname in ("model.pdb","homolog.pdb","dna.pdb"):
+        with open(fname,"w") as f:
+            f.write ( "REMARK  " + fname + "\n" + atom )
+    return stub
+
+
+def passes():
+    return [
+        prosmart.Pass ( "protein restraints","out_protein","model.pdb",["homolog.pdb"],["-side"] ),
+        prosmart.Pass ( "nucleic acid restraints","out_dnarna","model.pdb",["dna.pdb"],["-dna_rna"] ),
+        prosmart.Pass ( "h-bond restraints","out_hbond","model.pdb",[],[] )
+    ]
+
+
+def contents ( files ):
+    result = []
+    for fpath in files:
+        with open(fpath,"r") as f:
+            result.append ( f.read() )
+    return result
+
+
+# ============================================================================
+
+def test_coordinate_hash ( tmp_path ):
+    fpaths = [ str(tmp_path/name) for name in ("a.pdb","b.pdb","c.pdb","d.cif") ]
+    for fpath,text in zip(fpaths,[ "REMARK a\n" + atom,"REMARK b\n" + atom,
+                                   atom.replace("20.00","30.00"),"data_x\n" ]):
+        with open(fpath,"w") as f:
+            f.write ( text )
+    h = [ prosmart.coordinateHash(fpath) for fpath in fpaths ]
+    assert h[0]==h[1] and h[0]!=h[2] and len(set(h))==3
+    key = prosmart.makeKey ( fpaths[0],[fpaths[2]],["-side"] )
+    assert key==prosmart.makeKey ( fpaths[1],[fpaths[2]],["-side"] )
+    assert key!=prosmart.makeKey ( fpaths[0],[fpaths[2]],[] )
+    assert key!=prosmart.makeKey ( fpaths[0],[],["-side"] )
+
+
+def test_concurrent_passes ( workdir ):
+    body  = Body ( workdir,3 )
+    files = prosmart.run ( body,passes() )
+    assert files==[ os.path.join(d,"model.txt") for d in
+                        ("out_protein","out_dnarna","out_hbond") ]
+    assert all([os.path.isfile(f) for f in files])
+    assert body.started[0]==[ "-quick","-o","out_protein","-p1","model.pdb",
+                              "-p2","homolog.pdb","-side" ]
+    assert body.started[2]==[ "-quick","-o","out_hbond","-p1","model.pdb" ]
+    assert "3 pass(es), 0 from cache" in body.output[0]
+
+
+def test_cache ( workdir,tmp_path,monkeypatch ):
+    monkeypatch.setenv ( "PROSMART_CACHE",str(tmp_path/"cache") )
+    body  = Body ( workdir,3 )
+    made  = contents ( prosmart.run(body,passes()) )
+    assert len(body.started)==3
+    # same model in another job directory
+    os.mkdir ( str(tmp_path/"job2") )
+    monkeypatch.chdir ( tmp_path/"job2" )
+    for fname in ("model.pdb","homolog.pdb","dna.pdb"):
+        with open(fname,"w") as f:
+            f.write ( "REMARK  another job\n" + atom )
+    body   = Body ( workdir,3 )
+    plist  = passes()
+    cached = contents ( prosmart.run(body,plist) )
+    assert not body.started and cached==made
+    assert all([p.cached and p.time>0.0 for p in plist])
+    assert "3 from cache" in body.output[0]
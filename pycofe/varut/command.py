@@ -3,13 +3,13 @@
 #
 # ============================================================================
 #
-#    20.10.24   <--  Date of Last Modification.
+#    18.10.26   <--  Date of Last Modification.
 #                   ~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 # ----------------------------------------------------------------------------
 #
 #  APPLICATION CALL ROUTINES
 #
-#  Copyright (C) Eugene Krissinel, Andrey Lebedev 2017-2024
+#  Copyright (C) Eugene Krissinel, Andrey Lebedev 2017-2026
 #
 # ============================================================================
 #
@@ -20,6 +20,9 @@ import time
 import subprocess
 import traceback
 import platform
+import shutil
+import itertools
+import threading
 
 try:
     from time import process_time
@@ -50,20 +53,21 @@ class comrc():
 
 sys_time  = 0
 user_time = 0
+_times_lock = threading.Lock()  # call() may be used from worker threads
 
 def _add_times ( rc ):
     global sys_time,user_time
-    sys_time  += rc.stime/3600.0
-    user_time += rc.utime/3600.0
+    with _times_lock:
+        sys_time  += rc.stime/3600.0
+        user_time += rc.utime/3600.0
     return
 
 def getTimes():
     return [sys_time,user_time]
 
 
-def call ( executable,command_line,job_dir,stdin_fname,file_stdout,
-           file_stderr,log_parser=None,citation_ref=None,file_stdout_alt=None,
-           env=None,work_dir="." ):
+def _write_header ( executable,command_line,stdin_fname,file_stdout,
+                    file_stdout_alt=None ):
 
     msg = "\n" + "="*80 + "\n" +\
           time.strftime("## Run %Y-%m-%d at %H:%M:%S on ") + platform.uname()[1] +\
@@ -89,19 +93,16 @@ def call ( executable,command_line,job_dir,stdin_fname,file_stdout,
     if file_stdout_alt:
         file_stdout_alt.write ( msg + "\n" )
 
-    file_stdin = None
     if stdin_fname:
         msg = "\n" + "-"*80 + "\n## KEYWORD INPUT:\n\n"
         file_stdout.write ( msg )
         if file_stdout_alt:
             file_stdout_alt.write ( msg )
-        file_stdin = open ( stdin_fname,"r" )
-        msg = file_stdin.read()
+        with open(stdin_fname,"r") as file_stdin:
+            msg = file_stdin.read()
         file_stdout.write ( msg )
         if file_stdout_alt:
             file_stdout_alt.write ( msg )
-        file_stdin.close  ()
-        file_stdin = open ( stdin_fname,"r" )
 
     file_stdout.write ( "\n" + "="*80 + "\n\n" )
     file_stdout.flush()
@@ -109,6 +110,54 @@ def call ( executable,command_line,job_dir,stdin_fname,file_stdout,
         file_stdout_alt.write ( "\n" + "="*80 + "\n\n" )
         file_stdout_alt.flush()
 
+    return
+
+
+def _write_footer ( executable,rc,file_stdout,file_stderr,citation_ref ):
+
+    file_stdout.write ( "\n" + "-"*80 + "\n" )
+    file_stdout.write ( "   user time  : " + str(rc.utime) + " (sec)\n" )
+    file_stdout.write ( "   sys time   : " + str(rc.stime) + " (sec)\n" )
+    file_stdout.write ( "   memory used: " + str(rc.umem ) + " (MB)\n" )
+    file_stdout.write ( "-"*80 + "\n" )
+
+    _add_times ( rc )
+
+    # fetch citations
+    if citation_ref:
+        citations.addCitation ( citation_ref )
+    else:
+        citations.addCitation ( executable )
+
+    if rc.msg:
+        msg = ' *** error running {0}: {1}'.format(executable, rc.msg)
+        file_stdout.write(msg)
+        file_stderr.write(msg)
+
+    file_stdout.flush()
+    file_stderr.flush()
+
+    return
+
+
+def call ( executable,command_line,job_dir,stdin_fname,file_stdout,
+           file_stderr,log_parser=None,citation_ref=None,file_stdout_alt=None,
+           env=None,work_dir=".",nthreads=None ):
+
+    # nthreads -- number of threads for the program; by default, the share of
+    #             core budget given to calling thread (see core budget below)
+    if nthreads is None:
+        nthreads = threadShare()
+    command_line,env = applyThreads ( executable,command_line,stdin_fname,
+                                      env,nthreads )
+
+    _write_header ( executable,command_line,stdin_fname,file_stdout,
+                    file_stdout_alt )
+
+    file_stdin = None
+    if stdin_fname:
+        file_stdin = open ( stdin_fname,"r" )
+
     rc = comrc()
     try:
         iswindows = sys.platform.startswith("win")
@@ -138,26 +187,373 @@ def call ( executable,command_line,job_dir,stdin_fname,file_stdout,
     if file_stdin:
         file_stdin.close()
 
-    file_stdout.write ( "\n" + "-"*80 + "\n" )
-    file_stdout.write ( "   user time  : " + str(rc.utime) + " (sec)\n" )
-    file_stdout.write ( "   sys time   : " + str(rc.stime) + " (sec)\n" )
-    file_stdout.write ( "   memory used: " + str(rc.umem ) + " (MB)\n" )
-    file_stdout.write ( "-"*80 + "\n" )
+    _write_footer ( executable,rc,file_stdout,file_stderr,citation_ref )
 
-    _add_times ( rc )
+    return rc
 
-    # fetch citations
-    if citation_ref:
-        citations.addCitation ( citation_ref )
-    else:
-        citations.addCitation ( executable )
 
-    if rc.msg:
-        msg = ' *** error running {0}: {1}'.format(executable, rc.msg)
-        file_stdout.write(msg)
-        file_stderr.write(msg)
+# ============================================================================
+# Core budget
+#
+#  Job is given a budget of cores (setCoreBudget(), done by TaskDriver from
+#  job manager's allocation), which is passed to every program started by
+#  call() or app_pool as number of threads: thread-count variables of
+#  common parallel runtimes (OpenMP, MKL, OpenBLAS) are set in program's
+#  environment, and programs with own thread options (see thread_options)
+#  get them added to their command line or keyword input, unless they are
+#  already given there by the caller. Programs run by app_pool share the
+#  budget equally between concurrency slots. Code which runs programs from
+#  worker threads takes a share of the budget for every worker with
+#
+#    with command.core_share ( command.shareCores(nworkers) ):
+#        command.call ( ... )
+#
+#  or with setThreadShare() as thread pool initializer. Without budget
+#  (setCoreBudget() not called), programs are started unchanged.
 
-    file_stdout.flush()
-    file_stderr.flush()
+core_budget     = None
+thread_env_vars = [ "OMP_NUM_THREADS","MKL_NUM_THREADS","OPENBLAS_NUM_THREADS" ]
 
-    return rc
+_thread_share = threading.local()
+
+
+def allocatedCores ( job_manager,ncores_param ):
+    # number of cores given to the job: "ncores" command-line parameter, or,
+    # if it is not given, allocation made by queue where it can be found in
+    # the environment, or up to 4 cores when job runs locally; not more than
+    # the number of cores the job is allowed to run on
+    ncpus  = os.cpu_count() or 1
+    if hasattr(os,"sched_getaffinity"):
+        ncpus = len ( os.sched_getaffinity(0) )
+    ncores = 0
+    try:
+        ncores = int ( ncores_param )
+    except (TypeError,ValueError):
+        pass
+    if ncores<1:
+        if job_manager=="SHELL":
+            ncores = 4
+        else:
+            for var in ( "SLURM_CPUS_PER_TASK","NSLOTS" ):  # SLURM, SGE
+                try:
+                    ncores = int ( os.environ[var] )
+                    break
+                except (KeyError,ValueError):
+                    pass
+    return max ( 1,min(ncores,ncpus) )
+
+
+def setCoreBudget ( ncores ):
+    global core_budget
+    core_budget = None
+    if ncores:
+        core_budget = max ( 1,int(ncores) )
+    return
+
+def getCoreBudget():
+    return core_budget
+
+
+def splitCores ( nparts,ncores=None ):
+    # splits budget (or ncores, if given) between nparts programs; returns
+    # list of numbers of threads, at least 1 each
+    ncores = ncores or core_budget or 1
+    nparts = max ( 1,int(nparts) )
+    return [ max(1,ncores//nparts + (1 if i<ncores%nparts else 0))
+             for i in range(nparts) ]
+
+def shareCores ( nparts ):
+    # equal share of budget for nparts concurrent programs, or None if there
+    # is no budget
+    if core_budget is None:
+        return None
+    return max ( 1,core_budget//max(1,int(nparts)) )
+
+
+def setThreadShare ( nthreads ):
+    _thread_share.nthreads = nthreads
+    return
+
+def threadShare():
+    # threads for programs started from calling thread
+    return getattr ( _thread_share,"nthreads",core_budget )
+
+class core_share(object):
+
+    def __init__ ( self,nthreads ):
+        self.nthreads = nthreads
+
+    def __enter__ ( self ):
+        self.saved = getattr ( _thread_share,"nthreads",core_budget )
+        setThreadShare ( self.nthreads )
+        return self
+
+    def __exit__ ( self,*args ):
+        setThreadShare ( self.saved )
+        return False
+
+
+def _phaser_threads ( command_line,stdin_fname,nthreads ):
+    # keyword JOBS is put at the top of keyword input if not given
+    if stdin_fname and os.path.isfile(stdin_fname):
+        with open(stdin_fname,"r") as f:
+            script = f.read()
+        if not any([line.strip().upper().startswith("JOBS")
+                    for line in script.splitlines()]):
+            with open(stdin_fname,"w") as f:
+                f.write ( "JOBS " + str(nthreads) + "\n" + script )
+    return command_line
+
+def _shelxd_threads ( command_line,stdin_fname,nthreads ):
+    if not any([str(c).startswith("-t") for c in command_line]):
+        return command_line + [ "-t" + str(nthreads) ]
+    return command_line
+
+# program name -> function ( command_line,stdin_fname,nthreads ) returning
+# command line with program's thread options
+thread_options = {
+    "phaser" : _phaser_threads,
+    "shelxd" : _shelxd_threads
+}
+
+
+def appName ( executable ):
+    # program name without path and extension, e.g. "phaser" for
+    # "/ccp4/bin/phaser.exe"
+    name = os.path.basename ( str(executable) ).lower()
+    for ext in (".exe",".bat",".cmd"):
+        if name.endswith(ext):
+            name = name[:-len(ext)]
+    return name
+
+
+def applyThreads ( executable,command_line,stdin_fname,env,nthreads ):
+    # returns command line and environment for running program with given
+    # number of threads; arguments are returned unchanged if nthreads is None.
+    # Thread-count variables already set in env (if given) are kept.
+    if not nthreads:
+        return (command_line,env)
+    environ = dict ( env if env else os.environ )
+    for var in thread_env_vars:
+        if not env or var not in env:
+            environ[var] = str(nthreads)
+    name = appName ( executable )
+    if name in thread_options:
+        command_line = thread_options[name] ( list(command_line),stdin_fname,
+                                              nthreads )
+    return (command_line,environ)
+
+
+# ============================================================================
+# Asynchronous calls
+#
+#  Independent programs may be run concurrently:
+#
+#    pool = command.app_pool()         # limit from setMaxProcesses()
+#    h1   = pool.start ( "cfft",cmd1,job_dir,None,file_stdout,file_stderr )
+#    h2   = pool.start ( "cfft",cmd2,job_dir,None,file_stdout,file_stderr )
+#    rcs  = pool.wait_all()           # [h1.rc,h2.rc]
+#
+#  Arguments of start() are the same as in call(). Output of every program is
+#  buffered in a scratch file and written to file_stdout (through log_parser,
+#  if given) only when the program finishes and all programs started before
+#  it have been written out, so that logs stay contiguous and appear in the
+#  same order, with the same citations, as if call() was used sequentially.
+#  Resource usage is obtained for every child individually and returned in
+#  comrc, as in call(). Programs which cannot start immediately because of
+#  the concurrency limit are queued and started as running ones finish.
+#  Unless nthreads is given in start(), every program gets equal share of
+#  core budget for the number of concurrency slots.
+
+max_processes = 1   # default concurrency limit, see setMaxProcesses()
+
+_scratch_lock   = threading.Lock()
+_scratch_serial = itertools.count()  # numbers scratch files of all pools
+
+def setMaxProcesses ( nproc ):
+    global max_processes
+    max_processes = max ( 1,int(nproc) )
+    return
+
+
+class app_handle(object):
+
+    def __init__ ( self,executable,command_line,job_dir,stdin_fname,
+                   file_stdout,file_stderr,log_parser=None,citation_ref=None,
+                   file_stdout_alt=None,env=None,work_dir=".",notify=None,
+                   nthreads=None ):
+        self.executable      = executable
+        self.command_line    = command_line
+        self.job_dir         = job_dir
+        self.stdin_fname     = stdin_fname
+        self.file_stdout     = file_stdout
+        self.file_stderr     = file_stderr
+        self.log_parser      = log_parser
+        self.citation_ref    = citation_ref
+        self.file_stdout_alt = file_stdout_alt
+        self.env             = env
+        self.work_dir        = work_dir
+        self.nthreads        = nthreads
+        self.rc              = None   # comrc when finished
+        self.written         = False  # True when output was written to logs
+        self._out_path       = None
+        self._err_path       = None
+        self._done           = threading.Event()
+        self._notify         = notify  # event set when program finishes
+        self._failed         = None    # message if program could not start
+        return
+
+    def _launch ( self ):
+        # starts program with output redirected to scratch files and a thread
+        # waiting for its termination
+        with _scratch_lock:
+            serial_no = next ( _scratch_serial )
+        self._out_path = "_async_" + str(os.getpid()) + "_" + str(serial_no) + ".log"
+        self._err_path = "_async_" + str(os.getpid()) + "_" + str(serial_no) + ".err"
+        file_stdin = None
+        try:
+            self.command_line,self.env = applyThreads ( self.executable,
+                    self.command_line,self.stdin_fname,self.env,self.nthreads )
+            if self.stdin_fname:
+                file_stdin = open ( self.stdin_fname,"r" )
+            environ = self.env
+            if not environ:
+                environ = os.environ
+            with open(self._out_path,"w") as fout, open(self._err_path,"w") as ferr:
+                if sys.platform.startswith("win"):
+                    self._t1 = process_time()
+                p = subprocess.Popen ( [self.executable] + self.command_line,
+                                       shell=False,stdin=file_stdin,
+                                       stdout=fout,stderr=ferr,env=environ,
+                                       cwd=self.work_dir )
+        except Exception as e:
+            self._failed = str(e)
+            self.rc      = comrc()
+            self.rc.msg  = self._failed
+            self._finished()
+        else:
+            t = threading.Thread ( target=self._wait,args=(p,) )
+            t.daemon = True
+            t.start()
+        if file_stdin:
+            file_stdin.close()
+        return
+
+    def _wait ( self,p ):
+        try:
+            if sys.platform.startswith("win"):
+                rc = comrc ( [0,p.wait()],process_time()-self._t1 )
+            else:
+                rc = comrc ( os.wait4(p.pid,0) )
+        except Exception as e:
+            rc     = comrc()
+            rc.msg = str(e)
+        self.rc = rc
+        self._finished()
+        return
+
+    def _finished ( self ):
+        self._done.set()
+        if self._notify:
+            self._notify.set()
+        return
+
+    def done ( self ):
+        return self._done.is_set()
+
+    def _write_out ( self ):
+        # writes buffered output to logs exactly as call() would do
+        _write_header ( self.executable,self.command_line,self.stdin_fname,
+                        self.file_stdout,self.file_stdout_alt )
+        if self._out_path and os.path.isfile(self._out_path):
+            if self.log_parser:
+                with open(self._out_path,"rb") as fout:
+                    self.log_parser.parse_stream ( fout,ostream=self.file_stdout )
+            else:
+                with open(self._out_path,"r") as fout:
+                    shutil.copyfileobj ( fout,self.file_stdout )
+            os.remove ( self._out_path )
+        if self._err_path and os.path.isfile(self._err_path):
+            with open(self._err_path,"r") as ferr:
+                shutil.copyfileobj ( ferr,self.file_stderr )
+            os.remove ( self._err_path )
+        if self._failed:
+            self.file_stderr.write ( " ***** " + self._failed )
+        _write_footer ( self.executable,self.rc,self.file_stdout,
+                        self.file_stderr,self.citation_ref )
+        self.written = True
+        return
+
+
+class app_pool(object):
+
+    def __init__ ( self,max_procs=None ):
+        self.max_procs = max_procs or max_processes
+        self.handles   = []  # all handles in order of start() calls
+        self._nstarted = 0
+        self._nwritten = 0
+        self._changed  = threading.Event()
+        return
+
+    def start ( self,executable,command_line,job_dir,stdin_fname,file_stdout,
+                file_stderr,log_parser=None,citation_ref=None,
+                file_stdout_alt=None,env=None,work_dir=".",nthreads=None ):
+        if nthreads is None:
+            nthreads = threadShare()
+            if nthreads:
+                nthreads = max ( 1,nthreads//self.max_procs )
+        h = app_handle ( executable,command_line,job_dir,stdin_fname,
+                         file_stdout,file_stderr,log_parser=log_parser,
+                         citation_ref=citation_ref,file_stdout_alt=file_stdout_alt,
+                         env=env,work_dir=work_dir,notify=self._changed,
+                         nthreads=nthreads )
+        self.handles.append ( h )
+        self._schedule()
+        return h
+
+    def _nrunning ( self ):
+        n = 0
+        for h in self.handles[:self._nstarted]:
+            if not h.done():
+                n += 1
+        return n
+
+    def _schedule ( self ):
+        # starts queued programs while there are free slots
+        nfree = self.max_procs - self._nrunning()
+        while nfree>0 and self._nstarted<len(self.handles):
+            self.handles[self._nstarted]._launch()
+            self._nstarted += 1
+            nfree -= 1
+        return
+
+    def _flush_finished ( self ):
+        # writes out logs of finished programs in order of start() calls
+        while self._nwritten<self._nstarted and \
+              self.handles[self._nwritten].done():
+            self.handles[self._nwritten]._write_out()
+            self._nwritten += 1
+        return
+
+    def wait ( self,handle ):
+        # waits until given program finishes and its log is written; returns
+        # its comrc
+        while not handle.written:
+            self._changed.clear()
+            self._schedule()
+            self._flush_finished()
+            if not handle.written:
+                # wake up when any program finishes; timeout is a safeguard
+                self._changed.wait ( 1.0 )
+        self._schedule()
+        return handle.rc
+
+    def wait_all ( self ):
+        # waits for all programs; returns list of comrc in order of start()
+        if self.handles:
+            self.wait ( self.handles[-1] )
+        rcs = [h.rc for h in self.handles]
+        self.handles   = []
+        self._nstarted = 0
+        self._nwritten = 0
+        return rcs
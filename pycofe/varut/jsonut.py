@@ -3,19 +3,106 @@
 #
 # ============================================================================
 #
-#    08.07.24   <--  Date of Last Modification.
+#    18.10.26   <--  Date of Last Modification.
 #                   ~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 # ----------------------------------------------------------------------------
 #
 #  JSON HANDLING CLASS
 #
-#  Copyright (C) Eugene Krissinel, Andrey Lebedev 2017-2024
+#  Copyright (C) Eugene Krissinel, Andrey Lebedev 2017-2026
 #
 # ============================================================================
 #
 
 import json
 import re
+import threading
+
+# ============================================================================
+#
+#  JSON trees are converted into objects lazily: only the top-level object is
+#  built when JSON is parsed, while nested objects keep their parsed JSON
+#  dictionaries and are built on first access to any of their attributes
+#  (or __dict__, e.g. through vars()). Untouched nested objects are written
+#  back to JSON from these dictionaries directly and are shared, without
+#  copying, between copies of the tree made with plain() (such as in
+#  databox.make_class()). Raw dictionaries are therefore never modified:
+#  building an object takes fresh copies of everything mutable.
+
+_RAW  = "_jsonut_raw_"  # attribute keeping JSON dictionary of a lazy object
+_lock = threading.Lock()  # objects may be first accessed from worker threads
+
+
+def _copy_raw ( v ):
+    # deep copy of JSON (sub)tree
+    if isinstance(v,dict):
+        return dict([(k,_copy_raw(x)) for k,x in v.items()])
+    if isinstance(v,list):
+        return [_copy_raw(x) for x in v]
+    return v
+
+
+def _make ( d ):
+    # object for dictionary d, built lazily
+    obj = _lazy_jobj.__new__ ( _lazy_jobj )
+    object.__setattr__ ( obj,_RAW,d )
+    return obj
+
+
+def _fill ( obj,d ):
+    # sets obj's attributes from dictionary d: nested dictionaries become
+    # (lazy) objects, in lists too; lists of lists are copied as they are
+    od = object.__getattribute__ ( obj,"__dict__" )
+    for a, b in d.items():
+        if isinstance(b,dict):
+            od[a] = _make ( b )
+        elif isinstance(b,(list,tuple)):
+            od[a] = [_make(x) if isinstance(x,dict) else _copy_raw(x) for x in b]
+        else:
+            od[a] = b
+    return
+
+
+def _json_key ( k ):
+    # dictionary keys as json.dumps() would write them
+    if isinstance(k,str):
+        return k
+    if k is True:   return "true"
+    if k is False:  return "false"
+    if k is None:   return "null"
+    return str(k)
+
+
+def plain ( v ):
+    # Returns JSON tree (dictionaries, lists and scalars) equal to
+    # json.loads(json.dumps(v,default=lambda o: o.__dict__)), without the
+    # string round trip. Dictionaries of unmaterialised objects are shared
+    # with the source and must not be modified; use to_dict() for a tree
+    # which may be modified.
+    if v is None or type(v) in (str,int,float,bool):
+        return v
+    if isinstance(v,__jobj__):
+        od = object.__getattribute__ ( v,"__dict__" )
+        if _RAW in od:
+            return od[_RAW]
+        return dict([(_json_key(k),plain(x)) for k,x in od.items()])
+    if isinstance(v,dict):
+        return dict([(_json_key(k),plain(x)) for k,x in v.items()])
+    if isinstance(v,(list,tuple)):
+        return [plain(x) for x in v]
+    if isinstance(v,bool):  return bool(v)
+    if isinstance(v,int):   return int(v)
+    if isinstance(v,float): return float(v)
+    if isinstance(v,str):   return str(v)
+    return plain ( v.__dict__ )
+
+
+def _json_default ( o ):
+    od = object.__getattribute__ ( o,"__dict__" )
+    if _RAW in od:
+        return od[_RAW]
+    return od
+
 
 class __jobj__(object):
 
@@ -25,11 +112,7 @@ class __jobj__(object):
 
     def parse_json ( self,d ):
         if d:
-            for a, b in list(d.items()):
-                if isinstance(b, (list, tuple)):
-                   setattr(self, a, [__jobj__(x) if isinstance(x, dict) else x for x in b])
-                else:
-                   setattr(self, a, __jobj__(b) if isinstance(b, dict) else b)
+            _fill ( self,d )
         return
 
     def set_field ( self,name,value ):
@@ -39,11 +122,45 @@ class __jobj__(object):
     def get_field ( self,name ):
         return getattr ( self,name,None )
 
-    def to_JSON(self):
-        return json.dumps(self, default=lambda o: o.__dict__, sort_keys=True, indent=2)
+    def to_JSON ( self,compact=False ):
+        # compact=True omits indentation and spaces, which gives smaller
+        # files that are faster to write and parse
+        if compact:
+            return json.dumps ( self,default=_json_default,sort_keys=True,
+                                separators=(",",":") )
+        return json.dumps ( self,default=_json_default,sort_keys=True,indent=2 )
 
     def to_dict(self):
-        return json.loads(json.dumps(self, default=lambda o: o.__dict__))
+        return _copy_raw ( plain(self) )
+
+
+class _lazy_jobj(__jobj__):
+    # nested object which is not built yet; becomes __jobj__ on first access
+
+    def _materialise ( self ):
+        with _lock:
+            od = object.__getattribute__ ( self,"__dict__" )
+            if _RAW in od:
+                d = od.pop ( _RAW )
+                _fill ( self,d )
+                object.__setattr__ ( self,"__class__",__jobj__ )
+        return
+
+    def __getattribute__ ( self,name ):
+        if name!="__class__":
+            _lazy_jobj._materialise ( self )
+        return object.__getattribute__ ( self,name )
+
+    def __setattr__ ( self,name,value ):
+        _lazy_jobj._materialise ( self )
+        object.__setattr__ ( self,name,value )
+        return
+
+    def __delattr__ ( self,name ):
+        _lazy_jobj._materialise ( self )
+        object.__delattr__ ( self,name )
+        return
+
 
 class jObject(__jobj__):
 
@@ -52,11 +169,19 @@ class jObject(__jobj__):
         return
 
     def read_json ( self,json_str ):
-        if json_str:
+        # json_str may also be a dictionary, e.g. as returned by plain(),
+        # which avoids serialising objects just to copy them
+        if isinstance(json_str,dict):
+            super(jObject,self).parse_json ( json_str )
+        elif json_str:
             super(jObject,self).parse_json ( json.loads(json_str) )
         return
 
 
+def clone ( obj ):
+    # copy of object tree as jObject
+    return jObject ( plain(obj) )
+
 
 def readjObject ( file_path ):
     try:
@@ -67,9 +192,9 @@ def readjObject ( file_path ):
     except:
         return None
 
-def writejObject ( obj,file_path ):
+def writejObject ( obj,file_path,compact=False ):
     file     = open ( file_path,"w" )
-    json_str = file.write ( obj.to_JSON() )
+    json_str = file.write ( obj.to_JSON(compact) )
     file.close()
     return
 
@@ -116,8 +241,122 @@ def extract_json ( body,text ):
 #  ------------------------------------------------------------------
 #
 
+# ----------------------------------------------------------------------------
+#  Benchmark:  python -m pycofe.varut.jsonut bench [databox.meta]
+#  compares lazy and direct paths with eager parsing and string round trips
+#  used before, on given databox file or on a synthetic one with a large
+#  revision (many chains, sequences and ligands)
+# ----------------------------------------------------------------------------
+
+class _eager_jobj(object):
+    # former implementation, for reference
+    def __init__(self, d=None):
+        if d:
+            for a, b in list(d.items()):
+                if isinstance(b, (list, tuple)):
+                   setattr(self, a, [_eager_jobj(x) if isinstance(x, dict) else x for x in b])
+                else:
+                   setattr(self, a, _eager_jobj(b) if isinstance(b, dict) else b)
+        return
+    def to_JSON(self):
+        return json.dumps(self, default=lambda o: o.__dict__, sort_keys=True, indent=2)
+
+
+def _synthetic_databox ( nchains=240,nligands=40,nrevisions=3 ):
+    def dtype_obj ( t,n ):
+        return { "_type":t, "version":2, "subtype":["xyz","protein"],
+                 "dname":"[0012-%02d] %s"%(n,t), "jobId":12,
+                 "dataId":"0012-%02d"%n, "associated":[], "refkeys":{},
+                 "citations":["refmac5","molprobity","gesamt"],
+                 "files":{ "xyz":"0012-%02d_model.pdb"%n,
+                           "mtz":"0012-%02d_data.mtz"%n } }
+    seqs = []
+    for i in range(nchains):
+        seq = dtype_obj ( "DataSequence",i )
+        seq.update ({ "seq":"MKV"*100, "size":300, "ncopies":1, "weight":33000.0,
+                      "npred":1, "nfind":1, "chains":[chr(65+i%26)],
+                      "ensembles":[], "xyzmeta":{} })
+        seqs.append ( seq )
+    chains = []
+    for i in range(nchains):
+        chains.append ({ "id":chr(65+i%26)+str(i//26), "seq":"MKV"*100,
+                         "type":"Protein", "size":300, "file":"",
+                         "ligands":["NAG","SO4"], "xyz":[
+                             { "model":m, "B":[20.0+m,30.0,40.0] }
+                             for m in range(3)] })
+    ligs = [dtype_obj("DataLigand",i) for i in range(nligands)]
+    xyzmeta = { "cryst":{ "spaceGroup":"P 21 21 21","a":100.0,"b":120.0,
+                          "c":250.0,"alpha":90.0,"beta":90.0,"gamma":90.0 },
+                "xyz":[{ "model":1, "chains":chains }],
+                "ligands":["NAG","SO4"] }
+    revs = []
+    for r in range(nrevisions):
+        struct = dtype_obj ( "DataStructure",r )
+        struct.update ({ "xyzmeta":xyzmeta, "ligands":["NAG","SO4"],
+                         "refmacLinks":[], "links":[] })
+        hkl = dtype_obj ( "DataHKL",r )
+        hkl.update ({ "dataset":{ "reso_high":1.8,"columns":["FP","SIGFP"]*20 },
+                      "dataStats":dict([("k%d"%k,float(k)) for k in range(200)]) })
+        rev = dtype_obj ( "DataRevision",r )
+        rev.update ({ "HKL":hkl, "ASU":{ "seq":seqs,"nres":72000,"ha_type":"",
+                                         "matthews":2.4,"molWeight":8e6 },
+                      "Structure":struct, "Substructure":None,
+                      "Ligands":ligs, "Options":{ "leadKey":1 } })
+        revs.append ( rev )
+    return json.dumps ( { "_type":"DataBox",
+                          "data":{ "DataRevision":revs,"DataLigand":ligs } } )
+
+
+def benchmark ( fpath=None ):
+    import time
+    if fpath:
+        with open(fpath,"r") as f:
+            json_str = f.read()
+    else:
+        json_str = _synthetic_databox()
+
+    def timed ( func,nrep=5 ):
+        t = time.perf_counter()
+        for i in range(nrep):
+            r = func()
+        return ((time.perf_counter()-t)/nrep,r)
+
+    # typical job: read databox, make class of each revision, touch a few
+    # fields, write output revision
+    def job_eager():
+        box  = _eager_jobj ( json.loads(json_str) )
+        revs = [_eager_jobj(json.loads(r.to_JSON())) for r in box.data.DataRevision]
+        len ( revs[0].ASU.seq )
+        return revs[0].to_JSON()
+    def job_lazy():
+        box  = jObject ( json_str )
+        revs = [jObject(plain(r)) for r in box.data.DataRevision]
+        len ( revs[0].ASU.seq )
+        return revs[0].to_JSON(compact=True)
+
+    t_parse0,b0 = timed ( lambda: _eager_jobj(json.loads(json_str)) )
+    t_parse1,b1 = timed ( lambda: jObject(json_str) )
+    t_copy0,_   = timed ( lambda: _eager_jobj(json.loads(b0.data.DataRevision[0].to_JSON())) )
+    t_copy1,_   = timed ( lambda: jObject(plain(b1.data.DataRevision[0])) )
+    t_write0,w0 = timed ( lambda: b0.to_JSON() )
+    t_write1,w1 = timed ( lambda: b1.to_JSON(compact=True) )
+    t_job0,_    = timed ( job_eager )
+    t_job1,_    = timed ( job_lazy  )
+
+    print ( " databox size     : %.2f MB" % (len(json_str)/1.0e6) )
+    print ( "                     before      after" )
+    for name,t0,t1 in [("parse",t_parse0,t_parse1),("copy revision",t_copy0,t_copy1),
+                       ("write",t_write0,t_write1),("typical job",t_job0,t_job1)]:
+        print ( " %-16s : %8.4f s %8.4f s" % (name,t0,t1) )
+    print ( " written size     : %.2f MB %.2f MB" % (len(w0)/1.0e6,len(w1)/1.0e6) )
+    return
+
+
 if __name__ == "__main__":
     import sys
+    if len(sys.argv)>1 and sys.argv[1]=="bench":
+        benchmark ( sys.argv[2] if len(sys.argv)>2 else None )
+        sys.exit(0)
     A = jObject()
     A.name = "Onur"
     A.age = 35
@@ -3,13 +3,13 @@
 #
 # ============================================================================
 #
-#    10.04.25   <--  Date of Last Modification.
+#    18.10.26   <--  Date of Last Modification.
 #                   ~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 # ----------------------------------------------------------------------------
 #
 #  mmCIF Utility Functions
 #
-#  Copyright (C) Eugene Krissinel, Andrey Lebedev, Paul Bond 2024-2025
+#  Copyright (C) Eugene Krissinel, Andrey Lebedev, Paul Bond 2024-2026
 #
 # ============================================================================
 #
@@ -17,6 +17,8 @@
 import os
 import gemmi
 
+from pycofe.varut import xyzcache
+
 # ============================================================================
 
 
@@ -37,7 +39,7 @@ def can_make_pdb ( st ):
 def can_convert_to_pdb ( mmcif_file_path ):
 #  Returns True if mmCIF file is convertable to PDB
     if os.path.isfile ( mmcif_file_path ):
-        return can_make_pdb ( gemmi.read_structure(mmcif_file_path) )
+        return can_make_pdb ( xyzcache.read_structure(mmcif_file_path,shared=True) )
     return False
 
 
@@ -50,7 +52,7 @@ def convert_to_pdb ( mmcif_file_path,gemmi_st=None ):
     st            = gemmi_st
     if not st:
         if os.path.isfile(mmcif_file_path):
-            st = gemmi.read_structure ( mmcif_file_path )
+            st = xyzcache.read_structure ( mmcif_file_path,shared=True )
     if st:
         for model in st:
             if len(model)>62:
@@ -87,7 +89,7 @@ def convert_to_mmcif ( pdb_file_path ):
     mmcif_file_path = None
     if os.path.isfile(pdb_file_path):
         mmcif_file_path = os.path.splitext(pdb_file_path)[0] + ".mmcif"
-        st = gemmi.read_structure ( pdb_file_path )
+        st = xyzcache.read_structure ( pdb_file_path,shared=True )
         st.make_mmcif_document().write_file ( mmcif_file_path )
     return mmcif_file_path
 
@@ -96,7 +98,7 @@ def clean_mmcif ( mmcif_infile_path,mmcif_outfile_path ):
 #  Removes artefacts such as atoms with empty names and empty chains.
 #  Should be used if mmcif was produced by MMDB
     if os.path.isfile(mmcif_infile_path):
-        st = gemmi.read_structure ( mmcif_infile_path )
+        st = xyzcache.read_structure ( mmcif_infile_path )
         for model in st:
             for chain in model:
                 for res in chain:
@@ -113,7 +115,7 @@ def clean_mmcif ( mmcif_infile_path,mmcif_outfile_path ):
 def check_xyz_format ( file_path ):
     try:
         # Attempt to read the file as a structure
-        st = gemmi.read_structure ( file_path )        
+        st = xyzcache.read_structure ( file_path,shared=True )
         # Check if format is 'pdb'
         if st.format == gemmi.Format.Pdb:
             return 'pdb'
@@ -0,0 +1,276 @@
+##!/usr/bin/python
+
+#
+# ============================================================================
+#
+#    18.10.26   <--  Date of Last Modification.
+#                   ~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+# ----------------------------------------------------------------------------
+#
+#  POLLING OF REMOTE SERVICES
+#
+#  Poller waits for completion of jobs on remote servers (PDB-REDO, Data
+#  Link, wwPDB validation). Status checks start fast and are then spaced out
+#  exponentially, with random jitter, up to a maximum interval; intervals
+#  suggested by server (e.g. Retry-After headers) take precedence within
+#  given bounds. Several items may be checked concurrently by pollAll().
+#
+#  Network access goes through transport objects with method
+#
+#     request ( method,url,headers=None ) -> Response(status,headers,text)
+#
+#  so that polling code may be tested against a local mock server (see
+#  pycofe/tests/test_poller.py). Benchmark:
+#
+#     python -m pycofe.varut.poller bench
+#
+#  Copyright (C) Eugene Krissinel, Andrey Lebedev 2026
+#
+# ============================================================================
+#
+
+import time
+import random
+import threading
+import collections
+import email.utils
+import concurrent.futures
+
+# ============================================================================
+# Transports
+
+Response = collections.namedtuple ( "Response",["status","headers","text"] )
+
+
+class UrllibTransport(object):
+    # transport based on python standard library
+
+    def __init__ ( self,verify_cert=True,timeout=60 ):
+        import ssl
+        self.timeout = timeout
+        self.context = None
+        if not verify_cert:
+            self.context = ssl._create_unverified_context()
+
+    def request ( self,method,url,headers=None ):
+        import urllib.request
+        import urllib.error
+        req = urllib.request.Request ( url,method=method,headers=headers or {} )
+        try:
+            with urllib.request.urlopen(req,timeout=self.timeout,context=self.context) as res:
+                return Response ( res.status,dict(res.headers),
+                                  res.read().decode("utf-8","replace") )
+        except urllib.error.HTTPError as e:
+            return Response ( e.code,dict(e.headers),
+                              e.read().decode("utf-8","replace") )
+
+
+class RequestsTransport(object):
+    # transport based on requests module; connection errors are retried
+    # within the session and sessions are reused between requests. Sessions
+    # are not thread-safe, so that each thread gets its own one.
+
+    def __init__ ( self,verify_cert=True,timeout=60,retries=10 ):
+        import requests
+        self.requests    = requests
+        self.verify_cert = verify_cert
+        self.timeout     = timeout
+        self.retries     = retries
+        self.local       = threading.local()
+
+    def session ( self ):
+        session = getattr ( self.local,"session",None )
+        if session is None:
+            adapters = self.requests.adapters
+            retry    = adapters.Retry ( total=self.retries,backoff_factor=0.1 )
+            session  = self.requests.Session()
+            session.mount ( "http://" ,adapters.HTTPAdapter(max_retries=retry) )
+            session.mount ( "https://",adapters.HTTPAdapter(max_retries=retry) )
+            self.local.session = session
+        return session
+
+    def request ( self,method,url,headers=None ):
+        res = self.session().request ( method,url,headers=headers,
+                                       verify=self.verify_cert,timeout=self.timeout )
+        return Response ( res.status_code,dict(res.headers),res.text )
+
+
+def makeTransport ( verify_cert=True ):
+    # requests-based transport where available, standard library otherwise
+    try:
+        return RequestsTransport ( verify_cert=verify_cert )
+    except ImportError:
+        return UrllibTransport ( verify_cert=verify_cert )
+
+
+def retryAfter ( headers ):
+    # returns delay in seconds suggested by Retry-After header, or None
+    value = None
+    for key in headers or {}:
+        if key.lower()=="retry-after":
+            value = str(headers[key]).strip()
+    if not value:
+        return None
+    try:
+        return max ( 0.0,float(value) )
+    except ValueError:
+        pass
+    try:  # HTTP date
+        return max ( 0.0,email.utils.parsedate_to_datetime(value).timestamp()-time.time() )
+    except (TypeError,ValueError,IndexError):
+        return None
+
+
+# ============================================================================
+# Poller
+
+class Poller(object):
+    #  first   : delay before second status check
+    #  maxwait : maximum delay between checks
+    #  factor  : delay growth factor
+    #  jitter  : relative random spread of delays
+    #  minwait : minimum accepted server-suggested delay
+    #  timeout : total time limit (seconds) or None
+    #  sleep, clock : replaceable for testing
+
+    def __init__ ( self,first=2.0,maxwait=60.0,factor=2.0,jitter=0.2,
+                   minwait=1.0,timeout=None,sleep=time.sleep,clock=time.time ):
+        self.first   = first
+        self.maxwait = maxwait
+        self.factor  = factor
+        self.jitter  = jitter
+        self.minwait = minwait
+        self.timeout = timeout
+        self.sleep   = sleep
+        self.clock   = clock
+        self.reset()
+
+    def reset ( self ):
+        self.nchecks    = 0
+        self.delay      = None   # last delay used
+        self.last_delay = 0.0    # delay before the last check
+        self.t0         = self.clock()
+        self.t_detect   = None
+        return
+
+    def nextDelay ( self,suggested=None ):
+        # returns delay before next check
+        if self.delay is None:
+            delay = self.first
+        else:
+            delay = min ( self.maxwait,self.delay*self.factor )
+        self.delay = delay
+        if self.jitter>0.0:
+            delay *= 1.0 + self.jitter*(2.0*random.random()-1.0)
+        if suggested is not None:
+            delay = min ( self.maxwait,max(self.minwait,suggested) )
+        return delay
+
+    def wait ( self,suggested=None ):
+        # sleeps before next check; returns False if timeout would be exceeded
+        delay = self.nextDelay ( suggested )
+        if self.timeout is not None and \
+           self.clock()+delay-self.t0 > self.timeout:
+            return False
+        self.sleep ( delay )
+        self.last_delay = delay
+        return True
+
+    def poll ( self,check,stop=None ):
+        # check() returns (done,value,suggested_delay); polls until done, stop()
+        # returns True or timeout. Returns (done,value) of last check.
+        self.reset()
+        while True:
+            done,value,suggested = check()
+            self.nchecks += 1
+            if done:
+                self.t_detect = self.clock() - self.t0
+                return (True,value)
+            if (stop and stop()) or not self.wait(suggested):
+                return (False,value)
+
+    def pollAll ( self,checks,nworkers=4,stop=None,progress=None ):
+        # polls several items: checks is list of functions as in poll(), and
+        # pending items are checked concurrently. After each round of checks,
+        # progress(values) is called, if given, and polling is abandoned if it
+        # returns False. Returns (done,values) with values in order of checks.
+        self.reset()
+        n       = len(checks)
+        values  = [None]*n
+        pending = list(range(n))
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max(1,min(nworkers,n))) as pool:
+            while pending:
+                results = list ( pool.map(lambda i: checks[i](),pending) )
+                self.nchecks += 1
+                suggested = None
+                pending1  = []
+                for i,(done,value,sdelay) in zip(pending,results):
+                    values[i] = value
+                    if not done:
+                        pending1.append ( i )
+                        if sdelay is not None:
+                            suggested = sdelay if suggested is None else min(suggested,sdelay)
+                pending = pending1
+                if progress and progress(values)==False:
+                    return (False,values)
+                if not pending:
+                    break
+                if (stop and stop()) or not self.wait(suggested):
+                    return (False,values)
+        self.t_detect = self.clock() - self.t0
+        return (True,values)
+
+    def report ( self ):
+        # summary line for job log; remote completion happened between the
+        # last two checks, which bounds the time to detect it
+        if self.t_detect is None:
+            return "completion not detected after %.1f s, %d status check(s)" %\
+                   (self.clock()-self.t0,self.nchecks)
+        return "completion detected after %.1f s, %d status check(s), " \
+               "time-to-detect <= %.1f s" %\
+               (self.t_detect,self.nchecks,self.last_delay)
+
+
+# ----------------------------------------------------------------------------
+#  Benchmark:  python -m pycofe.varut.poller bench
+#  compares mean time-to-detect of fixed-interval polling and of poller for
+#  simulated remote job times
+# ----------------------------------------------------------------------------
+
+def benchmark ( ntrials=2000 ):
+
+    class Clock(object):
+        def __init__ ( self ):  self.t = 0.0
+        def __call__ ( self ):  return self.t
+        def sleep ( self,dt ):  self.t += dt
+
+    def detect ( poller_args,t_end ):
+        clock  = Clock()
+        poller = Poller ( sleep=clock.sleep,clock=clock,**poller_args )
+        poller.poll ( lambda: (clock.t>=t_end,None,None) )
+        return poller.t_detect - t_end,poller.nchecks
+
+    random.seed ( 1 )
+    for label,fixed,adaptive,tmax in [
+            ("PDB-REDO",
+             { "first":120.0,"factor":1.0,"jitter":0.0,"maxwait":120.0 },
+             { "first":5.0,"maxwait":120.0 },3600.0 ),
+            ("Data Link",
+             { "first":10.0,"factor":1.0,"jitter":0.0,"maxwait":10.0 },
+             { "first":1.0,"maxwait":10.0 },300.0 )]:
+        print ( " %s, job times uniform in 0-%d s:" % (label,tmax) )
+        for tlabel,(t1,t2) in [("short",(0.0,30.0)),("any",(0.0,tmax))]:
+            times = [random.uniform(t1,t2) for i in range(ntrials)]
+            for name,args in [("fixed",fixed),("adaptive",adaptive)]:
+                res = [detect(args,t) for t in times]
+                print ( "   %-5s jobs, %-8s : mean time-to-detect %6.1f s, " \
+                        "mean checks %5.1f" % (tlabel,name,
+                            sum([r[0] for r in res])/ntrials,
+                            sum([r[1] for r in res])/float(ntrials)) )
+    return
+
+
+if __name__ == "__main__":
+    import sys
+    if len(sys.argv)>1 and sys.argv[1]=="bench":
+        benchmark()
@@ -0,0 +1,260 @@
+##!/usr/bin/python
+
+#
+# ============================================================================
+#
+#    18.10.26   <--  Date of Last Modification.
+#                   ~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+# ----------------------------------------------------------------------------
+#
+#  CACHE OF STRUCTURE PREDICTION RESULTS
+#
+#  Prediction results are kept in cache directory as
+#
+#     <path>/items/<key>   : result directories, named by makeKey()
+#     <path>/index.json    : last use time, size and hit count of items, and
+#                            hit/miss statistics
+#     <path>/index.lock    : lock file serialising index updates
+#
+#  Items are looked up by canonical hash of sequences, copy numbers and
+#  prediction parameters. The index is changed only under exclusive lock
+#  (where fcntl is available) and rewritten atomically, so that concurrent
+#  jobs see either old or new index. New items are built aside and renamed
+#  into place, and least recently used items are removed when the number of
+#  items exceeds cache size.
+#
+#  Cached files are hard-linked into job directories; files which jobs may
+#  modify or pass on as output data (e.g. coordinate files) are cloned
+#  instead, using reflinks on file systems which support them, and plain
+#  copies otherwise. Hard-linked files must be treated as read-only.
+#
+#  Copyright (C) Eugene Krissinel, Andrey Lebedev 2026
+#
+# ============================================================================
+#
+
+import os
+import sys
+import json
+import time
+import uuid
+import shutil
+import hashlib
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# ============================================================================
+
+_FICLONE = 0x40049409   # Linux ioctl for copy-on-write file clones
+
+
+def makeKey ( sequences,ncopies,params ):
+    # canonical hash of prediction input; params is a dictionary of options
+    # affecting prediction results
+    data = { "sequences" : [ [s.upper(),int(n)] for s,n in zip(sequences,ncopies) ],
+             "params"    : dict ( (k,str(v)) for k,v in params.items() ) }
+    return hashlib.sha256 (
+        json.dumps(data,sort_keys=True,separators=(",",":")).encode("utf-8")
+    ).hexdigest()
+
+
+def cloneFile ( src,dst ):
+    # copy-on-write clone of file where supported, plain copy otherwise
+    if fcntl and sys.platform.startswith("linux"):
+        try:
+            with open(src,"rb") as fsrc, open(dst,"wb") as fdst:
+                fcntl.ioctl ( fdst.fileno(),_FICLONE,fsrc.fileno() )
+            shutil.copystat ( src,dst )
+            return
+        except (OSError,IOError):
+            pass
+    shutil.copy2 ( src,dst )
+    return
+
+
+def linkTree ( srcdir,dstdir,clone_exts=() ):
+    # makes copy of directory tree srcdir at dstdir, hard-linking files where
+    # possible and cloning files with extensions from clone_exts
+    os.makedirs ( dstdir,exist_ok=True )
+    for root,dirs,files in os.walk(srcdir):
+        droot = os.path.join ( dstdir,os.path.relpath(root,srcdir) )
+        for d in dirs:
+            os.makedirs ( os.path.join(droot,d),exist_ok=True )
+        for f in files:
+            src = os.path.join ( root ,f )
+            dst = os.path.join ( droot,f )
+            if f.lower().endswith(clone_exts):
+                cloneFile ( src,dst )
+            else:
+                try:
+                    os.link ( src,dst )
+                except OSError:
+                    cloneFile ( src,dst )
+    return
+
+
+def _tree_size ( dirpath ):
+    size = 0
+    for root,dirs,files in os.walk(dirpath):
+        for f in files:
+            try:
+                size += os.lstat(os.path.join(root,f)).st_size
+            except OSError:
+                pass
+    return size
+
+
+# ============================================================================
+
+class PredictionCache(object):
+
+    def __init__ ( self,path,size ):
+        self.path       = path
+        self.size       = max ( 1,int(size) )
+        self.items_dir  = os.path.join ( path,"items" )
+        self.tmp_dir    = os.path.join ( path,"tmp"   )
+        self.index_path = os.path.join ( path,"index.json" )
+        self.lock_path  = os.path.join ( path,"index.lock" )
+        os.makedirs ( self.items_dir,exist_ok=True )
+        os.makedirs ( self.tmp_dir  ,exist_ok=True )
+        self._lockf = None
+
+    # ----------------------------------------------------------------------
+
+    def _lock ( self ):
+        self._lockf = open ( self.lock_path,"a" )
+        if fcntl:
+            fcntl.flock ( self._lockf.fileno(),fcntl.LOCK_EX )
+        return
+
+    def _unlock ( self ):
+        if fcntl:
+            fcntl.flock ( self._lockf.fileno(),fcntl.LOCK_UN )
+        self._lockf.close()
+        self._lockf = None
+        return
+
+    def _read_index ( self ):
+        index = None
+        try:
+            with open(self.index_path,"r") as f:
+                index = json.load ( f )
+        except (OSError,IOError,ValueError):
+            pass
+        if not index or "entries" not in index:
+            index = { "entries" : {} }
+        if "stats" not in index:
+            index["stats"] = { "hits" : 0, "misses" : 0, "stores" : 0, "evictions" : 0 }
+        return index
+
+    def _write_index ( self,index ):
+        tmp_path = self.index_path + "." + uuid.uuid4().hex
+        with open(tmp_path,"w") as f:
+            json.dump ( index,f,indent=1 )
+        os.replace ( tmp_path,self.index_path )
+        return
+
+    def _item_dir ( self,key ):
+        return os.path.join ( self.items_dir,key )
+
+    def _evict ( self,index,keep_key ):
+        # removes least recently used entries from index so that it fits
+        # cache size; returns list of directories to delete, which are moved
+        # aside so that they can be deleted after releasing the lock
+        entries = index["entries"]
+        nevict  = len(entries) - self.size
+        if nevict<=0:
+            return []
+        keys = sorted ( [k for k in entries if k!=keep_key],
+                        key=lambda k: entries[k]["seen"] )
+        del_paths = []
+        for key in keys[:nevict]:
+            del entries[key]
+            index["stats"]["evictions"] += 1
+            item_dir = self._item_dir ( key )
+            if os.path.isdir(item_dir):
+                del_path = os.path.join ( self.tmp_dir,"del_" + uuid.uuid4().hex )
+                os.rename ( item_dir,del_path )
+                del_paths.append ( del_path )
+        return del_paths
+
+    # ----------------------------------------------------------------------
+
+    def fetch ( self,key,dest,clone_exts=() ):
+        # materialises cached item at dest and returns True on cache hit;
+        # returns False on miss
+        self._lock()
+        try:
+            index    = self._read_index()
+            entries  = index["entries"]
+            item_dir = self._item_dir ( key )
+            if key in entries and os.path.isdir(item_dir):
+                if os.path.isdir(dest):
+                    shutil.rmtree ( dest )
+                linkTree ( item_dir,dest,clone_exts )
+                entries[key]["seen"] = time.time()
+                entries[key]["hits"] = entries[key].get("hits",0) + 1
+                index["stats"]["hits"] += 1
+                hit = True
+            else:
+                if key in entries:  # item directory removed externally
+                    del entries[key]
+                index["stats"]["misses"] += 1
+                hit = False
+            self._write_index ( index )
+        finally:
+            self._unlock()
+        return hit
+
+    def store ( self,key,srcdir,clone_exts=() ):
+        # puts content of srcdir in cache under given key; files are linked
+        # or cloned as in fetch()
+        build_dir = os.path.join ( self.tmp_dir,"new_" + uuid.uuid4().hex )
+        linkTree ( srcdir,build_dir,clone_exts )  # done before locking
+        nbytes    = _tree_size ( build_dir )
+        del_paths = []
+        self._lock()
+        try:
+            index    = self._read_index()
+            item_dir = self._item_dir ( key )
+            if os.path.isdir(item_dir):
+                del_paths.append ( build_dir )  # stored by concurrent job
+            else:
+                os.rename ( build_dir,item_dir )
+                index["stats"]["stores"] += 1
+            t = time.time()
+            entry = index["entries"].setdefault ( key,{ "created":t,"hits":0 } )
+            entry["seen"]  = t
+            entry["bytes"] = nbytes
+            del_paths += self._evict ( index,key )
+            self._write_index ( index )
+        finally:
+            self._unlock()
+        for path in del_paths:
+            shutil.rmtree ( path,ignore_errors=True )
+        return
+
+    def getStats ( self ):
+        # returns dictionary with number of items, their total size and
+        # hit/miss statistics
+        index   = self._read_index()
+        entries = index["entries"]
+        stats   = dict ( index["stats"] )
+        stats["items"] = len(entries)
+        stats["bytes"] = sum ( [e.get("bytes",0) for e in entries.values()] )
+        nlookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = float(stats["hits"])/nlookups if nlookups>0 else 0.0
+        return stats
+
+    def writeStats ( self,file_stdout ):
+        stats = self.getStats()
+        file_stdout.write ( "\n ..... prediction cache: " +\
+                str(stats["items"]) + " item(s), " +\
+                "%.1f MB, " % (stats["bytes"]/1048576.0) +\
+                str(stats["hits"])   + " hit(s), " +\
+                str(stats["misses"]) + " miss(es), hit rate " +\
+                "%.1f%%\n" % (100.0*stats["hit_rate"]) )
+        return
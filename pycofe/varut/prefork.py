@@ -0,0 +1,445 @@
+##!/usr/bin/python
+
+#
+# ============================================================================
+#
+#    18.10.26   <--  Date of Last Modification.
+#                   ~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+# ----------------------------------------------------------------------------
+#
+#  PRE-FORKED TASK RUNNER
+#
+#  Command-line (server):
+#     ccp4-python -m pycofe.varut.prefork serve [socket_path]
+#
+#  Command-line (job launch, same contract as 'python -m pycofe.tasks.xxx'):
+#     ccp4-python -m pycofe.varut.prefork run pycofe.tasks.xxx jobManager jobDir jobId [...]
+#
+#  Command-line (launch latency benchmark):
+#     ccp4-python -m pycofe.varut.prefork bench [-n repeats] pycofe.tasks.xxx [...]
+#
+#  The server imports the heavy ccp4-python stack (pyrvapi, gemmi, parsers,
+#  citations, pyrama, matplotlib and task modules) once and then forks a
+#  fresh child for every job. The child inherits stdin/stdout/stderr, working
+#  directory, environment and command line of the launching 'run' client,
+#  executes task module's __main__ block exactly as 'python -m' would do, and
+#  passes the exit code (see varut/signal.py) back to the client, which exits
+#  with it. If server is not running, 'run' falls back to a cold start of the
+#  task module in a new interpreter, therefore it is always safe to use.
+#
+#  Copyright (C) Eugene Krissinel, Andrey Lebedev 2026
+#
+# ============================================================================
+#
+
+#  python native imports
+import os
+import sys
+import json
+import time
+import errno
+import socket
+import signal
+import runpy
+import struct
+import tempfile
+import traceback
+import importlib
+import importlib.util
+import subprocess
+
+# ============================================================================
+# configuration
+
+#  modules imported in the server before any job is forked; missing modules
+#  are skipped silently, so that the list may be kept generous
+preload_modules = [
+    "pyrvapi",
+    "pyrvapi_ext.parsers",
+    "gemmi",
+    "matplotlib",
+    "matplotlib.pyplot",
+    "pycofe.etc.citations",
+    "pycofe.etc.pyrama",
+    "pycofe.parsers.refmac_parser",
+    "pycofe.parsers.edstats_parser",
+    "pycofe.parsers.baver_parser",
+    "pycofe.parsers.modelcraft_parser",
+    "pycofe.dtypes.databox",
+    "pycofe.proc.qualrep",
+    "pycofe.tasks.basic",
+    "pycofe.tasks.editrevision",
+    "pycofe.tasks.xyz2revision",
+    "pycofe.tasks.asudef",
+    "pycofe.tasks.import_task"
+]
+
+# environment variable overriding default socket path
+socket_env_var = "PYCOFE_PREFORK_SOCKET"
+
+# maximal size of request message
+max_request = 4*1024*1024
+
+
+def socket_path():
+    if socket_env_var in os.environ:
+        return os.environ[socket_env_var]
+    return os.path.join ( tempfile.gettempdir(),
+                          "pycofe-prefork-" + str(os.getuid()) + ".sock" )
+
+
+# ============================================================================
+# message framing: 4-byte length followed by JSON body
+
+def _send_msg ( sock,obj,fds=None ):
+    data = json.dumps(obj).encode("utf-8")
+    data = struct.pack("!I",len(data)) + data
+    if fds:
+        socket.send_fds ( sock,[data],fds )
+    else:
+        sock.sendall ( data )
+    return
+
+def _recv_exact ( sock,n,fds ):
+    data = b""
+    while len(data)<n:
+        if fds is not None and not fds:
+            chunk,fds1,flags,addr = socket.recv_fds ( sock,n-len(data),3 )
+            fds += fds1
+        else:
+            chunk = sock.recv ( n-len(data) )
+        if not chunk:
+            return None
+        data += chunk
+    return data
+
+def _recv_msg ( sock,fds=None ):
+    head = _recv_exact ( sock,4,fds )
+    if not head:
+        return None
+    n = struct.unpack("!I",head)[0]
+    if n>max_request:
+        return None
+    body = _recv_exact ( sock,n,fds )
+    if body is None:
+        return None
+    return json.loads ( body.decode("utf-8") )
+
+
+# ============================================================================
+# server side
+
+def preload ( module_list=None,log=None ):
+    # imports modules into server process, returns list of loaded modules
+    mlist = module_list
+    if mlist is None:
+        mlist = preload_modules
+    os.environ.setdefault ( "MPLBACKEND","agg" )
+    loaded = []
+    for m in mlist:
+        try:
+            importlib.import_module ( m )
+            loaded.append ( m )
+        except Exception as e:
+            if log:
+                log.write ( " ..... preload of " + m + " skipped: " + str(e) + "\n" )
+    return loaded
+
+
+def _exit_code ( e ):
+    # converts SystemExit argument into process exit code
+    code = e.code
+    if code is None:
+        return 0
+    if isinstance(code,int):
+        return code
+    sys.stderr.write ( str(code) + "\n" )
+    return 1
+
+
+def _run_child ( conn,request,fds ):
+    # runs in forked child; never returns
+    code = 1
+    try:
+        signal.signal ( signal.SIGTERM,signal.SIG_DFL )
+        signal.signal ( signal.SIGINT ,signal.SIG_DFL )
+        signal.signal ( signal.SIGCHLD,signal.SIG_DFL )
+        for i in range(min(3,len(fds))):
+            os.dup2 ( fds[i],i )
+        for fd in fds:
+            if fd>2:
+                os.close ( fd )
+        sys.stdin  = os.fdopen ( 0,"r",closefd=False )
+        sys.stdout = os.fdopen ( 1,"w",closefd=False )
+        sys.stderr = os.fdopen ( 2,"w",closefd=False )
+        os.environ.clear()
+        os.environ.update ( request["env"] )
+        os.chdir ( request["cwd"] )
+        os.setsid()
+        _send_msg ( conn,{ "pid" : os.getpid() } )
+        module   = request["module"]
+        sys.argv = [module] + request["argv"]
+        if request.get("probe",False):
+            importlib.import_module ( module )
+            code = 0
+        else:
+            runpy.run_module ( module,run_name="__main__",alter_sys=True )
+            code = 0
+    except SystemExit as e:
+        code = _exit_code ( e )
+    except:
+        traceback.print_exc()
+        code = 1
+    try:
+        sys.stdout.flush()
+        sys.stderr.flush()
+    except:
+        pass
+    try:
+        _send_msg ( conn,{ "returncode" : code } )
+    except:
+        pass
+    os._exit ( code )
+
+
+def _reap_children():
+    while True:
+        try:
+            pid,status = os.waitpid ( -1,os.WNOHANG )
+        except ChildProcessError:
+            return
+        if pid==0:
+            return
+
+
+def serve ( path=None,module_list=None,log=sys.stdout ):
+    # runs forking server until terminated
+    spath = path
+    if not spath:
+        spath = socket_path()
+
+    loaded = preload ( module_list,log )
+    log.write ( " ..... preloaded " + str(len(loaded)) + " modules\n" )
+
+    if os.path.exists(spath):
+        os.remove ( spath )
+    server = socket.socket ( socket.AF_UNIX,socket.SOCK_STREAM )
+    server.bind   ( spath )
+    os.chmod      ( spath,0o600 )
+    server.listen ( 64 )
+    server.settimeout ( 1.0 )
+    log.write ( " ..... listening on " + spath + "\n" )
+    log.flush()
+
+    def _terminate ( signum,frame ):
+        raise KeyboardInterrupt()
+    signal.signal ( signal.SIGTERM,_terminate )
+
+    try:
+        while True:
+            _reap_children()
+            try:
+                conn,addr = server.accept()
+            except socket.timeout:
+                continue
+            except OSError as e:
+                if e.errno==errno.EINTR:
+                    continue
+                raise
+            conn.settimeout ( None )
+            fds = []
+            try:
+                request = _recv_msg ( conn,fds )
+            except:
+                request = None
+            if not request:
+                for fd in fds:
+                    os.close ( fd )
+                conn.close()
+                continue
+            pid = os.fork()
+            if pid==0:
+                server.close()
+                _run_child ( conn,request,fds )
+            for fd in fds:
+                os.close ( fd )
+            conn.close()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+        if os.path.exists(spath):
+            os.remove ( spath )
+
+    return
+
+
+# ============================================================================
+# client side
+
+def connect ( path=None ):
+    # returns connected socket or None if server is not available
+    spath = path
+    if not spath:
+        spath = socket_path()
+    if not os.path.exists(spath):
+        return None
+    sock = socket.socket ( socket.AF_UNIX,socket.SOCK_STREAM )
+    try:
+        sock.connect ( spath )
+    except OSError:
+        sock.close()
+        return None
+    return sock
+
+
+def run_warm ( sock,module,argv,probe=False ):
+    # submits job to server through connected socket and waits for completion;
+    # returns exit code of the job
+    request = {
+        "module" : module,
+        "argv"   : argv,
+        "cwd"    : os.getcwd(),
+        "env"    : dict(os.environ),
+        "probe"  : probe
+    }
+    sys.stdout.flush()
+    sys.stderr.flush()
+    _send_msg ( sock,request,[0,1,2] )
+
+    child_pid = [None]
+    def _forward ( signum,frame ):
+        if child_pid[0]:
+            try:
+                os.kill ( child_pid[0],signum )
+            except OSError:
+                pass
+        return
+    handlers = {}
+    for s in (signal.SIGTERM,signal.SIGINT,signal.SIGHUP):
+        handlers[s] = signal.signal ( s,_forward )
+
+    code = 1
+    try:
+        while True:
+            reply = _recv_msg ( sock )
+            if reply is None:
+                break  # child died without reporting
+            if "pid" in reply:
+                child_pid[0] = reply["pid"]
+            elif "returncode" in reply:
+                code = reply["returncode"]
+                break
+    finally:
+        for s in handlers:
+            signal.signal ( s,handlers[s] )
+        sock.close()
+
+    return code
+
+
+def run_cold ( module,argv,probe=False ):
+    # launches module in a new interpreter, as the job server normally does
+    if probe:
+        cmd = [ sys.executable,"-c","import importlib,sys;" +\
+                "importlib.import_module(sys.argv[1])",module ]
+    else:
+        cmd = [ sys.executable,"-m",module ] + argv
+    return subprocess.call ( cmd )
+
+
+def run ( module,argv,path=None ):
+    sock = connect ( path )
+    if sock:
+        return run_warm ( sock,module,argv )
+    return run_cold ( module,argv )
+
+
+# ============================================================================
+# launch latency benchmark
+
+def _task_class ( module ):
+    try:
+        text = open ( importlib.util.find_spec(module).origin ).read()
+        n    = text.find ( "(basic.TaskDriver)" )
+        if n>0:
+            return text[text.rfind("class ",0,n)+6:n].strip()
+    except:
+        pass
+    return module.split(".")[-1]
+
+
+def bench ( module_list,repeats=5,log=sys.stdout ):
+    # compares cold and warm launch latency for given task modules; the
+    # launch is measured up to the point where task module is imported and
+    # TaskDriver subclass is ready to run
+
+    spath  = os.path.join ( tempfile.mkdtemp(),"prefork.sock" )
+    server = subprocess.Popen ( [sys.executable,"-m","pycofe.varut.prefork",
+                                 "serve",spath],
+                                stdout=subprocess.DEVNULL )
+    t0 = time.time()
+    while not os.path.exists(spath) and time.time()-t0<120.0:
+        time.sleep ( 0.05 )
+
+    log.write ( "\n %-28s %-24s %12s %12s %8s\n" %
+                ("Task module","Task class","cold (ms)","warm (ms)","ratio") )
+    log.write ( " " + "-"*88 + "\n" )
+    try:
+        for module in module_list:
+            cold = []
+            warm = []
+            for i in range(repeats):
+                t1 = time.time()
+                run_cold ( module,[],probe=True )
+                cold.append ( time.time()-t1 )
+                t1   = time.time()
+                sock = connect ( spath )
+                if sock:
+                    run_warm ( sock,module,[],probe=True )
+                    warm.append ( time.time()-t1 )
+            tc = 1000.0*min(cold)
+            tw = 1000.0*min(warm) if warm else float("nan")
+            log.write ( " %-28s %-24s %12.1f %12.1f %8.1f\n" %
+                        (module.split(".")[-1],_task_class(module),tc,tw,
+                         tc/tw if warm and tw>0.0 else 0.0) )
+    finally:
+        server.terminate()
+        server.wait()
+
+    log.flush()
+    return
+
+
+# ============================================================================
+
+if __name__ == "__main__":
+
+    if len(sys.argv)<2:
+        sys.stderr.write ( "usage: prefork serve [socket] | " +\
+                           "run module args... | bench [-n N] module...\n" )
+        sys.exit ( 2 )
+
+    cmd = sys.argv[1]
+
+    if cmd=="serve":
+        serve ( sys.argv[2] if len(sys.argv)>2 else None )
+        sys.exit ( 0 )
+
+    elif cmd=="run":
+        sys.exit ( run(sys.argv[2],sys.argv[3:]) )
+
+    elif cmd=="bench":
+        args    = sys.argv[2:]
+        repeats = 5
+        if len(args)>1 and args[0]=="-n":
+            repeats = int(args[1])
+            args    = args[2:]
+        if not args:
+            args = [ "pycofe.tasks.editrevision","pycofe.tasks.xyz2revision",
+                     "pycofe.tasks.asudef","pycofe.tasks.import_task" ]
+        bench ( args,repeats )
+        sys.exit ( 0 )
+
+    sys.stderr.write ( "unknown command '" + cmd + "'\n" )
+    sys.exit ( 2 )
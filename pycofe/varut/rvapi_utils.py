@@ -3,13 +3,13 @@
 #
 # ============================================================================
 #
-#    04.01.25   <--  Date of Last Modification.
+#    18.10.26   <--  Date of Last Modification.
 #                   ~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 # ----------------------------------------------------------------------------
 #
 #  RVAPI Utility Functions
 #
-#  Copyright (C) Eugene Krissinel, Andrey Lebedev 2017-2025
+#  Copyright (C) Eugene Krissinel, Andrey Lebedev 2017-2026
 #
 # ============================================================================
 #
@@ -226,3 +226,32 @@ def makeRTFTable ( tableDict ):
 
     return rtfTable
 
+
+# ----------------------------------------------------------------------------
+# Graph data
+#
+#  Functions below add whole datasets (lists, tuples or numpy arrays) to
+#  graph data, so that calling code needs no per-point loops. Values are
+#  still passed to rvapi one at a time, as pyrvapi has no call for arrays.
+
+def addGraphReals ( dsetId,dataId,graphId,values,fmt="%g" ):
+    if hasattr(values,"tolist"):  # numpy array of any type
+        values = values.tolist()
+    for v in values:
+        pyrvapi.rvapi_add_graph_real ( dsetId,dataId,graphId,float(v),fmt )
+    return
+
+
+def addGraphInts ( dsetId,dataId,graphId,values ):
+    if hasattr(values,"tolist"):
+        values = values.tolist()
+    for v in values:
+        pyrvapi.rvapi_add_graph_int ( dsetId,dataId,graphId,int(v) )
+    return
+
+
+def addGraphDataset ( dsetId,dataId,graphId,name,header,values,fmt="%g" ):
+    # creates graph dataset and fills it with values
+    pyrvapi.rvapi_add_graph_dataset ( dsetId,dataId,graphId,name,header )
+    addGraphReals ( dsetId,dataId,graphId,values,fmt )
+    return
@@ -0,0 +1,123 @@
+##!/usr/bin/python
+
+#
+# ============================================================================
+#
+#    18.10.26   <--  Date of Last Modification.
+#                   ~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+# ----------------------------------------------------------------------------
+#
+#  PER-PROCESS CACHE OF PARSED COORDINATE FILES
+#
+#  read_structure(fpath) is a drop-in replacement for gemmi.read_structure()
+#  which parses every coordinate file only once per job. Files are identified
+#  by (device, inode, mtime, size), so that cached structures survive moving
+#  files into the output directory (os.rename) but are re-read after any
+#  modification of the file.
+#
+#  By default, a clone of cached structure is returned, which callers may
+#  modify freely. Read-only callers may request the cached object itself with
+#  shared=True; such callers must not modify the structure in any way
+#  (including setup_entities() and similar).
+#
+#  The cache holds least recently used structures with up to max_atoms atoms
+#  in total. It may be used from several threads at a time; files are parsed
+#  outside the cache lock, so that threads reading different files do not
+#  wait for each other.
+#
+#  Copyright (C) Eugene Krissinel, Andrey Lebedev 2026
+#
+# ============================================================================
+#
+
+import os
+import threading
+from collections import OrderedDict
+
+import gemmi
+
+# ============================================================================
+
+max_atoms = 1000000   # total number of atoms in cached structures; larger
+                      # structures are not cached
+
+_cache  = OrderedDict()   # key -> ( structure,number of atoms )
+_natoms = [0]             # atoms in cached structures
+_stats  = { "hits" : 0, "misses" : 0, "clones" : 0 }
+_lock   = threading.RLock()
+
+
+def _key ( fpath ):
+    try:
+        s = os.stat ( fpath )
+    except OSError:
+        return None
+    return ( s.st_dev,s.st_ino,s.st_mtime_ns,s.st_size )
+
+
+def _count_atoms ( st ):
+    return sum ( [model.count_atom_sites() for model in st] )
+
+
+def read_structure ( fpath,shared=False ):
+    key = _key ( fpath )
+    if key is None:
+        return gemmi.read_structure ( fpath )  # let gemmi report the error
+
+    # lock is held only for lookups and insertions, files are parsed and
+    # structures cloned outside it
+    with _lock:
+        entry = _cache.get ( key )
+        if entry:
+            _cache.move_to_end ( key )
+            _stats["hits"] += 1
+        else:
+            _stats["misses"] += 1
+
+    if entry:
+        st = entry[0]
+    else:
+        st     = gemmi.read_structure ( fpath )
+        natoms = _count_atoms ( st )
+        if len(st)<=0 or natoms>max_atoms:
+            return st  # not cached, therefore no need to clone
+        with _lock:
+            if key in _cache:  # parsed concurrently by another thread
+                st = _cache[key][0]
+            else:
+                _cache[key] = ( st,natoms )
+                _natoms[0] += natoms
+                while _natoms[0]>max_atoms:
+                    _natoms[0] -= _cache.popitem(last=False)[1][1]
+
+    if shared:
+        return st
+    with _lock:
+        _stats["clones"] += 1
+    return st.clone()
+
+
+def forget ( fpath=None ):
+    # removes given file from cache, or clears the whole cache
+    with _lock:
+        if fpath:
+            key = _key ( fpath )
+            if key in _cache:
+                _natoms[0] -= _cache.pop(key)[1]
+        else:
+            _cache.clear()
+            _natoms[0] = 0
+    return
+
+
+def getStats():
+    return dict(_stats)
+
+
+def writeStats ( file_stdout ):
+    if _stats["hits"] or _stats["misses"]:
+        file_stdout.write ( "\n ..... structure cache: " +\
+                            str(_stats["hits"])   + " hit(s), " +\
+                            str(_stats["misses"]) + " miss(es), " +\
+                            str(_stats["clones"]) + " clone(s)\n" )
+    return
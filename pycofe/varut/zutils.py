@@ -3,13 +3,13 @@
 #
 # ============================================================================
 #
-#    04.04.20   <--  Date of Last Modification.
+#    18.10.26   <--  Date of Last Modification.
 #                   ~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 # ----------------------------------------------------------------------------
 #
 #  COMRESSING UTILS
 #
-#  Copyright (C) Eugene Krissinel, Andrey Lebedev 2020
+#  Copyright (C) Eugene Krissinel, Andrey Lebedev 2020-2026
 #
 # ============================================================================
 #
@@ -17,6 +17,8 @@
 import os
 import gzip
 import shutil
+import threading
+import subprocess
 
 def gunzip ( source_filepath, dest_filepath=None, block_size=65536, baseDirPath="" ):
 
@@ -29,3 +31,132 @@ def gunzip ( source_filepath, dest_filepath=None, block_size=65536, baseDirPath=
         shutil.copyfileobj ( sfile, dfile, block_size )
 
     return dest_path
+
+
+# ============================================================================
+# Lazy decompression
+#
+#  gunzip_lazy() registers a compressed file under its uncompressed name
+#  without writing anything to disk. Readers which can take gzip streams
+#  use input_path() (path of file to read, compressed or not) or
+#  open_input(); programs which need a plain file call materialise(), which
+#  decompresses the file once -- with pigz, if available, or in-process
+#  otherwise -- either in place or directly into its final destination.
+#  rename() moves registered files without decompressing them. Files
+#  decompressed in place are temporary, since the compressed originals are
+#  kept, and are removed by cleanup(), which TaskDriver.start() calls at the
+#  end of every job.
+#
+#  All functions take paths as given to gunzip_lazy(), i.e. joined with
+#  baseDirPath, and may be used from several threads at a time; threads
+#  using a file which is being decompressed wait until it is written.
+
+_lock         = threading.Lock()
+_pending      = {}  # uncompressed path -> compressed path
+_busy         = {}  # path -> event set when its decompression is finished
+_materialised = []  # temporary files decompressed in place
+
+def gunzip_lazy ( source_filepath, baseDirPath="" ):
+    # returns uncompressed name of file, relative to baseDirPath as
+    # source_filepath
+    dest_path = os.path.splitext ( source_filepath )[0]
+    with _lock:
+        _pending[os.path.join(baseDirPath,dest_path)] = \
+                                os.path.join(baseDirPath,source_filepath)
+    return dest_path
+
+def _source ( fpath, claim=False ):
+    # waits while fpath is being decompressed by another thread and returns
+    # its compressed source, or None. If claim is True, fpath is taken off
+    # the pending list and marked as being decompressed by caller, who must
+    # call _release() afterwards.
+    while True:
+        with _lock:
+            event = _busy.get ( fpath )
+            if event is None:
+                if not claim:
+                    return _pending.get ( fpath,None )
+                source = _pending.pop ( fpath,None )
+                if source:
+                    _busy[fpath] = threading.Event()
+                return source
+        event.wait()
+
+def _release ( fpath, source=None ):
+    # ends decompression of fpath; source is put back on the pending list
+    # if decompression has failed
+    with _lock:
+        if source:
+            _pending[fpath] = source
+        _busy.pop(fpath).set()
+    return
+
+def is_pending ( fpath ):
+    return _source(fpath) is not None
+
+def input_path ( fpath ):
+    # path to read file fpath from: compressed original if fpath was not
+    # decompressed yet
+    return _source(fpath) or fpath
+
+def open_input ( fpath, mode="r" ):
+    # opens file for reading, decompressing on the fly as needed
+    source = _source ( fpath )
+    if source:
+        if "b" not in mode and "t" not in mode:
+            mode += "t"
+        return gzip.open ( source,mode )
+    return open ( fpath,mode )
+
+def _decompress ( source, dest ):
+    pigz = shutil.which ( "pigz" )
+    if pigz:
+        with open(dest,'wb') as dfile:
+            if subprocess.call([pigz,"-d","-c",source],stdout=dfile)==0:
+                return
+    with gzip.open(source,'rb') as sfile, open(dest,'wb') as dfile:
+        shutil.copyfileobj ( sfile, dfile, 1048576 )
+    return
+
+def materialise ( fpath, dest_filepath=None ):
+    # makes plain file for fpath (at dest_filepath, if given); returns its
+    # path. Threads asking for the same file wait until it is written.
+    source = _source ( fpath,claim=True )
+    dest   = dest_filepath or fpath
+    if source:
+        try:
+            _decompress ( source,dest )
+        except:
+            if os.path.isfile(dest):
+                os.remove ( dest )
+            _release ( fpath,source )
+            raise
+        if not dest_filepath:
+            with _lock:
+                _materialised.append ( dest )
+        _release ( fpath )
+    elif dest_filepath:
+        os.rename ( fpath,dest_filepath )
+    return dest
+
+def rename ( fpath, dest_filepath ):
+    # os.rename() for files which may be not decompressed yet
+    source = _source ( fpath,claim=True )
+    if source:
+        with _lock:
+            _pending[dest_filepath] = source
+        _release ( fpath )
+        return
+    os.rename ( fpath,dest_filepath )
+    return
+
+def cleanup():
+    # removes temporary files decompressed in place and forgets all files
+    # registered with gunzip_lazy()
+    with _lock:
+        for fpath in _materialised:
+            if os.path.isfile(fpath):
+                os.remove ( fpath )
+        del _materialised[:]
+        _pending.clear()
+    return